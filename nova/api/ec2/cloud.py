@@ -1046,23 +1046,38 @@ class CloudController(object):
             instances_set.append(i)
         return {'instancesSet': instances_set}
 
+    @staticmethod
+    def _volume_bdms(bdms):
+        return [bdm for bdm in bdms
+                if bdm['volume_id'] is not None and not bdm['no_device']]
+
     def _format_instance_bdm(self, context, instance_uuid, root_device_name,
-                             result):
-        """Format InstanceBlockDeviceMappingResponseItemType."""
+                             result, bdms=None, volumes=None):
+        """Format InstanceBlockDeviceMappingResponseItemType.
+
+        The block device mappings of the instance and the volumes they
+        refer to can be passed in, when they have been looked up for many
+        instances at once.
+        """
         root_device_type = 'instance-store'
         mapping = []
-        for bdm in db.block_device_mapping_get_all_by_instance(context,
-                                                               instance_uuid):
+        if bdms is None:
+            bdms = db.block_device_mapping_get_all_by_instance(context,
+                                                               instance_uuid)
+        bdms = self._volume_bdms(bdms)
+        if volumes is None:
+            volumes = self.volume_api.get_many(
+                    context, [bdm['volume_id'] for bdm in bdms])
+        for bdm in bdms:
             volume_id = bdm['volume_id']
-            if (volume_id is None or bdm['no_device']):
-                continue
-
             if (bdm['device_name'] == root_device_name and
                 (bdm['snapshot_id'] or bdm['volume_id'])):
                 assert not bdm['virtual_name']
                 root_device_type = 'ebs'
 
-            vol = self.volume_api.get(context, volume_id)
+            vol = volumes.get(volume_id)
+            if vol is None:
+                raise exception.VolumeNotFound(volume_id=volume_id)
             LOG.debug(_("vol = %s\n"), vol)
             # TODO(yamahata): volume attach time
             ebs = {'volumeId': volume_id,
@@ -1131,6 +1146,16 @@ class CloudController(object):
             except exception.NotFound:
                 instances = []
 
+        # Resolve the volumes attached to all the instances at once
+        bdms = {}
+        for instance in instances:
+            bdms[instance['uuid']] = self._volume_bdms(
+                    db.block_device_mapping_get_all_by_instance(
+                            context, instance['uuid']))
+        volumes = self.volume_api.get_many(context,
+                [bdm['volume_id'] for instance_bdms in bdms.values()
+                 for bdm in instance_bdms])
+
         for instance in instances:
             if not context.is_admin:
                 if pipelib.is_vpn_image(instance['image_ref']):
@@ -1176,7 +1201,9 @@ class CloudController(object):
             i['amiLaunchIndex'] = instance['launch_index']
             self._format_instance_root_device_name(instance, i)
             self._format_instance_bdm(context, instance['uuid'],
-                                      i['rootDeviceName'], i)
+                                      i['rootDeviceName'], i,
+                                      bdms=bdms[instance['uuid']],
+                                      volumes=volumes)
             host = instance['host']
             zone = ec2utils.get_availability_zone_by_host(host)
             i['placement'] = {'availabilityZone': zone}
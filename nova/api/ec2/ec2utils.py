@@ -132,13 +132,7 @@ def get_ip_info_for_instance_from_nw_info(nw_info):
 
 def get_ip_info_for_instance(context, instance):
     """Return a dictionary of IP information for an instance."""
-
-    info_cache = instance['info_cache'] or {}
-    cached_nwinfo = info_cache.get('network_info')
-    # Make sure empty response is turned into []
-    if not cached_nwinfo:
-        cached_nwinfo = []
-    nw_info = network_model.NetworkInfo.hydrate(cached_nwinfo)
+    nw_info = network_model.CachedNetworkInfo.for_instance(instance)
     return get_ip_info_for_instance_from_nw_info(nw_info)
 
 
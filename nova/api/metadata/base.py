@@ -399,12 +399,17 @@ class InstanceMetadata():
             yield ('%s/%s/%s' % ("openstack", CONTENT_DIR, cid), content)
 
 
-def get_metadata_by_address(conductor_api, address):
-    ctxt = context.get_admin_context()
+def get_instance_uuid_by_address(address, ctxt=None):
+    ctxt = ctxt or context.get_admin_context()
     fixed_ip = network.API().get_fixed_ip_by_address(ctxt, address)
+    return fixed_ip['instance_uuid']
 
+
+def get_metadata_by_address(conductor_api, address):
+    ctxt = context.get_admin_context()
     return get_metadata_by_instance_id(conductor_api,
-                                       fixed_ip['instance_uuid'],
+                                       get_instance_uuid_by_address(address,
+                                                                    ctxt),
                                        address,
                                        ctxt)
 
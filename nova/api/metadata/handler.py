@@ -26,14 +26,12 @@ import webob.dec
 import webob.exc
 
 from nova.api.metadata import base
+from nova.api.metadata import store
 from nova import conductor
 from nova import exception
 from nova.openstack.common import log as logging
-from nova.openstack.common import memorycache
 from nova import wsgi
 
-CACHE_EXPIRATION = 15  # in seconds
-
 CONF = cfg.CONF
 CONF.import_opt('use_forwarded_for', 'nova.api.auth')
 
@@ -58,40 +56,42 @@ class MetadataRequestHandler(wsgi.Application):
     """Serve metadata."""
 
     def __init__(self):
-        self._cache = memorycache.get_client()
+        self._store = store.MetadataStore()
         self.conductor_api = conductor.API()
 
     def get_metadata_by_remote_address(self, address):
         if not address:
             raise exception.FixedIpNotFoundForAddress(address=address)
 
-        cache_key = 'metadata-%s' % address
-        data = self._cache.get(cache_key)
+        data = self._store.get(address)
         if data:
             return data
 
         try:
-            data = base.get_metadata_by_address(self.conductor_api, address)
+            instance_uuid = base.get_instance_uuid_by_address(address)
         except exception.NotFound:
             return None
 
-        self._cache.set(cache_key, data, CACHE_EXPIRATION)
-
-        return data
+        return self._build_metadata(address, instance_uuid, address)
 
     def get_metadata_by_instance_id(self, instance_id, address):
-        cache_key = 'metadata-%s' % instance_id
-        data = self._cache.get(cache_key)
+        data = self._store.get(instance_id)
         if data:
             return data
 
+        return self._build_metadata(instance_id, instance_id, address)
+
+    def _build_metadata(self, name, instance_uuid, address):
+        # NOTE: the version is read before the metadata is built, so that
+        # an invalidation racing with the build discards the document.
+        version = self._store.get_version(instance_uuid)
         try:
             data = base.get_metadata_by_instance_id(self.conductor_api,
-                                                    instance_id, address)
+                                                    instance_uuid, address)
         except exception.NotFound:
             return None
 
-        self._cache.set(cache_key, data, CACHE_EXPIRATION)
+        self._store.put(name, instance_uuid, version, data)
 
         return data
 
@@ -0,0 +1,141 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Store of the instance metadata documents served by the metadata API.
+
+Building the metadata of an instance takes several conductor and network
+API calls, and cloud-init fetches dozens of paths per guest while it boots.
+The documents are built once and kept in memcached when memcached_servers
+is set, so that they are shared by all the metadata API workers. The
+services changing an instance or its network info invalidate them, rather
+than letting them expire after a few seconds.
+"""
+
+from oslo.config import cfg
+
+from nova.openstack.common import log as logging
+from nova.openstack.common import memorycache
+from nova.openstack.common import uuidutils
+
+metadata_store_opts = [
+    cfg.IntOpt('metadata_cache_expiration',
+               default=300,
+               help='Number of seconds the metadata documents are kept in '
+                    'memcached. They are invalidated as soon as the instance '
+                    'or its network info change, so this only bounds how '
+                    'long other changes, e.g. to security groups, take to '
+                    'show. Only used if memcached_servers is set, otherwise '
+                    'each metadata API worker keeps the documents for 15 '
+                    'seconds.'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(metadata_store_opts)
+CONF.import_opt('memcached_servers', 'nova.openstack.common.memorycache')
+
+LOG = logging.getLogger(__name__)
+
+LOCAL_CACHE_EXPIRATION = 15  # in seconds
+
+_STORE = None
+
+
+class MetadataStore(object):
+    """Metadata documents, keyed by fixed ip address or instance id.
+
+    Each document is stored along with the version of the metadata of its
+    instance at the time. Invalidating an instance replaces its version,
+    so that its documents are all ignored from then on, without having to
+    keep track of their keys. A document whose instance version is missing,
+    e.g. because memcached evicted it, is ignored as well.
+    """
+
+    def __init__(self):
+        self._cache = memorycache.get_client()
+
+    def _get_expiration(self):
+        if CONF.memcached_servers:
+            return CONF.metadata_cache_expiration
+        return LOCAL_CACHE_EXPIRATION
+
+    def _get_key(self, name):
+        return str('metadata-%s' % name)
+
+    def _get_version_key(self, instance_uuid):
+        return str('metadata-version-%s' % instance_uuid)
+
+    def get(self, name):
+        """Return the document stored under an address or instance id."""
+        document = self._cache.get(self._get_key(name))
+        if not document:
+            return None
+        instance_uuid, version, metadata = document
+        if self._cache.get(self._get_version_key(instance_uuid)) != version:
+            return None
+        return metadata
+
+    def get_version(self, instance_uuid):
+        """Return the current version of the metadata of an instance.
+
+        It has to be read before building a document and given to put(),
+        so that a document built while the instance is invalidated is
+        ignored. Returns None if no version could be stored.
+        """
+        version_key = self._get_version_key(instance_uuid)
+        version = self._cache.get(version_key)
+        if version is None:
+            # NOTE: add() so that concurrent workers agree on one version
+            self._cache.add(version_key, uuidutils.generate_uuid(),
+                            self._get_expiration())
+            version = self._cache.get(version_key)
+        return version
+
+    def put(self, name, instance_uuid, version, metadata):
+        """Store the metadata document of an instance under a name.
+
+        version is the one returned by get_version() before the document
+        was built.
+        """
+        if version is None:
+            return
+        self._cache.set(self._get_key(name),
+                        (instance_uuid, version, metadata),
+                        self._get_expiration())
+
+    def invalidate(self, instance_uuid):
+        """Forget the metadata documents of an instance."""
+        self._cache.set(self._get_version_key(instance_uuid),
+                        uuidutils.generate_uuid(), self._get_expiration())
+
+
+def invalidate(instance):
+    """Invalidate the metadata documents of an instance which changed.
+
+    This is a no-op unless memcached_servers is set, since the metadata API
+    workers cannot share documents otherwise. Errors are logged and never
+    propagated to the caller.
+    """
+    global _STORE
+    if not CONF.memcached_servers:
+        return
+    try:
+        if _STORE is None:
+            _STORE = MetadataStore()
+        _STORE.invalidate(instance['uuid'])
+    except Exception:
+        LOG.exception(_('Failed to invalidate the metadata of the instance'),
+                      instance=instance)
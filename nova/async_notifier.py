@@ -0,0 +1,183 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Notification driver publishing notifications from a background sender.
+
+The rpc notifier publishes every notification on the message bus from the
+greenthread emitting it, so the broker round-trip adds to the latency of
+API requests and compute operations. This driver only puts notifications
+in a bounded in-process queue. A background greenthread takes them off the
+queue in batches and publishes them to the notification_topics, grouped by
+topic.
+
+To use it, set notification_driver=nova.async_notifier instead of
+nova.openstack.common.notifier.rpc_notifier.
+"""
+
+import eventlet
+from eventlet import queue
+from oslo.config import cfg
+
+from nova.openstack.common import context as req_context
+from nova.openstack.common import log as logging
+from nova.openstack.common import rpc
+
+async_notifier_opts = [
+    cfg.IntOpt('async_notification_queue_size',
+               default=1000,
+               help='Maximum number of notifications waiting to be sent by '
+                    'the async notifier'),
+    cfg.IntOpt('async_notification_batch_size',
+               default=50,
+               help='Maximum number of notifications the async notifier '
+                    'takes off its queue at once'),
+    cfg.StrOpt('async_notification_overflow_policy',
+               default='block',
+               help='What the async notifier does with a notification '
+                    'when its queue is full: "block" the caller until there '
+                    'is room, or "drop" the notification'),
+    cfg.IntOpt('async_notification_flush_timeout',
+               default=10,
+               help='Maximum number of seconds a stopping service waits for '
+                    'the async notifier to send the notifications still in '
+                    'its queue'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(async_notifier_opts)
+CONF.import_opt('notification_topics',
+                'nova.openstack.common.notifier.rpc_notifier')
+CONF.import_opt('default_notification_level',
+                'nova.openstack.common.notifier.api')
+
+LOG = logging.getLogger(__name__)
+
+_queue = None
+_sender = None
+_stats = None
+
+
+def _reset():
+    """Used by unit tests to reset the queue and the counters."""
+    global _queue, _sender, _stats
+    if _sender is not None:
+        _sender.kill()
+    _queue = queue.Queue(max(1, CONF.async_notification_queue_size))
+    _sender = None
+    _stats = {'sent': 0, 'dropped': 0, 'failed': 0}
+
+
+def _get_queue():
+    global _sender
+    if _queue is None:
+        _reset()
+    if _sender is None or _sender.dead:
+        if _sender is not None:
+            LOG.error(_("The async notification sender died, restarting "
+                        "it"))
+        _sender = eventlet.spawn(_send_notifications)
+    return _queue
+
+
+def get_stats():
+    """Return the queue depth and the sent, dropped and failed counters."""
+    if _queue is None:
+        _reset()
+    return dict(_stats, queue_depth=_queue.qsize())
+
+
+def flush(timeout=None):
+    """Wait until all the queued notifications have been sent.
+
+    Gives up after timeout seconds if one is given. Returns whether the
+    queue was emptied.
+    """
+    # NOTE: join() blocks on a queue nothing was ever put in
+    if _queue is None or not _queue.unfinished_tasks:
+        return True
+    with eventlet.Timeout(timeout, False):
+        _queue.join()
+        return True
+    LOG.warn(_("Timed out after %(timeout)s seconds waiting for "
+               "%(count)d notifications to be sent"),
+             {'timeout': timeout, 'count': _queue.unfinished_tasks})
+    return False
+
+
+def notify(context, message):
+    """Queues a notification to be sent via RPC."""
+    if not context:
+        context = req_context.get_admin_context()
+    notifications = _get_queue()
+    if CONF.async_notification_overflow_policy == 'drop':
+        try:
+            notifications.put_nowait((context, message))
+        except queue.Full:
+            _stats['dropped'] += 1
+            LOG.warn(_("Dropped notification %(event_type)s because the "
+                       "notification queue is full"),
+                     {'event_type': message.get('event_type')})
+    else:
+        notifications.put((context, message))
+
+
+def _get_batch(notifications):
+    batch = [notifications.get()]
+    while (len(batch) < CONF.async_notification_batch_size and
+           not notifications.empty()):
+        batch.append(notifications.get_nowait())
+    return batch
+
+
+def _send_batch(batch):
+    """Publish a batch of notifications, topic by topic."""
+    by_topic = {}
+    topics = []
+    for index, (context, message) in enumerate(batch):
+        priority = message.get('priority',
+                               CONF.default_notification_level).lower()
+        for topic in CONF.notification_topics:
+            topic = '%s.%s' % (topic, priority)
+            if topic not in by_topic:
+                by_topic[topic] = []
+                topics.append(topic)
+            by_topic[topic].append((index, context, message))
+
+    # A notification counts as failed if it could not be sent to one of
+    # its topics, and as sent otherwise.
+    failed = set()
+    for topic in topics:
+        for index, context, message in by_topic[topic]:
+            try:
+                rpc.notify(context, topic, message)
+            except Exception:
+                failed.add(index)
+                LOG.exception(_("Could not send notification to %(topic)s. "
+                                "Payload=%(message)s"), locals())
+    _stats['failed'] += len(failed)
+    _stats['sent'] += len(batch) - len(failed)
+
+
+def _send_notifications():
+    notifications = _queue
+    while True:
+        batch = _get_batch(notifications)
+        try:
+            _send_batch(batch)
+        finally:
+            for _item in batch:
+                notifications.task_done()
@@ -0,0 +1,57 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Capacity Filter.  Only pass cells that have reported enough free RAM and
+disk for all of the requested instances.
+"""
+
+from nova.cells import filters
+from nova.openstack.common import log as logging
+
+LOG = logging.getLogger(__name__)
+
+
+class CapacityFilter(filters.BaseCellFilter):
+    """Filter out cells that cannot fit the requested instances."""
+
+    def _free_units(self, cell, resource, size_mb):
+        capacity = cell.capacities.get(resource)
+        if not capacity:
+            return None
+        return capacity.get('units_by_mb', {}).get(str(size_mb))
+
+    def cell_passes(self, cell, filter_properties):
+        """Cells that have not reported their capacity yet, and requests
+        without an instance type, always pass.
+        """
+        request_spec = filter_properties.get('request_spec', {})
+        instance_type = request_spec.get('instance_type')
+        if not instance_type or not cell.capacities:
+            return True
+        num_instances = len(request_spec.get('instance_uuids', [])) or 1
+        memory_mb = instance_type['memory_mb']
+        disk_mb = (instance_type['root_gb'] +
+                   instance_type['ephemeral_gb']) * 1024
+
+        ram_units = self._free_units(cell, 'ram_free', memory_mb)
+        disk_units = self._free_units(cell, 'disk_free', disk_mb)
+        for units in (ram_units, disk_units):
+            if units is not None and units < num_instances:
+                LOG.debug(_("%(cell)s can only fit %(units)s instance(s) "
+                            "of %(memory_mb)s MB RAM and %(disk_mb)s MB disk, "
+                            "%(num_instances)s requested."), locals())
+                return False
+        return True
@@ -41,7 +41,13 @@ cell_manager_opts = [
                         "or deleted to continue to update cells"),
         cfg.IntOpt("instance_update_num_instances",
                 default=1,
-                help="Number of instances to update per periodic task run")
+                help="Number of instances to update per periodic task run"),
+        cfg.IntOpt("instance_full_heal_interval",
+                default=0,
+                help="Number of seconds between two full passes over the "
+                        "instances to update cells. Passes in between only "
+                        "include instances updated since the previous pass "
+                        "started. Set to 0 to make every pass a full one")
 ]
 
 
@@ -49,6 +55,8 @@ LOG = logging.getLogger(__name__)
 
 CONF = cfg.CONF
 CONF.register_opts(cell_manager_opts, group='cells')
+CONF.import_opt('instance_sync_batch_size', 'nova.cells.messaging',
+                group='cells')
 
 
 class CellsManager(manager.Manager):
@@ -80,6 +88,9 @@ class CellsManager(manager.Manager):
                 CONF.cells.driver)
         self.driver = cells_driver_cls()
         self.instances_to_heal = iter([])
+        self.heal_pass_started_at = None
+        self.heal_watermark = None
+        self.last_full_heal_at = None
 
     def post_start_hook(self):
         """Have the driver start its consumers for inter-cell communication.
@@ -116,7 +127,15 @@ class CellsManager(manager.Manager):
         'CONF.cells.instance_update_num_instances' number of instances.
         When we get the list of instances, we shuffle them so that multiple
         nova-cells services aren't attempting to sync the same instances
-        in lockstep.
+        in lockstep.  The instances are read again right before being
+        sent, in batches of at most 'CONF.cells.instance_sync_batch_size'
+        per message.
+
+        If CONF.cells.instance_full_heal_interval is set, healing is
+        incremental between full passes: once a pass over the list has been
+        sent, the time the pass started becomes the watermark and the
+        next pass only includes instances updated after it.  A full pass
+        is made again once the interval has elapsed since the last one.
 
         If CONF.cells.instance_update_at_threshold is set, only attempt
         to sync instances that have been updated recently.  The CONF
@@ -137,11 +156,28 @@ class CellsManager(manager.Manager):
             except StopIteration:
                 if info['updated_list']:
                     return
+                if self.heal_pass_started_at is not None:
+                    # Everything updated before the previous pass
+                    # started has now been sent.
+                    self.heal_watermark = self.heal_pass_started_at
+                now = timeutils.utcnow()
+                self.heal_pass_started_at = now
+                full_interval = CONF.cells.instance_full_heal_interval
+                full_pass = (full_interval <= 0 or
+                             self.last_full_heal_at is None or
+                             timeutils.is_older_than(self.last_full_heal_at,
+                                                     full_interval))
+                if full_pass:
+                    self.last_full_heal_at = now
                 threshold = CONF.cells.instance_updated_at_threshold
                 updated_since = None
                 if threshold > 0:
                     updated_since = timeutils.utcnow() - datetime.timedelta(
                             seconds=threshold)
+                if (not full_pass and self.heal_watermark is not None and
+                        (updated_since is None or
+                         self.heal_watermark > updated_since)):
+                    updated_since = self.heal_watermark
                 self.instances_to_heal = cells_utils.get_instances_to_sync(
                         ctxt, updated_since=updated_since, shuffle=True,
                         uuids_only=True)
@@ -152,22 +188,36 @@ class CellsManager(manager.Manager):
                     return
             return instance
 
-        rd_context = ctxt.elevated(read_deleted='yes')
-
+        instance_uuids = []
         for i in xrange(CONF.cells.instance_update_num_instances):
-            while True:
-                # Yield to other greenthreads
-                time.sleep(0)
-                instance_uuid = _next_instance()
-                if not instance_uuid:
-                    return
-                try:
-                    instance = self.db.instance_get_by_uuid(rd_context,
-                            instance_uuid)
-                except exception.InstanceNotFound:
-                    continue
-                self._sync_instance(ctxt, instance)
+            instance_uuid = _next_instance()
+            if not instance_uuid:
                 break
+            instance_uuids.append(instance_uuid)
+
+        rd_context = ctxt.elevated(read_deleted='yes')
+        batch_size = max(CONF.cells.instance_sync_batch_size, 1)
+        for batch in cells_utils.batch_instances(instance_uuids, batch_size):
+            # Yield to other greenthreads
+            time.sleep(0)
+            # NOTE: the list of uuids can be many periodic runs old, so
+            # read the instances right before sending them up.
+            instances = self.db.instance_get_all_by_filters(rd_context,
+                    {'uuid': batch}, 'deleted', 'asc')
+            if instances:
+                self._sync_instances(ctxt, instances)
+
+    def _sync_instances(self, ctxt, instances):
+        """Send instance updates and destroys up to parent cells, using
+        batched messages unless batching is disabled.
+        """
+        batch_size = CONF.cells.instance_sync_batch_size
+        if batch_size <= 1:
+            for instance in instances:
+                self._sync_instance(ctxt, instance)
+            return
+        for batch in cells_utils.batch_instances(instances, batch_size):
+            self.msg_runner.sync_instances_at_top(ctxt, batch)
 
     def _sync_instance(self, ctxt, instance):
         """Broadcast an instance_update or instance_destroy message up to
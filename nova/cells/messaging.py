@@ -52,7 +52,14 @@ cell_messaging_opts = [
             help='Maximum number of hops for cells routing.'),
     cfg.StrOpt('scheduler',
             default='nova.cells.scheduler.CellsScheduler',
-            help='Cells scheduler to use')]
+            help='Cells scheduler to use'),
+    cfg.IntOpt('instance_sync_batch_size',
+            default=1,
+            help='Maximum number of instances to send to parent cells in '
+                 'a single compressed message when syncing instances. '
+                 'The default of 1 sends one message per instance, as '
+                 'expected by parent cells that do not support batched '
+                 'syncs; only raise it once all parent cells do.')]
 
 CONF = cfg.CONF
 CONF.import_opt('name', 'nova.cells.opts', group='cells')
@@ -766,6 +773,9 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
         """Update an instance in the DB if we're a top level cell."""
         if not self._at_the_top():
             return
+        self._update_instance_at_top(message, instance)
+
+    def _update_instance_at_top(self, message, instance):
         instance_uuid = instance['uuid']
 
         # Remove things that we can't update in the top level cells.
@@ -819,6 +829,9 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
         """Destroy an instance from the DB if we're a top level cell."""
         if not self._at_the_top():
             return
+        self._destroy_instance_at_top(message, instance)
+
+    def _destroy_instance_at_top(self, message, instance):
         instance_uuid = instance['uuid']
         LOG.debug(_("Got update to delete instance %(instance_uuid)s") %
                 locals())
@@ -828,6 +841,22 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
         except exception.InstanceNotFound:
             pass
 
+    def sync_instances_at_top(self, message, packed_instances, **kwargs):
+        """Update or destroy a batch of instances in the DB if we're a
+        top level cell.  The instances arrive compressed in a single
+        message; see cells_utils.pack_instances().
+        """
+        if not self._at_the_top():
+            return
+        instances = cells_utils.unpack_instances(packed_instances)
+        num_instances = len(instances)
+        LOG.debug(_("Got sync for %(num_instances)d instance(s)"), locals())
+        for instance in instances:
+            if instance['deleted']:
+                self._destroy_instance_at_top(message, instance)
+            else:
+                self._update_instance_at_top(message, instance)
+
     def instance_delete_everywhere(self, message, instance, delete_type,
                                    **kwargs):
         """Call compute API delete() or soft_delete() in every cell.
@@ -877,8 +906,13 @@ class _BroadcastMessageMethods(_BaseMessageMethods):
         instances = cells_utils.get_instances_to_sync(message.ctxt,
                 updated_since=updated_since, project_id=project_id,
                 deleted=deleted)
-        for instance in instances:
-            self._sync_instance(message.ctxt, instance)
+        batch_size = CONF.cells.instance_sync_batch_size
+        if batch_size <= 1:
+            for instance in instances:
+                self._sync_instance(message.ctxt, instance)
+            return
+        for batch in cells_utils.batch_instances(instances, batch_size):
+            self.msg_runner.sync_instances_at_top(message.ctxt, batch)
 
     def service_get_all(self, message, filters):
         if filters is None:
@@ -1114,6 +1148,16 @@ class MessageRunner(object):
                                     run_locally=False)
         message.process()
 
+    def sync_instances_at_top(self, ctxt, instances):
+        """Update or destroy a batch of instances at the top level cell
+        using a single message.
+        """
+        packed_instances = cells_utils.pack_instances(instances)
+        message = _BroadcastMessage(self, ctxt, 'sync_instances_at_top',
+                                    dict(packed_instances=packed_instances),
+                                    'up', run_locally=False)
+        message.process()
+
     def instance_delete_everywhere(self, ctxt, instance, delete_type):
         """This is used by API cell when it didn't know what cell
         an instance was in, but the instance was requested to be
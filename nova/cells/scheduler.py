@@ -21,6 +21,8 @@ import time
 
 from oslo.config import cfg
 
+from nova.cells import filters
+from nova.cells import weights
 from nova import compute
 from nova.compute import instance_actions
 from nova.compute import utils as compute_utils
@@ -31,6 +33,16 @@ from nova.openstack.common import log as logging
 from nova.scheduler import rpcapi as scheduler_rpcapi
 
 cell_scheduler_opts = [
+        cfg.ListOpt('scheduler_filter_classes',
+                default=['nova.cells.filters.all_filters'],
+                help='Filter classes the cells scheduler should use.  '
+                        'An entry of "nova.cells.filters.all_filters" '
+                        'maps to all cells filters included with nova.'),
+        cfg.ListOpt('scheduler_weight_classes',
+                default=['nova.cells.weights.all_weighers'],
+                help='Weigher classes the cells scheduler should use.  '
+                        'An entry of "nova.cells.weights.all_weighers" '
+                        'maps to all cell weighers included with nova.'),
         cfg.IntOpt('scheduler_retries',
                 default=10,
                 help='How many retries when no cells are available.'),
@@ -55,6 +67,12 @@ class CellsScheduler(base.Base):
         self.state_manager = msg_runner.state_manager
         self.compute_api = compute.API()
         self.scheduler_rpcapi = scheduler_rpcapi.SchedulerAPI()
+        self.filter_handler = filters.CellFilterHandler()
+        self.filter_classes = self.filter_handler.get_matching_classes(
+                CONF.cells.scheduler_filter_classes)
+        self.weight_handler = weights.CellWeightHandler()
+        self.weigher_classes = self.weight_handler.get_matching_classes(
+                CONF.cells.scheduler_weight_classes)
 
     def _create_instances_here(self, ctxt, request_spec):
         instance_values = request_spec['instance_properties']
@@ -86,22 +104,39 @@ class CellsScheduler(base.Base):
             cells.add(our_cell)
         return cells
 
+    def _grab_target_cell(self, filter_properties):
+        """Filter the possible cells and return the one with the highest
+        weight.  If no cells pass, raise exception.NoCellsAvailable
+        """
+        cells = self._get_possible_cells()
+        cells = self.filter_handler.get_filtered_objects(self.filter_classes,
+                                                         cells,
+                                                         filter_properties)
+        if not cells:
+            raise exception.NoCellsAvailable()
+        # Shuffle first so that equally weighted cells are picked at
+        # random.
+        random.shuffle(cells)
+        weighted_cells = self.weight_handler.get_weighed_objects(
+                self.weigher_classes, cells, filter_properties)
+        LOG.debug(_("Weighted cells: %(weighted_cells)s"), locals())
+        return weighted_cells[0].obj
+
     def _run_instance(self, message, host_sched_kwargs):
         """Attempt to schedule instance(s).  If we have no cells
         to try, raise exception.NoCellsAvailable
         """
         ctxt = message.ctxt
+        routing_path = message.routing_path
         request_spec = host_sched_kwargs['request_spec']
-
-        # The message we might forward to a child cell
-        cells = self._get_possible_cells()
-        if not cells:
-            raise exception.NoCellsAvailable()
-        cells = list(cells)
-
-        # Random selection for now
-        random.shuffle(cells)
-        target_cell = cells[0]
+        filter_properties = {'context': ctxt,
+                             'scheduler': self,
+                             'routing_path': routing_path,
+                             'host_sched_kwargs': host_sched_kwargs,
+                             'request_spec': request_spec}
+
+        # The cell we might forward the message to
+        target_cell = self._grab_target_cell(filter_properties)
 
         LOG.debug(_("Scheduling with routing_path=%(routing_path)s"),
                 locals())
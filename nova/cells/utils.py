@@ -16,9 +16,12 @@
 """
 Cells Utility Methods
 """
+import base64
 import random
+import zlib
 
 from nova import db
+from nova.openstack.common import jsonutils
 
 # Separator used between cell names for the 'full cell name' and routing
 # path
@@ -54,6 +57,33 @@ def get_instances_to_sync(context, updated_since=None, project_id=None,
             yield instance
 
 
+def batch_instances(instances, batch_size):
+    """Return a generator that will return lists of at most
+    'batch_size' instances taken from 'instances'.
+    """
+    batch = []
+    for instance in instances:
+        batch.append(instance)
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+def pack_instances(instances):
+    """Serialize a list of instances into a compressed string suitable
+    for sending to another cell in a single message.
+    """
+    return base64.b64encode(zlib.compress(jsonutils.dumps(instances)))
+
+
+def unpack_instances(packed_instances):
+    """Reverse of pack_instances()."""
+    return jsonutils.loads(zlib.decompress(base64.b64decode(
+            packed_instances)))
+
+
 def cell_with_item(cell_name, item):
     """Turn cell_name and item into <cell_name>@<item>."""
     if cell_name is None:
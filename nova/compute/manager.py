@@ -60,6 +60,7 @@ from nova import manager
 from nova import network
 from nova.network import model as network_model
 from nova.network.security_group import openstack_driver
+from nova import notifications
 from nova.openstack.common import excutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import lockutils
@@ -104,6 +105,12 @@ compute_opts = [
                 default=False,
                 help='Whether to start guests that were running before the '
                      'host rebooted'),
+    cfg.BoolOpt('batch_resource_audit',
+                default=True,
+                help='When the virt driver manages several nodes, audit '
+                     'their resources together: fetch the instances and '
+                     'migrations of all nodes with one call each and '
+                     'update their compute node records in one batch'),
     ]
 
 interval_opts = [
@@ -124,6 +131,10 @@ interval_opts = [
     cfg.IntOpt('reclaim_instance_interval',
                default=0,
                help='Interval in seconds for reclaiming deleted instances'),
+    cfg.IntOpt('span_histograms_save_interval',
+               default=60,
+               help='Interval in seconds for saving the span histograms '
+                    'used by nova-manage timing list'),
     cfg.IntOpt('volume_usage_poll_interval',
                default=0,
                help='Interval in seconds for gathering volume usages'),
@@ -181,6 +192,63 @@ CONF.import_opt('enable', 'nova.cells.opts', group='cells')
 
 LOG = logging.getLogger(__name__)
 
+# What _sync_instance_power_state() does when the hypervisor reports a power
+# state which does not match the vm_state of an instance.  Maps a vm_state to
+# the power states consistent with it, the actions for some of the other
+# power states and the action for the rest.  An action is a pair of whether
+# to call the stop API and the warning to log.  Other vm_states are ignored.
+_POWER_STATE_SYNC_RULES = {
+    vm_states.ACTIVE: (
+        (power_state.RUNNING, power_state.BUILDING),
+        {power_state.SUSPENDED: (True, _("Instance is suspended "
+                                         "unexpectedly. Calling the stop "
+                                         "API.")),
+         # Note(maoy): a VM may get into the paused state not only
+         # because the user request via API calls, but also
+         # due to (temporary) external instrumentations.
+         # Before the virt layer can reliably report the reason,
+         # we simply ignore the state discrepancy. In many cases,
+         # the VM state will go back to running after the external
+         # instrumentation is done. See bug 1097806 for details.
+         power_state.PAUSED: (False, _("Instance is paused unexpectedly. "
+                                       "Ignore.")),
+         # Occasionally, depending on the status of the hypervisor,
+         # which could be restarting for example, an instance may
+         # not be found.  Therefore just log the condidtion.
+         power_state.NOSTATE: (False, _("Instance is unexpectedly not "
+                                        "found. Ignore."))},
+        # The only rational power state should be RUNNING
+        (True, _("Instance shutdown by itself. Calling the stop API."))),
+    vm_states.STOPPED: (
+        (power_state.NOSTATE, power_state.SHUTDOWN, power_state.CRASHED),
+        {},
+        # Note(maoy): this assumes that the stop API is idempotent.
+        (True, _("Instance is not stopped. Calling the stop API."))),
+    # Note(maoy): this should be taken care of periodically in
+    # _cleanup_running_deleted_instances().
+    vm_states.SOFT_DELETED: (
+        (power_state.NOSTATE, power_state.SHUTDOWN),
+        {},
+        (False, _("Instance is not (soft-)deleted."))),
+    vm_states.DELETED: (
+        (power_state.NOSTATE, power_state.SHUTDOWN),
+        {},
+        (False, _("Instance is not (soft-)deleted."))),
+}
+
+
+def _get_power_state_sync_action(vm_state, vm_power_state):
+    """Return the (stop, warning) action of _POWER_STATE_SYNC_RULES for an
+    instance, or None if its power state is consistent with its vm_state.
+    """
+    rule = _POWER_STATE_SYNC_RULES.get(vm_state)
+    if rule is None:
+        return None
+    consistent_power_states, actions, default_action = rule
+    if vm_power_state in consistent_power_states:
+        return None
+    return actions.get(vm_power_state, default_action)
+
 
 def publisher_id(host=None):
     return notifier.publisher_id("compute", host)
@@ -611,6 +679,9 @@ class ComputeManager(manager.SchedulerDependentManager):
         """
         self.update_available_resource(nova.context.get_admin_context())
 
+    def cleanup_host(self):
+        self._save_span_histograms()
+
     def _get_power_state(self, context, instance):
         """Retrieve the power state for the given instance."""
         LOG.debug(_('Checking state'), instance=instance)
@@ -685,6 +756,10 @@ class ComputeManager(manager.SchedulerDependentManager):
         """Converts the model nw_info object to legacy style."""
         if self.driver.legacy_nwinfo():
             network_info = network_info.legacy()
+        elif isinstance(network_info, network_model.CachedNetworkInfo):
+            # NOTE: drivers are handed the full model, never the read-only
+            #       view of an info cache
+            network_info = network_info.model()
         return network_info
 
     def _setup_block_device_mapping(self, context, instance, bdms):
@@ -824,28 +899,31 @@ class ComputeManager(manager.SchedulerDependentManager):
             rt = self._get_resource_tracker(node)
             try:
                 limits = filter_properties.get('limits', {})
-                with rt.instance_claim(context, instance, limits):
-                    macs = self.driver.macs_for_instance(instance)
-
-                    network_info = self._allocate_network(context, instance,
-                            requested_networks, macs, security_groups)
-
-                    self._instance_update(
-                            context, instance['uuid'],
-                            vm_state=vm_states.BUILDING,
-                            task_state=task_states.BLOCK_DEVICE_MAPPING)
-
-                    block_device_info = self._prep_block_device(
-                            context, instance, bdms)
-
-                    set_access_ip = (is_first_time and
-                                     not instance['access_ip_v4'] and
-                                     not instance['access_ip_v6'])
-
-                    instance = self._spawn(context, instance, image_meta,
-                                           network_info, block_device_info,
-                                           injected_files, admin_password,
-                                           set_access_ip=set_access_ip)
+                with utils.collect_spans() as spans:
+                    with rt.instance_claim(context, instance, limits):
+                        macs = self.driver.macs_for_instance(instance)
+
+                        network_info = self._allocate_network(context,
+                                instance, requested_networks, macs,
+                                security_groups)
+
+                        self._instance_update(
+                                context, instance['uuid'],
+                                vm_state=vm_states.BUILDING,
+                                task_state=task_states.BLOCK_DEVICE_MAPPING)
+
+                        block_device_info = self._prep_block_device(
+                                context, instance, bdms)
+
+                        set_access_ip = (is_first_time and
+                                         not instance['access_ip_v4'] and
+                                         not instance['access_ip_v6'])
+
+                        instance = self._spawn(context, instance, image_meta,
+                                               network_info,
+                                               block_device_info,
+                                               injected_files, admin_password,
+                                               set_access_ip=set_access_ip)
             except exception.InstanceNotFound:
                 # the instance got deleted during the spawn
                 with excutils.save_and_reraise_exception():
@@ -871,6 +949,8 @@ class ComputeManager(manager.SchedulerDependentManager):
                         filter_properties, bdms)
             else:
                 # Spawn success:
+                extra_usage_info = dict(extra_usage_info,
+                                        timings=spans.to_dict())
                 self._notify_about_instance_usage(context, instance,
                         "create.end", network_info=network_info,
                         extra_usage_info=extra_usage_info)
@@ -878,6 +958,21 @@ class ComputeManager(manager.SchedulerDependentManager):
             with excutils.save_and_reraise_exception():
                 self._set_instance_error_state(context, instance['uuid'])
 
+    @manager.periodic_task(spacing=CONF.span_histograms_save_interval)
+    def _flush_span_histograms(self, context):
+        self._save_span_histograms()
+
+    def _save_span_histograms(self):
+        """Save the span histograms for nova-manage timing list."""
+        if not utils.span_histograms_changed():
+            return
+        try:
+            utils.save_span_histograms()
+        except (IOError, OSError) as e:
+            LOG.warn(_("Failed to save the span histograms to %(path)s: "
+                       "%(e)s") % {'path': CONF.span_histograms_path,
+                                   'e': e})
+
     def _log_original_error(self, exc_info, instance_uuid):
         type_, value, tb = exc_info
         LOG.error(_('Error: %s') %
@@ -1063,12 +1158,13 @@ class ComputeManager(manager.SchedulerDependentManager):
         is_vpn = pipelib.is_vpn_image(instance['image_ref'])
         try:
             # allocate and get network info
-            network_info = self.network_api.allocate_for_instance(
-                                context, instance, vpn=is_vpn,
-                                requested_networks=requested_networks,
-                                macs=macs,
-                                conductor_api=self.conductor_api,
-                                security_groups=security_groups)
+            with utils.span('allocate_network'):
+                network_info = self.network_api.allocate_for_instance(
+                                    context, instance, vpn=is_vpn,
+                                    requested_networks=requested_networks,
+                                    macs=macs,
+                                    conductor_api=self.conductor_api,
+                                    security_groups=security_groups)
         except Exception:
             with excutils.save_and_reraise_exception():
                 LOG.exception(_('Instance failed network setup'),
@@ -1082,7 +1178,9 @@ class ComputeManager(manager.SchedulerDependentManager):
     def _prep_block_device(self, context, instance, bdms):
         """Set up the block device for an instance with error logging."""
         try:
-            return self._setup_block_device_mapping(context, instance, bdms)
+            with utils.span('prep_block_device'):
+                return self._setup_block_device_mapping(context, instance,
+                                                        bdms)
         except Exception:
             with excutils.save_and_reraise_exception():
                 LOG.exception(_('Instance failed block device setup'),
@@ -1097,10 +1195,11 @@ class ComputeManager(manager.SchedulerDependentManager):
                 task_state=task_states.SPAWNING,
                 expected_task_state=task_states.BLOCK_DEVICE_MAPPING)
         try:
-            self.driver.spawn(context, instance, image_meta,
-                              injected_files, admin_password,
-                              self._legacy_nw_info(network_info),
-                              block_device_info)
+            with utils.span('driver_spawn'):
+                self.driver.spawn(context, instance, image_meta,
+                                  injected_files, admin_password,
+                                  self._legacy_nw_info(network_info),
+                                  block_device_info)
 
         except Exception:
             with excutils.save_and_reraise_exception():
@@ -1168,6 +1267,15 @@ class ComputeManager(manager.SchedulerDependentManager):
             self.conductor_api.block_device_mapping_get_all_by_instance(
                 context, instance))
 
+    def _get_bdm_volumes(self, context, bdms):
+        """Return the volumes of block device mappings, in one lookup."""
+        volumes = self.volume_api.get_many(
+                context, [bdm['volume_id'] for bdm in bdms])
+        for bdm in bdms:
+            if bdm['volume_id'] not in volumes:
+                raise exception.VolumeNotFound(volume_id=bdm['volume_id'])
+        return [volumes[bdm['volume_id']] for bdm in bdms]
+
     def _get_instance_volume_bdm(self, context, instance, volume_id):
         bdms = self._get_instance_volume_bdms(context, instance)
         for bdm in bdms:
@@ -2127,8 +2235,7 @@ class ComputeManager(manager.SchedulerDependentManager):
 
         connector = self.driver.get_volume_connector(instance)
 
-        for bdm in bdms:
-            volume = self.volume_api.get(context, bdm['volume_id'])
+        for bdm, volume in zip(bdms, self._get_bdm_volumes(context, bdms)):
             cinfo = self.volume_api.initialize_connection(
                     context, volume, connector)
 
@@ -2394,8 +2501,7 @@ class ComputeManager(manager.SchedulerDependentManager):
         bdms = self._get_instance_volume_bdms(context, instance)
         if bdms:
             connector = self.driver.get_volume_connector(instance)
-            for bdm in bdms:
-                volume = self.volume_api.get(context, bdm['volume_id'])
+            for volume in self._get_bdm_volumes(context, bdms):
                 self.volume_api.terminate_connection(context, volume,
                         connector)
 
@@ -3340,14 +3446,14 @@ class ComputeManager(manager.SchedulerDependentManager):
     @manager.periodic_task
     def _heal_instance_info_cache(self, context):
         """Called periodically.  On every call, try to update the
-        info_cache's network information for another instance by
+        info_cache's network information for the instances of this host by
         calling to the network manager.
 
-        This is implemented by keeping a cache of uuids of instances
-        that live on this host.  On each call, we pop one off of a
-        list, pull the DB record, and try the call to the network API.
-        If anything errors, we don't care.  It's possible the instance
-        has been deleted, etc.
+        The network information of all the instances is fetched with a
+        single bulk call to the network API, which only updates the
+        info_cache of the instances whose network information changed.
+        If anything errors, we don't care.  It's possible an instance has
+        been deleted, etc.
         """
         heal_interval = CONF.heal_instance_info_cache_interval
         if not heal_interval:
@@ -3357,35 +3463,18 @@ class ComputeManager(manager.SchedulerDependentManager):
             return
         self._last_info_cache_heal = curr_time
 
-        instance_uuids = getattr(self, '_instance_uuids_to_heal', None)
-        instance = None
-
-        while not instance or instance['host'] != self.host:
-            if instance_uuids:
-                try:
-                    instance = self.conductor_api.instance_get_by_uuid(context,
-                        instance_uuids.pop(0))
-                except exception.InstanceNotFound:
-                    # Instance is gone.  Try to grab another.
-                    continue
-            else:
-                # No more in our copy of uuids.  Pull from the DB.
-                db_instances = self.conductor_api.instance_get_all_by_host(
-                        context, self.host)
-                if not db_instances:
-                    # None.. just return.
-                    return
-                instance = db_instances.pop(0)
-                instance_uuids = [inst['uuid'] for inst in db_instances]
-                self._instance_uuids_to_heal = instance_uuids
+        instances = self.conductor_api.instance_get_all_by_host(context,
+                                                                self.host)
+        if not instances:
+            return
 
-        # We have an instance now and it's ours
         try:
-            # Call to network API to get instance info.. this will
-            # force an update to the instance's info_cache
-            self._get_instance_nw_info(context, instance)
-            LOG.debug(_('Updated the info_cache for instance'),
-                      instance=instance)
+            # Call to network API to get the instances info.. this will
+            # update the info_cache of the instances whose info changed
+            self.network_api.get_instance_nw_info_bulk(
+                    context, instances, conductor_api=self.conductor_api)
+            LOG.debug(_('Healed the info_cache of %d instances'),
+                      len(instances))
         except Exception:
             # We don't care about any failures
             pass
@@ -3543,6 +3632,10 @@ class ComputeManager(manager.SchedulerDependentManager):
                 # they just don't get the info in the usage events.
                 return
 
+            labels = dict((instance['uuid'],
+                           notifications.network_labels(instance))
+                          for instance in instances)
+            usages = {}
             refreshed = timeutils.utcnow()
             for bw_ctr in bw_counters:
                 # Allow switching of greenthreads between queries.
@@ -3592,6 +3685,23 @@ class ComputeManager(manager.SchedulerDependentManager):
                                                    bw_ctr['bw_out'],
                                                    last_refreshed=refreshed)
 
+                mac = bw_ctr['mac_address']
+                label = labels.get(bw_ctr['uuid'], {}).get(
+                        mac, 'net-name-not-found-%s' % mac)
+                usages.setdefault(bw_ctr['uuid'], {})[label] = dict(
+                        bw_in=bw_in, bw_out=bw_out)
+
+            # Record the usage in the system metadata of the instances, so
+            # instance update notifications can report it without a lookup
+            # wherever they are sent from.
+            for instance in instances:
+                if instance['uuid'] not in usages:
+                    continue
+                metadata = notifications.bandwidth_usage_system_metadata(
+                        start_time, usages[instance['uuid']])
+                self.conductor_api.instance_system_metadata_update(
+                        context, instance, metadata)
+
     def _get_host_volume_bdms(self, context, host):
         """Return all block device mappings on a compute host."""
         compute_host_bdms = []
@@ -3680,11 +3790,11 @@ class ComputeManager(manager.SchedulerDependentManager):
     def _sync_power_states(self, context):
         """Align power states between the database and the hypervisor.
 
-        To sync power state data we make a DB call to get the number of
-        virtual machines known by the hypervisor and if the number matches the
-        number of virtual machines known by the database, we proceed in a lazy
-        loop, one database record at a time, checking if the hypervisor has the
-        same power state as is in the database.
+        To sync power state data we make a DB call to get the virtual
+        machines known by the database and a single driver call to get
+        their power states from the hypervisor. Only the instances whose
+        power state diverges from the database are fetched again, in a
+        single DB call, to resolve the discrepancy.
         """
         db_instances = self.conductor_api.instance_get_all_by_host(context,
                                                                    self.host)
@@ -3696,33 +3806,66 @@ class ComputeManager(manager.SchedulerDependentManager):
             LOG.warn(_("Found %(num_db_instances)s in the database and "
                        "%(num_vm_instances)s on the hypervisor.") % locals())
 
+        idle_instances = []
         for db_instance in db_instances:
             if db_instance['task_state'] is not None:
                 LOG.info(_("During sync_power_state the instance has a "
                            "pending task. Skip."), instance=db_instance)
                 continue
-            # No pending tasks. Now try to figure out the real vm_power_state.
-            try:
-                vm_instance = self.driver.get_info(db_instance)
-                vm_power_state = vm_instance['state']
-            except exception.InstanceNotFound:
+            idle_instances.append(db_instance)
+
+        # No pending tasks. Now try to figure out the real vm_power_states.
+        vm_infos = self.driver.get_info_bulk(idle_instances)
+        vm_power_states = {}
+        for db_instance in idle_instances:
+            vm_info = vm_infos.get(db_instance['uuid'])
+            if vm_info is None:
                 vm_power_state = power_state.NOSTATE
-            # Note(maoy): the above get_info call might take a long time,
-            # for example, because of a broken libvirt driver.
+            else:
+                vm_power_state = vm_info['state']
+            if self._power_state_diverges(db_instance, vm_power_state):
+                vm_power_states[db_instance['uuid']] = vm_power_state
+
+        if not vm_power_states:
+            return
+
+        # We re-query the DB to get the latest instance info to minimize
+        # (not eliminate) race condition.
+        db_instances = self.conductor_api.instance_get_all_by_filters(
+                context, {'uuid': vm_power_states.keys()})
+        for db_instance in db_instances:
+            if db_instance['deleted']:
+                continue
+            vm_power_state = vm_power_states[db_instance['uuid']]
             self._sync_instance_power_state(context,
                                             db_instance,
-                                            vm_power_state)
+                                            vm_power_state,
+                                            refresh=False)
+
+    def _power_state_diverges(self, db_instance, vm_power_state):
+        """Return True if the hypervisor power state of an instance needs
+        to be synced to the database by _sync_instance_power_state().
+        """
+        if vm_power_state != db_instance['power_state']:
+            return True
+        return _get_power_state_sync_action(db_instance['vm_state'],
+                                            vm_power_state) is not None
 
-    def _sync_instance_power_state(self, context, db_instance, vm_power_state):
+    def _sync_instance_power_state(self, context, db_instance, vm_power_state,
+                                   refresh=True):
         """Align instance power state between the database and hypervisor.
 
         If the instance is not found on the hypervisor, but is in the database,
-        then a stop() API will be called on the instance."""
-
-        # We re-query the DB to get the latest instance info to minimize
-        # (not eliminate) race condition.
-        u = self.conductor_api.instance_get_by_uuid(context,
-                                                    db_instance['uuid'])
+        then a stop() API will be called on the instance. Pass refresh=False
+        if db_instance has just been read from the database."""
+
+        if refresh:
+            # We re-query the DB to get the latest instance info to minimize
+            # (not eliminate) race condition.
+            u = self.conductor_api.instance_get_by_uuid(context,
+                                                        db_instance['uuid'])
+        else:
+            u = db_instance
         db_power_state = u["power_state"]
         vm_state = u['vm_state']
 
@@ -3759,81 +3902,26 @@ class ComputeManager(manager.SchedulerDependentManager):
             db_power_state = vm_power_state
 
         # Note(maoy): Now resolve the discrepancy between vm_state and
-        # vm_power_state. We go through all possible vm_states.
-        if vm_state in (vm_states.BUILDING,
-                        vm_states.RESCUED,
-                        vm_states.RESIZED,
-                        vm_states.SUSPENDED,
-                        vm_states.PAUSED,
-                        vm_states.ERROR):
-            # TODO(maoy): we ignore these vm_state for now.
-            pass
-        elif vm_state == vm_states.ACTIVE:
-            # The only rational power state should be RUNNING
-            if vm_power_state in (power_state.SHUTDOWN,
-                                  power_state.CRASHED):
-                LOG.warn(_("Instance shutdown by itself. Calling "
-                           "the stop API."), instance=db_instance)
-                try:
-                    # Note(maoy): here we call the API instead of
-                    # brutally updating the vm_state in the database
-                    # to allow all the hooks and checks to be performed.
-                    self.conductor_api.compute_stop(context, db_instance)
-                except Exception:
-                    # Note(maoy): there is no need to propagate the error
-                    # because the same power_state will be retrieved next
-                    # time and retried.
-                    # For example, there might be another task scheduled.
-                    LOG.exception(_("error during stop() in "
-                                    "sync_power_state."),
-                                  instance=db_instance)
-            elif vm_power_state == power_state.SUSPENDED:
-                LOG.warn(_("Instance is suspended unexpectedly. Calling "
-                           "the stop API."), instance=db_instance)
-                try:
-                    self.conductor_api.compute_stop(context, db_instance)
-                except Exception:
-                    LOG.exception(_("error during stop() in "
-                                    "sync_power_state."),
-                                  instance=db_instance)
-            elif vm_power_state == power_state.PAUSED:
-                # Note(maoy): a VM may get into the paused state not only
-                # because the user request via API calls, but also
-                # due to (temporary) external instrumentations.
-                # Before the virt layer can reliably report the reason,
-                # we simply ignore the state discrepancy. In many cases,
-                # the VM state will go back to running after the external
-                # instrumentation is done. See bug 1097806 for details.
-                LOG.warn(_("Instance is paused unexpectedly. Ignore."),
-                         instance=db_instance)
-            elif vm_power_state == power_state.NOSTATE:
-                # Occasionally, depending on the status of the hypervisor,
-                # which could be restarting for example, an instance may
-                # not be found.  Therefore just log the condidtion.
-                LOG.warn(_("Instance is unexpectedly not found. Ignore."),
-                         instance=db_instance)
-        elif vm_state == vm_states.STOPPED:
-            if vm_power_state not in (power_state.NOSTATE,
-                                      power_state.SHUTDOWN,
-                                      power_state.CRASHED):
-                LOG.warn(_("Instance is not stopped. Calling "
-                           "the stop API."), instance=db_instance)
-                try:
-                    # Note(maoy): this assumes that the stop API is
-                    # idempotent.
-                    self.conductor_api.compute_stop(context, db_instance)
-                except Exception:
-                    LOG.exception(_("error during stop() in "
-                                    "sync_power_state."),
-                                  instance=db_instance)
-        elif vm_state in (vm_states.SOFT_DELETED,
-                          vm_states.DELETED):
-            if vm_power_state not in (power_state.NOSTATE,
-                                      power_state.SHUTDOWN):
-                # Note(maoy): this should be taken care of periodically in
-                # _cleanup_running_deleted_instances().
-                LOG.warn(_("Instance is not (soft-)deleted."),
-                         instance=db_instance)
+        # vm_power_state.
+        action = _get_power_state_sync_action(vm_state, vm_power_state)
+        if action is None:
+            return
+        stop, warning = action
+        LOG.warn(warning, instance=db_instance)
+        if stop:
+            try:
+                # Note(maoy): here we call the API instead of
+                # brutally updating the vm_state in the database
+                # to allow all the hooks and checks to be performed.
+                self.conductor_api.compute_stop(context, db_instance)
+            except Exception:
+                # Note(maoy): there is no need to propagate the error
+                # because the same power_state will be retrieved next
+                # time and retried.
+                # For example, there might be another task scheduled.
+                LOG.exception(_("error during stop() in "
+                                "sync_power_state."),
+                              instance=db_instance)
 
     @manager.periodic_task
     def _reclaim_queued_deletes(self, context):
@@ -3872,10 +3960,21 @@ class ComputeManager(manager.SchedulerDependentManager):
         """
         new_resource_tracker_dict = {}
         nodenames = set(self.driver.get_available_nodes())
-        for nodename in nodenames:
-            rt = self._get_resource_tracker(nodename)
-            rt.update_available_resource(context)
-            new_resource_tracker_dict[nodename] = rt
+        if CONF.batch_resource_audit and len(nodenames) > 1:
+            for nodename in nodenames:
+                rt = self._resource_tracker_dict.get(nodename)
+                if not rt:
+                    rt = resource_tracker.ResourceTracker(self.host,
+                                                          self.driver,
+                                                          nodename)
+                new_resource_tracker_dict[nodename] = rt
+            resource_tracker.update_available_resources(context, self.host,
+                    self.driver, new_resource_tracker_dict)
+        else:
+            for nodename in nodenames:
+                rt = self._get_resource_tracker(nodename)
+                rt.update_available_resource(context)
+                new_resource_tracker_dict[nodename] = rt
 
         # Delete orphan compute node not reported by driver but still in db
         compute_nodes_in_db = self._get_compute_nodes_in_db(context)
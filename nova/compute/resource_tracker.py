@@ -236,29 +236,41 @@ class ResourceTracker(object):
         """
         LOG.audit(_("Auditing locally available compute resources"))
         resources = self.driver.get_available_resource(self.nodename)
+        if self._audit_resources(context, resources):
+            self._sync_compute_node(context, resources)
 
+    def _audit_resources(self, context, resources, instances=None,
+                         migrations=None):
+        """Calculate usage of the node from the hypervisor view in
+        resources, the instances and the in-progress migrations.
+
+        Instances and migrations are fetched for this node if not given.
+        Returns False if the virt driver doesn't report resources.
+        """
         if not resources:
             # The virt driver does not support this function
             LOG.audit(_("Virt driver does not support "
                  "'get_available_resource'  Compute tracking is disabled."))
             self.compute_node = None
-            return
+            return False
 
         self._verify_resources(resources)
 
         self._report_hypervisor_resource_view(resources)
 
-        # Grab all instances assigned to this node:
-        instances = self.conductor_api.instance_get_all_by_host_and_node(
-            context, self.host, self.nodename)
+        if instances is None:
+            # Grab all instances assigned to this node:
+            instances = self.conductor_api.instance_get_all_by_host_and_node(
+                context, self.host, self.nodename)
 
         # Now calculate usage based on instance utilization:
         self._update_usage_from_instances(resources, instances)
 
-        # Grab all in-progress migrations:
-        capi = self.conductor_api
-        migrations = capi.migration_get_in_progress_by_host_and_node(context,
-                self.host, self.nodename)
+        if migrations is None:
+            # Grab all in-progress migrations:
+            capi = self.conductor_api
+            migrations = capi.migration_get_in_progress_by_host_and_node(
+                    context, self.host, self.nodename)
 
         self._update_usage_from_migrations(context, resources, migrations)
 
@@ -268,8 +280,7 @@ class ResourceTracker(object):
         self._update_usage_from_orphans(resources, orphans)
 
         self._report_final_resource_view(resources)
-
-        self._sync_compute_node(context, resources)
+        return True
 
     def _sync_compute_node(self, context, resources):
         """Create or update the compute node DB record."""
@@ -586,3 +597,60 @@ class ResourceTracker(object):
         except KeyError:
             return self.conductor_api.instance_type_get(context,
                     instance_type_id)
+
+
+@lockutils.synchronized(COMPUTE_RESOURCE_SEMAPHORE, 'nova-')
+def update_available_resources(context, host, driver, trackers):
+    """Audit the resources of several nodes of a host at once.
+
+    Same as calling ResourceTracker.update_available_resource() on each
+    of the trackers, but the instances and in-progress migrations of all
+    the nodes are fetched with one call each and the existing compute
+    node records are updated in a single batch.
+
+    :param trackers: dict of nodename to the ResourceTracker of the node
+    """
+    LOG.audit(_("Auditing locally available compute resources of "
+                "%d nodes"), len(trackers))
+    conductor_api = conductor.API()
+    all_resources = driver.get_available_resources(trackers.keys())
+
+    instances_by_node = {}
+    for instance in conductor_api.instance_get_all_by_host(
+            context, host, columns_to_join=[]):
+        instances_by_node.setdefault(instance['node'], []).append(instance)
+
+    migrations_by_node = {}
+    for migration in conductor_api.migration_get_in_progress_by_host(
+            context, host):
+        nodes = set()
+        if migration['source_compute'] == host:
+            nodes.add(migration['source_node'])
+        if migration['dest_compute'] == host:
+            nodes.add(migration['dest_node'])
+        for node in nodes:
+            migrations_by_node.setdefault(node, []).append(migration)
+
+    updates = []
+    updated_trackers = []
+    for nodename, tracker in trackers.iteritems():
+        resources = all_resources.get(nodename)
+        if not tracker._audit_resources(context, resources,
+                instances_by_node.get(nodename, []),
+                migrations_by_node.get(nodename, [])):
+            continue
+        if tracker.compute_node:
+            tracker.compute_node.pop('service', None)
+            updates.append((tracker.compute_node, resources))
+            updated_trackers.append(tracker)
+        else:
+            # First audit of the node: look up or create its record.
+            tracker._sync_compute_node(context, resources)
+
+    if updates:
+        compute_nodes = conductor_api.compute_nodes_update(context, updates,
+                                                           prune_stats=True)
+        for tracker, compute_node in zip(updated_trackers, compute_nodes):
+            tracker.compute_node = compute_node
+        LOG.info(_('Compute_service records updated for %(host)s: '
+                   '%(count)d nodes') % {'host': host, 'count': len(updates)})
@@ -251,9 +251,7 @@ def notify_about_instance_usage(context, instance, event_suffix,
 
 
 def get_nw_info_for_instance(instance):
-    info_cache = instance['info_cache'] or {}
-    cached_nwinfo = info_cache.get('network_info') or []
-    return network_model.NetworkInfo.hydrate(cached_nwinfo)
+    return network_model.CachedNetworkInfo.for_instance(instance)
 
 
 def has_audit_been_run(context, conductor, host, timestamp=None):
@@ -77,8 +77,8 @@ class LocalAPI(object):
         return self._manager.instance_get_all(context)
 
     def instance_get_all_by_host(self, context, host, columns_to_join=None):
-        return self._manager.instance_get_all_by_host(context, host,
-                                                      columns_to_join)
+        return self._manager.instance_get_all_by_host(
+            context, host, columns_to_join=columns_to_join)
 
     def instance_get_all_by_host_and_node(self, context, host, node):
         return self._manager.instance_get_all_by_host(context, host, node)
@@ -110,6 +110,11 @@ class LocalAPI(object):
     def instance_info_cache_delete(self, context, instance):
         return self._manager.instance_info_cache_delete(context, instance)
 
+    def instance_system_metadata_update(self, context, instance, metadata):
+        return self._manager.instance_system_metadata_update(context,
+                                                             instance,
+                                                             metadata)
+
     def instance_type_get(self, context, instance_type_id):
         return self._manager.instance_type_get(context, instance_type_id)
 
@@ -129,6 +134,9 @@ class LocalAPI(object):
         return self._manager.migration_get_in_progress_by_host_and_node(
             context, host, node)
 
+    def migration_get_in_progress_by_host(self, context, host):
+        return self._manager.migration_get_in_progress_by_host(context, host)
+
     def migration_create(self, context, instance, values):
         return self._manager.migration_create(context, instance, values)
 
@@ -279,6 +287,10 @@ class LocalAPI(object):
         return self._manager.compute_node_update(context, node, values,
                                                  prune_stats)
 
+    def compute_nodes_update(self, context, updates, prune_stats=False):
+        return self._manager.compute_nodes_update(context, updates,
+                                                  prune_stats)
+
     def compute_node_delete(self, context, node):
         return self._manager.compute_node_delete(context, node)
 
@@ -432,6 +444,10 @@ class API(object):
         return self.conductor_rpcapi.instance_info_cache_update(context,
                 instance, values)
 
+    def instance_system_metadata_update(self, context, instance, metadata):
+        return self.conductor_rpcapi.instance_system_metadata_update(
+                context, instance, metadata)
+
     def instance_info_cache_delete(self, context, instance):
         return self.conductor_rpcapi.instance_info_cache_delete(context,
                                                                 instance)
@@ -458,6 +474,10 @@ class API(object):
         return crpcapi.migration_get_in_progress_by_host_and_node(context,
                                                                   host, node)
 
+    def migration_get_in_progress_by_host(self, context, host):
+        crpcapi = self.conductor_rpcapi
+        return crpcapi.migration_get_in_progress_by_host(context, host)
+
     def migration_create(self, context, instance, values):
         return self.conductor_rpcapi.migration_create(context, instance,
                                                       values)
@@ -620,6 +640,10 @@ class API(object):
         return self.conductor_rpcapi.compute_node_update(context, node,
                                                          values, prune_stats)
 
+    def compute_nodes_update(self, context, updates, prune_stats=False):
+        return self.conductor_rpcapi.compute_nodes_update(context, updates,
+                                                          prune_stats)
+
     def compute_node_delete(self, context, node):
         return self.conductor_rpcapi.compute_node_delete(context, node)
 
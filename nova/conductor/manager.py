@@ -49,7 +49,7 @@ datetime_fields = ['launched_at', 'terminated_at', 'updated_at']
 class ConductorManager(manager.Manager):
     """Mission: TBD."""
 
-    RPC_API_VERSION = '1.48'
+    RPC_API_VERSION = '1.50'
 
     def __init__(self, *args, **kwargs):
         super(ConductorManager, self).__init__(*args, **kwargs)
@@ -138,6 +138,10 @@ class ConductorManager(manager.Manager):
             context, host, node)
         return jsonutils.to_primitive(migrations)
 
+    def migration_get_in_progress_by_host(self, context, host):
+        migrations = self.db.migration_get_in_progress_by_host(context, host)
+        return jsonutils.to_primitive(migrations)
+
     def migration_create(self, context, instance, values):
         values.update({'instance_uuid': instance['uuid'],
                        'source_compute': instance['host'],
@@ -289,6 +293,10 @@ class ConductorManager(manager.Manager):
         self.db.instance_info_cache_update(context, instance['uuid'],
                                            values)
 
+    def instance_system_metadata_update(self, context, instance, metadata):
+        self.db.instance_system_metadata_update(context, instance['uuid'],
+                                                metadata, False)
+
     def instance_type_get(self, context, instance_type_id):
         result = self.db.instance_type_get(context, instance_type_id)
         return jsonutils.to_primitive(result)
@@ -355,6 +363,12 @@ class ConductorManager(manager.Manager):
                                              prune_stats)
         return jsonutils.to_primitive(result)
 
+    def compute_nodes_update(self, context, updates, prune_stats=False):
+        result = self.db.compute_nodes_update(context,
+                [(node['id'], values) for node, values in updates],
+                prune_stats)
+        return jsonutils.to_primitive(result)
+
     def compute_node_delete(self, context, node):
         result = self.db.compute_node_delete(context, node['id'])
         return jsonutils.to_primitive(result)
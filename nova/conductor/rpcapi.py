@@ -87,6 +87,8 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
     1.47 - Added columns_to_join to instance_get_all_by_host and
                  instance_get_all_by_filters
     1.48 - Added compute_unrescue
+    1.49 - Added migration_get_in_progress_by_host and compute_nodes_update
+    1.50 - Added instance_system_metadata_update
     """
 
     BASE_RPC_API_VERSION = '1.0'
@@ -139,6 +141,10 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                             host=host, node=node)
         return self.call(context, msg, version='1.31')
 
+    def migration_get_in_progress_by_host(self, context, host):
+        msg = self.make_msg('migration_get_in_progress_by_host', host=host)
+        return self.call(context, msg, version='1.49')
+
     def migration_create(self, context, instance, values):
         instance_p = jsonutils.to_primitive(instance)
         msg = self.make_msg('migration_create', instance=instance_p,
@@ -336,6 +342,13 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                             values=values)
         return self.call(context, msg, version='1.26')
 
+    def instance_system_metadata_update(self, context, instance, metadata):
+        instance_p = jsonutils.to_primitive(instance)
+        msg = self.make_msg('instance_system_metadata_update',
+                            instance=instance_p,
+                            metadata=metadata)
+        return self.call(context, msg, version='1.50')
+
     def service_create(self, context, values):
         msg = self.make_msg('service_create', values=values)
         return self.call(context, msg, version='1.27')
@@ -354,6 +367,12 @@ class ConductorAPI(nova.openstack.common.rpc.proxy.RpcProxy):
                             prune_stats=prune_stats)
         return self.call(context, msg, version='1.33')
 
+    def compute_nodes_update(self, context, updates, prune_stats=False):
+        updates_p = jsonutils.to_primitive(updates)
+        msg = self.make_msg('compute_nodes_update', updates=updates_p,
+                            prune_stats=prune_stats)
+        return self.call(context, msg, version='1.49')
+
     def compute_node_delete(self, context, node):
         node_p = jsonutils.to_primitive(node)
         msg = self.make_msg('compute_node_delete', node=node_p)
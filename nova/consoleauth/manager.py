@@ -29,6 +29,7 @@ from nova import manager
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import memorycache
+from nova.openstack.common import uuidutils
 
 
 LOG = logging.getLogger(__name__)
@@ -37,6 +38,12 @@ consoleauth_opts = [
     cfg.IntOpt('console_token_ttl',
                default=600,
                help='How many seconds before deleting tokens'),
+    cfg.IntOpt('console_token_validation_ttl',
+               default=10,
+               help='How many seconds a token stays valid without asking '
+                    'the compute host again whether its console port is '
+                    'still valid. Set to 0 to validate tokens on every '
+                    'check.'),
     cfg.StrOpt('consoleauth_manager',
                default='nova.consoleauth.manager.ConsoleAuthManager',
                help='Manager for console auth'),
@@ -59,13 +66,33 @@ class ConsoleAuthManager(manager.Manager):
         self.compute_rpcapi = compute_rpcapi.ComputeAPI()
         self.cells_rpcapi = cells_rpcapi.CellsAPI()
 
-    def _get_tokens_for_instance(self, instance_uuid):
-        tokens_str = self.mc.get(instance_uuid.encode('UTF-8'))
-        if not tokens_str:
-            tokens = []
-        else:
-            tokens = jsonutils.loads(tokens_str)
-        return tokens
+    def _generation_key(self, instance_uuid):
+        return ('generation-%s' % instance_uuid).encode('UTF-8')
+
+    def _new_generation(self):
+        """Return a new token generation.
+
+        Generations are random, so that one evicted from memcached and
+        created again can never match the tokens of a revoked one.
+        """
+        return uuidutils.generate_uuid()
+
+    def _get_instance_generation(self, instance_uuid):
+        """Return the token generation of an instance.
+
+        Tokens are only valid for the generation of their instance current
+        when they were authorized. Replacing the generation atomically
+        revokes all the tokens of the instance, so no per-instance list of
+        tokens has to be read, modified and written back. Generations are
+        stored without expiry, so that they outlive any token authorized
+        for them.
+        """
+        key = self._generation_key(instance_uuid)
+        generation = self.mc.get(key)
+        if generation is None:
+            self.mc.add(key, self._new_generation())
+            generation = self.mc.get(key)
+        return generation
 
     def authorize_console(self, context, token, console_type, host, port,
                           internal_access_path, instance_uuid=None):
@@ -77,13 +104,11 @@ class ConsoleAuthManager(manager.Manager):
                       'port': port,
                       'internal_access_path': internal_access_path,
                       'last_activity_at': time.time()}
+        if instance_uuid is not None:
+            token_dict['generation'] = self._get_instance_generation(
+                    instance_uuid)
         data = jsonutils.dumps(token_dict)
         self.mc.set(token.encode('UTF-8'), data, CONF.console_token_ttl)
-        if instance_uuid is not None:
-            tokens = self._get_tokens_for_instance(instance_uuid)
-            tokens.append(token)
-            self.mc.set(instance_uuid.encode('UTF-8'),
-                        jsonutils.dumps(tokens))
 
         LOG.audit(_("Received Token: %(token)s, %(token_dict)s)"), locals())
 
@@ -92,19 +117,33 @@ class ConsoleAuthManager(manager.Manager):
         if instance_uuid is None:
             return False
 
+        generation = self.mc.get(self._generation_key(instance_uuid))
+        if generation is None or token.get('generation') != generation:
+            # The tokens of the instance have been deleted, or their
+            # generation was evicted, in which case they may have been.
+            return False
+
+        validated_key = ('validated-%s' % token['token']).encode('UTF-8')
+        if self.mc.get(validated_key):
+            return True
+
         # NOTE(comstud): consoleauth was meant to run in API cells.  So,
         # if cells is enabled, we must call down to the child cell for
         # the instance.
         if CONF.cells.enable:
-            return self.cells_rpcapi.validate_console_port(context,
+            valid = self.cells_rpcapi.validate_console_port(context,
                     instance_uuid, token['port'], token['console_type'])
+        else:
+            instance = self.conductor_api.instance_get_by_uuid(context,
+                                                               instance_uuid)
+            valid = self.compute_rpcapi.validate_console_port(context,
+                                                instance,
+                                                token['port'],
+                                                token['console_type'])
 
-        instance = self.conductor_api.instance_get_by_uuid(context,
-                                                           instance_uuid)
-        return self.compute_rpcapi.validate_console_port(context,
-                                            instance,
-                                            token['port'],
-                                            token['console_type'])
+        if valid and CONF.console_token_validation_ttl > 0:
+            self.mc.set(validated_key, '1', CONF.console_token_validation_ttl)
+        return valid
 
     def check_token(self, context, token):
         token_str = self.mc.get(token.encode('UTF-8'))
@@ -116,10 +155,10 @@ class ConsoleAuthManager(manager.Manager):
                 return token
 
     def delete_tokens_for_instance(self, context, instance_uuid):
-        tokens = self._get_tokens_for_instance(instance_uuid)
-        for token in tokens:
-            self.mc.delete(token.encode('UTF-8'))
-        self.mc.delete(instance_uuid.encode('UTF-8'))
+        # Tokens are left to expire, but they are no longer valid once the
+        # generation they were authorized for is gone.
+        self.mc.set(self._generation_key(instance_uuid),
+                    self._new_generation())
 
     def get_backdoor_port(self, context):
         return self.backdoor_port
@@ -200,6 +200,17 @@ def compute_node_update(context, compute_id, values, prune_stats=False):
     return IMPL.compute_node_update(context, compute_id, values, prune_stats)
 
 
+def compute_nodes_update(context, updates, prune_stats=False):
+    """Set the given properties on several computeNodes in one transaction.
+
+    :param updates: list of (compute_id, values) tuples
+
+    Returns the updated computeNodes, in the order of updates.
+    Raises ComputeHostNotFound if a computeNode does not exist.
+    """
+    return IMPL.compute_nodes_update(context, updates, prune_stats)
+
+
 def compute_node_delete(context, compute_id):
     """Delete a computeNode from the database.
 
@@ -418,6 +429,13 @@ def migration_get_in_progress_by_host_and_node(context, host, node):
     return IMPL.migration_get_in_progress_by_host_and_node(context, host, node)
 
 
+def migration_get_in_progress_by_host(context, host):
+    """Finds all migrations for any node of the given host that are not yet
+    confirmed or reverted.
+    """
+    return IMPL.migration_get_in_progress_by_host(context, host)
+
+
 ####################
 
 
@@ -443,6 +461,19 @@ def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
                                         instance_uuid, host)
 
 
+def fixed_ip_associate_pool_multi(context, network_ids, instance_uuid=None,
+                                  host=None):
+    """Find a free ip in each network and associate them to instance or host.
+
+    Raises if one is not available in any of the networks, in which case
+    none is associated.
+
+    :returns: dict of network id to associated address.
+    """
+    return IMPL.fixed_ip_associate_pool_multi(context, network_ids,
+                                              instance_uuid, host)
+
+
 def fixed_ip_create(context, values):
     """Create a fixed ip from the values dictionary."""
     return IMPL.fixed_ip_create(context, values)
@@ -506,6 +537,11 @@ def fixed_ips_by_virtual_interface(context, vif_id):
     return IMPL.fixed_ips_by_virtual_interface(context, vif_id)
 
 
+def fixed_ips_by_virtual_interfaces(context, vif_ids):
+    """Get fixed ips, with their floating ips, by virtual interface ids."""
+    return IMPL.fixed_ips_by_virtual_interfaces(context, vif_ids)
+
+
 def fixed_ip_update(context, address, values):
     """Create a fixed ip from the values dictionary."""
     return IMPL.fixed_ip_update(context, address, values)
@@ -544,6 +580,11 @@ def virtual_interface_get_by_instance(context, instance_id):
     return IMPL.virtual_interface_get_by_instance(context, instance_id)
 
 
+def virtual_interface_get_by_instances(context, instance_uuids):
+    """Gets all virtual_interfaces for a list of instances."""
+    return IMPL.virtual_interface_get_by_instances(context, instance_uuids)
+
+
 def virtual_interface_get_by_instance_and_network(context, instance_id,
                                                            network_id):
     """Gets all virtual interfaces for instance."""
@@ -1704,7 +1745,7 @@ def archive_deleted_rows(context, max_rows=None):
     """Move up to max_rows rows from production tables to corresponding shadow
     tables.
 
-    :returns: number of rows archived.
+    :returns: dict of table name to number of rows archived.
     """
     return IMPL.archive_deleted_rows(context, max_rows=max_rows)
 
@@ -23,6 +23,7 @@ import collections
 import copy
 import datetime
 import functools
+import random
 import sys
 import time
 import uuid
@@ -30,6 +31,7 @@ import uuid
 from oslo.config import cfg
 from sqlalchemy import and_
 from sqlalchemy import Boolean
+from sqlalchemy import case
 from sqlalchemy.exc import DataError
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.exc import NoSuchTableError
@@ -55,6 +57,7 @@ from nova import exception
 from nova.openstack.common.db import exception as db_exc
 from nova.openstack.common.db.sqlalchemy import session as db_session
 from nova.openstack.common.db.sqlalchemy import utils as sqlalchemyutils
+from nova.openstack.common import excutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import timeutils
 from nova.openstack.common import uuidutils
@@ -65,6 +68,24 @@ db_opts = [
                help='When set, compute API will consider duplicate hostnames '
                     'invalid within the specified scope, regardless of case. '
                     'Should be empty, "project" or "global".'),
+    cfg.IntOpt('archive_deleted_rows_batch_size',
+               default=1000,
+               help='Maximum number of deleted rows moved from a table to '
+                    'its shadow table in one transaction by "nova-manage db '
+                    'archive_deleted_rows". Archiving is not run by any nova '
+                    'service; run that command periodically, e.g. from cron, '
+                    'on a single host'),
+    cfg.IntOpt('fixed_ip_associate_pool_candidates',
+               default=32,
+               help='Number of free fixed ips read from a network at once, '
+                    'from a random id onwards, among which the one to claim '
+                    'is picked at random so that concurrent allocations '
+                    'rarely try the same ip'),
+    cfg.FloatOpt('archive_deleted_rows_batch_delay',
+                 default=0.1,
+                 help='Number of seconds to wait between two batches of '
+                      'deleted rows being archived, to throttle the load '
+                      'archiving puts on the database'),
 ]
 
 CONF = cfg.CONF
@@ -534,25 +555,41 @@ def _update_stats(context, new_stats, compute_id, session, prune_stats=False):
         session.add(stat)
 
 
+def _compute_node_update(context, compute_id, values, prune_stats, session):
+    stats = values.pop('stats', {})
+    _update_stats(context, stats, compute_id, session, prune_stats)
+    compute_ref = _compute_node_get(context, compute_id, session=session)
+    # Always update this, even if there's going to be no other
+    # changes in data.  This ensures that we invalidate the
+    # scheduler cache of compute node data in case of races.
+    if 'updated_at' not in values:
+        values['updated_at'] = timeutils.utcnow()
+    convert_datetimes(values, 'created_at', 'deleted_at', 'updated_at')
+    compute_ref.update(values)
+    return compute_ref
+
+
 @require_admin_context
 def compute_node_update(context, compute_id, values, prune_stats=False):
     """Updates the ComputeNode record with the most recent data."""
-    stats = values.pop('stats', {})
-
     session = get_session()
     with session.begin():
-        _update_stats(context, stats, compute_id, session, prune_stats)
-        compute_ref = _compute_node_get(context, compute_id, session=session)
-        # Always update this, even if there's going to be no other
-        # changes in data.  This ensures that we invalidate the
-        # scheduler cache of compute node data in case of races.
-        if 'updated_at' not in values:
-            values['updated_at'] = timeutils.utcnow()
-        convert_datetimes(values, 'created_at', 'deleted_at', 'updated_at')
-        compute_ref.update(values)
+        compute_ref = _compute_node_update(context, compute_id, values,
+                                           prune_stats, session)
     return compute_ref
 
 
+@require_admin_context
+def compute_nodes_update(context, updates, prune_stats=False):
+    """Updates several ComputeNode records in one transaction."""
+    session = get_session()
+    with session.begin():
+        compute_refs = [_compute_node_update(context, compute_id, values,
+                                             prune_stats, session)
+                        for compute_id, values in updates]
+    return compute_refs
+
+
 @require_admin_context
 def compute_node_delete(context, compute_id):
     """Delete a ComputeNode record."""
@@ -1025,39 +1062,167 @@ def fixed_ip_associate(context, address, instance_uuid, network_id=None,
     return fixed_ip_ref['address']
 
 
+def _fixed_ip_pool_candidates(context, session, network_id):
+    """Return up to fixed_ip_associate_pool_candidates free fixed ips of a
+    network, in random order, as (id, network_id) pairs.
+
+    The ips are read from a random id onwards, wrapping around to the
+    lowest ids, so that concurrent allocations from the network mostly see
+    different ips without counting or skipping over the free ones.
+    """
+    network_or_none = or_(models.FixedIp.network_id == network_id,
+                          models.FixedIp.network_id == None)
+    query = model_query(context, models.FixedIp.id, models.FixedIp.network_id,
+                        base_model=models.FixedIp, session=session,
+                        read_deleted="no").\
+                    filter(network_or_none).\
+                    filter_by(reserved=False).\
+                    filter_by(instance_uuid=None).\
+                    filter_by(host=None)
+    min_id, max_id = session.query(func.min(models.FixedIp.id),
+                                   func.max(models.FixedIp.id)).first()
+    if min_id is None:
+        return []
+    window = max(CONF.fixed_ip_associate_pool_candidates, 1)
+    start = random.randint(min_id, max_id)
+    rows = query.filter(models.FixedIp.id >= start).\
+                 order_by(models.FixedIp.id).\
+                 limit(window).\
+                 all()
+    if len(rows) < window and start > min_id:
+        rows += query.filter(models.FixedIp.id < start).\
+                      order_by(models.FixedIp.id).\
+                      limit(window - len(rows)).\
+                      all()
+    candidates = [tuple(row) for row in rows]
+    random.shuffle(candidates)
+    return candidates
+
+
+def _fixed_ip_claim(context, session, claims, instance_uuid, host):
+    """Claim fixed ips with a single compare-and-swap UPDATE.
+
+    :param claims: dict of fixed ip id to the id of the network to
+                   associate it with.
+    :returns: the ids of the fixed ips that were still free and are now
+              claimed.
+    """
+    values = {'network_id': case([(models.FixedIp.id == fixed_ip_id,
+                                   network_id)
+                                  for fixed_ip_id, network_id in
+                                  claims.iteritems()]),
+              'updated_at': timeutils.utcnow()}
+    if instance_uuid:
+        values['instance_uuid'] = instance_uuid
+    if host:
+        values['host'] = host
+    with session.begin():
+        rows = model_query(context, models.FixedIp, session=session,
+                           read_deleted="no").\
+                       filter(models.FixedIp.id.in_(claims.keys())).\
+                       filter_by(reserved=False).\
+                       filter_by(instance_uuid=None).\
+                       filter_by(host=None).\
+                       update(values, synchronize_session=False)
+    if rows == len(claims):
+        return claims.keys()
+    if not rows:
+        return []
+    # NOTE: some of the ips were claimed concurrently; find out which
+    #       ones are ours.
+    claimed = model_query(context, models.FixedIp.id,
+                          base_model=models.FixedIp, session=session,
+                          read_deleted="no").\
+                      filter(models.FixedIp.id.in_(claims.keys())).\
+                      filter_by(instance_uuid=instance_uuid).\
+                      filter_by(host=host).\
+                      all()
+    return [row[0] for row in claimed]
+
+
 @require_admin_context
 def fixed_ip_associate_pool(context, network_id, instance_uuid=None,
                             host=None):
+    addresses = fixed_ip_associate_pool_multi(context, [network_id],
+                                              instance_uuid=instance_uuid,
+                                              host=host)
+    return addresses[network_id]
+
+
+@require_admin_context
+def fixed_ip_associate_pool_multi(context, network_ids, instance_uuid=None,
+                                  host=None):
+    # NOTE: free fixed ips are claimed with a compare-and-swap UPDATE
+    #       instead of being locked with SELECT ... FOR UPDATE, so that
+    #       concurrent allocations from one network do not all queue up on
+    #       its first free row. Each allocation claims an ip picked at
+    #       random among a window of free ones, and tries another one if a
+    #       concurrent allocation got there first.
     if instance_uuid and not uuidutils.is_uuid_like(instance_uuid):
         raise exception.InvalidUUID(uuid=instance_uuid)
 
     session = get_session()
-    with session.begin():
-        network_or_none = or_(models.FixedIp.network_id == network_id,
-                              models.FixedIp.network_id == None)
-        fixed_ip_ref = model_query(context, models.FixedIp, session=session,
-                                   read_deleted="no").\
-                               filter(network_or_none).\
-                               filter_by(reserved=False).\
-                               filter_by(instance_uuid=None).\
-                               filter_by(host=None).\
-                               with_lockmode('update').\
-                               first()
-        # NOTE(vish): if with_lockmode isn't supported, as in sqlite,
-        #             then this has concurrency issues
-        if not fixed_ip_ref:
-            raise exception.NoMoreFixedIps()
-
-        if fixed_ip_ref['network_id'] is None:
-            fixed_ip_ref['network'] = network_id
-
-        if instance_uuid:
-            fixed_ip_ref['instance_uuid'] = instance_uuid
-
-        if host:
-            fixed_ip_ref['host'] = host
-        session.add(fixed_ip_ref)
-    return fixed_ip_ref['address']
+    pending = set(network_ids)
+    claimed = {}
+    # ids of the claimed ips which did not belong to any network yet
+    unassigned = set()
+    try:
+        # NOTE: every lost claim means another allocation got a free ip,
+        # so this ends once each network has an ip or is out of them.
+        while pending:
+            claims = {}
+            claims_unassigned = set()
+            for network_id in pending:
+                candidates = _fixed_ip_pool_candidates(context, session,
+                                                       network_id)
+                if not candidates:
+                    raise exception.NoMoreFixedIps()
+                for fixed_ip_id, fixed_ip_network_id in candidates:
+                    # ips without a network are candidates for several
+                    if fixed_ip_id not in claims:
+                        claims[fixed_ip_id] = network_id
+                        if fixed_ip_network_id is None:
+                            claims_unassigned.add(fixed_ip_id)
+                        break
+            for fixed_ip_id in _fixed_ip_claim(context, session, claims,
+                                               instance_uuid, host):
+                network_id = claims[fixed_ip_id]
+                claimed[network_id] = fixed_ip_id
+                if fixed_ip_id in claims_unassigned:
+                    unassigned.add(fixed_ip_id)
+                pending.discard(network_id)
+            if pending:
+                LOG.debug(_("Fixed ips claimed concurrently from networks "
+                            "%s, retrying"), list(pending), context=context)
+    except Exception:
+        with excutils.save_and_reraise_exception():
+            if claimed:
+                # NOTE: give back what we got, all the networks or none,
+                #       returning ips without a network to the shared pool.
+                released = claimed.values()
+                with session.begin():
+                    model_query(context, models.FixedIp, session=session,
+                                read_deleted="no").\
+                            filter(models.FixedIp.id.in_(released)).\
+                            update({'instance_uuid': None,
+                                    'host': None,
+                                    'updated_at': timeutils.utcnow()},
+                                   synchronize_session=False)
+                    if unassigned:
+                        model_query(context, models.FixedIp, session=session,
+                                    read_deleted="no").\
+                                filter(models.FixedIp.id.in_(unassigned)).\
+                                update({'network_id': None},
+                                       synchronize_session=False)
+
+    rows = model_query(context, models.FixedIp.id, models.FixedIp.address,
+                       base_model=models.FixedIp, session=session,
+                       read_deleted="no").\
+                   filter(models.FixedIp.id.in_(claimed.values())).\
+                   all()
+    addresses = dict(rows)
+    return dict((network_id, addresses[fixed_ip_id])
+                for network_id, fixed_ip_id in claimed.iteritems())
 
 
 @require_context
@@ -1247,6 +1412,18 @@ def fixed_ips_by_virtual_interface(context, vif_id):
     return result
 
 
+@require_context
+def fixed_ips_by_virtual_interfaces(context, vif_ids):
+    if not vif_ids:
+        return []
+    result = model_query(context, models.FixedIp, read_deleted="no").\
+                 filter(models.FixedIp.virtual_interface_id.in_(vif_ids)).\
+                 options(joinedload('floating_ips')).\
+                 all()
+
+    return result
+
+
 @require_context
 def fixed_ip_update(context, address, values):
     session = get_session()
@@ -1344,6 +1521,21 @@ def virtual_interface_get_by_instance(context, instance_uuid):
     return vif_refs
 
 
+@require_context
+def virtual_interface_get_by_instances(context, instance_uuids):
+    """Gets all virtual interfaces for a list of instances.
+
+    :param instance_uuids: = uuids of the instances to retrieve vifs for
+    """
+    if not instance_uuids:
+        return []
+    vif_refs = _virtual_interface_query(context).\
+                       filter(models.VirtualInterface.instance_uuid.in_(
+                              instance_uuids)).\
+                       all()
+    return vif_refs
+
+
 @require_context
 def virtual_interface_get_by_instance_and_network(context, instance_uuid,
                                                   network_id):
@@ -3414,6 +3606,16 @@ def migration_get_in_progress_by_host_and_node(context, host, node,
             all()
 
 
+def migration_get_in_progress_by_host(context, host, session=None):
+
+    return model_query(context, models.Migration, session=session).\
+            filter(or_(models.Migration.source_compute == host,
+                       models.Migration.dest_compute == host)).\
+            filter(~models.Migration.status.in_(['confirmed', 'reverted'])).\
+            options(joinedload_all('instance.system_metadata')).\
+            all()
+
+
 ##################
 
 
@@ -4780,11 +4982,49 @@ def _get_default_deleted_value(table):
         return None
 
 
+def _archive_deleted_rows_batch(conn, table, shadow_table, column,
+                                default_deleted_value, max_rows):
+    """Move up to max_rows deleted rows of table to shadow_table in one
+    transaction.
+
+    :returns: number of rows archived, or None if the rows cannot be moved
+              now.
+    """
+    # TODO(dripton): It would be more efficient to insert(select) and then
+    # delete(same select) without ever returning the selected rows back to
+    # Python.  sqlalchemy does not support that directly, but we have
+    # nova.db.sqlalchemy.utils.InsertFromSelect for the insert side.  We
+    # need a corresponding function for the delete side.
+    query = select([table],
+                   table.c.deleted != default_deleted_value).\
+                   order_by(column).limit(max_rows)
+    try:
+        # Group the insert and delete in a transaction.
+        with conn.begin():
+            rows = conn.execute(query).fetchall()
+            if not rows:
+                return 0
+            keys = [row[column.name] for row in rows]
+            conn.execute(shadow_table.insert(), rows)
+            result = conn.execute(table.delete(column.in_(keys)))
+    except IntegrityError:
+        # Either a foreign key constraint keeps us from deleting some of
+        # these rows until we clean up a dependent table, or another
+        # archiver moved them first.  Just skip this table for now; we'll
+        # come back to it later.
+        return None
+    return result.rowcount
+
+
 @require_admin_context
-def archive_deleted_rows_for_table(context, tablename, max_rows):
+def archive_deleted_rows_for_table(context, tablename, max_rows=None):
     """Move up to max_rows rows from one tables to the corresponding
     shadow table.
 
+    Rows are moved in transactions of at most archive_deleted_rows_batch_size
+    rows, waiting archive_deleted_rows_batch_delay seconds between two of
+    them.
+
     :returns: number of rows archived
     """
     # The context argument is only used for the decorator.
@@ -4801,38 +5041,28 @@ def archive_deleted_rows_for_table(context, tablename, max_rows):
     except NoSuchTableError:
         # No corresponding shadow table; skip it.
         return rows_archived
-    # Group the insert and delete in a transaction.
-    with conn.begin():
-        # TODO(dripton): It would be more efficient to insert(select) and then
-        # delete(same select) without ever returning the selected rows back to
-        # Python.  sqlalchemy does not support that directly, but we have
-        # nova.db.sqlalchemy.utils.InsertFromSelect for the insert side.  We
-        # need a corresponding function for the delete side.
-        try:
-            column = table.c.id
-            column_name = "id"
-        except AttributeError:
-            # We have one table (dns_domains) where the key is called
-            # "domain" rather than "id"
-            column = table.c.domain
-            column_name = "domain"
-        query = select([table],
-                       table.c.deleted != default_deleted_value).\
-                       order_by(column).limit(max_rows)
-        rows = conn.execute(query).fetchall()
-        if rows:
-            keys = [getattr(row, column_name) for row in rows]
-            delete_statement = table.delete(column.in_(keys))
-            try:
-                result = conn.execute(delete_statement)
-            except IntegrityError:
-                # A foreign key constraint keeps us from deleting some of
-                # these rows until we clean up a dependent table.  Just
-                # skip this table for now; we'll come back to it later.
-                return rows_archived
-            insert_statement = shadow_table.insert()
-            conn.execute(insert_statement, rows)
-            rows_archived = result.rowcount
+    try:
+        column = table.c.id
+    except AttributeError:
+        # We have one table (dns_domains) where the key is called
+        # "domain" rather than "id"
+        column = table.c.domain
+    batch_size = max(CONF.archive_deleted_rows_batch_size, 1)
+    while max_rows is None or rows_archived < max_rows:
+        if max_rows is None:
+            limit = batch_size
+        else:
+            limit = min(batch_size, max_rows - rows_archived)
+        if rows_archived and CONF.archive_deleted_rows_batch_delay > 0:
+            time.sleep(CONF.archive_deleted_rows_batch_delay)
+        batch = _archive_deleted_rows_batch(conn, table, shadow_table,
+                                            column, default_deleted_value,
+                                            limit)
+        if not batch:
+            break
+        rows_archived += batch
+        if batch < limit:
+            break
     return rows_archived
 
 
@@ -4841,17 +5071,27 @@ def archive_deleted_rows(context, max_rows=None):
     """Move up to max_rows rows from production tables to the corresponding
     shadow tables.
 
-    :returns: Number of rows archived.
+    Tables are archived before the tables they reference, so that rows
+    held back by a foreign key can go in the same run.
+
+    :returns: dict of table name to number of rows archived, for the tables
+              rows were archived from.
     """
     # The context argument is only used for the decorator.
-    tablenames = []
-    for model_class in models.__dict__.itervalues():
-        if hasattr(model_class, "__tablename__"):
-            tablenames.append(model_class.__tablename__)
-    rows_archived = 0
+    tablenames = [table.name
+                  for table in reversed(models.BASE.metadata.sorted_tables)]
+    rows_archived = {}
+    total = 0
     for tablename in tablenames:
-        rows_archived += archive_deleted_rows_for_table(context, tablename,
-                                         max_rows=max_rows - rows_archived)
-        if rows_archived >= max_rows:
-            break
+        if max_rows is None:
+            remaining = None
+        else:
+            remaining = max_rows - total
+            if remaining <= 0:
+                break
+        num = archive_deleted_rows_for_table(context, tablename,
+                                             max_rows=remaining)
+        if num:
+            rows_archived[tablename] = num
+            total += num
     return rows_archived
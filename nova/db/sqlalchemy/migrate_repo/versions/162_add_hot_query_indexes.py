@@ -0,0 +1,106 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+from sqlalchemy import Index, MetaData, Table
+
+
+def _new_indexes(meta):
+    instances = Table('instances', meta, autoload=True)
+    migrations = Table('migrations', meta, autoload=True)
+    fixed_ips = Table('fixed_ips', meta, autoload=True)
+    bw_usage_cache = Table('bw_usage_cache', meta, autoload=True)
+
+    return [
+        # Based on instance_get_active_by_window_joined
+        # from: nova/db/sqlalchemy/api.py
+        Index('instances_project_id_terminated_at_launched_at_idx',
+              instances.c.project_id, instances.c.terminated_at,
+              instances.c.launched_at),
+
+        # Based on migration_get_in_progress_by_host_and_node
+        # from: nova/db/sqlalchemy/api.py
+        # NOTE: the query matches either the source or the destination of a
+        #       migration, so it needs one index per side to be merged.
+        Index('migrations_by_source_host_node_and_status_idx',
+              migrations.c.source_compute, migrations.c.source_node,
+              migrations.c.deleted, migrations.c.status),
+        Index('migrations_by_dest_host_node_and_status_idx',
+              migrations.c.dest_compute, migrations.c.dest_node,
+              migrations.c.deleted, migrations.c.status),
+
+        # Based on fixed_ip_associate_pool
+        # from: nova/db/sqlalchemy/api.py
+        Index('fixed_ips_network_id_reserved_instance_uuid_host_idx',
+              fixed_ips.c.network_id, fixed_ips.c.reserved,
+              fixed_ips.c.instance_uuid, fixed_ips.c.host,
+              fixed_ips.c.deleted),
+
+        # Based on bw_usage_get and bw_usage_update
+        # from: nova/db/sqlalchemy/api.py
+        Index('bw_usage_cache_uuid_start_period_mac_idx',
+              bw_usage_cache.c.uuid, bw_usage_cache.c.start_period,
+              bw_usage_cache.c.mac),
+    ]
+
+
+def _replaced_indexes(meta):
+    migrations = Table('migrations', meta, autoload=True)
+    bw_usage_cache = Table('bw_usage_cache', meta, autoload=True)
+
+    return [
+        # Only its leading deleted column can be used by queries matching
+        # either side of a migration.
+        Index('migrations_by_host_nodes_and_status_idx',
+              migrations.c.deleted, migrations.c.source_compute,
+              migrations.c.dest_compute, migrations.c.source_node,
+              migrations.c.dest_node, migrations.c.status),
+
+        # A prefix of bw_usage_cache_uuid_start_period_mac_idx.
+        Index('bw_usage_cache_uuid_start_period_idx',
+              bw_usage_cache.c.uuid, bw_usage_cache.c.start_period),
+    ]
+
+
+def _existing_index_names(migrate_engine, table_name):
+    table = Table(table_name, MetaData(migrate_engine), autoload=True)
+    return [index.name for index in table.indexes]
+
+
+def upgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for index in _new_indexes(meta):
+        index.create(migrate_engine)
+
+    for index in _replaced_indexes(MetaData(migrate_engine)):
+        # NOTE: SQLite databases lost some indexes when migration 152
+        #       recreated their tables.
+        if index.name in _existing_index_names(migrate_engine,
+                                               index.table.name):
+            index.drop(migrate_engine)
+
+
+def downgrade(migrate_engine):
+    meta = MetaData()
+    meta.bind = migrate_engine
+
+    for index in _replaced_indexes(meta):
+        index.create(migrate_engine)
+
+    for index in _new_indexes(MetaData(migrate_engine)):
+        index.drop(migrate_engine)
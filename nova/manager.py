@@ -53,6 +53,7 @@ This module provides Manager, a base class for managers.
 
 """
 
+import sys
 import time
 
 import eventlet
@@ -71,6 +72,18 @@ periodic_opts = [
                default=True,
                help=('Some periodic tasks can be run in a separate process. '
                      'Should we run them here?')),
+    cfg.IntOpt('periodic_task_workers',
+               default=1,
+               help='Maximum number of periodic tasks of a service run '
+                    'concurrently. The default of 1 runs them in series; '
+                    'only raise it for services whose periodic tasks are '
+                    'safe to run alongside each other.'),
+    cfg.IntOpt('periodic_task_budget',
+               default=60,
+               help='Number of seconds a pass of the periodic tasks waits '
+                    'for a task without a budget of its own before leaving '
+                    'it to finish in the background. Set to 0 to always '
+                    'wait for tasks to finish.'),
     ]
 
 CONF = cfg.CONF
@@ -98,6 +111,10 @@ def periodic_task(*args, **kwargs):
            run_immediately is omitted or set to 'False', the first time the
            task runs will be approximately N seconds after the task scheduler
            starts.
+
+        A budget=N argument overrides periodic_task_budget for the task: a
+        pass of the periodic tasks waits at most N seconds for it, and 0
+        means no limit.
     """
     def decorator(f):
         # Test for old style invocation
@@ -114,6 +131,7 @@ def periodic_task(*args, **kwargs):
 
         # Control frequency
         f._periodic_spacing = kwargs.pop('spacing', 0)
+        f._periodic_budget = kwargs.pop('budget', None)
         if kwargs.pop('run_immediately', False):
             f._periodic_last_run = None
         else:
@@ -200,6 +218,10 @@ class Manager(base.Base):
         self.host = host
         self.load_plugins()
         self.backdoor_port = None
+        self._periodic_pool = eventlet.GreenPool(
+                max(1, CONF.periodic_task_workers))
+        self._periodic_in_progress = set()
+        self._periodic_task_stats = {}
         super(Manager, self).__init__(db_driver)
 
     def load_plugins(self):
@@ -215,11 +237,28 @@ class Manager(base.Base):
         return rpc_dispatcher.RpcDispatcher([self])
 
     def periodic_tasks(self, context, raise_on_error=False):
-        """Tasks to be run at a periodic interval."""
+        """Tasks to be run at a periodic interval.
+
+        The tasks which are due run concurrently in a pool of
+        periodic_task_workers greenthreads, so that a slow task does not
+        delay the others. A task whose previous run is still in progress is
+        skipped, and the pass stops waiting for a task once its budget is
+        spent, leaving it to finish in the background. A task which is due
+        while every worker is busy with such a task is deferred to the next
+        pass.
+        """
         idle_for = DEFAULT_INTERVAL
+        started = []
         for task_name, task in self._periodic_tasks:
             full_task_name = '.'.join([self.__class__.__name__, task_name])
 
+            if task_name in self._periodic_in_progress:
+                LOG.debug(_("Skipping periodic task %(full_task_name)s "
+                            "because its previous run is still in progress"),
+                          locals())
+                self._get_periodic_task_stats(task_name)['skips'] += 1
+                continue
+
             # If a periodic task is _nearly_ due, then we'll run it early
             if self._periodic_spacing[task_name] is None:
                 wait = 0
@@ -234,24 +273,125 @@ class Manager(base.Base):
                         idle_for = wait
                     continue
 
+            # Tasks started by this pass are waited for anyway, so wait for
+            # them to free a worker first.
+            while started and self._periodic_pool.free() == 0:
+                self._wait_for_periodic_task(*started.pop(0))
+            if self._periodic_pool.free() == 0:
+                # Every worker is busy with a task left over from a previous
+                # pass and spawning would block until one finishes, so the
+                # task is left due for the next pass.
+                LOG.debug(_("Deferring periodic task %(full_task_name)s "
+                            "because every worker is busy"), locals())
+                self._get_periodic_task_stats(task_name)['deferrals'] += 1
+                continue
+
             LOG.debug(_("Running periodic task %(full_task_name)s"), locals())
             self._periodic_last_run[task_name] = time.time()
-
-            try:
-                task(self, context)
-            except Exception as e:
-                if raise_on_error:
-                    raise
-                LOG.exception(_("Error during %(full_task_name)s: %(e)s"),
-                              locals())
+            self._periodic_in_progress.add(task_name)
+            thread = self._periodic_pool.spawn(self._run_periodic_task,
+                                               context, task_name, task,
+                                               raise_on_error)
+            started.append((task_name, task, thread, time.time()))
 
             if (not self._periodic_spacing[task_name] is None and
                 self._periodic_spacing[task_name] < idle_for):
                 idle_for = self._periodic_spacing[task_name]
-            eventlet.sleep(0)
+
+        for task_name, task, thread, start_time in started:
+            self._wait_for_periodic_task(task_name, task, thread, start_time)
 
         return idle_for
 
+    def _get_periodic_task_budget(self, task):
+        budget = getattr(task, '_periodic_budget', None)
+        if budget is None:
+            budget = CONF.periodic_task_budget
+        return budget
+
+    def _get_periodic_task_stats(self, task_name):
+        if task_name not in self._periodic_task_stats:
+            self._periodic_task_stats[task_name] = {'runs': 0,
+                                                    'skips': 0,
+                                                    'deferrals': 0,
+                                                    'overruns': 0,
+                                                    'last_duration': None,
+                                                    'max_duration': 0.0,
+                                                    'total_duration': 0.0}
+        return self._periodic_task_stats[task_name]
+
+    def get_periodic_task_stats(self):
+        """Return the run counters and durations of the periodic tasks.
+
+        The result maps task names to dicts with the number of runs, skips
+        (previous run still in progress), deferrals (every worker busy) and
+        overruns (run longer than the budget of the task) and the last, max
+        and total durations of the runs in seconds.
+        """
+        return dict((task_name, dict(stats)) for task_name, stats
+                    in self._periodic_task_stats.iteritems())
+
+    def _run_periodic_task(self, context, task_name, task, raise_on_error):
+        """Run a periodic task in a worker of the pool.
+
+        Returns the exc_info of the error raised by the task if it has to be
+        raised by the pass of the periodic tasks.
+        """
+        full_task_name = '.'.join([self.__class__.__name__, task_name])
+        start_time = time.time()
+        try:
+            task(self, context)
+        except Exception as e:
+            if raise_on_error:
+                return sys.exc_info()
+            LOG.exception(_("Error during %(full_task_name)s: %(e)s"),
+                          locals())
+        finally:
+            self._periodic_in_progress.discard(task_name)
+            duration = time.time() - start_time
+            stats = self._get_periodic_task_stats(task_name)
+            stats['runs'] += 1
+            stats['last_duration'] = duration
+            stats['max_duration'] = max(stats['max_duration'], duration)
+            stats['total_duration'] += duration
+            budget = self._get_periodic_task_budget(task)
+            if budget and duration > budget:
+                stats['overruns'] += 1
+                LOG.warn(_("Periodic task %(full_task_name)s took "
+                           "%(duration).2f seconds, more than its budget of "
+                           "%(budget)s seconds"), locals())
+
+    def _wait_for_periodic_task(self, task_name, task, thread, start_time):
+        budget = self._get_periodic_task_budget(task)
+        if not budget:
+            exc_info = thread.wait()
+        else:
+            exc_info = None
+            finished = False
+            with eventlet.Timeout(max(0, start_time + budget - time.time()),
+                                  False):
+                exc_info = thread.wait()
+                finished = True
+            if not finished:
+                full_task_name = '.'.join([self.__class__.__name__,
+                                           task_name])
+                LOG.warn(_("Periodic task %(full_task_name)s is still "
+                           "running after its budget of %(budget)s seconds, "
+                           "leaving it to finish in the background"),
+                         locals())
+                # Nobody is left to raise the error of the task, if any
+                thread.link(self._log_periodic_task_error, full_task_name)
+        if exc_info:
+            raise exc_info[0], exc_info[1], exc_info[2]
+
+    @staticmethod
+    def _log_periodic_task_error(thread, full_task_name):
+        exc_info = thread.wait()
+        if exc_info:
+            LOG.error(_("Error during %(full_task_name)s: %(e)s"),
+                      {'full_task_name': full_task_name, 'e': exc_info[1]},
+                      exc_info=exc_info)
+
     def init_host(self):
         """Hook to do additional manager initialization when one requests
         the service be started.  This is called before any service record
@@ -280,6 +420,13 @@ class Manager(base.Base):
         """
         pass
 
+    def cleanup_host(self):
+        """Hook to do additional manager cleanup when the service stops.
+
+        Child classes should override this method.
+        """
+        pass
+
 
 class SchedulerDependentManager(Manager):
     """Periodically send capability updates to the Scheduler services.
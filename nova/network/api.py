@@ -20,12 +20,14 @@
 import functools
 import inspect
 
+from nova.api.metadata import store as metadata_store
 from nova.compute import instance_types
 from nova.db import base
 from nova import exception
 from nova.network import floating_ips
 from nova.network import model as network_model
 from nova.network import rpcapi as network_rpcapi
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova import policy
 from nova import utils
@@ -77,6 +79,20 @@ def update_instance_cache_with_nw_info(api, context, instance,
             api.db.instance_info_cache_update(context, instance['uuid'], cache)
     except Exception:
         LOG.exception(_('Failed storing info cache'), instance=instance)
+    else:
+        # The metadata of the instance includes its network config
+        metadata_store.invalidate(instance)
+
+
+def info_cache_changed(instance, nw_info):
+    """Return True if nw_info differs from the info cache of instance."""
+    info_cache = instance.get('info_cache') or {}
+    cached = info_cache.get('network_info')
+    if not cached:
+        return True
+    if isinstance(cached, basestring):
+        cached = jsonutils.loads(cached)
+    return cached != jsonutils.loads(nw_info.json())
 
 
 def wrap_check_policy(func):
@@ -375,6 +391,35 @@ class API(base.Base):
 
         return network_model.NetworkInfo.hydrate(nw_info)
 
+    @wrap_check_policy
+    def get_instance_nw_info_bulk(self, context, instances,
+                                  conductor_api=None):
+        """Returns the network info of several instances, by uuid.
+
+        The info cache of an instance is only updated if its network info
+        differs from the cached one.
+        """
+        args = []
+        for instance in instances:
+            instance_type = instance_types.extract_instance_type(instance)
+            args.append({'instance_uuid': instance['uuid'],
+                         'rxtx_factor': instance_type['rxtx_factor'],
+                         'host': instance['host']})
+        nw_infos = self.network_rpcapi.get_instance_nw_info_bulk(context,
+                                                                 args)
+
+        result = {}
+        for instance in instances:
+            if instance['uuid'] not in nw_infos:
+                continue
+            nw_info = network_model.NetworkInfo.hydrate(
+                    nw_infos[instance['uuid']])
+            result[instance['uuid']] = nw_info
+            if info_cache_changed(instance, nw_info):
+                update_instance_cache_with_nw_info(self, context, instance,
+                                                   nw_info, conductor_api)
+        return result
+
     @wrap_check_policy
     def validate_networks(self, context, requested_networks):
         """validate the networks passed at the time of creating
@@ -42,6 +42,8 @@ topologies.  All of the network commands are issued to a subclass of
 
 """
 
+import contextlib
+import copy
 import datetime
 import itertools
 import math
@@ -192,6 +194,7 @@ class RPCAllocateFixedIP(object):
         vpn = kwargs.get('vpn')
         requested_networks = kwargs.get('requested_networks')
 
+        allocations = []
         for network in networks:
             address = None
             if requested_networks is not None:
@@ -206,15 +209,28 @@ class RPCAllocateFixedIP(object):
             # NOTE(vish): if there is no network host, set one
             if host is None:
                 host = self.network_rpcapi.set_network_host(context, network)
-            if host != self.host:
-                # need to call allocate_fixed_ip to correct network host
-                green_pool.spawn_n(self.network_rpcapi._rpc_allocate_fixed_ip,
-                        context, instance_id, network['id'], address, vpn,
-                        host)
-            else:
-                # i am the correct host, run here
-                self.allocate_fixed_ip(context, instance_id, network,
-                                       vpn=vpn, address=address)
+            allocations.append((network, address, host))
+
+        claimed = {}
+        if not vpn:
+            claimed = self._claim_fixed_ips(context, instance_id,
+                    [network for network, address, host in allocations
+                     if address is None and host == self.host])
+
+        with self._releasing_claimed_fixed_ips(context, claimed):
+            for network, address, host in allocations:
+                if host != self.host:
+                    # need to call allocate_fixed_ip to correct network host
+                    green_pool.spawn_n(
+                            self.network_rpcapi._rpc_allocate_fixed_ip,
+                            context, instance_id, network['id'], address,
+                            vpn, host)
+                else:
+                    # i am the correct host, run here
+                    self.allocate_fixed_ip(context, instance_id, network,
+                            vpn=vpn, address=address,
+                            claimed_address=claimed.get(network['id']))
+                    claimed.pop(network['id'], None)
 
         # wait for all of the allocates (if any) to finish
         green_pool.waitall()
@@ -268,7 +284,7 @@ class NetworkManager(manager.Manager):
         The one at a time part is to flatten the layout to help scale
     """
 
-    RPC_API_VERSION = '1.9'
+    RPC_API_VERSION = '1.10'
 
     # If True, this manager requires VIF to create a bridge.
     SHOULD_CREATE_BRIDGE = False
@@ -589,10 +605,64 @@ class NetworkManager(manager.Manager):
                                                          rxtx_factor, host)
         return nw_info
 
+    def get_instance_nw_info_bulk(self, context, instances):
+        """Creates network info lists for several instances at once.
+
+        :param instances: list of dicts with the instance_uuid, rxtx_factor
+                          and host of each instance
+        :returns: dict mapping instance uuids to network info lists
+
+        The virtual interfaces and the fixed ips (with their floating ips)
+        of all the instances are fetched with one query each, and every
+        network and its subnets are only looked up once.
+        """
+        instance_uuids = [instance['instance_uuid'] for instance in instances]
+        vifs = self.db.virtual_interface_get_by_instances(context,
+                                                          instance_uuids)
+        fixed_ips = {}
+        for fixed_ip in self.db.fixed_ips_by_virtual_interfaces(
+                context, [vif['id'] for vif in vifs]):
+            fixed_ips.setdefault(fixed_ip['virtual_interface_id'],
+                                 []).append(fixed_ip)
+        vifs_by_instance = {}
+        for vif in vifs:
+            vifs_by_instance.setdefault(vif['instance_uuid'], []).append(vif)
+
+        networks_by_id = {}
+        subnets_cache = {}
+        nw_infos = {}
+        for instance in instances:
+            instance_uuid = instance['instance_uuid']
+            instance_vifs = vifs_by_instance.get(instance_uuid, [])
+            try:
+                networks = {}
+                for vif in instance_vifs:
+                    network_id = vif.get('network_id')
+                    if network_id is None:
+                        continue
+                    if network_id not in networks_by_id:
+                        networks_by_id[network_id] = self._get_network_by_id(
+                                context, network_id)
+                    networks[vif['uuid']] = networks_by_id[network_id]
+                nw_infos[instance_uuid] = self.build_network_info_model(
+                        context, instance_vifs, networks,
+                        instance['rxtx_factor'], instance['host'],
+                        fixed_ips=fixed_ips, subnets_cache=subnets_cache)
+            except Exception:
+                LOG.exception(_('Failed to build the network info of '
+                                'instance %s'), instance_uuid)
+        return nw_infos
+
     def build_network_info_model(self, context, vifs, networks,
-                                 rxtx_factor, instance_host):
+                                 rxtx_factor, instance_host, fixed_ips=None,
+                                 subnets_cache=None):
         """Builds a NetworkInfo object containing all network information
-        for an instance"""
+        for an instance.
+
+        Callers building the network info of many instances can pass the
+        fixed ips (with their floating ips) of the vifs, keyed by vif id,
+        and a dict in which the subnets of each network are cached, to save
+        querying them for every vif."""
         nw_info = network_model.NetworkInfo()
         for vif in vifs:
             vif_dict = {'id': vif['uuid'],
@@ -607,8 +677,15 @@ class NetworkManager(manager.Manager):
 
             # get network dict for vif from args and build the subnets
             network = networks[vif['uuid']]
-            subnets = self._get_subnets_from_network(context, network, vif,
-                                                     instance_host)
+            if subnets_cache is None:
+                subnets = self._get_subnets_from_network(context, network,
+                                                         vif, instance_host)
+            else:
+                key = (network['uuid'], instance_host)
+                if key not in subnets_cache:
+                    subnets_cache[key] = self._get_subnets_from_network(
+                            context, network, vif, instance_host)
+                subnets = copy.deepcopy(subnets_cache[key])
 
             # if rxtx_cap data are not set everywhere, set to none
             try:
@@ -617,14 +694,27 @@ class NetworkManager(manager.Manager):
                 rxtx_cap = None
 
             # get fixed_ips
-            v4_IPs = self.ipam.get_v4_ips_by_interface(context,
-                                                       network['uuid'],
-                                                       vif['uuid'],
-                                                       network['project_id'])
-            v6_IPs = self.ipam.get_v6_ips_by_interface(context,
-                                                       network['uuid'],
-                                                       vif['uuid'],
-                                                       network['project_id'])
+            if fixed_ips is None:
+                v4_IPs = self.ipam.get_v4_ips_by_interface(context,
+                                                        network['uuid'],
+                                                        vif['uuid'],
+                                                        network['project_id'])
+                v6_IPs = self.ipam.get_v6_ips_by_interface(context,
+                                                        network['uuid'],
+                                                        vif['uuid'],
+                                                        network['project_id'])
+                floating_ips_by_address = None
+            else:
+                vif_fixed_ips = fixed_ips.get(vif['id'], [])
+                v4_IPs = [fixed_ip['address'] for fixed_ip in vif_fixed_ips]
+                v6_IPs = []
+                if network['cidr_v6']:
+                    v6_IPs.append(ipv6.to_global(network['cidr_v6'],
+                                                 vif['address'],
+                                                 network['project_id']))
+                floating_ips_by_address = dict(
+                        (fixed_ip['address'], fixed_ip['floating_ips'])
+                        for fixed_ip in vif_fixed_ips)
 
             # create model FixedIPs from these fixed_ips
             network_IPs = [network_model.FixedIP(address=ip_address)
@@ -635,8 +725,12 @@ class NetworkManager(manager.Manager):
             for fixed_ip in network_IPs:
                 if fixed_ip['version'] == 6:
                     continue
-                gfipbfa = self.ipam.get_floating_ips_by_fixed_address
-                floating_ips = gfipbfa(context, fixed_ip['address'])
+                if floating_ips_by_address is None:
+                    gfipbfa = self.ipam.get_floating_ips_by_fixed_address
+                    floating_ips = gfipbfa(context, fixed_ip['address'])
+                else:
+                    floating_ips = floating_ips_by_address.get(
+                            fixed_ip['address'], [])
                 floating_ips = [network_model.IP(address=ip['address'],
                                                  type='floating')
                                 for ip in floating_ips]
@@ -822,6 +916,34 @@ class NetworkManager(manager.Manager):
         else:
             return True
 
+    def _claim_fixed_ips(self, context, instance_id, networks):
+        """Associate a free fixed ip of each network with an instance.
+
+        The ips of an instance on several networks are claimed together,
+        for allocate_fixed_ip to use, instead of one network at a time.
+
+        :returns: dict of network id to claimed address.
+        """
+        network_ids = [network['id'] for network in networks
+                       if network['cidr']]
+        if len(network_ids) < 2:
+            return {}
+        return self.db.fixed_ip_associate_pool_multi(context.elevated(),
+                                                     network_ids,
+                                                     instance_id)
+
+    @contextlib.contextmanager
+    def _releasing_claimed_fixed_ips(self, context, claimed):
+        """Disassociate the claimed ips left in claimed if allocating the
+        fixed ips of an instance fails.
+        """
+        try:
+            yield
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                for address in claimed.values():
+                    self.db.fixed_ip_disassociate(context, address)
+
     def allocate_fixed_ip(self, context, instance_id, network, **kwargs):
         """Gets a fixed ip from the pool."""
         # TODO(vish): when this is called by compute, we can associate compute
@@ -843,7 +965,10 @@ class NetworkManager(manager.Manager):
         try:
             if network['cidr']:
                 address = kwargs.get('address', None)
-                if address:
+                if kwargs.get('claimed_address'):
+                    # NOTE: already associated by _claim_fixed_ips
+                    address = kwargs['claimed_address']
+                elif address:
                     address = self.db.fixed_ip_associate(context,
                                                          address,
                                                          instance_id,
@@ -1462,15 +1587,25 @@ class FlatManager(NetworkManager):
                             **kwargs):
         """Calls allocate_fixed_ip once for each network."""
         requested_networks = kwargs.get('requested_networks')
+        allocations = []
         for network in networks:
             address = None
             if requested_networks is not None:
                 for address in (fixed_ip for (uuid, fixed_ip) in
                                 requested_networks if network['uuid'] == uuid):
                     break
+            allocations.append((network, address))
+
+        claimed = self._claim_fixed_ips(context, instance_id,
+                [network for network, address in allocations
+                 if address is None])
 
-            self.allocate_fixed_ip(context, instance_id,
-                                   network, address=address)
+        with self._releasing_claimed_fixed_ips(context, claimed):
+            for network, address in allocations:
+                self.allocate_fixed_ip(context, instance_id,
+                        network, address=address,
+                        claimed_address=claimed.get(network['id']))
+                claimed.pop(network['id'], None)
 
     def deallocate_fixed_ip(self, context, address, host=None, teardown=True):
         """Returns a fixed ip to the pool."""
@@ -1696,7 +1831,10 @@ class VlanManager(RPCAllocateFixedIP, floating_ips.FloatingIP, NetworkManager):
                                        reserved=True)
         else:
             address = kwargs.get('address', None)
-            if address:
+            if kwargs.get('claimed_address'):
+                # NOTE: already associated by _claim_fixed_ips
+                address = kwargs['claimed_address']
+            elif address:
                 address = self.db.fixed_ip_associate(context, address,
                                                      instance_id,
                                                      network['id'])
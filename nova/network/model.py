@@ -430,3 +430,135 @@ class NetworkInfo(list):
 
             network_info.append((network_dict, info_dict))
         return network_info
+
+
+def _cached_fixed_ip(fixed_ip):
+    # NOTE: caches written by NetworkInfo.json() carry every key of the
+    #       model, so they can be used as they are. Anything else is run
+    #       through the model to fill in what is missing.
+    if ('version' in fixed_ip and 'type' in fixed_ip and
+            'meta' in fixed_ip and 'floating_ips' in fixed_ip and
+            all('version' in ip for ip in fixed_ip['floating_ips'])):
+        return fixed_ip
+    return FixedIP.hydrate(fixed_ip)
+
+
+class CachedVIF(object):
+    """Read-only VIF backed by a VIF decoded from an info cache."""
+
+    def __init__(self, vif):
+        self._vif = vif
+        self._model = None
+        self._fixed_ips = None
+
+    def __repr__(self):
+        return 'CachedVIF(%r)' % self._vif
+
+    def __getitem__(self, key):
+        try:
+            return self._vif[key]
+        except KeyError:
+            return self.model()[key]
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def get_meta(self, key, default=None):
+        return self['meta'].get(key, default)
+
+    def model(self):
+        """Return the VIF hydrated into the network model."""
+        if self._model is None:
+            self._model = VIF.hydrate(self._vif)
+        return self._model
+
+    def fixed_ips(self):
+        if self._fixed_ips is None:
+            self._fixed_ips = [_cached_fixed_ip(fixed_ip)
+                               for subnet in self['network']['subnets']
+                               for fixed_ip in subnet['ips']]
+        return list(self._fixed_ips)
+
+    def floating_ips(self):
+        return [floating_ip for fixed_ip in self.fixed_ips()
+                            for floating_ip in fixed_ip['floating_ips']]
+
+
+class CachedNetworkInfo(object):
+    """Read-only network_info decoded from an instance info cache.
+
+    The cache is decoded once and used as is: nothing is hydrated into
+    nested model objects unless the full model, or the legacy format built
+    from it, is asked for. Everything returned is shared by all the users
+    of the instance and must not be modified.
+    """
+
+    def __init__(self, network_info):
+        if isinstance(network_info, basestring):
+            network_info = jsonutils.loads(network_info)
+        self._network_info = network_info or []
+        self._vifs = None
+        self._model = None
+
+    @classmethod
+    def for_instance(cls, instance):
+        """Return the network_info of an instance's info cache.
+
+        The result is memoized on the info cache, if it can hold attributes,
+        for as long as its network_info is not replaced.
+        """
+        info_cache = instance['info_cache'] or {}
+        cached_nwinfo = info_cache.get('network_info') or []
+        memo = getattr(info_cache, '_cached_network_info', None)
+        if memo is not None and memo[0] is cached_nwinfo:
+            return memo[1]
+        network_info = cls(cached_nwinfo)
+        try:
+            info_cache._cached_network_info = (cached_nwinfo, network_info)
+        except AttributeError:
+            # NOTE: instances received over RPC are plain dicts
+            pass
+        return network_info
+
+    def __repr__(self):
+        return 'CachedNetworkInfo(%r)' % self._network_info
+
+    def _get_vifs(self):
+        if self._vifs is None:
+            self._vifs = [CachedVIF(vif) for vif in self._network_info]
+        return self._vifs
+
+    def __iter__(self):
+        return iter(self._get_vifs())
+
+    def __len__(self):
+        return len(self._network_info)
+
+    def __getitem__(self, index):
+        return self._get_vifs()[index]
+
+    def model(self):
+        """Return the network_info hydrated into the network model."""
+        if self._model is None:
+            self._model = NetworkInfo.hydrate(self._network_info)
+        return self._model
+
+    def fixed_ips(self):
+        """Returns all fixed_ips without floating_ips attached."""
+        return [ip for vif in self for ip in vif.fixed_ips()]
+
+    def floating_ips(self):
+        """Returns all floating_ips."""
+        return [ip for vif in self for ip in vif.floating_ips()]
+
+    def json(self):
+        return jsonutils.dumps(self._network_info)
+
+    def legacy(self):
+        """
+        Return the legacy network_info representation of self
+        """
+        return self.model().legacy()
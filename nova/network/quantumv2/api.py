@@ -362,6 +362,53 @@ class API(base.Base):
                                    conductor_api)
         return result
 
+    def get_instance_nw_info_bulk(self, context, instances,
+                                  conductor_api=None):
+        """Returns the network info of several instances, by uuid.
+
+        The ports and floating ips of all the instances are listed with one
+        query each, and the networks once per project. The info cache of an
+        instance is only updated if its network info differs from the
+        cached one.
+        """
+        if not instances:
+            return {}
+        client = quantumv2.get_client(context, admin=True)
+        data = client.list_ports(
+                device_id=[instance['uuid'] for instance in instances])
+        ports = data.get('ports', [])
+        floating_ips = self._get_floating_ips_by_ports(
+                client, [port['id'] for port in ports])
+
+        ports_by_instance = {}
+        for port in ports:
+            ports_by_instance.setdefault(port['device_id'], []).append(port)
+        networks_by_project = {}
+        result = {}
+        for instance in instances:
+            project_id = instance['project_id']
+            if project_id not in networks_by_project:
+                networks_by_project[project_id] = (
+                        self._get_available_networks(context, project_id))
+            # NOTE: list_ports() only returns the ports of the instance's
+            # own tenant when looking up a single instance.
+            instance_ports = [port for port in
+                              ports_by_instance.get(instance['uuid'], [])
+                              if port['tenant_id'] == project_id]
+            LOG.debug(_('get_instance_nw_info() for %s'),
+                      instance['display_name'])
+            nw_info = network_model.NetworkInfo.hydrate(
+                    self._build_network_info_model(context, instance,
+                            ports=instance_ports,
+                            floating_ips=floating_ips,
+                            available_networks=networks_by_project[
+                                    project_id]))
+            result[instance['uuid']] = nw_info
+            if network_api.info_cache_changed(instance, nw_info):
+                update_instance_info_cache(self, context, instance, nw_info,
+                                           conductor_api)
+        return result
+
     def _get_instance_nw_info(self, context, instance, networks=None):
         LOG.debug(_('get_instance_nw_info() for %s'),
                   instance['display_name'])
@@ -732,6 +779,20 @@ class API(base.Base):
             raise
         return data['floatingips']
 
+    def _get_floating_ips_by_ports(self, client, port_ids):
+        """Get the floatingips of several ports at once."""
+        if not port_ids:
+            return []
+        try:
+            data = client.list_floatingips(port_id=port_ids)
+        # If a quantum plugin does not implement the L3 API a 404 from
+        # list_floatingips will be raised.
+        except qexceptions.QuantumClientException as e:
+            if e.status_code == 404:
+                return []
+            raise
+        return data['floatingips']
+
     def release_floating_ip(self, context, address,
                             affect_auto_assigned=False):
         """Remove a floating ip with the given address from a project."""
@@ -780,15 +841,25 @@ class API(base.Base):
         """Force add a network to the project."""
         raise NotImplementedError()
 
-    def _build_network_info_model(self, context, instance, networks=None):
-        search_opts = {'tenant_id': instance['project_id'],
-                       'device_id': instance['uuid'], }
+    def _build_network_info_model(self, context, instance, networks=None,
+                                  ports=None, floating_ips=None,
+                                  available_networks=None):
+        """Build the network info of an instance.
+
+        ports, floating_ips and available_networks, if given, are used
+        instead of being looked up in quantum for this instance only.
+        """
         client = quantumv2.get_client(context, admin=True)
-        data = client.list_ports(**search_opts)
-        ports = data.get('ports', [])
+        if ports is None:
+            search_opts = {'tenant_id': instance['project_id'],
+                           'device_id': instance['uuid'], }
+            data = client.list_ports(**search_opts)
+            ports = data.get('ports', [])
         if networks is None:
-            networks = self._get_available_networks(context,
-                                                    instance['project_id'])
+            networks = available_networks
+            if networks is None:
+                networks = self._get_available_networks(
+                        context, instance['project_id'])
         else:
             # ensure ports are in preferred network order
             _ensure_requested_network_ordering(
@@ -813,8 +884,14 @@ class API(base.Base):
             network_IPs = []
             for fixed_ip in port['fixed_ips']:
                 fixed = network_model.FixedIP(address=fixed_ip['ip_address'])
-                floats = self._get_floating_ips_by_fixed_and_port(
-                        client, fixed_ip['ip_address'], port['id'])
+                if floating_ips is None:
+                    floats = self._get_floating_ips_by_fixed_and_port(
+                            client, fixed_ip['ip_address'], port['id'])
+                else:
+                    floats = [ip for ip in floating_ips
+                              if (ip['port_id'] == port['id'] and
+                                  ip['fixed_ip_address'] ==
+                                  fixed_ip['ip_address'])]
                 for ip in floats:
                     fip = network_model.IP(address=ip['floating_ip_address'],
                                            type='floating')
@@ -54,6 +54,7 @@ class NetworkAPI(rpc_proxy.RpcProxy):
         1.8 - Adds macs to allocate_for_instance
         1.9 - Adds rxtx_factor to [add|remove]_fixed_ip, removes instance_uuid
               from allocate_for_instance and instance_get_nw_info
+        1.10 - Adds get_instance_nw_info_bulk
     '''
 
     #
@@ -206,6 +207,10 @@ class NetworkAPI(rpc_proxy.RpcProxy):
                 instance_id=instance_id, rxtx_factor=rxtx_factor, host=host,
                 project_id=project_id), version='1.9')
 
+    def get_instance_nw_info_bulk(self, ctxt, instances):
+        return self.call(ctxt, self.make_msg('get_instance_nw_info_bulk',
+                instances=instances), version='1.10')
+
     def validate_networks(self, ctxt, networks):
         return self.call(ctxt, self.make_msg('validate_networks',
                 networks=networks))
@@ -21,6 +21,7 @@ the system.
 
 from oslo.config import cfg
 
+from nova.api.metadata import store as metadata_store
 from nova.compute import instance_types
 import nova.context
 from nova import db
@@ -49,12 +50,23 @@ notify_opts = [
     cfg.BoolOpt('notify_api_faults', default=False,
         help='If set, send api.fault notifications on caught exceptions '
              'in the API service.'),
+    cfg.BoolOpt('notify_bandwidth_usage_lookup', default=False,
+        help='If set, compute.instance.update notifications for instances '
+             'whose system metadata holds no bandwidth usage recorded by '
+             'the bandwidth usage poll look their bandwidth usage up in '
+             'the database, and their network info up in nova-network if '
+             'their info cache is empty. If not set, such notifications '
+             'report no bandwidth usage.'),
 ]
 
 
 CONF = cfg.CONF
 CONF.register_opts(notify_opts)
 
+# Prefix of the instance system metadata keys the bandwidth usage poll of
+# the compute manager records the usage of each network of an instance in.
+BANDWIDTH_USAGE_PREFIX = 'bandwidth_usage_'
+
 
 def send_api_fault(url, status, exception):
     """Send an api.fault notification."""
@@ -75,6 +87,9 @@ def send_update(context, old_instance, new_instance, service=None, host=None):
     in that instance
     """
 
+    # The metadata of the instance has to be built again
+    metadata_store.invalidate(new_instance)
+
     if not CONF.notify_on_any_change and not CONF.notify_on_state_change:
         # skip all this if updates are disabled
         return
@@ -181,7 +196,12 @@ def _send_instance_update_notification(context, instance, old_vm_state=None,
     payload["audit_period_ending"] = audit_end
 
     # add bw usage info:
-    bw = bandwidth_usage(instance, audit_start)
+    bw = bandwidth_usage_from_system_metadata(instance, audit_start)
+    if bw is None:
+        if CONF.notify_bandwidth_usage_lookup:
+            bw = bandwidth_usage(instance, audit_start)
+        else:
+            bw = {}
     payload["bandwidth"] = bw
 
     publisher_id = notifier_api.publisher_id(service, host)
@@ -220,8 +240,7 @@ def bandwidth_usage(instance_ref, audit_start,
     if (instance_ref.get('info_cache') and
         instance_ref['info_cache'].get('network_info') is not None):
 
-        cached_info = instance_ref['info_cache']['network_info']
-        nw_info = network_model.NetworkInfo.hydrate(cached_info)
+        nw_info = network_model.CachedNetworkInfo.for_instance(instance_ref)
     else:
         try:
             nw_info = network.API().get_instance_nw_info(admin_context,
@@ -256,6 +275,61 @@ def bandwidth_usage(instance_ref, audit_start,
     return bw
 
 
+def network_labels(instance_ref):
+    """Return a dict of MAC address to network label for the instance,
+    as found in its info cache.
+    """
+    labels = {}
+    info_cache = instance_ref.get('info_cache')
+    if info_cache and info_cache.get('network_info') is not None:
+        nw_info = network_model.CachedNetworkInfo.for_instance(instance_ref)
+        for vif in nw_info:
+            labels[vif['address']] = vif['network']['label']
+    return labels
+
+
+def bandwidth_usage_system_metadata(audit_start, usages):
+    """Return the instance system metadata recording the bandwidth usage
+    of an instance for the specified audit period.
+
+    :param audit_start: start of the audit period the usages are for.
+    :param usages: dict of network label to a dict with the bw_in and
+                   bw_out of the instance.
+    """
+    audit_start = timeutils.strtime(audit_start)
+    return dict((BANDWIDTH_USAGE_PREFIX + label,
+                 '%s;%d;%d' % (audit_start, usage['bw_in'], usage['bw_out']))
+                for label, usage in usages.iteritems())
+
+
+def bandwidth_usage_from_system_metadata(instance_ref, audit_start):
+    """Get the bandwidth usage of the instance for the specified audit
+    period from its system metadata, or None if the bandwidth usage poll
+    has not recorded any usage for the instance.
+    """
+    system_metadata = instance_ref.get('system_metadata') or {}
+    if not isinstance(system_metadata, dict):
+        system_metadata = utils.metadata_to_dict(system_metadata)
+
+    audit_start = timeutils.strtime(audit_start)
+    bw = None
+    for key, value in system_metadata.iteritems():
+        if not key.startswith(BANDWIDTH_USAGE_PREFIX):
+            continue
+        if bw is None:
+            bw = {}
+        try:
+            start, bw_in, bw_out = value.rsplit(';', 2)
+            if start != audit_start:
+                continue
+            bw[key[len(BANDWIDTH_USAGE_PREFIX):]] = dict(bw_in=int(bw_in),
+                                                         bw_out=int(bw_out))
+        except ValueError:
+            LOG.warn(_("Ignoring malformed bandwidth usage %(key)s: "
+                       "%(value)s") % locals(), instance=instance_ref)
+    return bw
+
+
 def image_meta(system_metadata):
     """Format image metadata for use in notifications from the instance
     system metadata.
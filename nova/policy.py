@@ -17,12 +17,14 @@
 
 """Policy Engine For Nova."""
 
+import copy
 import os.path
 
 from oslo.config import cfg
 
 from nova import exception
 from nova.openstack.common import policy
+from nova.openstack.common import timeutils
 from nova import utils
 
 
@@ -33,6 +35,11 @@ policy_opts = [
     cfg.StrOpt('policy_default_rule',
                default='default',
                help=_('Rule checked when requested rule is not found')),
+    cfg.IntOpt('policy_reload_interval',
+               default=1,
+               help=_('Minimum number of seconds between checks of the '
+                      'policy file for modifications. Set to 0 to check '
+                      'on every policy check')),
     ]
 
 CONF = cfg.CONF
@@ -40,27 +47,44 @@ CONF.register_opts(policy_opts)
 
 _POLICY_PATH = None
 _POLICY_CACHE = {}
+_POLICY_CHECKED_AT = None
+
+# Rules compiled by _compile_rule(), keyed by action, along with the
+# policy.Rules object they were compiled from.
+_COMPILED_RULES = {}
+_COMPILED_FROM = None
+
+# Maximum number of decisions remembered for a single context.
+_MAX_CACHED_DECISIONS = 256
 
 
 def reset():
     global _POLICY_PATH
     global _POLICY_CACHE
+    global _POLICY_CHECKED_AT
     _POLICY_PATH = None
     _POLICY_CACHE = {}
+    _POLICY_CHECKED_AT = None
     policy.reset()
 
 
 def init():
     global _POLICY_PATH
     global _POLICY_CACHE
+    global _POLICY_CHECKED_AT
     if not _POLICY_PATH:
         _POLICY_PATH = CONF.policy_file
         if not os.path.exists(_POLICY_PATH):
             _POLICY_PATH = CONF.find_file(_POLICY_PATH)
         if not _POLICY_PATH:
             raise exception.ConfigNotFound(path=CONF.policy_file)
+    if (_POLICY_CACHE and _POLICY_CHECKED_AT is not None and
+            not timeutils.is_older_than(_POLICY_CHECKED_AT,
+                                        CONF.policy_reload_interval)):
+        return
     utils.read_cached_file(_POLICY_PATH, _POLICY_CACHE,
                            reload_func=_set_rules)
+    _POLICY_CHECKED_AT = timeutils.utcnow()
 
 
 def _set_rules(data):
@@ -68,6 +92,121 @@ def _set_rules(data):
     policy.set_rules(policy.Rules.load_json(data, default_rule))
 
 
+def _true_check(target, creds):
+    return True
+
+
+def _false_check(target, creds):
+    return False
+
+
+def _compile_check(check, rules, seen):
+    """Turn a policy.BaseCheck tree into a single callable.
+
+    'rule:' references are resolved now rather than on every call and
+    the built-in checks become plain closures.  Any other check, or a
+    'rule:' reference that loops back on itself, is used as is.
+    """
+    kind = type(check)
+    if kind is policy.TrueCheck:
+        return _true_check
+    if kind is policy.FalseCheck:
+        return _false_check
+    if kind is policy.NotCheck:
+        func = _compile_check(check.rule, rules, seen)
+        return lambda target, creds: not func(target, creds)
+    if kind is policy.AndCheck:
+        funcs = [_compile_check(rule, rules, seen) for rule in check.rules]
+
+        def and_check(target, creds):
+            for func in funcs:
+                if not func(target, creds):
+                    return False
+            return True
+        return and_check
+    if kind is policy.OrCheck:
+        funcs = [_compile_check(rule, rules, seen) for rule in check.rules]
+
+        def or_check(target, creds):
+            for func in funcs:
+                if func(target, creds):
+                    return True
+            return False
+        return or_check
+    if kind is policy.RoleCheck:
+        role = check.match.lower()
+        return lambda target, creds: role in [x.lower()
+                                              for x in creds['roles']]
+    if kind is policy.RuleCheck and check.match not in seen:
+        try:
+            rule = rules[check.match]
+        except KeyError:
+            # We don't have any matching rule; fail closed
+            return _false_check
+        func = _compile_check(rule, rules, seen | set([check.match]))
+
+        def rule_check(target, creds):
+            try:
+                return func(target, creds)
+            except KeyError:
+                return False
+        return rule_check
+    return check
+
+
+def _compile_rule(action):
+    """Return a callable evaluating the rule for action.
+
+    Compiled rules are kept until different rules are set.
+    """
+    global _COMPILED_RULES
+    global _COMPILED_FROM
+    rules = policy._rules
+    if rules is not _COMPILED_FROM:
+        _COMPILED_RULES = {}
+        _COMPILED_FROM = rules
+    func = _COMPILED_RULES.get(action)
+    if func is None:
+        try:
+            # No rules to reference means we're going to fail closed
+            rule = rules[action] if rules else None
+        except KeyError:
+            rule = None
+        if rule is None:
+            func = _false_check
+        else:
+            func = _compile_check(rule, rules, set([action]))
+        _COMPILED_RULES[action] = func
+    return func
+
+
+def _check(action, target, credentials):
+    """Same as policy.check() without the exception handling."""
+    try:
+        return _compile_rule(action)(target, credentials)
+    except KeyError:
+        # If the rule doesn't exist, fail closed
+        return False
+
+
+def _get_decision_cache(context, credentials):
+    """Return the dict of policy decisions made for this context.
+
+    The decisions are dropped when the rules or the credentials of the
+    context change.
+    """
+    cache = getattr(context, '_policy_decisions', None)
+    if (cache is None or cache['rules'] is not policy._rules or
+            cache['credentials'] != credentials):
+        cache = {'rules': policy._rules,
+                 'credentials': copy.deepcopy(credentials),
+                 'decisions': {}}
+        context._policy_decisions = cache
+    elif len(cache['decisions']) >= _MAX_CACHED_DECISIONS:
+        cache['decisions'].clear()
+    return cache['decisions']
+
+
 def enforce(context, action, target, do_raise=True):
     """Verifies that the action is valid on the target in this context.
 
@@ -89,17 +228,36 @@ def enforce(context, action, target, do_raise=True):
        :return: returns a non-False value (not necessarily "True") if
            authorized, and the exact value False if not authorized and
            do_raise is False.
+
+       Decisions are remembered on the context for targets made of
+       hashable values, so repeated checks during a request are cheap.
     """
     init()
 
     credentials = context.to_dict()
 
-    # Add the exception arguments if asked to do a raise
-    extra = {}
-    if do_raise:
-        extra.update(exc=exception.PolicyNotAuthorized, action=action)
+    key = None
+    if isinstance(target, dict):
+        try:
+            key = (action, frozenset(target.iteritems()))
+        except TypeError:
+            # Unhashable values in the target
+            pass
+
+    if key is None:
+        result = _check(action, target, credentials)
+    else:
+        decisions = _get_decision_cache(context, credentials)
+        try:
+            result = decisions[key]
+        except KeyError:
+            result = _check(action, target, credentials)
+            decisions[key] = result
+
+    if do_raise and result is False:
+        raise exception.PolicyNotAuthorized(action=action)
 
-    return policy.check(action, target, credentials, **extra)
+    return result
 
 
 def check_is_admin(context):
@@ -112,7 +270,7 @@ def check_is_admin(context):
     credentials = context.to_dict()
     target = credentials
 
-    return policy.check('context_is_admin', target, credentials)
+    return _check('context_is_admin', target, credentials)
 
 
 @policy.register('is_admin')
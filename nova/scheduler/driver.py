@@ -135,9 +135,10 @@ class Scheduler(object):
         """Return the list of hosts that have a running service for topic."""
 
         services = db.service_get_all_by_topic(context, topic)
+        states = self.servicegroup_api.service_are_up(services)
         return [service['host']
-                for service in services
-                if self.servicegroup_api.service_is_up(service)]
+                for service, is_up in zip(services, states)
+                if is_up]
 
     def group_hosts(self, context, group):
         """Return the list of hosts that have VM's from the group."""
@@ -31,6 +31,7 @@ import eventlet
 import greenlet
 from oslo.config import cfg
 
+from nova import async_notifier
 from nova import conductor
 from nova import context
 from nova import exception
@@ -551,6 +552,11 @@ class Service(object):
             self.conn.close()
         except Exception:
             pass
+        try:
+            self.manager.cleanup_host()
+        except Exception:
+            LOG.exception(_('Failed to clean up the service host'))
+        async_notifier.flush(timeout=CONF.async_notification_flush_timeout)
         for x in self.timers:
             try:
                 x.stop()
@@ -656,6 +662,7 @@ class WSGIService(object):
 
         """
         self.server.stop()
+        async_notifier.flush(timeout=CONF.async_notification_flush_timeout)
 
     def wait(self):
         """Wait for the service to stop serving this API.
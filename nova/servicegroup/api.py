@@ -92,6 +92,22 @@ class API(object):
         LOG.debug(msg, member)
         return self._driver.is_up(member)
 
+    def service_are_up(self, members):
+        """Check whether each of the given members is up.
+
+        Returns a list of booleans in the same order as members.
+        """
+        LOG.debug(_('Check if %d members of the ServiceGroup are up'),
+                  len(members))
+        return self._driver.are_up(members)
+
+    def add_listener(self, callback):
+        """Register a callback called as callback(host, group_id, is_up)
+        whenever a member is found to have changed state. Not every driver
+        reports changes.
+        """
+        return self._driver.add_listener(callback)
+
     def leave(self, member_id, group_id):
         """Explicitly remove the given member from the ServiceGroup
         monitoring.
@@ -118,6 +134,9 @@ class API(object):
 class ServiceGroupDriver(object):
     """Base class for ServiceGroup drivers."""
 
+    def __init__(self, *args, **kwargs):
+        self._listeners = []
+
     def join(self, member_id, group_id, service=None):
         """Join the given service with it's group."""
         raise NotImplementedError()
@@ -126,6 +145,23 @@ class ServiceGroupDriver(object):
         """Check whether the given member is up."""
         raise NotImplementedError()
 
+    def are_up(self, members):
+        """Check whether each of the given members is up. Drivers able to
+        answer for many members at once should override this.
+        """
+        return [self.is_up(member) for member in members]
+
+    def add_listener(self, callback):
+        """Register a callback for member state changes."""
+        self._listeners.append(callback)
+
+    def _notify_listeners(self, member_id, group_id, is_up):
+        for callback in self._listeners:
+            try:
+                callback(member_id, group_id, is_up)
+            except Exception:
+                LOG.exception(_('ServiceGroup listener %s failed'), callback)
+
     def leave(self, member_id, group_id):
         """Remove the given member from the ServiceGroup monitoring."""
         raise NotImplementedError()
@@ -23,7 +23,18 @@ from nova.servicegroup import api
 from nova import utils
 
 
+db_driver_opts = [
+    cfg.IntOpt('servicegroup_db_cache_ttl',
+               default=10,
+               help='Number of seconds the members of a group are served '
+                    'from memory by the DB servicegroup driver before they '
+                    'are reloaded. Members that look down in the cached '
+                    'records are always reloaded before being reported '
+                    'down. Set to 0 to disable caching.'),
+    ]
+
 CONF = cfg.CONF
+CONF.register_opts(db_driver_opts)
 CONF.import_opt('service_down_time', 'nova.service')
 
 LOG = logging.getLogger(__name__)
@@ -32,8 +43,14 @@ LOG = logging.getLogger(__name__)
 class DbDriver(api.ServiceGroupDriver):
 
     def __init__(self, *args, **kwargs):
+        super(DbDriver, self).__init__(*args, **kwargs)
         self.db_allowed = kwargs.get('db_allowed', True)
         self.conductor_api = conductor.API(use_local=self.db_allowed)
+        # Maps a group to the time its services were last loaded and
+        # the list of service records.
+        self._groups = {}
+        # Maps (topic, host) to the last known up/down state of a member.
+        self._states = {}
 
     def join(self, member_id, group_id, service=None):
         """Join the given service with it's group."""
@@ -55,6 +72,21 @@ class DbDriver(api.ServiceGroupDriver):
         """Moved from nova.utils
         Check whether a service is up based on last heartbeat.
         """
+        return self._is_up(service_ref, timeutils.utcnow())
+
+    def are_up(self, service_refs):
+        """Check whether each of the given services is up, reading the
+        clock only once for the whole batch.
+        """
+        now = timeutils.utcnow()
+        return [self._is_up(service_ref, now) for service_ref in service_refs]
+
+    def _is_up(self, service_ref, now):
+        is_up = self._heartbeat_is_recent(service_ref, now)
+        self._record_state(service_ref, is_up)
+        return is_up
+
+    def _heartbeat_is_recent(self, service_ref, now):
         last_heartbeat = service_ref['updated_at'] or service_ref['created_at']
         if isinstance(last_heartbeat, basestring):
             # NOTE(russellb) If this service_ref came in over rpc via
@@ -62,23 +94,64 @@ class DbDriver(api.ServiceGroupDriver):
             # converted back to a datetime.
             last_heartbeat = timeutils.parse_strtime(last_heartbeat)
         # Timestamps in DB are UTC.
-        elapsed = utils.total_seconds(timeutils.utcnow() - last_heartbeat)
+        elapsed = utils.total_seconds(now - last_heartbeat)
         LOG.debug('DB_Driver.is_up last_heartbeat = %(lhb)s elapsed = %(el)s',
                   {'lhb': str(last_heartbeat), 'el': str(elapsed)})
         return abs(elapsed) <= CONF.service_down_time
 
+    def _record_state(self, service_ref, is_up):
+        """Remember the state of a member and notify the listeners
+        registered with add_listener() when it changes.
+        """
+        topic = service_ref.get('topic')
+        host = service_ref.get('host')
+        if topic is None or host is None:
+            return
+        previous = self._states.get((topic, host))
+        self._states[(topic, host)] = is_up
+        if previous is not None and previous != is_up:
+            if is_up:
+                LOG.info(_('Service %(host)s of the %(topic)s group is up'),
+                         locals())
+            else:
+                LOG.warn(_('Service %(host)s of the %(topic)s group is down'),
+                         locals())
+            self._notify_listeners(host, topic, is_up)
+
     def get_all(self, group_id):
         """
         Returns ALL members of the given group
         """
         LOG.debug(_('DB_Driver: get_all members of the %s group') % group_id)
-        rs = []
+        services, cached = self._get_group_services(group_id)
+        now = timeutils.utcnow()
+        if cached and not all(self._heartbeat_is_recent(service, now)
+                              for service in services):
+            # Cached heartbeats only get older, so a member that looks down
+            # in the cache may have reported since; never declare a member
+            # down without reading its current record.
+            services, cached = self._get_group_services(group_id,
+                                                        reload=True)
+        states = [self._is_up(service, now) for service in services]
+        return [service['host']
+                for service, is_up in zip(services, states) if is_up]
+
+    def _get_group_services(self, group_id, reload=False):
+        """Return the service records of a group, reloading them through
+        the conductor at most once every servicegroup_db_cache_ttl seconds.
+
+        Returns a (services, cached) tuple, where cached tells whether the
+        records were served from memory.
+        """
+        ttl = CONF.servicegroup_db_cache_ttl
+        if ttl and not reload and group_id in self._groups:
+            loaded_at, services = self._groups[group_id]
+            if not timeutils.is_older_than(loaded_at, ttl):
+                return services, True
         ctxt = context.get_admin_context()
         services = self.conductor_api.service_get_all_by_topic(ctxt, group_id)
-        for service in services:
-            if self.is_up(service):
-                rs.append(service['host'])
-        return rs
+        self._groups[group_id] = (timeutils.utcnow(), services)
+        return services, False
 
     def _report_state(self, service):
         """Update the state of this service in the datastore."""
@@ -39,6 +39,7 @@ LOG = logging.getLogger(__name__)
 class MemcachedDriver(api.ServiceGroupDriver):
 
     def __init__(self, *args, **kwargs):
+        super(MemcachedDriver, self).__init__(*args, **kwargs)
         test = kwargs.get('test')
         if not CONF.memcached_servers and not test:
             raise RuntimeError(_('memcached_servers not defined'))
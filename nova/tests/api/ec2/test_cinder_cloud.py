@@ -555,6 +555,27 @@ class CinderCloudTestCase(test.TestCase):
 
         self._tearDownBlockDeviceMapping(inst1, inst2, volumes)
 
+    def test_describe_instances_bdm_volumes_looked_up_at_once(self):
+        (inst1, inst2, volumes) = self._setUpBlockDeviceMapping()
+        calls = []
+        orig_get_many = self.cloud.volume_api.get_many
+
+        def fake_get_many(context, volume_ids):
+            calls.append(sorted(volume_ids))
+            return orig_get_many(context, volume_ids)
+
+        self.stubs.Set(self.cloud.volume_api, 'get_many', fake_get_many)
+
+        result = self.cloud.describe_instances(self.context,
+                instance_id=[ec2utils.id_to_ec2_id(inst1['id']),
+                             ec2utils.id_to_ec2_id(inst2['id'])])
+        instances = [instance for reservation in result['reservationSet']
+                     for instance in reservation['instancesSet']]
+        self.assertEqual(len(instances), 2)
+        self.assertEqual(calls, [sorted(vol['id'] for vol in volumes)])
+
+        self._tearDownBlockDeviceMapping(inst1, inst2, volumes)
+
     def _setUpImageSet(self, create_volumes_and_snapshots=False):
         mappings1 = [
             {'device': '/dev/sda1', 'virtual': 'root'},
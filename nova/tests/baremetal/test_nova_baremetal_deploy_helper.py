@@ -90,7 +90,7 @@ class WorkerTestCase(bm_db_base.BMDBTestCase):
         """Check all queued requests are passed to deploy()."""
         history = []
 
-        def fake_deploy(**params):
+        def fake_deploy(progress=None, **params):
             history.append(params)
 
         self.stubs.Set(bmdh, 'deploy', fake_deploy)
@@ -108,13 +108,37 @@ class WorkerTestCase(bm_db_base.BMDBTestCase):
         self.assertEqual(params_list, history)
         self.mox.VerifyAll()
 
+    def test_run_reports_progress(self):
+        def fake_deploy(progress=None, **params):
+            progress(50, 2048)
+
+        self.stubs.Set(bmdh, 'deploy', fake_deploy)
+        self.mox.StubOutWithMock(bm_db, 'bm_node_update')
+        bm_db.bm_node_update(mox.IgnoreArg(), 1,
+                             {'task_state': bmdh.baremetal_states.DEPLOYING,
+                              'deploy_progress': 0,
+                              'deploy_throughput': None})
+        bm_db.bm_node_update(mox.IgnoreArg(), 1,
+                             {'deploy_progress': 50,
+                              'deploy_throughput': 2048})
+        bm_db.bm_node_update(mox.IgnoreArg(), 1,
+                             {'task_state': bmdh.baremetal_states.DEPLOYDONE,
+                              'deploy_progress': 100})
+        self.mox.ReplayAll()
+
+        bmdh.QUEUE.put((1, {}))
+        self.wait_queue_empty(1)
+        # let the worker finish the request it dequeued
+        time.sleep(0.2)
+        self.mox.VerifyAll()
+
     def test_run_with_failing_deploy(self):
         """Check a worker keeps on running even if deploy() raises
         an exception.
         """
         history = []
 
-        def fake_deploy(**params):
+        def fake_deploy(progress=None, **params):
             history.append(params)
             # always fail
             raise Exception('test')
@@ -167,7 +191,7 @@ class PhysicalWorkTestCase(test.TestCase):
         self.mox.StubOutWithMock(bmdh, 'logout_iscsi')
         self.mox.StubOutWithMock(bmdh, 'make_partitions')
         self.mox.StubOutWithMock(bmdh, 'is_block_device')
-        self.mox.StubOutWithMock(bmdh, 'dd')
+        self.mox.StubOutWithMock(bmdh, 'copy_image')
         self.mox.StubOutWithMock(bmdh, 'mkswap')
         self.mox.StubOutWithMock(bmdh, 'block_uuid')
         self.mox.StubOutWithMock(bmdh, 'switch_pxe_config')
@@ -181,7 +205,7 @@ class PhysicalWorkTestCase(test.TestCase):
         bmdh.make_partitions(dev, root_mb, swap_mb)
         bmdh.is_block_device(root_part).AndReturn(True)
         bmdh.is_block_device(swap_part).AndReturn(True)
-        bmdh.dd(image_path, root_part)
+        bmdh.copy_image(image_path, root_part, None)
         bmdh.mkswap(swap_part)
         bmdh.block_uuid(root_part).AndReturn(root_uuid)
         bmdh.logout_iscsi(address, port, iqn)
@@ -221,7 +245,7 @@ class PhysicalWorkTestCase(test.TestCase):
         bmdh.get_image_mb(image_path).AndReturn(1)  # < root_mb
         bmdh.discovery(address, port)
         bmdh.login_iscsi(address, port, iqn)
-        bmdh.work_on_disk(dev, root_mb, swap_mb, image_path).\
+        bmdh.work_on_disk(dev, root_mb, swap_mb, image_path, None).\
                 AndRaise(TestException)
         bmdh.logout_iscsi(address, port, iqn)
         self.mox.ReplayAll()
@@ -232,6 +256,79 @@ class PhysicalWorkTestCase(test.TestCase):
                          pxe_config_path, root_mb, swap_mb)
 
 
+class CopyImageTestCase(test.TestCase):
+    def setUp(self):
+        super(CopyImageTestCase, self).setUp()
+        self.flags(deploy_block_size_mb=4, deploy_segment_mb=8,
+                   group='baremetal')
+        self.mb = 1024 * 1024
+        self.stubs.Set(os.path, 'getsize', lambda path: 20 * self.mb + 1)
+
+    def test_dd(self):
+        self.mox.StubOutWithMock(bmdh.utils, 'execute')
+        bmdh.utils.execute('dd', 'if=src', 'of=dst', 'bs=1M', 'oflag=direct',
+                           run_as_root=True, check_exit_code=[0])
+        bmdh.utils.execute('dd', 'if=src', 'of=dst', 'bs=4M', 'oflag=direct',
+                           'skip=2', 'seek=2', 'count=2',
+                           'conv=sparse,notrunc',
+                           run_as_root=True, check_exit_code=[0])
+        self.mox.ReplayAll()
+
+        bmdh.dd('src', 'dst')
+        bmdh.dd('src', 'dst', 4, 2, 2, sparse=True)
+
+    def test_copy_image_in_segments(self):
+        self.mox.StubOutWithMock(bmdh, 'dd')
+        # 6 blocks of 4MB, written 2 at a time
+        bmdh.dd('image', 'dev', 4, 0, 2, sparse=False)
+        bmdh.dd('image', 'dev', 4, 2, 2, sparse=False)
+        bmdh.dd('image', 'dev', 4, 4, 2, sparse=False)
+        self.mox.ReplayAll()
+
+        history = []
+
+        def progress(percent, throughput):
+            history.append(percent)
+            self.assertTrue(throughput > 0)
+
+        bmdh.copy_image('image', 'dev', progress)
+        self.assertEqual([39, 79, 100], history)
+
+    def test_copy_image_skipping_zeroes(self):
+        self.flags(deploy_skip_zero_blocks=True, deploy_segment_mb=1024,
+                   group='baremetal')
+        self.mox.StubOutWithMock(bmdh, 'dd')
+        bmdh.dd('image', 'dev', 4, 0, 6, sparse=True)
+        self.mox.ReplayAll()
+
+        bmdh.copy_image('image', 'dev')
+
+
+class BareMetalDeployTestCase(test.TestCase):
+    def test_start_workers(self):
+        self.flags(deploy_workers=3, group='baremetal')
+        started = []
+
+        class FakeWorker(object):
+            def start(self):
+                started.append(self)
+
+            def isAlive(self):
+                return self in started
+
+        self.stubs.Set(bmdh, 'Worker', FakeWorker)
+        app = bmdh.BareMetalDeploy()
+        self.assertEqual(3, len(app.workers))
+
+        # a dead worker is replaced
+        workers = list(app.workers)
+        del started[0]
+        app._start_workers()
+        self.assertEqual(3, len(app.workers))
+        self.assertEqual(workers[1:], app.workers[:2])
+        self.assertNotIn(app.workers[2], workers)
+
+
 class SwitchPxeConfigTestCase(test.TestCase):
     def setUp(self):
         super(SwitchPxeConfigTestCase, self).setUp()
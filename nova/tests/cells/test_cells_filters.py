@@ -0,0 +1,77 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Unit Tests for cells scheduler filters.
+"""
+
+from nova.cells import filters
+from nova.cells import state
+from nova import test
+
+
+class _FilterTestClass(test.TestCase):
+    """Base class for testing individual filter plugins."""
+    filter_cls_name = None
+
+    def setUp(self):
+        super(_FilterTestClass, self).setUp()
+        self.filter_handler = filters.CellFilterHandler()
+        self.filter_classes = self.filter_handler.get_matching_classes(
+                [self.filter_cls_name])
+
+    def _filter_cells(self, cells, filter_properties):
+        return self.filter_handler.get_filtered_objects(self.filter_classes,
+                                                        cells,
+                                                        filter_properties)
+
+
+class TestCapacityFilter(_FilterTestClass):
+    filter_cls_name = 'nova.cells.filters.capacity_filter.CapacityFilter'
+
+    def _get_cell(self, name, ram_units, disk_units):
+        cell = state.CellState(name)
+        cell.capacities = {
+                'ram_free': {'total_mb': 0,
+                             'units_by_mb': {'1024': ram_units}},
+                'disk_free': {'total_mb': 0,
+                              'units_by_mb': {'20480': disk_units}}}
+        return cell
+
+    def _get_filter_properties(self, num_instances):
+        instance_type = {'memory_mb': 1024, 'root_gb': 10,
+                         'ephemeral_gb': 10}
+        request_spec = {'instance_type': instance_type,
+                        'instance_uuids': range(num_instances)}
+        return {'request_spec': request_spec}
+
+    def test_filters_cells_without_room(self):
+        cell1 = self._get_cell('cell1', 2, 5)
+        cell2 = self._get_cell('cell2', 5, 1)
+        cell3 = self._get_cell('cell3', 5, 5)
+        result = self._filter_cells([cell1, cell2, cell3],
+                                    self._get_filter_properties(2))
+        self.assertEqual([cell1, cell3], result)
+
+    def test_passes_cells_without_capacity_info(self):
+        cell1 = state.CellState('cell1')
+        cell2 = self._get_cell('cell2', 0, 0)
+        result = self._filter_cells([cell1, cell2],
+                                    self._get_filter_properties(1))
+        self.assertEqual([cell1], result)
+
+    def test_passes_requests_without_instance_type(self):
+        cell1 = self._get_cell('cell1', 0, 0)
+        result = self._filter_cells([cell1], {'request_spec': {}})
+        self.assertEqual([cell1], result)
@@ -207,8 +207,10 @@ class CellsManagerClassTestCase(test.TestCase):
             call_info['get_instances'] += 1
             return iter(instances)
 
-        def instance_get_by_uuid(context, uuid):
-            return instances[int(uuid[-1]) - 1]
+        def instance_get_all_by_filters(context, filters, sort_key,
+                                        sort_dir):
+            self.assertEqual(context.read_deleted, 'yes')
+            return list(filters['uuid'])
 
         def sync_instance(context, instance):
             self.assertEqual(context, fake_context)
@@ -216,8 +218,8 @@ class CellsManagerClassTestCase(test.TestCase):
 
         self.stubs.Set(cells_utils, 'get_instances_to_sync',
                 get_instances_to_sync)
-        self.stubs.Set(self.cells_manager.db, 'instance_get_by_uuid',
-                instance_get_by_uuid)
+        self.stubs.Set(self.cells_manager.db, 'instance_get_all_by_filters',
+                instance_get_all_by_filters)
         self.stubs.Set(self.cells_manager, '_sync_instance',
                 sync_instance)
         self.stubs.Set(timeutils, 'utcnow', utcnow)
@@ -241,6 +243,119 @@ class CellsManagerClassTestCase(test.TestCase):
         self.assertEqual(call_info['sync_instances'],
                 [instances[-1], instances[0]])
 
+    def test_heal_instances_batched(self):
+        self.flags(instance_updated_at_threshold=0,
+                   instance_update_num_instances=5,
+                   instance_sync_batch_size=2,
+                   group='cells')
+        ctxt = context.RequestContext('fake', 'fake')
+
+        instances = [dict(uuid='fake_uuid%d' % i, deleted=False)
+                     for i in xrange(5)]
+
+        def get_instances_to_sync(context, **kwargs):
+            self.assertEqual(kwargs.get('updated_since'), None)
+            self.assertTrue(kwargs.get('uuids_only'))
+            return iter([instance['uuid'] for instance in instances])
+
+        def instance_get_all_by_filters(context, filters, sort_key,
+                                        sort_dir):
+            return [instance for instance in instances
+                    if instance['uuid'] in filters['uuid']]
+
+        self.stubs.Set(cells_utils, 'get_instances_to_sync',
+                get_instances_to_sync)
+        self.stubs.Set(self.cells_manager.db, 'instance_get_all_by_filters',
+                instance_get_all_by_filters)
+        self.mox.StubOutWithMock(self.msg_runner, 'instance_update_at_top')
+        self.mox.StubOutWithMock(self.msg_runner, 'sync_instances_at_top')
+        self.msg_runner.sync_instances_at_top(ctxt, instances[:2])
+        self.msg_runner.sync_instances_at_top(ctxt, instances[2:4])
+        self.msg_runner.sync_instances_at_top(ctxt, instances[4:])
+        self.mox.ReplayAll()
+
+        self.cells_manager._heal_instances(ctxt)
+
+    def test_heal_instances_skips_purged_instances(self):
+        self.flags(instance_updated_at_threshold=0,
+                   instance_update_num_instances=2,
+                   instance_sync_batch_size=2,
+                   group='cells')
+        ctxt = context.RequestContext('fake', 'fake')
+
+        def get_instances_to_sync(context, **kwargs):
+            return iter(['fake_uuid1', 'fake_uuid2'])
+
+        call_info = {'filters': []}
+
+        def instance_get_all_by_filters(context, filters, sort_key,
+                                        sort_dir):
+            call_info['filters'].append(filters)
+            return []
+
+        self.stubs.Set(cells_utils, 'get_instances_to_sync',
+                get_instances_to_sync)
+        self.stubs.Set(self.cells_manager.db, 'instance_get_all_by_filters',
+                instance_get_all_by_filters)
+        self.mox.StubOutWithMock(self.msg_runner, 'sync_instances_at_top')
+        self.mox.ReplayAll()
+
+        self.cells_manager._heal_instances(ctxt)
+        self.assertEqual([{'uuid': ['fake_uuid1', 'fake_uuid2']}],
+                         call_info['filters'])
+
+    def test_heal_instances_watermark(self):
+        self.flags(instance_updated_at_threshold=0,
+                   instance_update_num_instances=10,
+                   instance_sync_batch_size=10,
+                   instance_full_heal_interval=150,
+                   group='cells')
+        ctxt = context.RequestContext('fake', 'fake')
+
+        call_info = {'updated_since': []}
+        lists = [['instance1', 'instance2'], [], ['instance3'],
+                 ['instance1', 'instance2', 'instance3']]
+
+        def get_instances_to_sync(context, **kwargs):
+            call_info['updated_since'].append(kwargs.get('updated_since'))
+            return iter(lists.pop(0))
+
+        def instance_get_all_by_filters(context, filters, sort_key,
+                                        sort_dir):
+            return list(filters['uuid'])
+
+        self.stubs.Set(cells_utils, 'get_instances_to_sync',
+                get_instances_to_sync)
+        self.stubs.Set(self.cells_manager.db, 'instance_get_all_by_filters',
+                instance_get_all_by_filters)
+        self.mox.StubOutWithMock(self.msg_runner, 'sync_instances_at_top')
+        self.msg_runner.sync_instances_at_top(ctxt,
+                ['instance1', 'instance2'])
+        self.msg_runner.sync_instances_at_top(ctxt, ['instance3'])
+        self.msg_runner.sync_instances_at_top(ctxt,
+                ['instance1', 'instance2', 'instance3'])
+        self.mox.ReplayAll()
+
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        first_pass_start = timeutils.utcnow()
+
+        # First pass: everything.
+        self.cells_manager._heal_instances(ctxt)
+        timeutils.advance_time_seconds(60)
+        second_pass_start = timeutils.utcnow()
+        # Second pass: only what changed since the first pass started.
+        # Nothing did, so nothing is sent.
+        self.cells_manager._heal_instances(ctxt)
+        timeutils.advance_time_seconds(60)
+        self.cells_manager._heal_instances(ctxt)
+        # The last full pass is now older than the interval: everything.
+        timeutils.advance_time_seconds(60)
+        self.cells_manager._heal_instances(ctxt)
+
+        self.assertEqual([None, first_pass_start, second_pass_start, None],
+                         call_info['updated_since'])
+
     def test_sync_instances(self):
         self.mox.StubOutWithMock(self.msg_runner,
                                  'sync_instances')
@@ -1093,9 +1093,37 @@ class CellsBroadcastMethodsTestCase(test.TestCase):
         self.src_msg_runner.bw_usage_update_at_top(self.ctxt,
                                                    fake_bw_update_info)
 
+    def test_sync_instances_at_top(self):
+        instance1 = {'uuid': 'fake_uuid1', 'deleted': False,
+                     'id': 1, 'vm_state': 'active'}
+        instance2 = {'uuid': 'fake_uuid2', 'deleted': True}
+        expected_cell_name = 'api-cell!child-cell2!grandchild-cell1'
+        expected_instance1 = {'uuid': 'fake_uuid1', 'deleted': False,
+                              'vm_state': 'active',
+                              'cell_name': expected_cell_name}
+
+        # To show these should not be called in src/mid-level cell
+        self.mox.StubOutWithMock(self.src_db_inst, 'instance_update')
+        self.mox.StubOutWithMock(self.src_db_inst, 'instance_destroy')
+        self.mox.StubOutWithMock(self.mid_db_inst, 'instance_update')
+        self.mox.StubOutWithMock(self.mid_db_inst, 'instance_destroy')
+
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'instance_update')
+        self.mox.StubOutWithMock(self.tgt_db_inst, 'instance_destroy')
+        self.tgt_db_inst.instance_update(self.ctxt, 'fake_uuid1',
+                                         expected_instance1,
+                                         update_cells=False)
+        self.tgt_db_inst.instance_destroy(self.ctxt, 'fake_uuid2',
+                                          update_cells=False)
+        self.mox.ReplayAll()
+
+        self.src_msg_runner.sync_instances_at_top(self.ctxt,
+                                                  [instance1, instance2])
+
     def test_sync_instances(self):
         # Reset this, as this is a broadcast down.
         self._setup_attrs(up=False)
+        self.flags(instance_sync_batch_size=1, group='cells')
         project_id = 'fake_project_id'
         updated_since_raw = 'fake_updated_since_raw'
         updated_since_parsed = 'fake_updated_since_parsed'
@@ -1136,6 +1164,43 @@ class CellsBroadcastMethodsTestCase(test.TestCase):
         self.src_msg_runner.sync_instances(self.ctxt,
                 project_id, updated_since_raw, deleted)
 
+    def test_sync_instances_batched(self):
+        # Reset this, as this is a broadcast down.
+        self._setup_attrs(up=False)
+        self.flags(instance_sync_batch_size=2, group='cells')
+        project_id = 'fake_project_id'
+        deleted = 'fake_deleted'
+
+        fake_instances = [dict(uuid='fake_uuid%d' % i, deleted=False)
+                          for i in xrange(3)]
+
+        self.mox.StubOutWithMock(self.tgt_msg_runner,
+                                 'instance_update_at_top')
+        self.mox.StubOutWithMock(self.tgt_msg_runner,
+                                 'sync_instances_at_top')
+        self.mox.StubOutWithMock(cells_utils, 'get_instances_to_sync')
+
+        # Middle cell.
+        cells_utils.get_instances_to_sync(self.ctxt,
+                updated_since=None,
+                project_id=project_id,
+                deleted=deleted).AndReturn([])
+
+        # Bottom/Target cell
+        cells_utils.get_instances_to_sync(self.ctxt,
+                updated_since=None,
+                project_id=project_id,
+                deleted=deleted).AndReturn(iter(fake_instances))
+        self.tgt_msg_runner.sync_instances_at_top(self.ctxt,
+                                                  fake_instances[:2])
+        self.tgt_msg_runner.sync_instances_at_top(self.ctxt,
+                                                  fake_instances[2:])
+
+        self.mox.ReplayAll()
+
+        self.src_msg_runner.sync_instances(self.ctxt,
+                project_id, None, deleted)
+
     def test_service_get_all_with_disabled(self):
         # Reset this, as this is a broadcast down.
         self._setup_attrs(up=False)
@@ -206,3 +206,34 @@ class CellsSchedulerTestCase(test.TestCase):
         self.assertEqual(1, call_info['num_tries'])
         self.assertEqual(self.instance_uuids, call_info['errored_uuids1'])
         self.assertEqual(self.instance_uuids, call_info['errored_uuids2'])
+
+    def _set_child_cell_ram_units(self, units):
+        self.my_cell_state.capacities = {}
+        child_cells = self.state_manager.get_child_cells()
+        for cell in child_cells:
+            cell.capacities = {'ram_free': {'total_mb': units * 512,
+                                            'units_by_mb': {'512': units}}}
+        return child_cells
+
+    def test_grab_target_cell_selects_cell_with_capacity(self):
+        child_cells = self._set_child_cell_ram_units(0)
+        roomy_cell = child_cells[-1]
+        roomy_cell.capacities = {'ram_free': {'total_mb': 5120,
+                                              'units_by_mb': {'512': 10}}}
+        request_spec = dict(self.request_spec,
+                            instance_type={'memory_mb': 512, 'root_gb': 1,
+                                           'ephemeral_gb': 0})
+        target_cell = self.scheduler._grab_target_cell(
+                {'request_spec': request_spec})
+        self.assertEqual(roomy_cell, target_cell)
+
+    def test_grab_target_cell_no_cell_with_capacity(self):
+        # Three instances are requested but every cell only has room
+        # for one.
+        self._set_child_cell_ram_units(1)
+        request_spec = dict(self.request_spec,
+                            instance_type={'memory_mb': 512, 'root_gb': 1,
+                                           'ephemeral_gb': 0})
+        self.assertRaises(exception.NoCellsAvailable,
+                          self.scheduler._grab_target_cell,
+                          {'request_spec': request_spec})
@@ -81,6 +81,19 @@ class CellsUtilsTestCase(test.TestCase):
                  'project_id': 'fake-project'})
         self.assertEqual(call_info['shuffle'], 2)
 
+    def test_batch_instances(self):
+        instances = range(5)
+        batches = list(cells_utils.batch_instances(instances, 2))
+        self.assertEqual([[0, 1], [2, 3], [4]], batches)
+        self.assertEqual([], list(cells_utils.batch_instances([], 2)))
+
+    def test_pack_and_unpack_instances(self):
+        instances = [{'uuid': 'fake_uuid%d' % i, 'deleted': False,
+                      'display_name': 'server%d' % i} for i in xrange(50)]
+        packed = cells_utils.pack_instances(instances)
+        self.assertTrue(isinstance(packed, str))
+        self.assertEqual(instances, cells_utils.unpack_instances(packed))
+
     def test_split_cell_and_item(self):
         path = 'australia', 'queensland', 'gold_coast'
         cell = cells_utils._PATH_CELL_SEP.join(path)
@@ -0,0 +1,76 @@
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+"""
+Unit Tests for cells scheduler weights.
+"""
+
+from nova.cells import state
+from nova.cells import weights
+from nova import test
+
+
+class _WeigherTestClass(test.TestCase):
+    """Base class for testing individual weigher plugins."""
+    weigher_cls_name = None
+
+    def setUp(self):
+        super(_WeigherTestClass, self).setUp()
+        self.weight_handler = weights.CellWeightHandler()
+        self.weight_classes = self.weight_handler.get_matching_classes(
+                [self.weigher_cls_name])
+
+    def _get_weighed_cells(self, cells, weight_properties):
+        return self.weight_handler.get_weighed_objects(self.weight_classes,
+                cells, weight_properties)
+
+
+class RamByInstanceTypeWeigherTestClass(_WeigherTestClass):
+    weigher_cls_name = ('nova.cells.weights.ram_by_instance_type.'
+                        'RamByInstanceTypeWeigher')
+
+    def _get_cells(self):
+        cells = []
+        for name, units in [('cell1', 2), ('cell2', 10), ('cell3', 5)]:
+            cell = state.CellState(name)
+            cell.capacities = {'ram_free': {'total_mb': units * 1024,
+                                            'units_by_mb': {'1024': units}}}
+            cells.append(cell)
+        return cells
+
+    def _get_weight_properties(self):
+        return {'request_spec': {'instance_type': {'memory_mb': 1024}}}
+
+    def test_default_spreading(self):
+        cells = self._get_cells()
+        weighted_cells = self._get_weighed_cells(
+                cells, self._get_weight_properties())
+        self.assertEqual(['cell2', 'cell3', 'cell1'],
+                         [wc.obj.name for wc in weighted_cells])
+
+    def test_negative_multiplier_stacks(self):
+        self.flags(ram_weight_multiplier=-1.0, group='cells')
+        cells = self._get_cells()
+        weighted_cells = self._get_weighed_cells(
+                cells, self._get_weight_properties())
+        self.assertEqual(['cell1', 'cell3', 'cell2'],
+                         [wc.obj.name for wc in weighted_cells])
+
+    def test_unknown_instance_type(self):
+        cells = self._get_cells()
+        weight_properties = {'request_spec': {
+                'instance_type': {'memory_mb': 4096}}}
+        weighted_cells = self._get_weighed_cells(cells, weight_properties)
+        self.assertEqual([0.0, 0.0, 0.0],
+                         [wc.weight for wc in weighted_cells])
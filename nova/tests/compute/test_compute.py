@@ -35,6 +35,7 @@ from nova.compute import api as compute_api
 from nova.compute import instance_types
 from nova.compute import manager as compute_manager
 from nova.compute import power_state
+from nova.compute import resource_tracker
 from nova.compute import rpcapi as compute_rpcapi
 from nova.compute import task_states
 from nova.compute import utils as compute_utils
@@ -47,6 +48,7 @@ from nova.image import glance
 from nova.network import api as network_api
 from nova.network import model as network_model
 from nova.network.security_group import openstack_driver
+from nova import notifications
 from nova.openstack.common import importutils
 from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
@@ -1862,6 +1864,15 @@ class ComputeTestCase(BaseTestCase):
         self.assertTrue(payload['launched_at'])
         image_ref_url = glance.generate_image_url(FAKE_IMAGE_REF)
         self.assertEquals(payload['image_ref_url'], image_ref_url)
+        for span in ('prep_block_device', 'driver_spawn'):
+            self.assertTrue(span in payload['timings'])
+        self.assertTrue('timings' not in
+                        test_notifier.NOTIFICATIONS[0]['payload'])
+        self.assertTrue(utils.span_histograms_changed())
+        self.compute._flush_span_histograms(self.context)
+        self.assertFalse(utils.span_histograms_changed())
+        self.assertTrue('driver_spawn' in
+                        utils.load_span_histograms(CONF.span_histograms_path))
         self.compute.terminate_instance(self.context,
                 instance=jsonutils.to_primitive(inst_ref))
 
@@ -3331,6 +3342,91 @@ class ComputeTestCase(BaseTestCase):
         self.assertEqual(len(instances), 1)
         self.assertEqual(instances[0]['task_state'], None)
 
+    def test_sync_power_states_bulk(self):
+        in_sync = self._create_fake_instance(
+                {'host': self.compute.host,
+                 'power_state': power_state.RUNNING})
+        shut_down = self._create_fake_instance(
+                {'host': self.compute.host,
+                 'power_state': power_state.RUNNING})
+        busy = self._create_fake_instance(
+                {'host': self.compute.host,
+                 'power_state': power_state.RUNNING,
+                 'task_state': task_states.REBOOTING})
+        stopped = self._create_fake_instance(
+                {'host': self.compute.host,
+                 'vm_state': vm_states.STOPPED,
+                 'power_state': power_state.SHUTDOWN})
+        ctxt = context.get_admin_context()
+
+        def fake_get_info_bulk(instances):
+            # Instances with a pending task are not synced
+            self.assertEqual(set([in_sync['uuid'], shut_down['uuid'],
+                                  stopped['uuid']]),
+                             set(i['uuid'] for i in instances))
+            self.assertFalse(busy['uuid'] in
+                             [instance['uuid'] for instance in instances])
+            return {in_sync['uuid']: {'state': power_state.RUNNING},
+                    shut_down['uuid']: {'state': power_state.SHUTDOWN},
+                    stopped['uuid']: {'state': power_state.SHUTDOWN}}
+
+        self.stubs.Set(self.compute.driver, 'get_info_bulk',
+                       fake_get_info_bulk)
+        self.mox.StubOutWithMock(self.compute.conductor_api,
+                                 'instance_get_by_uuid')
+        self.mox.StubOutWithMock(self.compute, '_sync_instance_power_state')
+        self.compute._sync_instance_power_state(
+                ctxt, mox.ContainsKeyValue('uuid', shut_down['uuid']),
+                power_state.SHUTDOWN, refresh=False)
+        self.mox.ReplayAll()
+
+        self.compute._sync_power_states(ctxt)
+
+    def test_power_state_diverges_when_sync_acts(self):
+        warnings = []
+        stops = []
+        self.stubs.Set(compute_manager.LOG, 'warn',
+                       lambda *args, **kwargs: warnings.append(args))
+        self.stubs.Set(self.compute.conductor_api, 'compute_stop',
+                       lambda context, instance: stops.append(instance))
+        ctxt = context.get_admin_context()
+        for vm_state in (vm_states.ACTIVE, vm_states.STOPPED,
+                         vm_states.SOFT_DELETED, vm_states.RESIZED):
+            for vm_power_state in (power_state.NOSTATE, power_state.RUNNING,
+                                   power_state.PAUSED, power_state.SHUTDOWN,
+                                   power_state.CRASHED,
+                                   power_state.SUSPENDED):
+                instance = {'uuid': 'fake-uuid', 'host': self.compute.host,
+                            'vm_state': vm_state, 'task_state': None,
+                            'power_state': vm_power_state}
+                del warnings[:]
+                self.compute._sync_instance_power_state(
+                        ctxt, instance, vm_power_state, refresh=False)
+                self.assertEqual(
+                        bool(warnings),
+                        self.compute._power_state_diverges(instance,
+                                                           vm_power_state))
+        # ACTIVE with SHUTDOWN, CRASHED or SUSPENDED and STOPPED with
+        # RUNNING, PAUSED or SUSPENDED
+        self.assertEqual(6, len(stops))
+
+    def test_sync_power_states_instance_stopped_behind_the_scenes(self):
+        instance = self._create_fake_instance(
+                {'host': self.compute.host,
+                 'power_state': power_state.RUNNING})
+        ctxt = context.get_admin_context()
+
+        self.stubs.Set(self.compute.driver, 'get_info_bulk',
+                       lambda instances: {})
+        self.mox.StubOutWithMock(self.compute.conductor_api, 'compute_stop')
+        self.mox.ReplayAll()
+
+        self.compute._sync_power_states(ctxt)
+
+        instance = db.instance_get_by_uuid(ctxt, instance['uuid'])
+        self.assertEqual(power_state.NOSTATE, instance['power_state'])
+        self.assertEqual(vm_states.ACTIVE, instance['vm_state'])
+
     def test_add_instance_fault(self):
         instance = self._create_fake_instance()
         exc_info = None
@@ -3521,76 +3617,101 @@ class ComputeTestCase(BaseTestCase):
         self.flags(heal_instance_info_cache_interval=-1)
         ctxt = context.get_admin_context()
 
-        instance_map = {}
-        instances = []
-        for x in xrange(5):
-            uuid = 'fake-uuid-%s' % x
-            instance_map[uuid] = {'uuid': uuid, 'host': CONF.host}
-            instances.append(instance_map[uuid])
-
-        call_info = {'get_all_by_host': 0, 'get_by_uuid': 0,
-                'get_nw_info': 0, 'expected_instance': None}
+        instances = [{'uuid': 'fake-uuid-%s' % x, 'host': CONF.host}
+                     for x in xrange(5)]
+        call_info = {'get_all_by_host': 0, 'get_nw_info_bulk': 0}
 
         def fake_instance_get_all_by_host(context, host):
             call_info['get_all_by_host'] += 1
             return instances[:]
 
-        def fake_instance_get_by_uuid(context, instance_uuid):
-            if instance_uuid not in instance_map:
-                raise exception.InstanceNotFound(instance_id=instance_uuid)
-            call_info['get_by_uuid'] += 1
-            return instance_map[instance_uuid]
-
-        # NOTE(comstud): Override the stub in setUp()
-        def fake_get_instance_nw_info(context, instance):
-            # Note that this exception gets caught in compute/manager
-            # and is ignored.  However, the below increment of
-            # 'get_nw_info' won't happen, and you'll get an assert
-            # failure checking it below.
-            self.assertEqual(call_info['expected_instance'], instance)
-            call_info['get_nw_info'] += 1
+        def fake_get_instance_nw_info_bulk(context, instances_to_heal,
+                                           conductor_api=None):
+            self.assertEqual(instances, instances_to_heal)
+            self.assertEqual(self.compute.conductor_api, conductor_api)
+            call_info['get_nw_info_bulk'] += 1
+            return {}
 
         self.stubs.Set(self.compute.conductor_api, 'instance_get_all_by_host',
                 fake_instance_get_all_by_host)
-        self.stubs.Set(self.compute.conductor_api, 'instance_get_by_uuid',
-                fake_instance_get_by_uuid)
-        self.stubs.Set(self.compute, '_get_instance_nw_info',
-                fake_get_instance_nw_info)
+        self.stubs.Set(self.compute.network_api, 'get_instance_nw_info_bulk',
+                fake_get_instance_nw_info_bulk)
 
-        call_info['expected_instance'] = instances[0]
+        # The whole host is healed on every call
         self.compute._heal_instance_info_cache(ctxt)
         self.assertEqual(1, call_info['get_all_by_host'])
-        self.assertEqual(0, call_info['get_by_uuid'])
-        self.assertEqual(1, call_info['get_nw_info'])
+        self.assertEqual(1, call_info['get_nw_info_bulk'])
 
-        call_info['expected_instance'] = instances[1]
-        self.compute._heal_instance_info_cache(ctxt)
-        self.assertEqual(1, call_info['get_all_by_host'])
-        self.assertEqual(1, call_info['get_by_uuid'])
-        self.assertEqual(2, call_info['get_nw_info'])
-
-        # Make an instance switch hosts
-        instances[2]['host'] = 'not-me'
-        # Make an instance disappear
-        instance_map.pop(instances[3]['uuid'])
-        # '2' and '3' should be skipped..
-        call_info['expected_instance'] = instances[4]
         self.compute._heal_instance_info_cache(ctxt)
-        self.assertEqual(call_info['get_all_by_host'], 1)
-        # Incremented for '2' and '4'.. '3' caused a raise above.
-        self.assertEqual(call_info['get_by_uuid'], 3)
-        self.assertEqual(call_info['get_nw_info'], 3)
-        # Should be no more left.
-        self.assertEqual(len(self.compute._instance_uuids_to_heal), 0)
-
-        # This should cause a DB query now so we get first instance
-        # back again
-        call_info['expected_instance'] = instances[0]
+        self.assertEqual(2, call_info['get_all_by_host'])
+        self.assertEqual(2, call_info['get_nw_info_bulk'])
+
+        # Nothing to heal
+        del instances[:]
         self.compute._heal_instance_info_cache(ctxt)
-        self.assertEqual(call_info['get_all_by_host'], 2)
-        # Stays the same, because the instance came from the DB
-        self.assertEqual(call_info['get_by_uuid'], 3)
-        self.assertEqual(call_info['get_nw_info'], 4)
+        self.assertEqual(3, call_info['get_all_by_host'])
+        self.assertEqual(2, call_info['get_nw_info_bulk'])
+
+    def test_get_bdm_volumes(self):
+        bdms = [{'volume_id': 'vol1'}, {'volume_id': 'vol2'}]
+        volumes = {'vol1': {'id': 'vol1'}, 'vol2': {'id': 'vol2'}}
+        self.mox.StubOutWithMock(self.compute.volume_api, 'get_many')
+        self.compute.volume_api.get_many(self.context,
+                ['vol1', 'vol2']).AndReturn(volumes)
+        self.compute.volume_api.get_many(self.context,
+                ['vol1', 'vol2']).AndReturn({'vol1': volumes['vol1']})
+        self.mox.ReplayAll()
+
+        self.assertEqual([volumes['vol1'], volumes['vol2']],
+                         self.compute._get_bdm_volumes(self.context, bdms))
+        self.assertRaises(exception.VolumeNotFound,
+                          self.compute._get_bdm_volumes, self.context, bdms)
+
+    def test_poll_bandwidth_usage_records_system_metadata(self):
+        self.flags(bandwidth_poll_interval=-1)
+        ctxt = context.get_admin_context()
+        nw_info = network_model.NetworkInfo(
+                [fake_network_cache_model.new_vif()])
+        instances = [{'uuid': 'fake_uuid1',
+                      'info_cache': {'network_info': nw_info.json()}},
+                     {'uuid': 'fake_uuid2', 'info_cache': None}]
+        bw_counters = [{'uuid': 'fake_uuid1',
+                        'mac_address': nw_info[0]['address'],
+                        'bw_in': 10, 'bw_out': 20},
+                       {'uuid': 'fake_uuid2', 'mac_address': 'bb:bb',
+                        'bw_in': 30, 'bw_out': 40}]
+        usages = {'fake_uuid1': {'bw_in': 100, 'bw_out': 200,
+                                 'last_ctr_in': 5, 'last_ctr_out': 10}}
+
+        def fake_bw_usage_get(context, uuid, start_period, mac):
+            return usages.get(uuid)
+
+        self.stubs.Set(self.compute.conductor_api, 'instance_get_all_by_host',
+                       lambda context, host: instances)
+        self.stubs.Set(self.compute.driver, 'get_all_bw_counters',
+                       lambda instances: bw_counters)
+        self.stubs.Set(self.compute.conductor_api, 'bw_usage_get',
+                       fake_bw_usage_get)
+        self.stubs.Set(self.compute.conductor_api, 'bw_usage_update',
+                       lambda *args, **kwargs: None)
+
+        def fake_system_metadata_update(context, instance, metadata):
+            instance['system_metadata'] = metadata
+
+        self.stubs.Set(self.compute.conductor_api,
+                       'instance_system_metadata_update',
+                       fake_system_metadata_update)
+
+        self.compute._poll_bandwidth_usage(ctxt)
+
+        audit_start = utils.last_completed_audit_period()[1]
+        self.assertEqual({'public': {'bw_in': 105, 'bw_out': 210}},
+                         notifications.bandwidth_usage_from_system_metadata(
+                                 instances[0], audit_start))
+        self.assertEqual({'net-name-not-found-bb:bb': {'bw_in': 0,
+                                                       'bw_out': 0}},
+                         notifications.bandwidth_usage_from_system_metadata(
+                                 instances[1], audit_start))
 
     def test_poll_rescued_instances(self):
         timed_out_time = timeutils.utcnow() - datetime.timedelta(minutes=5)
@@ -3817,6 +3938,23 @@ class ComputeTestCase(BaseTestCase):
                           self.compute._get_resource_tracker,
                           'invalidnodename')
 
+    def test_update_available_resource_batched(self):
+        self.flags(batch_resource_audit=True)
+        self.mox.StubOutWithMock(self.compute.driver, 'get_available_nodes')
+        self.mox.StubOutWithMock(resource_tracker,
+                                 'update_available_resources')
+        self.mox.StubOutWithMock(self.compute, '_get_compute_nodes_in_db')
+        self.compute.driver.get_available_nodes().AndReturn(['node1',
+                                                             'node2'])
+        resource_tracker.update_available_resources(self.context,
+                self.compute.host, self.compute.driver, mox.IgnoreArg())
+        self.compute._get_compute_nodes_in_db(self.context).AndReturn([])
+        self.mox.ReplayAll()
+
+        self.compute.update_available_resource(self.context)
+        self.assertEqual(['node1', 'node2'],
+                         sorted(self.compute._resource_tracker_dict.keys()))
+
     def test_instance_update_host_check(self):
         # make sure rt usage doesn't happen if the host or node is different
         def fail_get(nodename):
@@ -19,6 +19,7 @@
 
 import uuid
 
+import mox
 from oslo.config import cfg
 
 from nova.compute import instance_types
@@ -916,3 +917,72 @@ class OrphanTestCase(BaseTrackerTestCase):
         orphans = self.tracker._find_orphaned_instances()
 
         self.assertEqual(2, len(orphans))
+
+
+class MultiNodeAuditTestCase(BaseTrackerTestCase):
+
+    def setUp(self):
+        super(MultiNodeAuditTestCase, self).setUp()
+        self.tracker2 = resource_tracker.ResourceTracker(self.host,
+                self.tracker.driver, 'fakenode2')
+        self.tracker2.compute_node = self._create_compute_node(
+                {'id': 2, 'hypervisor_hostname': 'fakenode2'})
+        self.trackers = {'fakenode': self.tracker, 'fakenode2': self.tracker2}
+        self.batch_updates = []
+
+        self.stubs.Set(db, 'instance_get_all_by_host',
+                self._fake_instance_get_all_by_host)
+        self.stubs.Set(db, 'instance_get_all_by_host_and_node',
+                self._fail_per_node_query)
+        self.stubs.Set(db, 'migration_get_in_progress_by_host_and_node',
+                self._fail_per_node_query)
+        self.stubs.Set(db, 'migration_get_in_progress_by_host',
+                self._fake_migration_get_in_progress_by_host)
+        self.stubs.Set(db, 'compute_nodes_update',
+                self._fake_compute_nodes_update)
+
+    def _fake_instance_get_all_by_host(self, context, host,
+                                       columns_to_join=None):
+        self.assertEqual([], columns_to_join)
+        return [i for i in self._instances.values() if i['host'] == host]
+
+    def _fail_per_node_query(self, *args, **kwargs):
+        raise test.TestingException("per-node query during batched audit")
+
+    def _fake_migration_get_in_progress_by_host(self, ctxt, host):
+        return []
+
+    def _fake_compute_nodes_update(self, ctx, updates, prune_stats=False):
+        self.batch_updates.append((updates, prune_stats))
+        return [dict(values, id=compute_id) for compute_id, values in updates]
+
+    def test_batched_audit(self):
+        self._fake_instance(host=self.host, node='fakenode', memory_mb=3,
+                            task_state=None)
+        self._fake_instance(host=self.host, node='fakenode2', memory_mb=1,
+                            task_state=None)
+
+        resource_tracker.update_available_resources(self.context, self.host,
+                self.tracker.driver, self.trackers)
+
+        self.assertEqual(1, len(self.batch_updates))
+        updates, prune_stats = self.batch_updates[0]
+        self.assertTrue(prune_stats)
+        self.assertEqual([1, 2], sorted(c_id for c_id, values in updates))
+        self._assert(3, 'memory_mb_used')
+        self._assert(1, 'running_vms')
+        self._assert(1, 'memory_mb_used', tracker=self.tracker2)
+        self._assert(1, 'running_vms', tracker=self.tracker2)
+
+    def test_batched_audit_creates_new_node(self):
+        self.tracker2.compute_node = None
+        self.mox.StubOutWithMock(self.tracker2, '_create')
+        self.tracker2._create(self.context, mox.IgnoreArg())
+        self.mox.ReplayAll()
+
+        resource_tracker.update_available_resources(self.context, self.host,
+                self.tracker.driver, self.trackers)
+
+        self.assertEqual(1, len(self.batch_updates))
+        updates, prune_stats = self.batch_updates[0]
+        self.assertEqual([1], [c_id for c_id, values in updates])
@@ -145,6 +145,15 @@ class _BaseTestCase(object):
             self.context, 'fake-host', 'fake-node')
         self.assertEqual(result, 'fake-result')
 
+    def test_migration_get_in_progress_by_host(self):
+        self.mox.StubOutWithMock(db, 'migration_get_in_progress_by_host')
+        db.migration_get_in_progress_by_host(
+            self.context, 'fake-host').AndReturn('fake-result')
+        self.mox.ReplayAll()
+        result = self.conductor.migration_get_in_progress_by_host(
+            self.context, 'fake-host')
+        self.assertEqual(result, 'fake-result')
+
     def test_migration_create(self):
         inst = {'uuid': 'fake-uuid',
                 'host': 'fake-host',
@@ -380,6 +389,17 @@ class _BaseTestCase(object):
                                                   fake_instance,
                                                   fake_values)
 
+    def test_instance_system_metadata_update(self):
+        fake_metadata = {'key1': 'val1'}
+        fake_instance = {'uuid': 'fake-uuid'}
+        self.mox.StubOutWithMock(db, 'instance_system_metadata_update')
+        db.instance_system_metadata_update(self.context, 'fake-uuid',
+                                           fake_metadata, False)
+        self.mox.ReplayAll()
+        self.conductor.instance_system_metadata_update(self.context,
+                                                       fake_instance,
+                                                       fake_metadata)
+
     def test_instance_type_get(self):
         self.mox.StubOutWithMock(db, 'instance_type_get')
         db.instance_type_get(self.context, 'fake-id').AndReturn('fake-type')
@@ -430,6 +450,19 @@ class _BaseTestCase(object):
                                                     'fake-values', False)
         self.assertEqual(result, 'fake-result')
 
+    def test_compute_nodes_update(self):
+        node1 = {'id': 'fake-id1'}
+        node2 = {'id': 'fake-id2'}
+        self.mox.StubOutWithMock(db, 'compute_nodes_update')
+        db.compute_nodes_update(self.context,
+                                [('fake-id1', 'fake-values1'),
+                                 ('fake-id2', 'fake-values2')],
+                                True).AndReturn('fake-result')
+        self.mox.ReplayAll()
+        result = self.conductor.compute_nodes_update(self.context,
+                [(node1, 'fake-values1'), (node2, 'fake-values2')], True)
+        self.assertEqual(result, 'fake-result')
+
     def test_compute_node_delete(self):
         node = {'id': 'fake-id'}
         self.mox.StubOutWithMock(db, 'compute_node_delete')
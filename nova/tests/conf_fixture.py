@@ -16,6 +16,8 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+import os
+
 import fixtures
 from oslo.config import cfg
 
@@ -35,6 +37,8 @@ CONF.import_opt('instance_dns_manager', 'nova.network.floating_ips')
 CONF.import_opt('policy_file', 'nova.policy')
 CONF.import_opt('compute_driver', 'nova.virt.driver')
 CONF.import_opt('api_paste_config', 'nova.wsgi')
+CONF.import_opt('span_histograms_path', 'nova.utils')
+CONF.import_opt('config_drive_cache_dir', 'nova.virt.configdrive')
 
 
 class ConfFixture(fixtures.Fixture):
@@ -49,6 +53,8 @@ class ConfFixture(fixtures.Fixture):
         self.conf.set_default('api_paste_config',
                               paths.state_path_def('etc/nova/api-paste.ini'))
         self.conf.set_default('compute_driver', 'nova.virt.fake.FakeDriver')
+        self.conf.set_default('config_drive_cache_dir', os.path.join(
+                self.useFixture(fixtures.TempDir()).path, 'config_drives'))
         self.conf.set_default('fake_network', True)
         self.conf.set_default('fake_rabbit', True)
         self.conf.set_default('flat_network_bridge', 'br100')
@@ -65,6 +71,9 @@ class ConfFixture(fixtures.Fixture):
         self.conf.set_default('rpc_response_timeout', 5)
         self.conf.set_default('sql_connection', "sqlite://")
         self.conf.set_default('sqlite_synchronous', False)
+        self.conf.set_default('span_histograms_path', os.path.join(
+                self.useFixture(fixtures.TempDir()).path,
+                'span_histograms.json'))
         self.conf.set_default('use_ipv6', True)
         self.conf.set_default('verbose', True)
         self.conf.set_default('vlan_interface', 'eth0')
@@ -53,6 +53,9 @@ class ConsoleauthTestCase(test.TestCase):
         timeutils.advance_time_seconds(1)
         self.assertFalse(self.manager.check_token(self.context, token))
 
+    def _validate_console_port_api(self):
+        return self.manager.compute_rpcapi
+
     def _stub_validate_console_port(self, result):
         def fake_validate_console_port(ctxt, instance, port, console_type):
             return result
@@ -83,13 +86,108 @@ class ConsoleauthTestCase(test.TestCase):
                                           '127.0.0.1', '8080', 'host',
                                           instance)
         self.manager.delete_tokens_for_instance(self.context, instance)
-        stored_tokens = self.manager._get_tokens_for_instance(instance)
-
-        self.assertEqual(len(stored_tokens), 0)
 
         for token in tokens:
             self.assertFalse(self.manager.check_token(self.context, token))
 
+    def test_delete_tokens_for_instance_keeps_new_tokens(self):
+        instance = u"12345"
+        self._stub_validate_console_port(True)
+
+        self.manager.authorize_console(self.context, u"token1", 'novnc',
+                                      '127.0.0.1', '8080', 'host',
+                                      instance)
+        self.manager.delete_tokens_for_instance(self.context, instance)
+        self.manager.authorize_console(self.context, u"token2", 'novnc',
+                                      '127.0.0.1', '8080', 'host',
+                                      instance)
+
+        self.assertFalse(self.manager.check_token(self.context, u"token1"))
+        self.assertTrue(self.manager.check_token(self.context, u"token2"))
+
+    def test_evicted_generation_revokes_tokens(self):
+        instance = u"12345"
+        self._stub_validate_console_port(True)
+
+        self.manager.authorize_console(self.context, u"token1", 'novnc',
+                                      '127.0.0.1', '8080', 'host',
+                                      instance)
+        self.manager.mc.delete(self.manager._generation_key(instance))
+        self.assertFalse(self.manager.check_token(self.context, u"token1"))
+
+        self.manager.authorize_console(self.context, u"token2", 'novnc',
+                                      '127.0.0.1', '8080', 'host',
+                                      instance)
+        self.assertFalse(self.manager.check_token(self.context, u"token1"))
+        self.assertTrue(self.manager.check_token(self.context, u"token2"))
+
+    def test_tokens_keep_their_ttl(self):
+        self.useFixture(test.TimeOverride())
+        self.flags(console_token_ttl=10)
+        instance = u"12345"
+        self._stub_validate_console_port(True)
+
+        self.manager.authorize_console(self.context, u"token1", 'novnc',
+                                      '127.0.0.1', '8080', 'host',
+                                      instance)
+        timeutils.advance_time_seconds(25)
+        self.manager.authorize_console(self.context, u"token2", 'novnc',
+                                      '127.0.0.1', '8080', 'host',
+                                      instance)
+        timeutils.advance_time_seconds(9)
+        self.assertFalse(self.manager.check_token(self.context, u"token1"))
+        self.assertTrue(self.manager.check_token(self.context, u"token2"))
+        timeutils.advance_time_seconds(1)
+        self.assertFalse(self.manager.check_token(self.context, u"token2"))
+
+    def test_delete_tokens_for_instance_without_tokens(self):
+        self.manager.delete_tokens_for_instance(self.context, u"12345")
+
+    def test_validation_is_cached(self):
+        self.useFixture(test.TimeOverride())
+        self.flags(console_token_validation_ttl=5)
+        calls = []
+
+        def fake_validate_console_port(*args):
+            calls.append(args)
+            return True
+
+        self.stubs.Set(self._validate_console_port_api(),
+                       'validate_console_port', fake_validate_console_port)
+        self.manager.authorize_console(self.context, u"mytok", 'novnc',
+                                       '127.0.0.1', '8080', 'host',
+                                       u"instance")
+
+        self.assertTrue(self.manager.check_token(self.context, u"mytok"))
+        self.assertTrue(self.manager.check_token(self.context, u"mytok"))
+        self.assertEqual(len(calls), 1)
+
+        timeutils.advance_time_seconds(5)
+        self.assertTrue(self.manager.check_token(self.context, u"mytok"))
+        self.assertEqual(len(calls), 2)
+
+        self.manager.delete_tokens_for_instance(self.context, u"instance")
+        self.assertFalse(self.manager.check_token(self.context, u"mytok"))
+        self.assertEqual(len(calls), 2)
+
+    def test_validation_cache_disabled(self):
+        self.flags(console_token_validation_ttl=0)
+        calls = []
+
+        def fake_validate_console_port(*args):
+            calls.append(args)
+            return True
+
+        self.stubs.Set(self._validate_console_port_api(),
+                       'validate_console_port', fake_validate_console_port)
+        self.manager.authorize_console(self.context, u"mytok", 'novnc',
+                                       '127.0.0.1', '8080', 'host',
+                                       u"instance")
+
+        self.assertTrue(self.manager.check_token(self.context, u"mytok"))
+        self.assertTrue(self.manager.check_token(self.context, u"mytok"))
+        self.assertEqual(len(calls), 2)
+
     def test_wrong_token_has_port(self):
         token = u'mytok'
 
@@ -123,10 +221,12 @@ class ControlauthMemcacheEncodingTestCase(test.TestCase):
     def test_authorize_console_encoding(self):
         self.mox.StubOutWithMock(self.manager.mc, "set")
         self.mox.StubOutWithMock(self.manager.mc, "get")
+        self.mox.StubOutWithMock(self.manager.mc, "add")
+        self.manager.mc.get(mox.IsA(str)).AndReturn(None)
+        self.manager.mc.add(mox.IsA(str), mox.IgnoreArg()).AndReturn(True)
+        self.manager.mc.get(mox.IsA(str)).AndReturn('generation')
         self.manager.mc.set(mox.IsA(str), mox.IgnoreArg(), mox.IgnoreArg()
                            ).AndReturn(True)
-        self.manager.mc.get(mox.IsA(str)).AndReturn(None)
-        self.manager.mc.set(mox.IsA(str), mox.IgnoreArg()).AndReturn(True)
 
         self.mox.ReplayAll()
 
@@ -143,11 +243,8 @@ class ControlauthMemcacheEncodingTestCase(test.TestCase):
         self.manager.check_token(self.context, self.u_token)
 
     def test_delete_tokens_for_instance_encoding(self):
-        self.mox.StubOutWithMock(self.manager.mc, "delete")
-        self.mox.StubOutWithMock(self.manager.mc, "get")
-        self.manager.mc.get(mox.IsA(str)).AndReturn('["token"]')
-        self.manager.mc.delete(mox.IsA(str)).AndReturn(True)
-        self.manager.mc.delete(mox.IsA(str)).AndReturn(True)
+        self.mox.StubOutWithMock(self.manager.mc, "set")
+        self.manager.mc.set(mox.IsA(str), mox.IgnoreArg()).AndReturn(True)
 
         self.mox.ReplayAll()
 
@@ -161,6 +258,9 @@ class CellsConsoleauthTestCase(ConsoleauthTestCase):
         super(CellsConsoleauthTestCase, self).setUp()
         self.flags(enable=True, group='cells')
 
+    def _validate_console_port_api(self):
+        return self.manager.cells_rpcapi
+
     def _stub_validate_console_port(self, result):
         def fake_validate_console_port(ctxt, instance_uuid, console_port,
                                        console_type):
@@ -177,6 +177,15 @@ class API(object):
     def get_all(self, context):
         return self.volume_list
 
+    def get_many(self, context, volume_ids):
+        volumes = {}
+        for volume_id in volume_ids:
+            try:
+                volumes[volume_id] = self.get(context, volume_id)
+            except exception.VolumeNotFound:
+                pass
+        return volumes
+
     def delete(self, context, volume):
         LOG.info('deleting volume %s', volume['id'])
         self.volume_list = [v for v in self.volume_list if v != volume]
@@ -28,6 +28,7 @@ from nova import exception
 from nova import network
 from nova.network import api
 from nova.network import floating_ips
+from nova.network import model
 from nova.network import rpcapi as network_rpcapi
 from nova import policy
 from nova import test
@@ -59,6 +60,17 @@ class NetworkPolicyTestCase(test.TestCase):
         self.mox.ReplayAll()
         api.check_policy(self.context, 'get_all')
 
+    def test_get_instance_nw_info_bulk_checks_policy(self):
+        self.mox.StubOutWithMock(policy, 'enforce')
+        policy.enforce(self.context, 'network:get_instance_nw_info_bulk',
+                       mox.IgnoreArg()).AndRaise(
+                exception.PolicyNotAuthorized(
+                        action='network:get_instance_nw_info_bulk'))
+        self.mox.ReplayAll()
+        self.assertRaises(exception.PolicyNotAuthorized,
+                          network.API().get_instance_nw_info_bulk,
+                          self.context, [])
+
 
 class ApiTestCase(test.TestCase):
     def setUp(self):
@@ -89,6 +101,39 @@ class ApiTestCase(test.TestCase):
         self.network_api.allocate_for_instance(
             self.context, instance, 'vpn', 'requested_networks', macs=macs)
 
+    def test_get_instance_nw_info_bulk(self):
+        inst_type = instance_types.get_default_instance_type()
+        sys_meta = utils.dict_to_metadata(
+                instance_types.save_instance_type_info({}, inst_type))
+        nw_info = model.NetworkInfo([model.VIF(id='fake-vif')])
+        stale_nw_info = model.NetworkInfo([model.VIF(id='stale-vif')])
+        fresh = dict(uuid='fresh', host='host', system_metadata=sys_meta,
+                     info_cache={'network_info': nw_info.json()})
+        stale = dict(uuid='stale', host='host', system_metadata=sys_meta,
+                     info_cache={'network_info': stale_nw_info.json()})
+
+        self.mox.StubOutWithMock(self.network_api.network_rpcapi,
+                                 'get_instance_nw_info_bulk')
+        self.network_api.network_rpcapi.get_instance_nw_info_bulk(
+            self.context,
+            [{'instance_uuid': 'fresh',
+              'rxtx_factor': inst_type['rxtx_factor'],
+              'host': 'host'},
+             {'instance_uuid': 'stale',
+              'rxtx_factor': inst_type['rxtx_factor'],
+              'host': 'host'}]).AndReturn({'fresh': nw_info,
+                                           'stale': nw_info})
+        self.mox.StubOutWithMock(self.network_api.db,
+                                 'instance_info_cache_update')
+        self.network_api.db.instance_info_cache_update(
+            self.context, 'stale', {'network_info': nw_info.json()})
+        self.mox.ReplayAll()
+
+        result = self.network_api.get_instance_nw_info_bulk(self.context,
+                                                            [fresh, stale])
+        self.assertEqual(['fresh', 'stale'], sorted(result.keys()))
+        self.assertEqual(nw_info, result['stale'])
+
     def _do_test_associate_floating_ip(self, orig_instance_uuid):
         """Test post-association logic."""
 
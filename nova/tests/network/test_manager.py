@@ -31,6 +31,7 @@ from nova.network import manager as network_manager
 from nova.network import model as net_model
 from nova.openstack.common.db import exception as db_exc
 from nova.openstack.common import importutils
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common import rpc
 from nova.openstack.common.rpc import common as rpc_common
@@ -488,6 +489,50 @@ class FlatNetworkTestCase(test.TestCase):
                                                                None, None),
                          None)
 
+    def test_allocate_fixed_ips_claims_ips_at_once(self):
+        self.mox.StubOutWithMock(db, 'fixed_ip_associate_pool_multi')
+        self.mox.StubOutWithMock(self.network, 'allocate_fixed_ip')
+
+        network = dict(networks[1], id=2, uuid=FAKEUUID[:-1] + 'b')
+        db.fixed_ip_associate_pool_multi(mox.IgnoreArg(), [0, 2],
+                FAKEUUID).AndReturn({0: '192.168.0.101',
+                                     2: '192.168.1.101'})
+        self.network.allocate_fixed_ip(self.context, FAKEUUID, networks[0],
+                                       address=None,
+                                       claimed_address='192.168.0.101')
+        self.network.allocate_fixed_ip(self.context, FAKEUUID, networks[1],
+                                       address='192.168.1.100',
+                                       claimed_address=None)
+        self.network.allocate_fixed_ip(self.context, FAKEUUID, network,
+                                       address=None,
+                                       claimed_address='192.168.1.101')
+        self.mox.ReplayAll()
+
+        requested_networks = [(networks[1]['uuid'], '192.168.1.100')]
+        self.network._allocate_fixed_ips(self.context, FAKEUUID, HOST,
+                networks + [network], requested_networks=requested_networks)
+
+    def test_allocate_fixed_ips_releases_claimed_ips_on_failure(self):
+        self.mox.StubOutWithMock(db, 'fixed_ip_associate_pool_multi')
+        self.mox.StubOutWithMock(db, 'fixed_ip_disassociate')
+        self.mox.StubOutWithMock(self.network, 'allocate_fixed_ip')
+
+        db.fixed_ip_associate_pool_multi(mox.IgnoreArg(), [0, 1],
+                FAKEUUID).AndReturn({0: '192.168.0.101',
+                                     1: '192.168.1.101'})
+        self.network.allocate_fixed_ip(self.context, FAKEUUID, networks[0],
+                                       address=None,
+                                       claimed_address='192.168.0.101')
+        self.network.allocate_fixed_ip(self.context, FAKEUUID, networks[1],
+                address=None, claimed_address='192.168.1.101').AndRaise(
+                        exception.FixedIpLimitExceeded())
+        db.fixed_ip_disassociate(self.context, '192.168.1.101')
+        self.mox.ReplayAll()
+
+        self.assertRaises(exception.FixedIpLimitExceeded,
+                          self.network._allocate_fixed_ips,
+                          self.context, FAKEUUID, HOST, networks[:2])
+
 
 class VlanNetworkTestCase(test.TestCase):
     def setUp(self):
@@ -564,6 +609,28 @@ class VlanNetworkTestCase(test.TestCase):
         network['vpn_private_address'] = '192.168.0.2'
         self.network.allocate_fixed_ip(self.context, FAKEUUID, network)
 
+    def test_allocate_fixed_ips_claims_local_ips_at_once(self):
+        self.mox.StubOutWithMock(db, 'fixed_ip_associate_pool_multi')
+        self.mox.StubOutWithMock(self.network, 'allocate_fixed_ip')
+        self.mox.StubOutWithMock(self.network.network_rpcapi,
+                                 '_rpc_allocate_fixed_ip')
+
+        db.fixed_ip_associate_pool_multi(mox.IgnoreArg(), [0, 1],
+                FAKEUUID).AndReturn({0: '192.168.0.101',
+                                     1: '192.168.1.101'})
+        self.network.allocate_fixed_ip(self.context, FAKEUUID, networks[0],
+                                       vpn=None, address=None,
+                                       claimed_address='192.168.0.101')
+        self.network.allocate_fixed_ip(self.context, FAKEUUID, networks[1],
+                                       vpn=None, address=None,
+                                       claimed_address='192.168.1.101')
+        self.network.network_rpcapi._rpc_allocate_fixed_ip(self.context,
+                FAKEUUID, 2, None, None, 'otherhost')
+        self.mox.ReplayAll()
+
+        self.network._allocate_fixed_ips(self.context, FAKEUUID, HOST,
+                networks + [dict(networks[1], id=2, host='otherhost')])
+
     def test_create_networks_too_big(self):
         self.assertRaises(ValueError, self.network.create_networks, None,
                           num_networks=4094, vlan_start=1)
@@ -1913,6 +1980,41 @@ class AllocateTestCase(test.TestCase):
                                              host=self.network.host,
                                              project_id=project_id)
 
+    def test_get_instance_nw_info_bulk(self):
+        self.flags(auto_assign_floating_ip=True)
+        networks = db.network_get_all(self.context)
+        for network in networks:
+            db.network_update(self.context, network['id'],
+                              {'host': self.network.host})
+        project_id = self.context.project_id
+        instances = []
+        for i, address in enumerate(('10.10.10.10', '10.10.10.11')):
+            db.floating_ip_create(self.context,
+                                  {'address': address,
+                                   'pool': 'nova'})
+            inst = db.instance_create(self.context,
+                                      {'host': self.compute.host,
+                                       'display_name': '%s-%d' % (HOST, i),
+                                       'instance_type_id': 1})
+            self.network.allocate_for_instance(self.context,
+                instance_id=inst['id'], instance_uuid=inst['uuid'],
+                host=inst['host'], vpn=None, rxtx_factor=3,
+                project_id=project_id, macs=None)
+            instances.append({'instance_uuid': inst['uuid'],
+                              'rxtx_factor': 3,
+                              'host': inst['host']})
+
+        nw_infos = self.network.get_instance_nw_info_bulk(self.context,
+                                                          instances)
+        self.assertEqual(2, len(nw_infos))
+        for instance in instances:
+            nw_info = self.network.get_instance_nw_info(self.context,
+                instance['instance_uuid'], instance['rxtx_factor'],
+                instance['host'])
+            self.assertEqual(1, len(nw_info.floating_ips()))
+            self.assertEqual(jsonutils.loads(nw_info.json()),
+                jsonutils.loads(nw_infos[instance['instance_uuid']].json()))
+
     def test_allocate_for_instance_with_mac(self):
         available_macs = set(['ca:fe:de:ad:be:ef'])
         inst = db.instance_create(self.context, {'host': self.compute.host,
@@ -350,3 +350,83 @@ class NetworkInfoTests(test.TestCase):
                 [fake_network_cache_model.new_ip({'address': '10.10.0.2'}),
                  fake_network_cache_model.new_ip(
                         {'address': '10.10.0.3'})] * 4)
+
+
+class CachedNetworkInfoTests(test.TestCase):
+    def _ninfo(self):
+        vif = fake_network_cache_model.new_vif()
+        vif['network']['subnets'][0]['ips'][0].add_floating_ip(
+                fake_network_cache_model.new_ip(
+                        {'address': '192.168.1.1', 'type': 'floating'}))
+        return model.NetworkInfo([vif,
+                fake_network_cache_model.new_vif(
+                        {'address': 'bb:bb:bb:bb:bb:bb'})])
+
+    def test_matches_hydrated_model(self):
+        ninfo = self._ninfo()
+        cached = model.CachedNetworkInfo(ninfo.json())
+        self.assertEqual(len(ninfo), len(cached))
+        self.assertEqual(ninfo.fixed_ips(), cached.fixed_ips())
+        self.assertEqual(ninfo.floating_ips(), cached.floating_ips())
+        self.assertEqual(ninfo.legacy(), cached.legacy())
+        self.assertEqual(ninfo, cached.model())
+        self.assertEqual(ninfo[1]['address'], cached[1]['address'])
+        self.assertEqual(ninfo[0]['network']['label'],
+                         cached[0]['network']['label'])
+        self.assertEqual(ninfo[0].fixed_ips(), cached[0].fixed_ips())
+
+    def test_not_hydrated_for_ip_lookups(self):
+        cached = model.CachedNetworkInfo(self._ninfo().json())
+        self.mox.StubOutWithMock(model.VIF, 'hydrate')
+        self.mox.StubOutWithMock(model.FixedIP, 'hydrate')
+        self.mox.ReplayAll()
+        self.assertEqual(8, len(cached.fixed_ips()))
+        self.assertEqual(['192.168.1.1'],
+                         [ip['address'] for ip in cached.floating_ips()])
+        self.assertEqual(['aa:aa:aa:aa:aa:aa', 'bb:bb:bb:bb:bb:bb'],
+                         [vif['address'] for vif in cached])
+
+    def test_incomplete_cache(self):
+        cached = model.CachedNetworkInfo([
+                {'address': 'aa:aa:aa:aa:aa:aa',
+                 'network': {'label': 'private',
+                             'subnets': [{'cidr': '192.168.0.0/24',
+                                          'ips': [{'address': '192.168.0.3',
+                                                   'type': 'fixed'}]}]}}])
+        self.assertEqual(None, cached[0]['type'])
+        self.assertEqual(None, cached[0].get('devname'))
+        fixed_ips = cached.fixed_ips()
+        self.assertEqual(1, len(fixed_ips))
+        self.assertEqual(4, fixed_ips[0]['version'])
+        self.assertEqual([], cached.floating_ips())
+
+    def test_empty(self):
+        for network_info in (None, [], '[]'):
+            cached = model.CachedNetworkInfo(network_info)
+            self.assertFalse(cached)
+            self.assertEqual([], cached.fixed_ips())
+            self.assertEqual([], cached.legacy())
+
+    def test_for_instance_memoized_on_info_cache(self):
+        class InfoCache(dict):
+            pass
+
+        info_cache = InfoCache(network_info=self._ninfo().json())
+        instance = {'info_cache': info_cache}
+        cached = model.CachedNetworkInfo.for_instance(instance)
+        self.assertTrue(cached is
+                        model.CachedNetworkInfo.for_instance(instance))
+
+        info_cache['network_info'] = '[]'
+        self.assertFalse(model.CachedNetworkInfo.for_instance(instance))
+
+    def test_for_instance_plain_dict(self):
+        instance = {'info_cache': {'network_info': self._ninfo().json()}}
+        cached = model.CachedNetworkInfo.for_instance(instance)
+        self.assertEqual(8, len(cached.fixed_ips()))
+        self.assertEqual({'network_info': self._ninfo().json()},
+                         instance['info_cache'])
+
+    def test_for_instance_without_info_cache(self):
+        cached = model.CachedNetworkInfo.for_instance({'info_cache': None})
+        self.assertEqual(0, len(cached))
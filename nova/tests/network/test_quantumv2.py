@@ -380,6 +380,60 @@ class TestQuantumv2(test.TestCase):
         self.assertEquals('my_mac%s' % id_suffix, nw_inf[0]['address'])
         self.assertEquals(0, len(nw_inf[0]['network']['subnets']))
 
+    def test_get_instance_nw_info_bulk(self):
+        # Test that the ports and floating ips of several instances are
+        # listed at once.
+        api = quantumapi.API()
+        instance2 = dict(self.instance, uuid=str(uuid.uuid4()))
+        project_id = self.instance['project_id']
+        port1 = dict(self.port_data2[0], device_id=self.instance['uuid'],
+                     tenant_id=project_id)
+        port2 = dict(self.port_data2[1], device_id=instance2['uuid'],
+                     tenant_id=project_id)
+        his_port = dict(self.port_data2[1], id='his_portid',
+                        device_id=instance2['uuid'],
+                        tenant_id='his_tenantid')
+        self.mox.StubOutWithMock(api.db, 'instance_info_cache_update')
+        api.db.instance_info_cache_update(mox.IgnoreArg(),
+                                          self.instance['uuid'],
+                                          mox.IgnoreArg())
+        api.db.instance_info_cache_update(mox.IgnoreArg(),
+                                          instance2['uuid'],
+                                          mox.IgnoreArg())
+        quantumv2.get_client(mox.IgnoreArg(),
+                             admin=True).MultipleTimes().AndReturn(
+            self.moxed_client)
+        self.moxed_client.list_ports(
+            device_id=[self.instance['uuid'], instance2['uuid']]).AndReturn(
+                {'ports': [port1, port2, his_port]})
+        self.moxed_client.list_floatingips(
+            port_id=['my_portid1', 'my_portid2', 'his_portid']).AndReturn(
+                {'floatingips': self.float_data2})
+        self.moxed_client.list_networks(
+            tenant_id=project_id, shared=False).AndReturn(
+                {'networks': self.nets2})
+        self.moxed_client.list_networks(
+            shared=True).AndReturn({'networks': []})
+        for i, subnet_data in ((1, self.subnet_data1),
+                               (2, self.subnet_data2)):
+            self.moxed_client.list_subnets(
+                id=mox.SameElementsAs(['my_subid%s' % i])).AndReturn(
+                    {'subnets': subnet_data})
+            self.moxed_client.list_ports(
+                network_id=subnet_data[0]['network_id'],
+                device_owner='network:dhcp').AndReturn(
+                    {'ports': []})
+        self.mox.ReplayAll()
+
+        nw_infos = api.get_instance_nw_info_bulk(self.context,
+                                                 [self.instance, instance2])
+        self._verify_nw_info(nw_infos[self.instance['uuid']])
+        nw_info = nw_infos[instance2['uuid']]
+        self.assertEqual(1, len(nw_info))
+        self.assertEqual('my_portid2', nw_info[0]['id'])
+        self.assertEqual(['172.0.2.2'],
+                         nw_info.fixed_ips()[0].floating_ip_addresses())
+
     def test_refresh_quantum_extensions_cache(self):
         api = quantumapi.API()
         self.moxed_client.list_extensions().AndReturn(
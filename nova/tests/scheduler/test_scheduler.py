@@ -414,12 +414,12 @@ class SchedulerTestCase(test.TestCase):
         services = [service1, service2]
 
         self.mox.StubOutWithMock(db, 'service_get_all_by_topic')
-        self.mox.StubOutWithMock(servicegroup.API, 'service_is_up')
+        self.mox.StubOutWithMock(servicegroup.API, 'service_are_up')
 
         db.service_get_all_by_topic(self.context,
                 self.topic).AndReturn(services)
-        self.servicegroup_api.service_is_up(service1).AndReturn(False)
-        self.servicegroup_api.service_is_up(service2).AndReturn(True)
+        self.servicegroup_api.service_are_up(services).AndReturn(
+                [False, True])
 
         self.mox.ReplayAll()
         result = self.driver.hosts_up(self.context, self.topic)
@@ -16,6 +16,7 @@ import datetime
 
 import eventlet
 import fixtures
+import mox
 
 from nova import context
 from nova import db
@@ -141,3 +142,94 @@ class DBServiceGroupTestCase(test.TestCase):
         self.mox.ReplayAll()
         result = self.servicegroup_api.service_is_up(service)
         self.assertFalse(result)
+
+    def test_service_are_up(self):
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        now = timeutils.utcnow()
+        up = {'updated_at': now, 'created_at': now}
+        down = {'updated_at': now - datetime.timedelta(
+                    seconds=self.down_time + 1),
+                'created_at': now}
+        self.mox.StubOutWithMock(timeutils, 'utcnow')
+        timeutils.utcnow().AndReturn(now)
+        self.mox.ReplayAll()
+        result = self.servicegroup_api.service_are_up([up, down, up])
+        self.assertEqual(result, [True, False, True])
+
+    def test_get_all_cached(self):
+        self.flags(servicegroup_db_cache_ttl=10, service_down_time=60)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        driver = self.servicegroup_api._driver
+        service = {'host': self._host, 'topic': self._topic,
+                   'updated_at': timeutils.utcnow(), 'created_at': None}
+        self.mox.StubOutWithMock(driver.conductor_api,
+                                 'service_get_all_by_topic')
+        driver.conductor_api.service_get_all_by_topic(
+                mox.IgnoreArg(), self._topic).AndReturn([service])
+        driver.conductor_api.service_get_all_by_topic(
+                mox.IgnoreArg(), self._topic).AndReturn([])
+        self.mox.ReplayAll()
+
+        self.assertEqual(self.servicegroup_api.get_all(self._topic),
+                         [self._host])
+        timeutils.advance_time_seconds(5)
+        self.assertEqual(self.servicegroup_api.get_all(self._topic),
+                         [self._host])
+        timeutils.advance_time_seconds(6)
+        self.assertEqual(self.servicegroup_api.get_all(self._topic), [])
+
+    def test_get_all_reloads_members_down_in_cache(self):
+        self.flags(servicegroup_db_cache_ttl=10, service_down_time=60)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        driver = self.servicegroup_api._driver
+        changes = []
+        self.servicegroup_api.add_listener(
+                lambda *args: changes.append(args))
+        now = timeutils.utcnow()
+        cached = {'host': self._host, 'topic': self._topic,
+                  'updated_at': now - datetime.timedelta(seconds=55),
+                  'created_at': None}
+        reported = {'host': self._host, 'topic': self._topic,
+                    'updated_at': now + datetime.timedelta(seconds=6),
+                    'created_at': None}
+        self.mox.StubOutWithMock(driver.conductor_api,
+                                 'service_get_all_by_topic')
+        driver.conductor_api.service_get_all_by_topic(
+                mox.IgnoreArg(), self._topic).AndReturn([cached])
+        driver.conductor_api.service_get_all_by_topic(
+                mox.IgnoreArg(), self._topic).AndReturn([reported])
+        self.mox.ReplayAll()
+
+        self.assertEqual(self.servicegroup_api.get_all(self._topic),
+                         [self._host])
+        timeutils.advance_time_seconds(6)
+        self.assertEqual(self.servicegroup_api.get_all(self._topic),
+                         [self._host])
+        self.assertEqual(changes, [])
+
+    def test_state_change_listener(self):
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        changes = []
+
+        def listener(host, topic, is_up):
+            changes.append((host, topic, is_up))
+
+        self.servicegroup_api.add_listener(listener)
+        service = {'host': self._host, 'topic': self._topic,
+                   'updated_at': timeutils.utcnow(), 'created_at': None}
+        self.assertTrue(self.servicegroup_api.service_is_up(service))
+        self.assertTrue(self.servicegroup_api.service_is_up(service))
+        self.assertEqual(changes, [])
+
+        timeutils.advance_time_seconds(self.down_time + 1)
+        self.assertFalse(self.servicegroup_api.service_is_up(service))
+        self.assertEqual(changes, [(self._host, self._topic, False)])
+
+        service['updated_at'] = timeutils.utcnow()
+        self.assertTrue(self.servicegroup_api.service_is_up(service))
+        self.assertEqual(changes, [(self._host, self._topic, False),
+                                   (self._host, self._topic, True)])
@@ -0,0 +1,129 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the asynchronous notification driver."""
+
+import eventlet
+
+from nova import async_notifier
+from nova import context
+from nova.openstack.common import rpc
+from nova import test
+
+
+class AsyncNotifierTestCase(test.TestCase):
+    def setUp(self):
+        super(AsyncNotifierTestCase, self).setUp()
+        self.flags(notification_topics=['notifications'])
+        self.context = context.get_admin_context()
+        self.sent = []
+
+        def fake_notify(ctxt, topic, msg):
+            self.sent.append((topic, msg['event_type']))
+
+        self.stubs.Set(rpc, 'notify', fake_notify)
+        async_notifier._reset()
+        self.addCleanup(async_notifier._reset)
+
+    def _msg(self, event_type, priority='INFO'):
+        return {'event_type': event_type, 'priority': priority,
+                'payload': {}}
+
+    def test_notify_is_sent_in_background(self):
+        async_notifier.notify(self.context, self._msg('a'))
+        self.assertEqual(self.sent, [])
+        async_notifier.flush()
+        self.assertEqual(self.sent, [('notifications.info', 'a')])
+
+    def test_batch_is_grouped_by_topic_in_order(self):
+        self.flags(async_notification_batch_size=10)
+        async_notifier.notify(self.context, self._msg('a'))
+        async_notifier.notify(self.context, self._msg('b', 'ERROR'))
+        async_notifier.notify(self.context, self._msg('c'))
+        async_notifier.flush()
+        self.assertEqual(self.sent, [('notifications.info', 'a'),
+                                     ('notifications.info', 'c'),
+                                     ('notifications.error', 'b')])
+
+    def test_drop_policy(self):
+        self.flags(async_notification_queue_size=1,
+                   async_notification_overflow_policy='drop')
+        async_notifier._reset()
+        async_notifier.notify(self.context, self._msg('a'))
+        async_notifier.notify(self.context, self._msg('b'))
+        stats = async_notifier.get_stats()
+        self.assertEqual(stats['dropped'], 1)
+        self.assertEqual(stats['queue_depth'], 1)
+        async_notifier.flush()
+        self.assertEqual(self.sent, [('notifications.info', 'a')])
+
+    def test_block_policy(self):
+        self.flags(async_notification_queue_size=1)
+        async_notifier._reset()
+        async_notifier.notify(self.context, self._msg('a'))
+        async_notifier.notify(self.context, self._msg('b'))
+        async_notifier.flush()
+        self.assertEqual(self.sent, [('notifications.info', 'a'),
+                                     ('notifications.info', 'b')])
+        self.assertEqual(async_notifier.get_stats()['dropped'], 0)
+
+    def test_failed_notifications_are_counted(self):
+        def fake_notify(ctxt, topic, msg):
+            if msg['event_type'] == 'bad':
+                raise Exception('boom')
+            self.sent.append((topic, msg['event_type']))
+
+        self.stubs.Set(rpc, 'notify', fake_notify)
+        async_notifier.notify(self.context, self._msg('bad'))
+        async_notifier.notify(self.context, self._msg('good'))
+        async_notifier.flush()
+        self.assertEqual(self.sent, [('notifications.info', 'good')])
+        self.assertEqual(async_notifier.get_stats(),
+                         {'sent': 1, 'dropped': 0, 'failed': 1,
+                          'queue_depth': 0})
+
+    def test_notifications_are_counted_once(self):
+        self.flags(notification_topics=['notifications', 'monitor'])
+
+        def fake_notify(ctxt, topic, msg):
+            if topic.startswith('monitor') and msg['event_type'] == 'bad':
+                raise Exception('boom')
+            self.sent.append((topic, msg['event_type']))
+
+        self.stubs.Set(rpc, 'notify', fake_notify)
+        async_notifier.notify(self.context, self._msg('bad'))
+        async_notifier.notify(self.context, self._msg('good'))
+        async_notifier.flush()
+        self.assertEqual(len(self.sent), 3)
+        self.assertEqual(async_notifier.get_stats(),
+                         {'sent': 1, 'dropped': 0, 'failed': 1,
+                          'queue_depth': 0})
+
+    def test_flush_timeout(self):
+        self.stubs.Set(rpc, 'notify',
+                       lambda ctxt, topic, msg: eventlet.sleep(1))
+        async_notifier.notify(self.context, self._msg('a'))
+        self.assertFalse(async_notifier.flush(timeout=0.01))
+
+    def test_dead_sender_is_restarted(self):
+        async_notifier.notify(self.context, self._msg('a'))
+        async_notifier.flush()
+        async_notifier._sender.kill()
+        async_notifier.notify(self.context, self._msg('b'))
+        self.assertTrue(async_notifier.flush(timeout=1))
+        self.assertEqual(self.sent, [('notifications.info', 'a'),
+                                     ('notifications.info', 'b')])
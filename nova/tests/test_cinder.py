@@ -87,6 +87,10 @@ class FakeHTTPClient(cinder.cinder_client.client.HTTPClient):
     def get_volumes_nonexisting(self, **kw):
         raise cinder_exception.NotFound(code=404, message='Resource not found')
 
+    def get_volumes_detail(self, **kw):
+        volumes = [_stub_volume(id='1234'), _stub_volume(id='4321')]
+        return (200, {'volumes': volumes})
+
     def get_volumes_5678(self, **kw):
         """Volume with image metadata."""
         volume = {'volume': _stub_volume(id='1234',
@@ -139,6 +143,7 @@ class CinderTestCase(test.TestCase):
         self.fake_client_factory = FakeClientFactory()
         self.stubs.Set(cinder.cinder_client, "Client",
                        self.fake_client_factory)
+        self.stubs.Set(cinder, "_CLIENT_POOL", cinder.ClientPool())
         self.api = cinder.API()
         catalog = [{
             "type": "volume",
@@ -194,3 +199,59 @@ class CinderTestCase(test.TestCase):
         self.assert_called('GET', '/volumes/1234')
         self.assertEquals(
             self.fake_client_factory.client.client.retries, retries)
+
+    def test_clients_are_reused(self):
+        self.api.get(self.context, '1234')
+        client = self.fake_client_factory.client
+        self.assertEqual(client.client.auth_token, None)
+
+        other_context = context.RequestContext('other_user', 'project_id',
+                                               auth_token='other_token',
+                                               service_catalog=
+                                               self.context.service_catalog)
+        self.api.get(other_context, '1234')
+        self.assertTrue(self.fake_client_factory.client is client)
+        self.assertEqual(len(client.callstack), 2)
+        self.assertEqual(client.client.user, 'other_user')
+
+    def test_clients_are_pooled_per_endpoint(self):
+        self.api.get(self.context, '1234')
+        client = self.fake_client_factory.client
+        self.flags(
+            cinder_endpoint_template='http://other_host:8776/v1/%(project_id)s'
+        )
+        self.api.get(self.context, '1234')
+        self.assertFalse(self.fake_client_factory.client is client)
+
+    def test_concurrent_calls_use_separate_clients(self):
+        with cinder.cinderclient(self.context) as client:
+            with cinder.cinderclient(self.context) as other_client:
+                self.assertFalse(client is other_client)
+
+    def test_get_many(self):
+        self.flags(cinder_list_volumes_threshold=1)
+        volumes = self.api.get_many(self.context, ['1234', '4321'])
+        self.assert_called('GET', '/volumes/detail')
+        self.assertEqual(len(self.fake_client_factory.client.callstack), 1)
+        self.assertEqual(sorted(volumes.keys()), ['1234', '4321'])
+        self.assertEqual(volumes['4321']['id'], '4321')
+
+    def test_get_many_looks_up_missing_volumes(self):
+        self.flags(cinder_list_volumes_threshold=1)
+        volumes = self.api.get_many(self.context,
+                                    ['1234', '5678', 'nonexisting'])
+        self.assert_called('GET', '/volumes/detail', pos=0)
+        self.assertEqual(sorted(volumes.keys()), ['1234', '5678'])
+
+    def test_get_many_single_volume(self):
+        volumes = self.api.get_many(self.context, ['1234'])
+        self.assert_called('GET', '/volumes/1234')
+        self.assertEqual(volumes.keys(), ['1234'])
+
+    def test_get_many_below_threshold(self):
+        self.flags(cinder_list_volumes_threshold=2)
+        volumes = self.api.get_many(self.context, ['1234', 'nonexisting'])
+        urls = [call[1] for call in self.fake_client_factory.client.callstack]
+        self.assertEqual(sorted(urls),
+                         ['/volumes/1234', '/volumes/nonexisting'])
+        self.assertEqual(volumes.keys(), ['1234'])
@@ -20,11 +20,16 @@ import mox
 import os
 import tempfile
 
+from oslo.config import cfg
+
 from nova import test
 
 from nova.openstack.common import log
 from nova import utils
 from nova.virt import configdrive
+from nova.virt.disk import fsimage
+
+CONF = cfg.CONF
 
 LOG = log.getLogger(__name__)
 
@@ -91,3 +96,77 @@ class ConfigDriveTestCase(test.TestCase):
         finally:
             if imagefile:
                 utils.delete_if_exists(imagefile)
+
+    def _make_drive(self):
+        (fd, imagefile) = tempfile.mkstemp(prefix='cd_')
+        os.close(fd)
+        self.addCleanup(utils.delete_if_exists, imagefile)
+        with configdrive.ConfigDriveBuilder() as c:
+            c._add_file('this/is/a/path/hello', 'This is some content')
+            c.make_drive(imagefile)
+        with open(imagefile) as f:
+            return f.read()
+
+    def test_make_drive_iso9660_in_process(self):
+        self.mox.StubOutWithMock(utils, 'execute')
+        self.mox.ReplayAll()
+
+        image = self._make_drive()
+        self.assertEqual(image[16 * 2048:16 * 2048 + 6], '\x01CD001')
+        self.assertTrue('This is some content' in image)
+
+    def test_make_drive_vfat_in_process(self):
+        self.flags(config_drive_format='vfat')
+        self.mox.StubOutWithMock(utils, 'execute')
+        self.mox.StubOutWithMock(utils, 'mkfs')
+        self.mox.ReplayAll()
+
+        image = self._make_drive()
+        self.assertEqual(len(image), configdrive.CONFIGDRIVESIZE_BYTES)
+        self.assertTrue('This is some content' in image)
+
+    def test_make_drive_reuses_identical_drive(self):
+        self.flags(config_drive_cache_age=3600)
+        image = self._make_drive()
+
+        self.mox.StubOutWithMock(fsimage, 'write_iso9660')
+        self.mox.ReplayAll()
+        self.assertEqual(self._make_drive(), image)
+
+    def test_make_drive_cache_disabled(self):
+        self._make_drive()
+
+        self.mox.StubOutWithMock(fsimage, 'write_iso9660')
+        fsimage.write_iso9660(mox.IgnoreArg(), mox.IgnoreArg(), 'config-2',
+                              publisher=mox.IgnoreArg())
+        self.mox.ReplayAll()
+        self._make_drive()
+        self.assertFalse(os.path.exists(CONF.config_drive_cache_dir))
+
+    def test_make_drive_cache_is_private(self):
+        self.flags(config_drive_cache_age=3600)
+        self._make_drive()
+        cache_dir = CONF.config_drive_cache_dir
+        self.assertEqual(os.stat(cache_dir).st_mode & 0777, 0700)
+        for name in os.listdir(cache_dir):
+            path = os.path.join(cache_dir, name)
+            self.assertEqual(os.stat(path).st_mode & 0777, 0600)
+
+    def test_make_drive_different_contents(self):
+        self.flags(config_drive_cache_age=3600)
+        self._make_drive()
+        with configdrive.ConfigDriveBuilder() as c:
+            c._add_file('this/is/a/path/hello', 'This is other content')
+            self.assertFalse(os.path.exists(c._cached_image_path()))
+
+    def test_expire_cached_images(self):
+        self.flags(config_drive_cache_age=3600)
+        self._make_drive()
+        cached = os.listdir(CONF.config_drive_cache_dir)
+        self.assertEqual(len(cached), 1)
+
+        self.flags(config_drive_cache_age=1)
+        path = os.path.join(CONF.config_drive_cache_dir, cached[0])
+        os.utime(path, (0, 0))
+        configdrive._expire_cached_images(CONF.config_drive_cache_dir)
+        self.assertFalse(os.path.exists(path))
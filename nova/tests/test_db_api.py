@@ -30,6 +30,7 @@ from sqlalchemy.sql.expression import select
 
 from nova import context
 from nova import db
+from nova.db.sqlalchemy import api as sqlalchemy_api
 from nova import exception
 from nova.openstack.common.db.sqlalchemy import session as db_session
 from nova.openstack.common import timeutils
@@ -1643,6 +1644,33 @@ class CapacityTestCase(test.TestCase):
         self.assertEqual(num_instance_stat['key'], stat['key'])
         self.assertEqual(1, int(stat['value']))
 
+    def test_compute_nodes_update(self):
+        item1 = self._create_helper('host1')
+        item2 = db.compute_node_create(self.ctxt,
+                dict(self.compute_node_dict, stats={}))
+
+        updates = [(item1['id'], {'vcpus': 4,
+                                  'stats': dict(num_instances=1)}),
+                   (item2['id'], {'vcpus': 8})]
+        items = db.compute_nodes_update(self.ctxt, updates, prune_stats=True)
+
+        self.assertEqual([item1['id'], item2['id']],
+                         [item['id'] for item in items])
+        self.assertEqual(4, items[0]['vcpus'])
+        self.assertEqual(8, items[1]['vcpus'])
+        nodes = dict((node['id'], node)
+                     for node in db.compute_node_get_all(self.ctxt))
+        self.assertEqual(1, len(nodes[item1['id']]['stats']))
+        self.assertEqual(8, nodes[item2['id']]['vcpus'])
+
+    def test_compute_nodes_update_not_found(self):
+        item = self._create_helper('host1')
+        updates = [(item['id'], {'vcpus': 4}), (item['id'] + 1, {'vcpus': 8})]
+        self.assertRaises(exception.ComputeHostNotFound,
+                          db.compute_nodes_update, self.ctxt, updates)
+        node = db.compute_node_get_all(self.ctxt)[0]
+        self.assertEqual(2, node['vcpus'])
+
 
 class MigrationTestCase(test.TestCase):
 
@@ -1707,6 +1735,18 @@ class MigrationTestCase(test.TestCase):
         self.assertEqual(3, len(migrations))
         self._assert_in_progress(migrations)
 
+    def test_in_progress_host1(self):
+        migrations = db.migration_get_in_progress_by_host(self.ctxt, 'host1')
+        # 2 as source + 1 as dest
+        self.assertEqual(3, len(migrations))
+        self._assert_in_progress(migrations)
+
+    def test_in_progress_host2(self):
+        migrations = db.migration_get_in_progress_by_host(self.ctxt, 'host2')
+        # 2 as dest, 2 as source
+        self.assertEqual(4, len(migrations))
+        self._assert_in_progress(migrations)
+
     def test_instance_join(self):
         migrations = db.migration_get_in_progress_by_host_and_node(self.ctxt,
                 'host2', 'b')
@@ -1965,6 +2005,160 @@ class TestIpAllocation(test.TestCase):
         self.assertEqual(fixed_ip['instance_uuid'], self.instance['uuid'])
         self.assertEqual(fixed_ip['network_id'], self.network['id'])
 
+    def test_fixed_ip_associate_pool_succeeds_and_sets_network(self):
+        self.create_fixed_ip(reserved=True)
+        address = self.create_fixed_ip(address='192.168.0.2')
+        self.assertEqual(address,
+                         db.fixed_ip_associate_pool(self.ctxt,
+                                                    self.network['id'],
+                                                    self.instance['uuid']))
+        fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address)
+        self.assertEqual(fixed_ip['instance_uuid'], self.instance['uuid'])
+        self.assertEqual(fixed_ip['network_id'], self.network['id'])
+
+    def test_fixed_ip_associate_pool_fails_if_no_ip_free(self):
+        other = db.network_create_safe(self.ctxt, {})
+        self.create_fixed_ip(network_id=other['id'])
+        self.create_fixed_ip(address='192.168.0.2', host='fake_host')
+        self.assertRaises(exception.NoMoreFixedIps,
+                          db.fixed_ip_associate_pool,
+                          self.ctxt, self.network['id'],
+                          self.instance['uuid'])
+
+    def test_fixed_ip_associate_pool_retries_lost_claims(self):
+        address = self.create_fixed_ip(network_id=self.network['id'])
+        claim = sqlalchemy_api._fixed_ip_claim
+        lost = []
+
+        def fake_claim(*args):
+            if not lost:
+                lost.append(args[2])
+                return []
+            return claim(*args)
+
+        self.stubs.Set(sqlalchemy_api, '_fixed_ip_claim', fake_claim)
+        self.assertEqual(address,
+                         db.fixed_ip_associate_pool(self.ctxt,
+                                                    self.network['id'],
+                                                    self.instance['uuid']))
+        self.assertEqual(1, len(lost))
+
+    def _take_fixed_ips(self, fixed_ip_ids):
+        """Claim fixed ips for another host, as a concurrent allocation."""
+        for fixed_ip_id in fixed_ip_ids:
+            fixed_ip = db.fixed_ip_get(self.ctxt, fixed_ip_id)
+            db.fixed_ip_update(self.ctxt, fixed_ip['address'],
+                               {'host': 'other_host'})
+
+    def test_fixed_ip_associate_pool_reads_candidates_again(self):
+        self.flags(fixed_ip_associate_pool_candidates=2)
+        addresses = [self.create_fixed_ip(address='192.168.0.%d' % i,
+                                          network_id=self.network['id'])
+                     for i in xrange(1, 6)]
+        claim = sqlalchemy_api._fixed_ip_claim
+        lost = []
+
+        def fake_claim(context, session, claims, instance_uuid, host):
+            if len(lost) < 3:
+                # A concurrent allocation gets there first
+                self._take_fixed_ips(claims.keys())
+                lost.extend(claims.keys())
+                return []
+            return claim(context, session, claims, instance_uuid, host)
+
+        self.stubs.Set(sqlalchemy_api, '_fixed_ip_claim', fake_claim)
+        address = db.fixed_ip_associate_pool(self.ctxt, self.network['id'],
+                                             self.instance['uuid'])
+        self.assertEqual(3, len(lost))
+        self.assertTrue(address in addresses)
+        fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address)
+        self.assertFalse(fixed_ip['id'] in lost)
+        self.assertEqual(fixed_ip['instance_uuid'], self.instance['uuid'])
+
+    def test_fixed_ip_associate_pool_reads_from_random_id(self):
+        self.flags(fixed_ip_associate_pool_candidates=1)
+        addresses = [self.create_fixed_ip(address='192.168.0.%d' % i,
+                                          network_id=self.network['id'])
+                     for i in xrange(1, 4)]
+        self.stubs.Set(sqlalchemy_api.random, 'randint', lambda a, b: b)
+        self.assertEqual(addresses[-1],
+                         db.fixed_ip_associate_pool(self.ctxt,
+                                                    self.network['id'],
+                                                    self.instance['uuid']))
+
+    def test_fixed_ip_associate_pool_wraps_around(self):
+        self.flags(fixed_ip_associate_pool_candidates=2)
+        addresses = [self.create_fixed_ip(address='192.168.0.%d' % i,
+                                          network_id=self.network['id'])
+                     for i in xrange(1, 4)]
+        self.create_fixed_ip(address='192.168.0.4', host='fake_host')
+        self.stubs.Set(sqlalchemy_api.random, 'randint', lambda a, b: b)
+        self.stubs.Set(sqlalchemy_api.random, 'shuffle', lambda x: None)
+        self.assertEqual(addresses[0],
+                         db.fixed_ip_associate_pool(self.ctxt,
+                                                    self.network['id'],
+                                                    self.instance['uuid']))
+
+    def test_fixed_ip_associate_pool_multi(self):
+        other = db.network_create_safe(self.ctxt, {})
+        address = self.create_fixed_ip(network_id=self.network['id'])
+        other_address = self.create_fixed_ip(address='192.168.1.1',
+                                             network_id=other['id'])
+        addresses = db.fixed_ip_associate_pool_multi(
+                self.ctxt, [self.network['id'], other['id']],
+                self.instance['uuid'])
+        self.assertEqual({self.network['id']: address,
+                          other['id']: other_address}, addresses)
+        for address in addresses.values():
+            fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address)
+            self.assertEqual(fixed_ip['instance_uuid'],
+                             self.instance['uuid'])
+
+    def test_fixed_ip_associate_pool_multi_releases_ips_on_failure(self):
+        other = db.network_create_safe(self.ctxt, {})
+        address = self.create_fixed_ip(network_id=self.network['id'])
+        claim = sqlalchemy_api._fixed_ip_claim
+
+        def fake_claim(context, session, claims, instance_uuid, host):
+            # A concurrent allocation takes the ip of the other network
+            self._take_fixed_ips(fixed_ip_id
+                                 for fixed_ip_id, network_id in
+                                 claims.iteritems()
+                                 if network_id == other['id'])
+            return claim(context, session, claims, instance_uuid, host)
+
+        self.create_fixed_ip(address='192.168.1.1', network_id=other['id'])
+        self.stubs.Set(sqlalchemy_api, '_fixed_ip_claim', fake_claim)
+        self.assertRaises(exception.NoMoreFixedIps,
+                          db.fixed_ip_associate_pool_multi,
+                          self.ctxt, [self.network['id'], other['id']],
+                          self.instance['uuid'])
+        fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address)
+        self.assertEqual(fixed_ip['instance_uuid'], None)
+
+    def test_fixed_ip_associate_pool_multi_returns_unassigned_ips(self):
+        other = db.network_create_safe(self.ctxt, {})
+        address = self.create_fixed_ip()
+        other_address = self.create_fixed_ip(address='192.168.1.1',
+                                             network_id=other['id'])
+        claim = sqlalchemy_api._fixed_ip_claim
+
+        def fake_claim(context, session, claims, instance_uuid, host):
+            # A concurrent allocation takes the ip of the other network, so
+            # only the ip without a network is left to be claimed.
+            db.fixed_ip_update(self.ctxt, other_address,
+                               {'host': 'other_host'})
+            return claim(context, session, claims, instance_uuid, host)
+
+        self.stubs.Set(sqlalchemy_api, '_fixed_ip_claim', fake_claim)
+        self.assertRaises(exception.NoMoreFixedIps,
+                          db.fixed_ip_associate_pool_multi,
+                          self.ctxt, [self.network['id'], other['id']],
+                          self.instance['uuid'])
+        fixed_ip = db.fixed_ip_get_by_address(self.ctxt, address)
+        self.assertEqual(fixed_ip['instance_uuid'], None)
+        self.assertEqual(fixed_ip['network_id'], None)
+
 
 class InstanceDestroyConstraints(test.TestCase):
 
@@ -2359,6 +2553,46 @@ class VirtualInterfaceTestCase(test.TestCase, ModelsObjectComparatorMixin):
         self._assertEqualListsOfObjects(vifs1, vifs1_real)
         self._assertEqualListsOfObjects(vifs2, vifs2_real)
 
+    def test_virtual_interface_get_by_instances(self):
+        inst_uuid2 = db.instance_create(self.ctxt, {})['uuid']
+        inst_uuid3 = db.instance_create(self.ctxt, {})['uuid']
+        vifs = [self._create_virt_interface({'address': 'fake1'}),
+                self._create_virt_interface({'address': 'fake2',
+                                             'instance_uuid': inst_uuid2})]
+        self._create_virt_interface({'address': 'fake3',
+                                     'instance_uuid': inst_uuid3})
+        vifs_real = db.virtual_interface_get_by_instances(self.ctxt,
+                [self.instance_uuid, inst_uuid2])
+        self._assertEqualListsOfObjects(vifs, vifs_real)
+        self.assertEqual([],
+                         db.virtual_interface_get_by_instances(self.ctxt, []))
+
+    def test_fixed_ips_by_virtual_interfaces(self):
+        vifs = [self._create_virt_interface({'address': 'fake1'}),
+                self._create_virt_interface({'address': 'fake2'}),
+                self._create_virt_interface({'address': 'fake3'})]
+        for i, vif in enumerate(vifs):
+            db.fixed_ip_create(self.ctxt,
+                               {'address': '192.168.0.%d' % i,
+                                'virtual_interface_id': vif['id']})
+        fixed_ip_id = db.fixed_ip_get_by_address(self.ctxt,
+                                                 '192.168.0.0')['id']
+        db.floating_ip_create(self.ctxt, {'address': '10.0.0.1',
+                                          'fixed_ip_id': fixed_ip_id})
+
+        fixed_ips = db.fixed_ips_by_virtual_interfaces(self.ctxt,
+                [vifs[0]['id'], vifs[1]['id']])
+        fixed_ips = dict((fixed_ip['address'], fixed_ip)
+                         for fixed_ip in fixed_ips)
+        self.assertEqual(['192.168.0.0', '192.168.0.1'],
+                         sorted(fixed_ips.keys()))
+        self.assertEqual(['10.0.0.1'],
+                         [floating_ip['address'] for floating_ip in
+                          fixed_ips['192.168.0.0']['floating_ips']])
+        self.assertEqual([], fixed_ips['192.168.0.1']['floating_ips'])
+        self.assertEqual([],
+                         db.fixed_ips_by_virtual_interfaces(self.ctxt, []))
+
     def test_virtual_interface_get_by_instance_and_network(self):
         inst_uuid2 = db.instance_create(self.ctxt, {})['uuid']
         values = {'host': 'localhost', 'project_id': 'project2'}
@@ -2595,3 +2829,57 @@ class ArchiveTestCase(test.TestCase):
         # Then archiving console_pools should work.
         num = db.archive_deleted_rows_for_table(self.context, "console_pools")
         self.assertEqual(num, 1)
+
+    def _create_deleted_mappings(self, num):
+        for uuidstr in self.uuidstrs:
+            insert_statement = self.table1.insert().values(uuid=uuidstr)
+            self.conn.execute(insert_statement)
+        update_statement = self.table1.update().\
+                where(self.table1.c.uuid.in_(self.uuidstrs[:num]))\
+                .values(deleted=1)
+        self.conn.execute(update_statement)
+
+    def test_archive_deleted_rows_for_table_in_batches(self):
+        self.flags(archive_deleted_rows_batch_size=3,
+                   archive_deleted_rows_batch_delay=0.5)
+        self._create_deleted_mappings(5)
+        sleeps = []
+        self.stubs.Set(sqlalchemy_api.time, 'sleep', sleeps.append)
+        num = db.archive_deleted_rows_for_table(self.context,
+                                                "instance_id_mappings")
+        self.assertEqual(num, 5)
+        # Two batches, throttled once.
+        self.assertEqual([0.5], sleeps)
+        query = select([self.shadow_table1]).\
+                where(self.shadow_table1.c.uuid.in_(self.uuidstrs))
+        self.assertEqual(len(self.conn.execute(query).fetchall()), 5)
+        query = select([self.table1]).\
+                where(self.table1.c.uuid.in_(self.uuidstrs))
+        self.assertEqual(len(self.conn.execute(query).fetchall()), 1)
+
+    def test_archive_deleted_rows_reports_tables(self):
+        self._create_deleted_mappings(2)
+        insert_statement = self.table2.insert().values(
+                domain=self.uuidstrs[0], deleted=1)
+        self.conn.execute(insert_statement)
+        rows_archived = db.archive_deleted_rows(self.context)
+        self.assertEqual(rows_archived.get("instance_id_mappings"), 2)
+        self.assertEqual(rows_archived.get("dns_domains"), 1)
+        self.assertEqual(db.archive_deleted_rows(self.context), {})
+
+    def test_archive_deleted_rows_dependent_tables_first(self):
+        dialect = self.engine.url.get_dialect()
+        if dialect == sqlite.dialect:
+            self.conn.execute("PRAGMA foreign_keys = ON")
+        insert_statement = self.console_pools.insert().values(deleted=1)
+        result = self.conn.execute(insert_statement)
+        id1 = result.inserted_primary_key[0]
+        self.ids.append(id1)
+        insert_statement = self.consoles.insert().values(deleted=1,
+                                                         pool_id=id1)
+        result = self.conn.execute(insert_statement)
+        id2 = result.inserted_primary_key[0]
+        self.ids.append(id2)
+        rows_archived = db.archive_deleted_rows(self.context)
+        self.assertEqual(rows_archived.get("consoles"), 1)
+        self.assertEqual(rows_archived.get("console_pools"), 1)
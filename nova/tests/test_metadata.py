@@ -36,6 +36,7 @@ import webob
 from nova.api.metadata import base
 from nova.api.metadata import handler
 from nova.api.metadata import password
+from nova.api.metadata import store
 from nova import block_device
 from nova.compute import instance_types
 from nova.conductor import api as conductor_api
@@ -568,6 +569,101 @@ class MetadataHandlerTestCase(test.TestCase):
         self.assertEqual(response.status_int, 500)
 
 
+class MetadataStoreTestCase(test.TestCase):
+    def setUp(self):
+        super(MetadataStoreTestCase, self).setUp()
+        self.store = store.MetadataStore()
+
+    def _put(self, name, instance_uuid, metadata):
+        version = self.store.get_version(instance_uuid)
+        self.store.put(name, instance_uuid, version, metadata)
+
+    def test_invalidate(self):
+        self._put('192.168.1.1', 'uuid1', 'md1')
+        self._put('uuid1', 'uuid1', 'md1')
+        self._put('192.168.1.2', 'uuid2', 'md2')
+        self.assertEqual('md1', self.store.get('192.168.1.1'))
+        self.assertEqual('md1', self.store.get('uuid1'))
+
+        self.store.invalidate('uuid1')
+        self.assertEqual(None, self.store.get('192.168.1.1'))
+        self.assertEqual(None, self.store.get('uuid1'))
+        self.assertEqual('md2', self.store.get('192.168.1.2'))
+
+    def test_evicted_version_invalidates(self):
+        self._put('192.168.1.1', 'uuid1', 'md1')
+        self.store._cache.delete(self.store._get_version_key('uuid1'))
+        self.assertEqual(None, self.store.get('192.168.1.1'))
+
+        self._put('192.168.1.1', 'uuid1', 'md1')
+        self.assertEqual('md1', self.store.get('192.168.1.1'))
+
+    def test_invalidated_during_build(self):
+        version = self.store.get_version('uuid1')
+        self.store.invalidate('uuid1')
+        self.store.put('192.168.1.1', 'uuid1', version, 'md1')
+        self.assertEqual(None, self.store.get('192.168.1.1'))
+
+    def test_invalidate_with_memcached(self):
+        self.flags(memcached_servers=['localhost:11211'])
+        self.stubs.Set(store, '_STORE', self.store)
+        self._put('192.168.1.1', 'uuid1', 'md1')
+
+        store.invalidate({'uuid': 'uuid1'})
+        self.assertEqual(None, self.store.get('192.168.1.1'))
+
+    def test_invalidate_without_memcached(self):
+        self.flags(memcached_servers=None)
+        self.stubs.Set(store, '_STORE', self.store)
+        self._put('192.168.1.1', 'uuid1', 'md1')
+
+        store.invalidate({'uuid': 'uuid1'})
+        self.assertEqual('md1', self.store.get('192.168.1.1'))
+
+    def _stub_build(self, instance, build=None):
+        calls = []
+
+        class FakeMD(object):
+            uuid = instance['uuid']
+
+        def fake_get_metadata_by_instance_id(capi, instance_id, address):
+            calls.append(address)
+            if build:
+                build()
+            return FakeMD()
+
+        self.stubs.Set(base, 'get_instance_uuid_by_address',
+                       lambda address: instance['uuid'])
+        self.stubs.Set(base, 'get_metadata_by_instance_id',
+                       fake_get_metadata_by_instance_id)
+        return calls
+
+    def test_handler_serves_from_store(self):
+        instance = INSTANCES[0]
+        calls = self._stub_build(instance)
+        md_handler = handler.MetadataRequestHandler()
+
+        md = md_handler.get_metadata_by_remote_address('192.168.1.1')
+        self.assertEqual(md, md_handler.get_metadata_by_remote_address(
+            '192.168.1.1'))
+        self.assertEqual(['192.168.1.1'], calls)
+
+        md_handler._store.invalidate(instance['uuid'])
+        md_handler.get_metadata_by_remote_address('192.168.1.1')
+        self.assertEqual(['192.168.1.1', '192.168.1.1'], calls)
+
+    def test_handler_invalidated_during_build(self):
+        instance = INSTANCES[0]
+        md_handler = handler.MetadataRequestHandler()
+        calls = self._stub_build(
+                instance,
+                lambda: md_handler._store.invalidate(instance['uuid']))
+
+        md_handler.get_metadata_by_remote_address('192.168.1.1')
+        md_handler.get_metadata_by_remote_address('192.168.1.1')
+        self.assertEqual(['192.168.1.1', '192.168.1.1'], calls)
+
+
 class MetadataPasswordTestCase(test.TestCase):
     def setUp(self):
         super(MetadataPasswordTestCase, self).setUp()
@@ -52,6 +52,7 @@ import uuid
 from migrate.versioning import repository
 import netaddr
 import sqlalchemy
+from sqlalchemy.dialects import mysql
 from sqlalchemy.dialects import postgresql
 from sqlalchemy.dialects import sqlite
 import sqlalchemy.exc
@@ -1106,6 +1107,120 @@ class TestNovaMigrations(BaseMigrationTestCase, CommonTestsMixIn):
                 self.assertEqual(result['value'], original['value'])
                 self.assertEqual(result['created_at'], None)
 
+    # migration 162, composite indexes for the hot instance, migration,
+    # fixed ip and bandwidth usage queries
+    def _pre_upgrade_162(self, engine):
+        # Enough rows for the planners to tell selective indexes from
+        # unselective ones once statistics are collected.
+        now = timeutils.utcnow().replace(microsecond=0)
+        instances = get_table(engine, 'instances')
+        migrations = get_table(engine, 'migrations')
+        fixed_ips = get_table(engine, 'fixed_ips')
+        bw_usage_cache = get_table(engine, 'bw_usage_cache')
+        for i in xrange(50):
+            engine.execute(instances.insert(),
+                           uuid='m162-uuid%d' % i, deleted=0,
+                           project_id='m162-project%d' % (i % 10),
+                           host='m162-host%d' % (i % 5),
+                           launched_at=now, terminated_at=None)
+            engine.execute(migrations.insert(),
+                           instance_uuid='m162-uuid%d' % i, deleted=0,
+                           source_compute='m162-host%d' % i,
+                           source_node='m162-node%d' % i,
+                           dest_compute='m162-host%d' % (i + 1),
+                           dest_node='m162-node%d' % (i + 1),
+                           status='confirmed')
+            engine.execute(fixed_ips.insert(),
+                           address='10.162.0.%d' % i, deleted=0,
+                           network_id=i % 5, reserved=False,
+                           instance_uuid='m162-uuid%d' % i if i % 2 else None,
+                           host=None, allocated=False, leased=False)
+            engine.execute(bw_usage_cache.insert(),
+                           uuid='m162-uuid%d' % i, mac='m162-mac%d' % i,
+                           start_period=now, deleted=0)
+
+    def _check_162(self, engine, data):
+        new_indexes = {
+            'instances':
+                ['instances_project_id_terminated_at_launched_at_idx'],
+            'migrations': ['migrations_by_source_host_node_and_status_idx',
+                           'migrations_by_dest_host_node_and_status_idx'],
+            'fixed_ips':
+                ['fixed_ips_network_id_reserved_instance_uuid_host_idx'],
+            'bw_usage_cache': ['bw_usage_cache_uuid_start_period_mac_idx'],
+            }
+        for table_name, index_names in new_indexes.items():
+            table = get_table(engine, table_name)
+            existing = [index.name for index in table.indexes]
+            for index_name in index_names:
+                self.assertTrue(index_name in existing)
+        table = get_table(engine, 'migrations')
+        self.assertFalse('migrations_by_host_nodes_and_status_idx' in
+                         [index.name for index in table.indexes])
+
+        # Query plan regression check of the queries the indexes are for,
+        # from: nova/db/sqlalchemy/api.py
+        plans = [
+            # instance_get_active_by_window_joined
+            ("SELECT * FROM instances WHERE project_id = 'm162-project1' "
+             "AND (terminated_at IS NULL OR terminated_at > '2013-01-01') "
+             "AND launched_at < '2038-01-01'",
+             ['instances_project_id_terminated_at_launched_at_idx']),
+            # migration_get_in_progress_by_host_and_node
+            ("SELECT * FROM migrations WHERE deleted = 0 AND "
+             "((source_compute = 'm162-host1' AND "
+             "source_node = 'm162-node1') OR "
+             "(dest_compute = 'm162-host1' AND dest_node = 'm162-node1')) "
+             "AND status NOT IN ('confirmed', 'reverted')",
+             ['migrations_by_source_host_node_and_status_idx',
+              'migrations_by_dest_host_node_and_status_idx']),
+            # fixed_ip_associate_pool
+            ("SELECT * FROM fixed_ips WHERE deleted = 0 AND "
+             "(network_id = 1 OR network_id IS NULL) AND reserved = 0 AND "
+             "instance_uuid IS NULL AND host IS NULL",
+             ['fixed_ips_network_id_reserved_instance_uuid_host_idx']),
+            # bw_usage_get and bw_usage_update
+            ("SELECT * FROM bw_usage_cache WHERE uuid = 'm162-uuid1' AND "
+             "mac = 'm162-mac1' AND start_period = '2013-01-01'",
+             ['bw_usage_cache_uuid_start_period_mac_idx']),
+            # bw_usage_get_by_uuids
+            ("SELECT * FROM bw_usage_cache WHERE "
+             "uuid IN ('m162-uuid1', 'm162-uuid2') AND "
+             "start_period = '2013-01-01'",
+             ['bw_usage_cache_uuid_start_period_mac_idx']),
+            ]
+        dialect = engine.url.get_dialect()
+        if dialect == sqlite.dialect:
+            engine.execute('ANALYZE')
+            for query, index_names in plans:
+                plan = ' '.join(row['detail'] for row in
+                                engine.execute('EXPLAIN QUERY PLAN ' + query))
+                for index_name in index_names:
+                    self.assertTrue(index_name in plan, plan)
+            # NOTE: the statistics table would be taken for a nova table by
+            #       the downgrade of migration 154.
+            engine.execute('DROP TABLE sqlite_stat1')
+        elif dialect == mysql.dialect:
+            engine.execute('ANALYZE TABLE instances, migrations, fixed_ips, '
+                           'bw_usage_cache')
+            for query, index_names in plans:
+                for row in engine.execute('EXPLAIN ' + query):
+                    for index_name in index_names:
+                        self.assertTrue(index_name in row['possible_keys'],
+                                        row['possible_keys'])
+
+    def _post_downgrade_162(self, engine):
+        table = get_table(engine, 'migrations')
+        existing = [index.name for index in table.indexes]
+        self.assertTrue('migrations_by_host_nodes_and_status_idx' in existing)
+        self.assertFalse('migrations_by_source_host_node_and_status_idx' in
+                         existing)
+        table = get_table(engine, 'bw_usage_cache')
+        existing = [index.name for index in table.indexes]
+        self.assertTrue('bw_usage_cache_uuid_start_period_idx' in existing)
+        self.assertFalse('bw_usage_cache_uuid_start_period_mac_idx' in
+                         existing)
+
 
 class TestBaremetalMigrations(BaseMigrationTestCase, CommonTestsMixIn):
     """Test sqlalchemy-migrate migrations."""
@@ -1154,3 +1269,15 @@ class TestBaremetalMigrations(BaseMigrationTestCase, CommonTestsMixIn):
     def _post_downgrade_004(self, engine):
         bm_nodes = get_table(engine, 'bm_nodes')
         self.assertNotIn(u'instance_name', [c.name for c in bm_nodes.columns])
+
+    def _check_005(self, engine, data):
+        bm_nodes = get_table(engine, 'bm_nodes')
+        columns = [c.name for c in bm_nodes.columns]
+        self.assertIn(u'deploy_progress', columns)
+        self.assertIn(u'deploy_throughput', columns)
+
+    def _post_downgrade_005(self, engine):
+        bm_nodes = get_table(engine, 'bm_nodes')
+        columns = [c.name for c in bm_nodes.columns]
+        self.assertNotIn(u'deploy_progress', columns)
+        self.assertNotIn(u'deploy_throughput', columns)
@@ -18,9 +18,12 @@
 """Tests for common notifcations."""
 
 import copy
+import datetime
 
+import mox
 from oslo.config import cfg
 
+from nova.api.metadata import store as metadata_store
 from nova.compute import instance_types
 from nova.compute import task_states
 from nova.compute import vm_states
@@ -174,6 +177,16 @@ class NotificationsTestCase(test.TestCase):
 
         self.assertEquals(0, len(test_notifier.NOTIFICATIONS))
 
+    def test_send_update_invalidates_metadata(self):
+        invalidated = []
+        self.stubs.Set(metadata_store, 'invalidate', invalidated.append)
+        self.flags(notify_on_state_change=None, notify_on_any_change=False)
+
+        notifications.send_update(self.context, self.instance, self.instance)
+
+        self.assertEqual([self.instance], invalidated)
+        self.assertEquals(0, len(test_notifier.NOTIFICATIONS))
+
     def test_send_on_vm_change(self):
 
         # pretend we just transitioned to ACTIVE:
@@ -276,6 +289,59 @@ class NotificationsTestCase(test.TestCase):
         notif = test_notifier.NOTIFICATIONS[0]
         self.assertEquals('compute.someotherhost', notif['publisher_id'])
 
+    def _send_update_bandwidth(self):
+        notifications.send_update_with_states(self.context, self.instance,
+                vm_states.BUILDING, vm_states.ACTIVE, task_states.SPAWNING,
+                None)
+        self.assertEquals(1, len(test_notifier.NOTIFICATIONS))
+        return test_notifier.NOTIFICATIONS[0]['payload']['bandwidth']
+
+    def _record_bandwidth(self, audit_start):
+        metadata = notifications.bandwidth_usage_system_metadata(audit_start,
+                {'test1': dict(bw_in=1, bw_out=2)})
+        db.instance_system_metadata_update(self.context,
+                self.instance['uuid'], metadata, False)
+        self.instance = db.instance_get_by_uuid(self.context,
+                                                self.instance['uuid'])
+
+    def test_update_bandwidth_from_system_metadata(self):
+        self._record_bandwidth(notifications.audit_period_bounds(True)[0])
+        self.mox.StubOutWithMock(db, 'bw_usage_get_by_uuids')
+        self.mox.ReplayAll()
+
+        self.assertEquals({'test1': dict(bw_in=1, bw_out=2)},
+                          self._send_update_bandwidth())
+
+    def test_update_bandwidth_stale_system_metadata(self):
+        self.flags(notify_bandwidth_usage_lookup=True)
+        self._record_bandwidth(datetime.datetime(2000, 1, 1))
+        self.mox.StubOutWithMock(db, 'bw_usage_get_by_uuids')
+        self.mox.ReplayAll()
+
+        self.assertEquals({}, self._send_update_bandwidth())
+
+    def test_update_bandwidth_no_lookup(self):
+        self.mox.StubOutWithMock(notifications, 'bandwidth_usage')
+        self.mox.ReplayAll()
+
+        self.assertEquals({}, self._send_update_bandwidth())
+
+    def test_update_bandwidth_lookup(self):
+        self.flags(notify_bandwidth_usage_lookup=True)
+        self.mox.StubOutWithMock(notifications, 'bandwidth_usage')
+        notifications.bandwidth_usage(mox.IgnoreArg(),
+                mox.IgnoreArg()).AndReturn({'test1': 'usage'})
+        self.mox.ReplayAll()
+
+        self.assertEquals({'test1': 'usage'}, self._send_update_bandwidth())
+
+    def test_network_labels(self):
+        labels = notifications.network_labels(
+                {'info_cache': {'network_info': self.net_info.json()}})
+        self.assertEquals(dict((vif['address'], vif['network']['label'])
+                               for vif in self.net_info), labels)
+        self.assertEquals({}, notifications.network_labels({}))
+
     def test_payload_has_fixed_ip_labels(self):
         info = notifications.info_from_instance(self.context, self.instance,
                                                   self.net_info, None)
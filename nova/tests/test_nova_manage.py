@@ -20,11 +20,14 @@ import os
 import StringIO
 import sys
 
+import mox
+
 from nova import context
 from nova import db
 from nova import exception
 from nova import test
 from nova.tests.db import fakes as db_fakes
+from nova import utils
 
 
 TOPDIR = os.path.normpath(os.path.join(
@@ -383,6 +386,22 @@ class DBCommandsTestCase(test.TestCase):
         self.assertRaises(SystemExit,
                           self.commands.archive_deleted_rows, -1)
 
+    def test_archive_deleted_rows_reports_tables(self):
+        self.mox.StubOutWithMock(db, 'archive_deleted_rows')
+        db.archive_deleted_rows(mox.IgnoreArg(), 10).AndReturn(
+                {'instances': 2, 'instance_faults': 5})
+        self.mox.ReplayAll()
+        output = StringIO.StringIO()
+        sys.stdout = output
+        try:
+            self.commands.archive_deleted_rows('10')
+        finally:
+            sys.stdout = sys.__stdout__
+        lines = output.getvalue().splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertEqual(['instance_faults', '5'], lines[0].split())
+        self.assertEqual(['instances', '2'], lines[1].split())
+
 
 class ServiceCommandsTestCase(test.TestCase):
     def setUp(self):
@@ -396,3 +415,30 @@ class ServiceCommandsTestCase(test.TestCase):
     def test_service_disable_invalid_params(self):
         self.assertRaises(SystemExit,
                           self.commands.disable, 'nohost', 'noservice')
+
+
+class TimingCommandsTestCase(test.TestCase):
+    def setUp(self):
+        super(TimingCommandsTestCase, self).setUp()
+        self.commands = nova_manage.TimingCommands()
+
+    def test_list(self):
+        histogram = utils.SpanHistogram()
+        histogram.add(0.2)
+        histogram.add(4)
+        self.stubs.Set(utils, 'load_span_histograms',
+                       lambda path: {'image_fetch': histogram})
+        output = StringIO.StringIO()
+        sys.stdout = output
+        try:
+            self.commands.list()
+        finally:
+            sys.stdout = sys.__stdout__
+        lines = output.getvalue().splitlines()
+        self.assertEqual(2, len(lines))
+        self.assertEqual(['image_fetch', '2', '2.10', '0.25', '4.00', '4.00',
+                          '4.00'], lines[1].split())
+
+    def test_list_missing_file(self):
+        self.assertRaises(SystemExit, self.commands.list,
+                          '/nonexistent/spans.json')
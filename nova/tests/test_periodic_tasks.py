@@ -17,6 +17,8 @@
 
 import time
 
+import eventlet
+from eventlet import event
 from testtools import matchers
 
 from nova import manager
@@ -122,3 +124,147 @@ class Manager(test.TestCase):
 
         m = Manager()
         self.assertEqual([], m._periodic_tasks)
+
+    def test_periodic_tasks_run_concurrently(self):
+        self.flags(periodic_task_workers=2)
+
+        class Manager(manager.Manager):
+            @manager.periodic_task
+            def foo(self, context):
+                eventlet.sleep(0.2)
+
+            @manager.periodic_task
+            def bar(self, context):
+                eventlet.sleep(0.2)
+
+        m = Manager()
+        start = time.time()
+        m.periodic_tasks(None)
+        self.assertThat(time.time() - start, matchers.LessThan(0.35))
+        stats = m.get_periodic_task_stats()
+        self.assertEqual(1, stats['foo']['runs'])
+        self.assertEqual(1, stats['bar']['runs'])
+
+    def test_periodic_tasks_in_series(self):
+        self.flags(periodic_task_workers=1)
+        calls = []
+
+        class Manager(manager.Manager):
+            @manager.periodic_task
+            def foo(self, context):
+                calls.append('foo start')
+                eventlet.sleep(0)
+                calls.append('foo end')
+
+            @manager.periodic_task
+            def bar(self, context):
+                calls.append('bar start')
+                eventlet.sleep(0)
+                calls.append('bar end')
+
+        m = Manager()
+        m.periodic_tasks(None)
+        self.assertEqual(4, len(calls))
+        for name in ('foo', 'bar'):
+            start = calls.index('%s start' % name)
+            self.assertEqual('%s end' % name, calls[start + 1])
+
+    def test_periodic_task_over_budget(self):
+        self.flags(periodic_task_workers=2)
+        done = event.Event()
+
+        class Manager(manager.Manager):
+            @manager.periodic_task(budget=0.1)
+            def foo(self, context):
+                done.wait()
+
+            @manager.periodic_task
+            def bar(self, context):
+                return 'bar'
+
+        m = Manager()
+        start = time.time()
+        m.periodic_tasks(None)
+        self.assertThat(time.time() - start, matchers.LessThan(1))
+        stats = m.get_periodic_task_stats()
+        self.assertFalse('foo' in stats)
+        self.assertEqual(1, stats['bar']['runs'])
+
+        # The previous run of foo is still in progress
+        m.periodic_tasks(None)
+        stats = m.get_periodic_task_stats()
+        self.assertEqual(1, stats['foo']['skips'])
+        self.assertEqual(2, stats['bar']['runs'])
+
+        done.send()
+        eventlet.sleep(0)
+        stats = m.get_periodic_task_stats()
+        self.assertEqual(1, stats['foo']['runs'])
+        self.assertEqual(1, stats['foo']['overruns'])
+        self.assertThat(stats['foo']['last_duration'],
+                        matchers.GreaterThan(0.1))
+
+    def test_periodic_task_error(self):
+        class Manager(manager.Manager):
+            @manager.periodic_task
+            def foo(self, context):
+                raise test.TestingException()
+
+        m = Manager()
+        m.periodic_tasks(None)
+        self.assertEqual(1, m.get_periodic_task_stats()['foo']['runs'])
+        self.assertRaises(test.TestingException, m.periodic_tasks, None,
+                          raise_on_error=True)
+
+    def test_periodic_task_deferred_when_workers_busy(self):
+        done = event.Event()
+
+        class Manager(manager.Manager):
+            @manager.periodic_task(budget=0.1)
+            def foo(self, context):
+                done.wait()
+
+            @manager.periodic_task
+            def bar(self, context):
+                return 'bar'
+
+        m = Manager()
+        m.periodic_tasks(None)
+        self.assertEqual(1, m.get_periodic_task_stats()['bar']['runs'])
+
+        # The only worker is still busy with foo
+        start = time.time()
+        m.periodic_tasks(None)
+        self.assertThat(time.time() - start, matchers.LessThan(1))
+        stats = m.get_periodic_task_stats()
+        self.assertEqual(1, stats['foo']['skips'])
+        self.assertEqual(1, stats['bar']['deferrals'])
+        self.assertEqual(1, stats['bar']['runs'])
+
+        done.send()
+        eventlet.sleep(0)
+        m.periodic_tasks(None)
+        self.assertEqual(2, m.get_periodic_task_stats()['bar']['runs'])
+
+    def test_periodic_task_error_logged_after_budget(self):
+        done = event.Event()
+        errors = []
+
+        class Manager(manager.Manager):
+            @manager.periodic_task(budget=0.1)
+            def foo(self, context):
+                done.wait()
+                raise test.TestingException()
+
+        self.stubs.Set(manager.LOG, 'error',
+                       lambda *args, **kwargs: errors.append(kwargs))
+        m = Manager()
+        m.periodic_tasks(None, raise_on_error=True)
+        self.assertEqual([], errors)
+
+        done.send()
+        eventlet.sleep(0)
+        eventlet.sleep(0)
+        self.assertEqual(1, len(errors))
+        self.assertEqual(test.TestingException,
+                         errors[0]['exc_info'][0])
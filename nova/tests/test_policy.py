@@ -21,9 +21,12 @@ import os.path
 import StringIO
 import urllib2
 
+import mox
+
 from nova import context
 from nova import exception
 from nova.openstack.common import policy as common_policy
+from nova.openstack.common import timeutils
 from nova import policy
 from nova import test
 from nova import utils
@@ -58,6 +61,33 @@ class PolicyFileTestCase(test.TestCase):
             self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
                               self.context, action, self.target)
 
+    def test_modified_policy_reloads_after_interval(self):
+        self.flags(policy_reload_interval=10)
+        with utils.tempdir() as tmpdir:
+            tmpfilename = os.path.join(tmpdir, 'policy')
+
+            self.flags(policy_file=tmpfilename)
+            policy.reset()
+
+            timeutils.set_time_override()
+            self.addCleanup(timeutils.clear_time_override)
+
+            action = "example:test"
+            with open(tmpfilename, "w") as policyfile:
+                policyfile.write('{"example:test": ""}')
+            policy.enforce(self.context, action, self.target)
+            with open(tmpfilename, "w") as policyfile:
+                policyfile.write('{"example:test": "!"}')
+            mtime = os.path.getmtime(tmpfilename)
+            os.utime(tmpfilename, (mtime + 1, mtime + 1))
+
+            # The file isn't looked at again until the interval passes.
+            timeutils.advance_time_seconds(5)
+            policy.enforce(self.context, action, self.target)
+            timeutils.advance_time_seconds(6)
+            self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                              self.context, action, self.target)
+
 
 class PolicyTestCase(test.TestCase):
     def setUp(self):
@@ -147,6 +177,98 @@ class PolicyTestCase(test.TestCase):
         policy.enforce(admin_context, uppercase_action, self.target)
 
 
+class CompiledPolicyTestCase(test.TestCase):
+    def setUp(self):
+        super(CompiledPolicyTestCase, self).setUp()
+        rules = {
+            "admin": "role:admin",
+            "owner": "project_id:%(project_id)s",
+            "admin_or_owner": "rule:admin or rule:owner",
+            "example:nested": "rule:admin_or_owner",
+            "example:not_missing": "not rule:missing",
+            "example:not_bad_target": "not rule:owner",
+            "example:loop": "rule:example:loop or @",
+            "example:get_http": "http://www.example.com",
+        }
+        self.policy.set_rules(rules)
+        self.context = context.RequestContext('fake', 'fake', roles=['member'])
+
+    def test_nested_rules(self):
+        policy.enforce(self.context, "example:nested",
+                       {'project_id': 'fake'})
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, "example:nested",
+                          {'project_id': 'other'})
+        admin_context = context.RequestContext('fake', 'fake',
+                                               roles=['Admin'])
+        policy.enforce(admin_context, "example:nested",
+                       {'project_id': 'other'})
+
+    def test_missing_rule_reference_fails_closed(self):
+        policy.enforce(self.context, "example:not_missing", {})
+
+    def test_rule_reference_with_bad_target_fails_closed(self):
+        # "owner" can't be evaluated without a project_id in the target
+        policy.enforce(self.context, "example:not_bad_target", {})
+
+    def test_self_referencing_rule_compiles(self):
+        # Compiling must not recurse forever; the loop is left to the
+        # original RuleCheck.
+        self.assertTrue(callable(policy._compile_rule("example:loop")))
+
+    def test_rules_compiled_once(self):
+        self.mox.StubOutWithMock(policy, '_compile_check')
+        policy._compile_check(mox.IgnoreArg(), mox.IgnoreArg(),
+                              set(["example:nested"])).AndReturn(
+                                      lambda target, creds: True)
+        self.mox.ReplayAll()
+        policy.enforce(self.context, "example:nested",
+                       {'project_id': 'fake'})
+        policy.enforce(self.context, "example:nested",
+                       {'project_id': 'other'})
+
+    def test_decisions_cached_per_context(self):
+        call_info = {'count': 0}
+
+        def fakeurlopen(url, post_data):
+            call_info['count'] += 1
+            return StringIO.StringIO("True")
+        self.stubs.Set(urllib2, 'urlopen', fakeurlopen)
+
+        action = "example:get_http"
+        policy.enforce(self.context, action, {'project_id': 'fake'})
+        policy.enforce(self.context, action, {'project_id': 'fake'})
+        self.assertEqual(call_info['count'], 1)
+
+        # A different target is a different decision
+        policy.enforce(self.context, action, {'project_id': 'other'})
+        self.assertEqual(call_info['count'], 2)
+
+        # So is another context
+        other_context = context.RequestContext('fake', 'fake')
+        policy.enforce(other_context, action, {'project_id': 'fake'})
+        self.assertEqual(call_info['count'], 3)
+
+        # Targets that can't be hashed are not cached
+        policy.enforce(self.context, action, {'project_id': ['fake']})
+        policy.enforce(self.context, action, {'project_id': ['fake']})
+        self.assertEqual(call_info['count'], 5)
+
+    def test_decisions_dropped_when_credentials_change(self):
+        target = {'project_id': 'other'}
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, "example:nested", target)
+        self.context.roles.append('admin')
+        policy.enforce(self.context, "example:nested", target)
+
+    def test_decisions_dropped_when_rules_change(self):
+        target = {'project_id': 'fake'}
+        policy.enforce(self.context, "example:nested", target)
+        self.policy.set_rules({"example:nested": "!"})
+        self.assertRaises(exception.PolicyNotAuthorized, policy.enforce,
+                          self.context, "example:nested", target)
+
+
 class DefaultPolicyTestCase(test.TestCase):
 
     def setUp(self):
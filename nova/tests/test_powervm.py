@@ -22,6 +22,7 @@ import contextlib
 
 from nova import context
 from nova import db
+from nova import exception as nova_exception
 from nova import test
 
 from nova.compute import instance_types
@@ -29,6 +30,7 @@ from nova.compute import power_state
 from nova.compute import task_states
 from nova.network import model as network_model
 from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
 from nova.tests import fake_network_cache_model
 from nova.tests.image import fake
 from nova.virt import images
@@ -54,6 +56,16 @@ class FakeIVMOperator(object):
     def get_lpar(self, instance_name, resource_type='lpar'):
         return fake_lpar(instance_name)
 
+    def get_cached_lpar(self, instance_name):
+        return self.get_lpar(instance_name)
+
+    def get_lpars(self, refresh=False):
+        return dict((name, fake_lpar(name))
+                    for name in self.list_lpar_instances())
+
+    def invalidate_lpars(self):
+        pass
+
     def list_lpar_instances(self):
         return ['instance-00000001', 'instance-00000002']
 
@@ -101,6 +113,12 @@ class FakeIVMOperator(object):
     def get_hostname(self):
         return 'fake-powervm'
 
+    def get_host_info(self):
+        return {'memory': self.get_memory_info(),
+                'cpu': self.get_cpu_info(),
+                'disk': self.get_disk_info(),
+                'hostname': self.get_hostname()}
+
     def rename_lpar(self, old, new):
         pass
 
@@ -491,3 +509,133 @@ class PowerVMDriverTestCase(test.TestCase):
         self.assertEquals(host_stats['supported_instances'][0][0], "ppc64")
         self.assertEquals(host_stats['supported_instances'][0][1], "powervm")
         self.assertEquals(host_stats['supported_instances'][0][2], "hvm")
+
+
+class IVMOperatorTestCase(test.TestCase):
+    """Unit tests for the IVM operator."""
+
+    def setUp(self):
+        super(IVMOperatorTestCase, self).setUp()
+        self.ivm_operator = operator.IVMOperator(
+                common.Connection('fake_host', 'fake_user', 'fake_pass'))
+        self.commands = []
+        self.output = []
+        self.stubs.Set(self.ivm_operator, 'run_vios_command',
+                       self._fake_run_vios_command)
+
+    def _fake_run_vios_command(self, cmd, check_exit_code=True):
+        self.commands.append(cmd)
+        return self.output.pop(0)
+
+    def _separated(self, *outputs, **kwargs):
+        exit_codes = kwargs.get('exit_codes', [0] * len(outputs))
+        lines = []
+        for output, exit_code in zip(outputs, exit_codes):
+            lines.extend(output)
+            lines.append('%s %d' % (operator.OUTPUT_SEPARATOR, exit_code))
+        return lines
+
+    def test_run_vios_commands(self):
+        self.output = [self._separated(['a', 'b'], [], ['c'])]
+        outputs = self.ivm_operator.run_vios_commands(['cmd1', 'cmd2',
+                                                       'cmd3'])
+        self.assertEqual([['a', 'b'], [], ['c']], outputs)
+        self.assertEqual(['cmd1; echo %(sep)s $?; cmd2; echo %(sep)s $?; '
+                          'cmd3; echo %(sep)s $?' %
+                          {'sep': operator.OUTPUT_SEPARATOR}], self.commands)
+
+    def test_run_vios_commands_checks_every_exit_code(self):
+        self.output = [self._separated(['a'], ['b'], ['c'],
+                                       exit_codes=[0, 1, 0])]
+        exc = self.assertRaises(nova_exception.ProcessExecutionError,
+                                self.ivm_operator.run_vios_commands,
+                                ['cmd1', 'cmd2', 'cmd3'])
+        self.assertEqual(1, exc.exit_code)
+        self.assertEqual('cmd2', exc.cmd)
+
+    def test_run_vios_commands_without_check_exit_code(self):
+        self.output = [self._separated(['a'], ['b'], exit_codes=[1, 0])]
+        outputs = self.ivm_operator.run_vios_commands(['cmd1', 'cmd2'],
+                                                      check_exit_code=False)
+        self.assertEqual([['a'], ['b']], outputs)
+
+    def test_run_vios_commands_interrupted(self):
+        self.output = [['a', '%s 0' % operator.OUTPUT_SEPARATOR, 'b']]
+        self.assertRaises(nova_exception.ProcessExecutionError,
+                          self.ivm_operator.run_vios_commands,
+                          ['cmd1', 'cmd2'])
+
+    def test_get_lpars(self):
+        self.output = [self._separated(
+                ['1,Running,939395,instance-00000001',
+                 '2,Not Activated,0,instance,00000002'],
+                ['1024,2048,2,instance-00000001',
+                 '512,1024,1,instance,00000002'])]
+        lpars = self.ivm_operator.get_lpars()
+
+        self.assertEqual(1, len(self.commands))
+        self.assertEqual(['instance,00000002', 'instance-00000001'],
+                         sorted(lpars.keys()))
+        lpar = lpars['instance-00000001']
+        self.assertEqual('Running', lpar['state'])
+        self.assertEqual('939395', lpar['uptime'])
+        self.assertEqual('2048', lpar['max_mem'])
+        self.assertEqual('2', lpar['max_procs'])
+        self.assertEqual('Not Activated',
+                         lpars['instance,00000002']['state'])
+
+        # served from the snapshot
+        self.assertEqual(lpar,
+                self.ivm_operator.get_cached_lpar('instance-00000001'))
+        self.assertEqual(1, len(self.commands))
+
+    def test_get_lpars_cache_expires(self):
+        self.flags(powervm_lpar_cache_ttl=5)
+        snapshot = self._separated(['1,Running,1,instance-00000001'], [])
+        self.output = [snapshot, snapshot]
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+
+        self.ivm_operator.get_lpars()
+        self.ivm_operator.get_lpars()
+        self.assertEqual(1, len(self.commands))
+        timeutils.advance_time_seconds(6)
+        self.ivm_operator.get_lpars()
+        self.assertEqual(2, len(self.commands))
+
+    def test_get_cached_lpar_miss_refreshes(self):
+        self.output = [self._separated(['1,Running,1,instance-00000001'], []),
+                       self._separated(['1,Running,1,instance-00000001',
+                                        '2,Running,1,instance-00000002'], [])]
+        self.ivm_operator.get_lpars()
+        lpar = self.ivm_operator.get_cached_lpar('instance-00000002')
+        self.assertEqual('2', lpar['lpar_id'])
+        self.assertEqual(2, len(self.commands))
+
+    def test_start_lpar_invalidates_lpars(self):
+        snapshot = self._separated(['1,Running,1,instance-00000001'], [])
+        self.output = [snapshot, [], snapshot]
+        self.ivm_operator.get_lpars()
+        self.ivm_operator.start_lpar('instance-00000001')
+        self.ivm_operator.get_lpars()
+        self.assertEqual(3, len(self.commands))
+
+    def test_get_host_info(self):
+        self.output = [
+            self._separated(['65536,46336'], ['8.0,6.3'],
+                            ['rootvg', 'datavg'], ['fake-powervm']),
+            self._separated(
+                ['1271 (10168 megabytes):0 (0 megabytes):'
+                 '1271 (10168 megabytes)'],
+                ['100 (800 megabytes):50 (400 megabytes):'
+                 '50 (400 megabytes)'])]
+        host_info = self.ivm_operator.get_host_info()
+
+        self.assertEqual(2, len(self.commands))
+        self.assertEqual({'total_mem': 65536, 'avail_mem': 46336},
+                         host_info['memory'])
+        self.assertEqual({'total_procs': 8.0, 'avail_procs': 6.3},
+                         host_info['cpu'])
+        self.assertEqual({'disk_total': 10968, 'disk_used': 400,
+                          'disk_avail': 10568}, host_info['disk'])
+        self.assertEqual('fake-powervm', host_info['hostname'])
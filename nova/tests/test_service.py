@@ -25,6 +25,7 @@ import sys
 import mox
 from oslo.config import cfg
 
+from nova import async_notifier
 from nova import context
 from nova import db
 from nova import exception
@@ -171,6 +172,20 @@ class ServiceTestCase(test.TestCase):
                                'nova.tests.test_service.FakeManager')
         serv.start()
 
+    def test_stop_cleans_up_host_and_flushes_notifications(self):
+        serv = service.Service(self.host,
+                               self.binary,
+                               self.topic,
+                               'nova.tests.test_service.FakeManager')
+        serv.conn = self.mox.CreateMockAnything()
+        serv.conn.close()
+        self.mox.StubOutWithMock(serv.manager, 'cleanup_host')
+        serv.manager.cleanup_host()
+        self.mox.StubOutWithMock(async_notifier, 'flush')
+        async_notifier.flush(timeout=CONF.async_notification_flush_timeout)
+        self.mox.ReplayAll()
+        serv.stop()
+
 
 class TestWSGIService(test.TestCase):
 
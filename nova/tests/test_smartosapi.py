@@ -0,0 +1,350 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+
+"""
+Test suite for the SmartOS driver.
+"""
+
+import os
+import stat
+
+from eventlet import greenthread
+import fixtures
+
+from nova.compute import power_state
+from nova import exception
+from nova.image import glance
+from nova.openstack.common import timeutils
+from nova import test
+from nova import utils
+from nova.virt.smartosapi import driver as smartos_driver
+from nova.virt.smartosapi import hostinfo
+from nova.virt.smartosapi import inventory
+from nova.virt.smartosapi import kvm_driver
+from nova.virt.smartosapi import kvm_image
+
+VMADM_LIST_OUTPUT = """\
+9d9a8a0e-1b77-4de4-9f0a-3ad0a3a4a1c1:joyent:running:512::instance-00000001
+2cdd2f3d-0b76-4a8d-8f6e-6cbd4e27d6b2:kvm:stopped:1024:2:instance-00000002
+7f0c3b84-52d8-4e2f-a1f3-7ac10d0e8f2e:kvm:provisioning:256:1:
+"""
+
+SYSINFO_OUTPUT = """\
+{
+  "Live Image": "20130419T073558Z",
+  "System Type": "SunOS",
+  "Boot Time": "1366874519",
+  "Manufacturer": "Dell Inc.",
+  "Product": "PowerEdge R710",
+  "Hostname": "smartos01",
+  "CPU Type": "Intel(R) Xeon(R) CPU E5620 @ 2.40GHz",
+  "CPU Virtualization": "vmx",
+  "CPU Physical Cores": 2,
+  "UUID": "44454c4c-3900-1039-804e-b7c04f593253",
+  "CPU Total Cores": 16,
+  "MiB of Memory": "49139",
+  "Zpool": "zones",
+  "Zpool Size in GiB": 1816
+}
+"""
+
+ZPOOL_LIST_OUTPUT = "zones\t1992864825344\t107374182400\t1885490642944\n"
+
+UUID1 = '9d9a8a0e-1b77-4de4-9f0a-3ad0a3a4a1c1'
+UUID2 = '2cdd2f3d-0b76-4a8d-8f6e-6cbd4e27d6b2'
+UUID3 = '7f0c3b84-52d8-4e2f-a1f3-7ac10d0e8f2e'
+
+
+class SmartOSInventoryTestCase(test.TestCase):
+    """Test the vmadm inventory using a fake vmadm executable."""
+
+    def setUp(self):
+        super(SmartOSInventoryTestCase, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.calls_file = os.path.join(self.tmpdir, 'calls')
+        self.list_file = os.path.join(self.tmpdir, 'list')
+        vmadm = os.path.join(self.tmpdir, 'vmadm')
+        with open(vmadm, 'w') as f:
+            f.write('#!/bin/sh\n'
+                    'echo "$@" >> %s\n'
+                    'if [ "$1" = "list" ]; then cat %s; fi\n' %
+                    (self.calls_file, self.list_file))
+        os.chmod(vmadm, stat.S_IRWXU)
+        self._set_vmadm_list(VMADM_LIST_OUTPUT)
+        self.flags(smartos_vmadm_path=vmadm)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self.conn = smartos_driver.SmartOSDriver(None)
+
+    def _set_vmadm_list(self, output):
+        with open(self.list_file, 'w') as f:
+            f.write(output)
+
+    def _get_vmadm_calls(self):
+        if not os.path.exists(self.calls_file):
+            return []
+        with open(self.calls_file) as f:
+            return f.read().splitlines()
+
+    def test_parse_vmadm_list(self):
+        vms = inventory.parse_vmadm_list(VMADM_LIST_OUTPUT + "bogus\n")
+        self.assertEqual(set([UUID1, UUID2, UUID3]), set(vms.keys()))
+        self.assertEqual('joyent', vms[UUID1]['brand'])
+        self.assertEqual(512, vms[UUID1]['ram'])
+        self.assertEqual(0, vms[UUID1]['vcpus'])
+        self.assertEqual(power_state.RUNNING, vms[UUID1]['power_state'])
+        self.assertEqual(power_state.SHUTDOWN, vms[UUID2]['power_state'])
+        self.assertEqual(power_state.NOSTATE, vms[UUID3]['power_state'])
+        self.assertEqual('', vms[UUID3]['alias'])
+
+    def test_list_instances(self):
+        self.assertEqual(
+                set(['instance-00000001', 'instance-00000002', UUID3]),
+                set(self.conn.list_instances()))
+        self.assertEqual(set([UUID1, UUID2, UUID3]),
+                         set(self.conn.list_instance_uuids()))
+        self.assertEqual(3, self.conn.get_num_instances())
+
+    def test_instance_exists(self):
+        self.assertTrue(self.conn.instance_exists('instance-00000002'))
+        self.assertTrue(self.conn.instance_exists(UUID1))
+        self.assertFalse(self.conn.instance_exists('instance-00000009'))
+
+    def test_get_info(self):
+        info = self.conn.get_info({'uuid': UUID2})
+        self.assertEqual(power_state.SHUTDOWN, info['state'])
+        self.assertEqual(1024 * 1024, info['max_mem'])
+        self.assertEqual(2, info['num_cpu'])
+        self.assertRaises(exception.InstanceNotFound, self.conn.get_info,
+                          {'uuid': 'missing'})
+
+    def test_snapshot_shared_until_ttl_expires(self):
+        self.flags(smartos_inventory_cache_ttl=10)
+        self.conn.list_instances()
+        self.conn.get_info({'uuid': UUID1})
+        self.conn.get_num_instances()
+        self.conn.instance_exists(UUID2)
+        self.assertEqual(1, len(self._get_vmadm_calls()))
+
+        self._set_vmadm_list(VMADM_LIST_OUTPUT.splitlines()[0] + "\n")
+        timeutils.advance_time_seconds(11)
+        self.assertEqual(1, self.conn.get_num_instances())
+        self.assertEqual(2, len(self._get_vmadm_calls()))
+
+    def test_destroy_invalidates_snapshot(self):
+        zfs_calls = []
+        real_execute = utils.execute
+
+        def fake_execute(*cmd, **kwargs):
+            if cmd[0] == 'zfs':
+                zfs_calls.append(cmd)
+                return '', ''
+            return real_execute(*cmd, **kwargs)
+
+        self.stubs.Set(utils, 'execute', fake_execute)
+        self.conn.destroy({'uuid': UUID2}, None)
+        # Unknown guests are not deleted
+        self.conn.destroy({'uuid': 'missing'}, None)
+        self.assertEqual(['list -p -o uuid,brand,state,ram,vcpus,alias',
+                          'delete %s' % UUID2,
+                          'list -p -o uuid,brand,state,ram,vcpus,alias'],
+                         self._get_vmadm_calls())
+        self.assertEqual([('zfs', 'destroy', 'zones/%s-disk0' % UUID2)],
+                         zfs_calls)
+
+
+class FakeImageService(object):
+    def __init__(self, data):
+        self.data = data
+
+    def download(self, context, image_id, data=None):
+        data.write(self.data)
+
+
+class SmartOSKVMImageTestCase(test.TestCase):
+    """Test fetching, caching and cloning of KVM images."""
+
+    def setUp(self):
+        super(SmartOSKVMImageTestCase, self).setUp()
+        self.tmpdir = self.useFixture(fixtures.TempDir()).path
+        self.image_uuid = 'd1a6b2a8-1e39-4a48-8a8a-86b4e0e6e5c9'
+        self.image = kvm_image.KVMImage('fake-context', self.image_uuid,
+                                        1024 * 1024, 'fake-user',
+                                        'fake-project', disk_format='raw')
+        self.zvol = os.path.join(self.tmpdir, 'zvol')
+        self.stubs.Set(self.image, 'zvol_device', lambda: self.zvol)
+        self.stubs.Set(self.image, 'write_manifest_file', lambda f: None)
+        self.commands = []
+
+        def fake_execute(*cmd, **kwargs):
+            self.commands.append(cmd)
+            return '', ''
+
+        self.stubs.Set(utils, 'execute', fake_execute)
+
+    def test_fetch_raw_image_streams_into_zvol(self):
+        self.stubs.Set(glance, 'get_remote_image_service',
+                lambda context, href: (FakeImageService('imagedata'), href))
+        self.image.fetch_image()
+        with open(self.zvol) as f:
+            self.assertEqual('imagedata', f.read())
+        zvol_name = 'zones/%s' % self.image_uuid
+        self.assertEqual([('zfs', 'create', '-V', '2M', zvol_name),
+                          ('zfs', 'snapshot', '%s@dataset' % zvol_name)],
+                         self.commands)
+
+    def test_fetch_failure_destroys_zvol(self):
+        class FailingImageService(object):
+            def download(self, context, image_id, data=None):
+                raise exception.ImageNotFound(image_id=image_id)
+
+        self.stubs.Set(glance, 'get_remote_image_service',
+                lambda context, href: (FailingImageService(), href))
+        self.assertRaises(exception.ImageNotFound, self.image.fetch_image)
+        self.assertEqual(('zfs', 'destroy', '-r',
+                          'zones/%s' % self.image_uuid), self.commands[-1])
+
+    def test_concurrent_spawns_fetch_once(self):
+        call_info = {'fetched': 0}
+
+        def fake_fetch_image():
+            greenthread.sleep(0)
+            call_info['fetched'] += 1
+
+        self.stubs.Set(self.image, 'check_image_exists_locally',
+                lambda: call_info['fetched'] > 0)
+        self.stubs.Set(self.image, 'fetch_image', fake_fetch_image)
+        threads = [greenthread.spawn(self.image.ensure_created)
+                   for i in xrange(3)]
+        for thread in threads:
+            thread.wait()
+        self.assertEqual(1, call_info['fetched'])
+
+    def test_boot_clones_image_snapshot(self):
+        instance = {'uuid': UUID2, 'name': 'instance-00000002',
+                    'memory_mb': 1024, 'vcpus': 2}
+        nics = {'ips': [{'ip': '10.0.0.2', 'netmask': '255.255.255.0',
+                         'gateway': '10.0.0.1'}]}
+        driver = kvm_driver.KVMDriver(instance, self.image, nics)
+        driver.boot()
+        self.assertEqual(('zfs', 'clone',
+                          'zones/%s@dataset' % self.image_uuid,
+                          'zones/%s-disk0' % UUID2), self.commands[0])
+        self.assertEqual('create', self.commands[1][1])
+        disk = driver.startinfo()['disks'][0]
+        self.assertEqual('/dev/zvol/rdsk/zones/%s-disk0' % UUID2,
+                         disk['path'])
+        self.assertTrue(disk['nocreate'])
+
+    def test_boot_failure_destroys_clone(self):
+        instance = {'uuid': UUID2, 'name': 'instance-00000002',
+                    'memory_mb': 1024, 'vcpus': 2}
+        nics = {'ips': [{'ip': '10.0.0.2', 'netmask': '255.255.255.0',
+                         'gateway': '10.0.0.1'}]}
+
+        def fake_execute(*cmd, **kwargs):
+            self.commands.append(cmd)
+            if cmd[1] == 'create':
+                raise exception.ProcessExecutionError(exit_code=1)
+            return '', ''
+
+        self.stubs.Set(utils, 'execute', fake_execute)
+        driver = kvm_driver.KVMDriver(instance, self.image, nics)
+        self.assertRaises(exception.ProcessExecutionError, driver.boot)
+        self.assertEqual(('zfs', 'destroy', 'zones/%s-disk0' % UUID2),
+                         self.commands[-1])
+
+    def _fail_zfs_destroy(self, stderr):
+        def fake_execute(*cmd, **kwargs):
+            raise exception.ProcessExecutionError(exit_code=1, stderr=stderr)
+
+        self.stubs.Set(utils, 'execute', fake_execute)
+
+    def test_destroy_instance_disk_ignores_missing_dataset(self):
+        self._fail_zfs_destroy("cannot open 'zones/%s-disk0': "
+                               "dataset does not exist" % UUID2)
+        kvm_image.destroy_instance_disk(UUID2)
+
+    def test_destroy_instance_disk_raises_other_errors(self):
+        self._fail_zfs_destroy("cannot destroy 'zones/%s-disk0': "
+                               "dataset is busy" % UUID2)
+        self.assertRaises(exception.ProcessExecutionError,
+                          kvm_image.destroy_instance_disk, UUID2)
+
+
+class SmartOSHostResourcesTestCase(test.TestCase):
+    """Test the collection of host resources."""
+
+    def setUp(self):
+        super(SmartOSHostResourcesTestCase, self).setUp()
+        self.commands = []
+
+        def fake_execute(*cmd, **kwargs):
+            self.commands.append(cmd[0])
+            if cmd[0] == 'sysinfo':
+                return SYSINFO_OUTPUT, ''
+            if cmd[0] == 'zpool':
+                return ZPOOL_LIST_OUTPUT, ''
+            return VMADM_LIST_OUTPUT, ''
+
+        self.stubs.Set(utils, 'execute', fake_execute)
+
+    def test_parse_sysinfo(self):
+        info = hostinfo.parse_sysinfo(SYSINFO_OUTPUT)
+        self.assertEqual(16, info['vcpus'])
+        self.assertEqual(49139, info['memory_mb'])
+        self.assertEqual('smartos01', info['hostname'])
+        cpu_info = info['cpu_info']
+        self.assertEqual('Intel', cpu_info['vendor'])
+        self.assertEqual({'sockets': 2, 'cores': 8, 'threads': 1},
+                         cpu_info['topology'])
+        self.assertEqual(['vmx'], cpu_info['features'])
+
+    def test_parse_zpool_list(self):
+        pools = hostinfo.parse_zpool_list(ZPOOL_LIST_OUTPUT + "bogus\n")
+        self.assertEqual(['zones'], pools.keys())
+        self.assertEqual(1992864825344, pools['zones']['size'])
+        self.assertEqual(107374182400, pools['zones']['allocated'])
+        self.assertEqual(1885490642944, pools['zones']['free'])
+
+    def test_get_available_resource(self):
+        conn = smartos_driver.SmartOSDriver(None)
+        resources = conn.get_available_resource(None)
+        self.assertEqual(['sysinfo', 'zpool', 'vmadm'],
+                         self.commands)
+        self.assertEqual(16, resources['vcpus'])
+        self.assertEqual(3, resources['vcpus_used'])
+        self.assertEqual(49139, resources['memory_mb'])
+        self.assertEqual(512 + 1024 + 256, resources['memory_mb_used'])
+        self.assertEqual(1856, resources['local_gb'])
+        self.assertEqual(100, resources['local_gb_used'])
+        self.assertEqual(1756, resources['disk_available_least'])
+
+    def test_host_stats_use_last_collection(self):
+        conn = smartos_driver.SmartOSDriver(None)
+        stats = conn.get_host_stats()
+        self.assertEqual(3, len(self.commands))
+        self.assertEqual(49139 - 1792, stats['host_memory_free'])
+        self.assertEqual(1756, stats['disk_available'])
+        conn.get_host_stats()
+        self.assertEqual(3, len(self.commands))
+        conn.get_available_resource(None)
+        conn.get_host_stats()
+        self.assertEqual(6, len(self.commands))
+        conn.get_host_stats(refresh=True)
+        self.assertEqual(9, len(self.commands))
@@ -958,3 +958,71 @@ class StringLengthTestCase(test.TestCase):
         self.assertRaises(exception.InvalidInput,
                           utils.check_string_length,
                           'a' * 256, 'name', max_length=255)
+
+
+class SpanTestCase(test.TestCase):
+    def setUp(self):
+        super(SpanTestCase, self).setUp()
+        utils.reset_span_histograms()
+        self.addCleanup(utils.reset_span_histograms)
+        self.now = 100.0
+        self.stubs.Set(utils.time, 'time', lambda: self.now)
+
+    def _span(self, name, seconds):
+        with utils.span(name):
+            self.now += seconds
+
+    def test_span_records_histogram(self):
+        self._span('fetch', 0.2)
+        self._span('fetch', 3)
+        histogram = utils.get_span_histograms()['fetch']
+        self.assertEqual(2, histogram.count)
+        self.assertAlmostEqual(3.2, histogram.total)
+        self.assertEqual(3, histogram.maximum)
+        self.assertEqual(0.25, histogram.percentile(50))
+        self.assertEqual(3, histogram.percentile(99))
+
+    def test_span_records_on_error(self):
+        def fail():
+            with utils.span('fail'):
+                raise test.TestingException()
+        self.assertRaises(test.TestingException, fail)
+        self.assertEqual(1, utils.get_span_histograms()['fail'].count)
+
+    def test_percentile_of_overflow_bucket(self):
+        histogram = utils.SpanHistogram()
+        histogram.add(1000)
+        self.assertEqual(1000, histogram.percentile(50))
+
+    def test_collect_spans(self):
+        self._span('outside', 1)
+        with utils.collect_spans() as spans:
+            self._span('fetch', 1)
+            self._span('fetch', 0.5)
+            self._span('spawn', 2)
+        self._span('outside', 1)
+        self.assertEqual({'fetch': 1.5, 'spawn': 2}, spans.to_dict())
+        self.assertEqual(3, utils.get_span_histograms()['fetch'].count +
+                            utils.get_span_histograms()['spawn'].count)
+
+    def test_save_and_load_span_histograms(self):
+        self._span('fetch', 0.2)
+        self._span('fetch', 30)
+        with utils.tempdir() as tmpdir:
+            path = os.path.join(tmpdir, 'spans.json')
+            self.flags(span_histograms_path=path)
+            utils.save_span_histograms()
+            histograms = utils.load_span_histograms(path)
+        saved = utils.get_span_histograms()['fetch']
+        self.assertEqual(['fetch'], histograms.keys())
+        self.assertEqual(saved.counts, histograms['fetch'].counts)
+        self.assertEqual(saved.total, histograms['fetch'].total)
+        self.assertEqual(saved.maximum, histograms['fetch'].maximum)
+
+    def test_span_histograms_changed(self):
+        self.assertFalse(utils.span_histograms_changed())
+        self._span('fetch', 0.2)
+        self.assertTrue(utils.span_histograms_changed())
+        with utils.tempdir() as tmpdir:
+            utils.save_span_histograms(os.path.join(tmpdir, 'spans.json'))
+        self.assertFalse(utils.span_histograms_changed())
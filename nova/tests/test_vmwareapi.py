@@ -25,6 +25,7 @@ from nova.compute import task_states
 from nova import context
 from nova import db
 from nova import exception
+from nova.openstack.common import timeutils
 from nova import test
 import nova.tests.image.fake
 from nova.tests import matchers
@@ -298,6 +299,77 @@ class VMwareAPIVMTestCase(test.TestCase):
         self.assertEquals(self.conn.destroy(self.instance, self.network_info),
                           None)
 
+    def test_inventory_cache_avoids_round_trips(self):
+        self._create_vm()
+        vmwareapi_fake.reset_call_counts()
+        for i in range(3):
+            self.conn.get_info({'name': 1})
+            self.conn.list_instances()
+        self.assertEquals(
+            vmwareapi_fake.get_call_count("RetrieveProperties"), 0)
+
+    def test_inventory_cache_expires(self):
+        self.flags(vmwareapi_inventory_cache_ttl=10)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        self._create_vm()
+        vmwareapi_fake.reset_call_counts()
+        self.conn.get_info({'name': 1})
+        self.assertEquals(
+            vmwareapi_fake.get_call_count("RetrieveProperties"), 0)
+        timeutils.advance_time_seconds(11)
+        self.conn.get_info({'name': 1})
+        self.conn.get_info({'name': 1})
+        self.assertEquals(
+            vmwareapi_fake.get_call_count("RetrieveProperties"), 1)
+
+    def test_inventory_cache_disabled(self):
+        self.flags(vmwareapi_inventory_cache_ttl=0)
+        self._create_vm()
+        vmwareapi_fake.reset_call_counts()
+        self.conn.get_info({'name': 1})
+        self.conn.get_info({'name': 1})
+        self.assertEquals(
+            vmwareapi_fake.get_call_count("RetrieveProperties"), 2)
+
+    def test_inventory_cache_invalidated_on_power_off(self):
+        self._create_vm()
+        self.conn.power_off(self.instance)
+        info = self.conn.get_info({'name': 1})
+        self._check_vm_info(info, power_state.SHUTDOWN)
+
+    def test_inventory_cache_invalidated_on_failed_task(self):
+        self._create_vm()
+        self.conn.get_info({'name': 1})
+        inventory = self.conn._vmops._inventory
+
+        def fake_wait_for_task(instance_uuid, task_ref):
+            raise exception.NovaException('task failed')
+
+        self.stubs.Set(self.conn._session, '_wait_for_task',
+                       fake_wait_for_task)
+        self.assertRaises(exception.NovaException,
+                          self.conn.power_off, self.instance)
+        self.assertTrue(inventory._is_stale())
+
+    def test_inventory_cache_expires_datacenter_and_res_pool(self):
+        self.flags(vmwareapi_inventory_cache_ttl=10)
+        timeutils.set_time_override()
+        self.addCleanup(timeutils.clear_time_override)
+        inventory = self.conn._vmops._inventory
+        dc_ref = inventory.get_datacenter_ref_and_name()[0]
+        res_pool_ref = inventory.get_res_pool_ref()
+        vmwareapi_fake.reset_call_counts()
+        inventory.get_datacenter_ref_and_name()
+        inventory.get_res_pool_ref()
+        self.assertEquals(
+            vmwareapi_fake.get_call_count("RetrieveProperties"), 0)
+        timeutils.advance_time_seconds(11)
+        self.assertEquals(inventory.get_datacenter_ref_and_name()[0], dc_ref)
+        self.assertEquals(inventory.get_res_pool_ref(), res_pool_ref)
+        self.assertEquals(
+            vmwareapi_fake.get_call_count("RetrieveProperties"), 2)
+
     def test_pause(self):
         pass
 
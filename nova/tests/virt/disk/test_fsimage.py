@@ -0,0 +1,180 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""Tests for the in-process ISO9660 and VFAT image writers."""
+
+import StringIO
+import struct
+
+from nova import exception
+from nova import test
+from nova.virt.disk import fsimage
+
+FILES = [('openstack/latest/meta_data.json', '{"uuid": "fake"}'),
+         ('openstack/latest/user_data', 'x' * 5000),
+         ('openstack/content/0000', ''),
+         ('ec2/2009-04-04/meta-data.json', '{}'),
+         (u'a file with a rather long name \xe9.txt', u'caf\xe9')]
+
+EXPECTED = {'openstack/latest/meta_data.json': '{"uuid": "fake"}',
+            'openstack/latest/user_data': 'x' * 5000,
+            'openstack/content/0000': '',
+            'ec2/2009-04-04/meta-data.json': '{}',
+            u'a file with a rather long name \xe9.txt': 'caf\xc3\xa9'}
+
+
+def _read_joliet(image):
+    """Return a dict of path to data of the Joliet tree of an image."""
+    block = fsimage.ISO_BLOCK_SIZE
+    svd = image[17 * block:18 * block]
+    assert svd[:6] == '\x02CD001'
+    contents = {}
+
+    def read_dir(record, prefix):
+        extent, size = struct.unpack('<I4xI', record[2:14])
+        data = image[extent * block:extent * block + size]
+        offset = 0
+        while offset < len(data):
+            length = ord(data[offset])
+            if not length:
+                offset = (offset // block + 1) * block
+                continue
+            entry = data[offset:offset + length]
+            name_length = ord(entry[32])
+            name = entry[33:33 + name_length]
+            offset += length
+            if name in ('\x00', '\x01'):
+                continue
+            name = prefix + name.decode('utf-16-be')
+            if ord(entry[25]) & 2:
+                read_dir(entry, name + '/')
+            else:
+                start, length = struct.unpack('<I4xI', entry[2:14])
+                contents[name] = image[start * block:start * block + length]
+
+    read_dir(svd[156:190], u'')
+    return contents
+
+
+def _read_vfat(image):
+    """Return the label and a dict of path to data of a FAT16 image."""
+    (sector_size, sectors_per_cluster, reserved, fat_count, root_entries,
+     fat_sectors) = struct.unpack('<HBHBH3xH', image[11:24])
+    cluster_size = sector_size * sectors_per_cluster
+    fat_start = reserved * sector_size
+    root_start = fat_start + fat_count * fat_sectors * sector_size
+    data_start = root_start + root_entries * 32
+
+    def read_chain(cluster):
+        data = ''
+        while 2 <= cluster < 0xfff8:
+            offset = data_start + (cluster - 2) * cluster_size
+            data += image[offset:offset + cluster_size]
+            cluster = struct.unpack('<H', image[fat_start + cluster * 2:
+                                                fat_start + cluster * 2 +
+                                                2])[0]
+        return data
+
+    contents = {}
+    labels = []
+
+    def read_dir(data, prefix):
+        long_name = []
+        for offset in xrange(0, len(data), 32):
+            entry = data[offset:offset + 32]
+            if entry[0] == '\x00':
+                break
+            attr = ord(entry[11])
+            if attr == fsimage.FAT_ATTR_LONG_NAME:
+                part = entry[1:11] + entry[14:26] + entry[28:32]
+                long_name.insert(0, part.decode('utf-16-le'))
+                continue
+            name = u''.join(long_name).split(u'\x00')[0]
+            long_name = []
+            if attr & fsimage.FAT_ATTR_VOLUME_ID:
+                labels.append(entry[:11])
+                continue
+            if entry[:2] in ('. ', '..'):
+                continue
+            cluster, size = struct.unpack('<HI', entry[26:32])
+            if attr & fsimage.FAT_ATTR_DIRECTORY:
+                read_dir(read_chain(cluster), prefix + name + u'/')
+            else:
+                contents[prefix + name] = read_chain(cluster)[:size]
+
+    read_dir(image[root_start:data_start], u'')
+    return labels[0], contents
+
+
+class IsoWriterTestCase(test.TestCase):
+    def _write(self, files):
+        f = StringIO.StringIO()
+        fsimage.write_iso9660(f, files, u'config-2', publisher='publisher')
+        return f.getvalue()
+
+    def test_write_iso9660(self):
+        image = self._write(FILES)
+        self.assertEqual(len(image) % fsimage.ISO_BLOCK_SIZE, 0)
+        pvd = image[16 * fsimage.ISO_BLOCK_SIZE:]
+        self.assertEqual(pvd[:6], '\x01CD001')
+        self.assertEqual(pvd[40:72].rstrip(), 'config-2')
+        self.assertEqual(pvd[318:446].rstrip(), 'publisher')
+        volume_size = struct.unpack('<I', pvd[80:84])[0]
+        self.assertEqual(volume_size * fsimage.ISO_BLOCK_SIZE, len(image))
+        self.assertEqual(_read_joliet(image), EXPECTED)
+
+    def test_directory_spanning_blocks(self):
+        files = [('dir/file-with-a-long-name-%03d' % i, str(i))
+                 for i in xrange(200)]
+        self.assertEqual(_read_joliet(self._write(files)), dict(files))
+
+    def test_invalid_path(self):
+        self.assertRaises(exception.InvalidInput, self._write,
+                          [('a/../b', 'data')])
+        self.assertRaises(exception.InvalidInput, self._write,
+                          [('a', 'data'), ('a/b', 'data')])
+
+
+class VfatWriterTestCase(test.TestCase):
+    def _write(self, files, size=64 * 1024 * 1024):
+        f = StringIO.StringIO()
+        fsimage.write_vfat(f, files, 'config-2', size)
+        return f.getvalue()
+
+    def test_write_vfat(self):
+        image = self._write(FILES)
+        self.assertEqual(len(image), 64 * 1024 * 1024)
+        self.assertEqual(image[510:512], '\x55\xaa')
+        self.assertEqual(image[54:62], 'FAT16   ')
+        self.assertEqual(_read_vfat(image), ('config-2   ', EXPECTED))
+
+    def test_directory_spanning_clusters(self):
+        files = [('dir/file-with-a-long-name-%03d' % i, str(i))
+                 for i in xrange(200)]
+        self.assertEqual(_read_vfat(self._write(files))[1], dict(files))
+
+    def test_short_names_are_unique(self):
+        used = set()
+        names = [fsimage._fat_short_name(u'meta_data.json', used)
+                 for i in xrange(12)]
+        self.assertEqual(len(set(names)), 12)
+        self.assertEqual(names[0], 'META_D~1JSO')
+        self.assertEqual(names[9], 'META_~10JSO')
+
+    def test_files_too_large(self):
+        self.assertRaises(exception.InvalidInput, self._write,
+                          [('big', 'x' * 5 * 1024 * 1024)], 4 * 1024 * 1024)
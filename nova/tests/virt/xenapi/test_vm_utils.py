@@ -67,6 +67,7 @@ class GenerateConfigDriveTestCase(test.TestCase):
                 'nova.api.metadata.base.InstanceMetadata',
                 FakeInstanceMetadata))
 
+        self.flags(config_drive_build_in_process=False)
         self.mox.StubOutWithMock(utils, 'execute')
         utils.execute('genisoimage', '-o', mox.IgnoreArg(), '-ldots',
                       '-allow-lowercase', '-allow-multidot', '-l',
@@ -38,6 +38,7 @@ import tempfile
 import time
 from xml.sax import saxutils
 
+from eventlet import corolocal
 from eventlet import event
 from eventlet.green import subprocess
 from eventlet import greenthread
@@ -48,9 +49,11 @@ from oslo.config import cfg
 from nova import exception
 from nova.openstack.common import excutils
 from nova.openstack.common import importutils
+from nova.openstack.common import jsonutils
 from nova.openstack.common import log as logging
 from nova.openstack.common.rpc import common as rpc_common
 from nova.openstack.common import timeutils
+from nova import paths
 
 notify_decorator = 'nova.openstack.common.notifier.api.notify_decorator'
 
@@ -83,6 +86,12 @@ utils_opts = [
     cfg.StrOpt('tempdir',
                default=None,
                help='Explicitly specify the temporary working directory'),
+    cfg.StrOpt('span_histograms_path',
+               default=paths.state_path_def('span_histograms.json'),
+               help='File the histograms of the durations of the spans '
+                    'recorded by a service are saved to, every '
+                    'span_histograms_save_interval seconds and when the '
+                    'service stops'),
 ]
 CONF = cfg.CONF
 CONF.register_opts(monkey_patch_opts)
@@ -1014,6 +1023,170 @@ def timefunc(func):
     return inner
 
 
+# Upper bounds in seconds of the buckets of the span duration histograms
+SPAN_HISTOGRAM_BUCKETS = (0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120, 300,
+                          600)
+
+_SPAN_HISTOGRAMS = {}
+# Whether spans were recorded since the histograms were last saved
+_SPAN_HISTOGRAMS_CHANGED = [False]
+_SPAN_COLLECTOR = corolocal.local()
+
+
+class SpanHistogram(object):
+    """Distribution of the durations of a span, in SPAN_HISTOGRAM_BUCKETS.
+
+    Durations longer than the last bucket are counted in an extra one.
+    """
+
+    def __init__(self, counts=None, total=0.0, maximum=0.0):
+        self.counts = counts or [0] * (len(SPAN_HISTOGRAM_BUCKETS) + 1)
+        self.total = total
+        self.maximum = maximum
+
+    @property
+    def count(self):
+        return sum(self.counts)
+
+    def add(self, seconds):
+        for index, bound in enumerate(SPAN_HISTOGRAM_BUCKETS):
+            if seconds <= bound:
+                break
+        else:
+            index = len(SPAN_HISTOGRAM_BUCKETS)
+        self.counts[index] += 1
+        self.total += seconds
+        self.maximum = max(self.maximum, seconds)
+
+    def percentile(self, percent):
+        """Return the upper bound of the bucket of the given percentile.
+
+        The maximum duration is returned for the overflow bucket.
+        """
+        rank = self.count * percent / 100.0
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= rank:
+                if index < len(SPAN_HISTOGRAM_BUCKETS):
+                    return min(SPAN_HISTOGRAM_BUCKETS[index], self.maximum)
+                break
+        return self.maximum
+
+    def to_primitive(self):
+        return {'counts': self.counts, 'total': self.total,
+                'maximum': self.maximum}
+
+    @classmethod
+    def from_primitive(cls, primitive):
+        return cls(list(primitive['counts']), primitive['total'],
+                   primitive['maximum'])
+
+
+class SpanCollector(object):
+    """Durations of the spans recorded while the collector is active.
+
+    See collect_spans().
+    """
+
+    def __init__(self):
+        self.spans = []
+
+    def add(self, name, seconds):
+        self.spans.append((name, seconds))
+
+    def to_dict(self):
+        """Return the total seconds spent in each span, by name."""
+        totals = {}
+        for name, seconds in self.spans:
+            totals[name] = round(totals.get(name, 0) + seconds, 3)
+        return totals
+
+
+@contextlib.contextmanager
+def collect_spans():
+    """Collect the spans recorded by the current greenthread.
+
+    Yields a SpanCollector. This is meant to time the stages of one
+    operation, e.g. the spawn of an instance, which may go through several
+    layers of code that only need to call span().
+    """
+    collector = SpanCollector()
+    previous = getattr(_SPAN_COLLECTOR, 'collector', None)
+    _SPAN_COLLECTOR.collector = collector
+    try:
+        yield collector
+    finally:
+        _SPAN_COLLECTOR.collector = previous
+
+
+def record_span(name, seconds):
+    """Record that a span called name lasted the given seconds.
+
+    The duration is added to the histogram of the span and to the active
+    SpanCollector of the greenthread, if any.
+    """
+    if name not in _SPAN_HISTOGRAMS:
+        _SPAN_HISTOGRAMS[name] = SpanHistogram()
+    _SPAN_HISTOGRAMS[name].add(seconds)
+    _SPAN_HISTOGRAMS_CHANGED[0] = True
+    collector = getattr(_SPAN_COLLECTOR, 'collector', None)
+    if collector is not None:
+        collector.add(name, seconds)
+
+
+@contextlib.contextmanager
+def span(name):
+    """Time the enclosed block of code as a span called name."""
+    start_time = time.time()
+    try:
+        yield
+    finally:
+        record_span(name, time.time() - start_time)
+
+
+def get_span_histograms():
+    """Return the histograms of the spans recorded so far, by name."""
+    return dict(_SPAN_HISTOGRAMS)
+
+
+def reset_span_histograms():
+    _SPAN_HISTOGRAMS.clear()
+    _SPAN_HISTOGRAMS_CHANGED[0] = False
+
+
+def span_histograms_changed():
+    """Return whether spans were recorded since the last save."""
+    return _SPAN_HISTOGRAMS_CHANGED[0]
+
+
+def save_span_histograms(path=None):
+    """Save the histograms of the spans recorded so far to a file.
+
+    The file is replaced atomically, so that readers never see a partial
+    one. Defaults to span_histograms_path.
+    """
+    path = path or CONF.span_histograms_path
+    data = dict((name, histogram.to_primitive())
+                for name, histogram in _SPAN_HISTOGRAMS.iteritems())
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path))
+    with remove_path_on_error(tmp_path):
+        with os.fdopen(fd, 'w') as f:
+            f.write(jsonutils.dumps({'buckets': SPAN_HISTOGRAM_BUCKETS,
+                                     'histograms': data}))
+        os.rename(tmp_path, path)
+    _SPAN_HISTOGRAMS_CHANGED[0] = False
+
+
+def load_span_histograms(path=None):
+    """Return the histograms saved by save_span_histograms(), by name."""
+    path = path or CONF.span_histograms_path
+    with open(path) as f:
+        data = jsonutils.loads(f.read())
+    return dict((name, SpanHistogram.from_primitive(primitive))
+                for name, primitive in data['histograms'].iteritems())
+
+
 @contextlib.contextmanager
 def remove_path_on_error(path):
     """Protect code that wants to operate on PATH atomically.
@@ -53,6 +53,8 @@ class BareMetalNode(BASE, models.NovaBase):
     image_path = Column(String(255), nullable=True)
     pxe_config_path = Column(String(255), nullable=True)
     deploy_key = Column(String(255), nullable=True)
+    deploy_progress = Column(Integer)
+    deploy_throughput = Column(Integer)
     root_mb = Column(Integer)
     swap_mb = Column(Integer)
 
@@ -418,6 +418,19 @@ class BareMetalDriver(driver.ComputeDriver):
             pass
         return resource
 
+    def get_available_resources(self, nodenames):
+        context = nova_context.get_admin_context()
+        nodes = db.bm_node_get_all(context, service_host=CONF.host)
+        nodes = dict((str(node['uuid']), node) for node in nodes)
+        resources = {}
+        for nodename in nodenames:
+            node = nodes.get(nodename)
+            if node is None:
+                resources[nodename] = {}
+            else:
+                resources[nodename] = self._node_resource(node)
+        return resources
+
     def ensure_filtering_rules_for_instance(self, instance_ref, network_info):
         self.firewall_driver.setup_basic_filtering(instance_ref, network_info)
         self.firewall_driver.prepare_instance_filter(instance_ref,
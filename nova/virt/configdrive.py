@@ -17,17 +17,22 @@
 
 """Config Drive v2 helper."""
 
+import errno
+import hashlib
 import os
 import shutil
 import tempfile
+import time
 
 from oslo.config import cfg
 
 from nova import exception
 from nova.openstack.common import fileutils
 from nova.openstack.common import log as logging
+from nova import paths
 from nova import utils
 from nova import version
+from nova.virt.disk import fsimage
 
 LOG = logging.getLogger(__name__)
 
@@ -48,7 +53,22 @@ configdrive_opts = [
     cfg.StrOpt('mkisofs_cmd',
                default='genisoimage',
                help='Name and optionally path of the tool used for '
-                    'ISO image creation')
+                    'ISO image creation'),
+    cfg.BoolOpt('config_drive_build_in_process',
+                default=True,
+                help='Build config drive images in-process rather than with '
+                     'mkisofs_cmd, or with mkfs.vfat and a loop mount'),
+    cfg.StrOpt('config_drive_cache_dir',
+               default=paths.state_path_def('config_drives'),
+               help='Where to keep recently built config drive images, to '
+                    'reuse them for identical config drives'),
+    cfg.IntOpt('config_drive_cache_age',
+               default=0,
+               help='Number of seconds an unused config drive image is kept '
+                    'for reuse. The images hold the admin password and user '
+                    'data of instances, and stay on the host for that long '
+                    'after the instances are gone. Set to 0 to disable '
+                    'config drive reuse.'),
     ]
 
 CONF = cfg.CONF
@@ -63,12 +83,8 @@ class ConfigDriveBuilder(object):
 
     def __init__(self, instance_md=None):
         self.imagefile = None
-
-        # TODO(mikal): I don't think I can use utils.tempdir here, because
-        # I need to have the directory last longer than the scope of this
-        # method call
-        self.tempdir = tempfile.mkdtemp(dir=CONF.config_drive_tempdir,
-                                        prefix='cd_gen_')
+        self.tempdir = None
+        self.files = []
 
         if instance_md is not None:
             self.add_instance_metadata(instance_md)
@@ -85,11 +101,23 @@ class ConfigDriveBuilder(object):
         self.cleanup()
 
     def _add_file(self, path, data):
-        filepath = os.path.join(self.tempdir, path)
-        dirname = os.path.dirname(filepath)
-        fileutils.ensure_tree(dirname)
-        with open(filepath, 'w') as f:
-            f.write(data)
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+        self.files.append((path, data))
+
+    def _write_tempdir(self):
+        """Lay the files out in a directory for the external tools."""
+        # TODO(mikal): I don't think I can use utils.tempdir here, because
+        # I need to have the directory last longer than the scope of this
+        # method call
+        self.tempdir = tempfile.mkdtemp(dir=CONF.config_drive_tempdir,
+                                        prefix='cd_gen_')
+        for path, data in self.files:
+            filepath = os.path.join(self.tempdir, path)
+            dirname = os.path.dirname(filepath)
+            fileutils.ensure_tree(dirname)
+            with open(filepath, 'w') as f:
+                f.write(data)
 
     def add_instance_metadata(self, instance_md):
         for (path, value) in instance_md.metadata_for_config_drive():
@@ -97,12 +125,26 @@ class ConfigDriveBuilder(object):
             LOG.debug(_('Added %(filepath)s to config drive'),
                       {'filepath': path})
 
-    def _make_iso9660(self, path):
-        publisher = "%(product)s %(version)s" % {
+    def _publisher(self):
+        return "%(product)s %(version)s" % {
             'product': version.product_string(),
             'version': version.version_string_with_package()
             }
 
+    def _write_iso9660(self, path):
+        with open(path, 'wb') as f:
+            fsimage.write_iso9660(f, self.files, 'config-2',
+                                  publisher=self._publisher())
+
+    def _write_vfat(self, path):
+        with open(path, 'wb') as f:
+            fsimage.write_vfat(f, self.files, 'config-2',
+                               CONFIGDRIVESIZE_BYTES)
+
+    def _make_iso9660(self, path):
+        publisher = self._publisher()
+        self._write_tempdir()
+
         utils.execute(CONF.mkisofs_cmd,
                       '-o', path,
                       '-ldots',
@@ -120,6 +162,8 @@ class ConfigDriveBuilder(object):
                       run_as_root=False)
 
     def _make_vfat(self, path):
+        self._write_tempdir()
+
         # NOTE(mikal): This is a little horrible, but I couldn't find an
         # equivalent to genisoimage for vfat filesystems.
         with open(path, 'w') as f:
@@ -160,21 +204,104 @@ class ConfigDriveBuilder(object):
         :raises ProcessExecuteError if a helper process has failed.
         """
         if CONF.config_drive_format == 'iso9660':
-            self._make_iso9660(path)
+            if CONF.config_drive_build_in_process:
+                make = self._write_iso9660
+            else:
+                make = self._make_iso9660
         elif CONF.config_drive_format == 'vfat':
-            self._make_vfat(path)
+            if CONF.config_drive_build_in_process:
+                make = self._write_vfat
+            else:
+                make = self._make_vfat
         else:
             raise exception.ConfigDriveUnknownFormat(
                 format=CONF.config_drive_format)
 
+        cached_path = self._cached_image_path()
+        if cached_path is not None and _fetch_cached_image(cached_path, path):
+            return
+        make(path)
+        if cached_path is not None:
+            _cache_image(path, cached_path)
+
+    def _cached_image_path(self):
+        """Return where an identical config drive image would be cached.
+
+        Images are cached under a hash of their format and contents, so
+        that rebuilding or rescheduling an instance with unchanged metadata
+        does not build its config drive again.
+        """
+        if CONF.config_drive_cache_age <= 0:
+            return None
+        digest = hashlib.sha256()
+        digest.update('%s %s\n' % (CONF.config_drive_format,
+                                    CONF.config_drive_build_in_process))
+        for path, data in sorted(self.files):
+            if isinstance(path, unicode):
+                path = path.encode('utf-8')
+            digest.update('%d %s %d\n' % (len(path), path, len(data)))
+            digest.update(data)
+        return os.path.join(CONF.config_drive_cache_dir,
+                            '%s.%s' % (digest.hexdigest(),
+                                       CONF.config_drive_format))
+
     def cleanup(self):
         if self.imagefile:
             utils.delete_if_exists(self.imagefile)
 
+        if self.tempdir:
+            try:
+                shutil.rmtree(self.tempdir)
+            except OSError, e:
+                LOG.error(_('Could not remove tmpdir: %s'), str(e))
+
+
+def _fetch_cached_image(cached_path, path):
+    try:
+        shutil.copyfile(cached_path, path)
+    except IOError, e:
+        if e.errno != errno.ENOENT:
+            LOG.warn(_('Could not reuse config drive %(cached_path)s: '
+                       '%(error)s'), {'cached_path': cached_path, 'error': e})
+        return False
+    # Keep the image around for as long as it is being reused
+    os.utime(cached_path, None)
+    LOG.debug(_('Reused config drive %s'), cached_path)
+    return True
+
+
+def _cache_image(path, cached_path):
+    cache_dir = os.path.dirname(cached_path)
+    try:
+        # The images hold the user data and admin password of instances
         try:
-            shutil.rmtree(self.tempdir)
+            os.makedirs(cache_dir, 0700)
         except OSError, e:
-            LOG.error(_('Could not remove tmpdir: %s'), str(e))
+            if e.errno != errno.EEXIST:
+                raise
+        os.chmod(cache_dir, 0700)
+        _expire_cached_images(cache_dir)
+        fd, tmp_path = tempfile.mkstemp(dir=cache_dir, prefix='.cd_')
+        os.close(fd)
+        os.chmod(tmp_path, 0600)
+        shutil.copyfile(path, tmp_path)
+        os.rename(tmp_path, cached_path)
+    except (IOError, OSError), e:
+        LOG.warn(_('Could not cache config drive %(cached_path)s: '
+                   '%(error)s'), {'cached_path': cached_path, 'error': e})
+
+
+def _expire_cached_images(cache_dir):
+    """Remove the cached images unused for config_drive_cache_age."""
+    expired = time.time() - CONF.config_drive_cache_age
+    for name in os.listdir(cache_dir):
+        cached_path = os.path.join(cache_dir, name)
+        try:
+            if os.path.getmtime(cached_path) < expired:
+                os.unlink(cached_path)
+        except OSError:
+            # Removed by another builder
+            pass
 
 
 def required_by(instance):
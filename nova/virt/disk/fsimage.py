@@ -0,0 +1,500 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+# All Rights Reserved.
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Writers for small ISO9660 and VFAT filesystem images.
+
+The images are laid out in memory from a list of (path, data) pairs and
+written out front to back in a single pass, so that no staging directory,
+external mkisofs/mkfs tool or loop mount is needed. They are meant for
+config drives: a handful of small files, read-only, without permissions or
+ownership.
+
+ISO9660 images carry a Joliet tree next to the primary tree, which keeps
+the file names case and lets them be longer than 8.3. VFAT images are
+FAT16 filesystems with long file names.
+"""
+
+import struct
+import uuid
+
+from nova import exception
+from nova.openstack.common import timeutils
+
+ISO_BLOCK_SIZE = 2048
+# Sectors 0 to 15 are the system area, followed by the primary and the
+# Joliet volume descriptors and the descriptor set terminator.
+ISO_FIRST_FREE_BLOCK = 19
+
+FAT_SECTOR_SIZE = 512
+FAT_RESERVED_SECTORS = 1
+FAT_COUNT = 2
+FAT_ROOT_ENTRIES = 512
+FAT_DIR_ENTRY_SIZE = 32
+FAT16_MIN_CLUSTERS = 4085
+FAT16_MAX_CLUSTERS = 65524
+FAT_ATTR_VOLUME_ID = 0x08
+FAT_ATTR_DIRECTORY = 0x10
+FAT_ATTR_ARCHIVE = 0x20
+FAT_ATTR_LONG_NAME = 0x0f
+FAT_SHORT_NAME_CHARS = "$%'-_@~`!(){}^#&"
+
+
+class _Node(object):
+    """A file or a directory of the image being built."""
+
+    def __init__(self, name, parent=None, data=None):
+        self.name = name
+        self.parent = parent or self
+        self.data = data
+        self.children = None if data is not None else {}
+        # Where the node is stored, per tree for ISO9660 directories
+        self.location = {}
+        self.size = {}
+
+    @property
+    def is_dir(self):
+        return self.children is not None
+
+
+def _make_tree(files):
+    """Turn (path, data) pairs into a tree of _Nodes."""
+    root = _Node(u'')
+    for path, data in files:
+        if isinstance(path, str):
+            path = path.decode('utf-8')
+        if isinstance(data, unicode):
+            data = data.encode('utf-8')
+        parts = [part for part in path.split(u'/') if part]
+        if not parts or u'.' in parts or u'..' in parts:
+            raise exception.InvalidInput(
+                    reason=_('Invalid image file path %s') % path)
+        node = root
+        for part in parts[:-1]:
+            node = node.children.setdefault(part, _Node(part, node))
+            if not node.is_dir:
+                raise exception.InvalidInput(
+                        reason=_('Invalid image file path %s') % path)
+        node.children[parts[-1]] = _Node(parts[-1], node, data)
+    return root
+
+
+def _walk_dirs(root):
+    """Return the directories of the tree, breadth first."""
+    dirs = [root]
+    for node in dirs:
+        dirs.extend(child for name, child in sorted(node.children.items())
+                    if child.is_dir)
+    return dirs
+
+
+def _walk_files(root):
+    files = []
+    for node in _walk_dirs(root):
+        files.extend(child for name, child in sorted(node.children.items())
+                     if not child.is_dir)
+    return files
+
+
+def _blocks(size, block_size):
+    return (size + block_size - 1) // block_size
+
+
+def _iso_both16(value):
+    return struct.pack('<H', value) + struct.pack('>H', value)
+
+
+def _iso_both32(value):
+    return struct.pack('<I', value) + struct.pack('>I', value)
+
+
+def _iso_primary_name(node):
+    name = node.name.encode('ascii', 'replace')
+    if not node.is_dir:
+        name += ';1'
+    return name
+
+
+def _iso_joliet_name(node):
+    return node.name[:64].encode('utf-16-be')
+
+
+def _iso_primary_field(value, length):
+    return value.encode('ascii', 'replace')[:length].ljust(length)
+
+
+def _iso_joliet_field(value, length):
+    field = value[:length // 2].encode('utf-16-be')
+    field += u' '.encode('utf-16-be') * ((length - len(field)) // 2)
+    return field.ljust(length, '\x00')
+
+
+class _IsoTree(object):
+    """One directory hierarchy of an ISO9660 image.
+
+    Both trees of the image share the file extents but have their own path
+    tables and directories.
+    """
+
+    def __init__(self, key, root, encode_name, encode_field):
+        self.key = key
+        self.dirs = _walk_dirs(root)
+        self.encode_name = encode_name
+        self.encode_field = encode_field
+        for node in self.dirs:
+            node.size[key] = len(self._directory(node, None))
+        self.path_table_size = len(self._path_table(False))
+
+    def _entries(self, node):
+        return sorted((self.encode_name(child), child)
+                      for child in node.children.values())
+
+    def _record(self, identifier, node, timestamp):
+        if node.is_dir:
+            location = node.location.get(self.key, 0)
+            size = node.size.get(self.key, 0)
+            flags = 2
+        else:
+            location = node.location.get('data', 0)
+            size = len(node.data)
+            flags = 0
+        if timestamp is None:
+            timestamp = '\x00' * 7
+        pad = '\x00' if len(identifier) % 2 == 0 else ''
+        length = 33 + len(identifier) + len(pad)
+        return (struct.pack('<BB', length, 0) +
+                _iso_both32(location) + _iso_both32(size) + timestamp +
+                struct.pack('<BBB', flags, 0, 0) + _iso_both16(1) +
+                struct.pack('<B', len(identifier)) + identifier + pad)
+
+    def _directory(self, node, timestamp):
+        records = [self._record('\x00', node, timestamp),
+                   self._record('\x01', node.parent, timestamp)]
+        for identifier, child in self._entries(node):
+            records.append(self._record(identifier, child, timestamp))
+
+        # Records may not cross block boundaries
+        data = ''
+        for record in records:
+            used = len(data) % ISO_BLOCK_SIZE
+            if used + len(record) > ISO_BLOCK_SIZE:
+                data += '\x00' * (ISO_BLOCK_SIZE - used)
+            data += record
+        return _iso_pad(data)
+
+    def _path_table(self, big_endian):
+        numbers = dict((id(node), number)
+                       for number, node in enumerate(self.dirs, 1))
+        fmt = '>BBIH' if big_endian else '<BBIH'
+        table = ''
+        for node in self.dirs:
+            if node.name:
+                identifier = self.encode_name(node)
+            else:
+                identifier = '\x00'
+            table += struct.pack(fmt, len(identifier), 0,
+                                 node.location.get(self.key, 0),
+                                 numbers[id(node.parent)]) + identifier
+            if len(identifier) % 2:
+                table += '\x00'
+        return table
+
+    def allocate_path_tables(self, block):
+        """Place the little and big endian path tables from block on."""
+        self.path_table_blocks = _blocks(self.path_table_size,
+                                         ISO_BLOCK_SIZE)
+        self.path_table_location = block
+        return block + 2 * self.path_table_blocks
+
+    def allocate_directories(self, block):
+        for node in self.dirs:
+            node.location[self.key] = block
+            block += node.size[self.key] // ISO_BLOCK_SIZE
+        return block
+
+    def volume_descriptor(self, volume_id, publisher, volume_size,
+                          timestamp, vd_timestamp):
+        joliet = self.key == 'joliet'
+        field = self.encode_field
+        root = self.dirs[0]
+        never = '0' * 16 + '\x00'
+        return ''.join([
+            struct.pack('<B', 2 if joliet else 1), 'CD001', '\x01', '\x00',
+            field(u'LINUX', 32),
+            field(volume_id, 32),
+            '\x00' * 8,
+            _iso_both32(volume_size),
+            ('%/E' if joliet else '').ljust(32, '\x00'),
+            _iso_both16(1),
+            _iso_both16(1),
+            _iso_both16(ISO_BLOCK_SIZE),
+            _iso_both32(self.path_table_size),
+            struct.pack('<I', self.path_table_location),
+            struct.pack('<I', 0),
+            struct.pack('>I', self.path_table_location +
+                        self.path_table_blocks),
+            struct.pack('>I', 0),
+            self._record('\x00', root, timestamp),
+            field(u'', 128),
+            field(publisher, 128),
+            field(u'', 128),
+            field(u'', 128),
+            field(u'', 37),
+            field(u'', 37),
+            field(u'', 37),
+            vd_timestamp,
+            vd_timestamp,
+            never,
+            never,
+            '\x01',
+            ]).ljust(ISO_BLOCK_SIZE, '\x00')
+
+    def write_path_tables(self, f):
+        f.write(_iso_pad(self._path_table(False)))
+        f.write(_iso_pad(self._path_table(True)))
+
+    def write_directories(self, f, timestamp):
+        for node in self.dirs:
+            f.write(self._directory(node, timestamp))
+
+
+def _iso_pad(data):
+    return data + '\x00' * (-len(data) % ISO_BLOCK_SIZE)
+
+
+def write_iso9660(f, files, volume_id, publisher=u'', timestamp=None):
+    """Write an ISO9660 image with a Joliet tree holding the given files.
+
+    :param f: file object to write the image to.
+    :param files: list of (path, data) pairs, directories are created as
+                  needed.
+    :param volume_id: volume identifier of the image, at most 16 characters.
+    :param publisher: publisher identifier of the image.
+    :param timestamp: creation time of the files, defaults to now.
+    """
+    if timestamp is None:
+        timestamp = timeutils.utcnow()
+    root = _make_tree(files)
+    trees = [_IsoTree('primary', root, _iso_primary_name, _iso_primary_field),
+             _IsoTree('joliet', root, _iso_joliet_name, _iso_joliet_field)]
+
+    block = ISO_FIRST_FREE_BLOCK
+    for tree in trees:
+        block = tree.allocate_path_tables(block)
+    for tree in trees:
+        block = tree.allocate_directories(block)
+    files = _walk_files(root)
+    for node in files:
+        node.location['data'] = block
+        block += _blocks(len(node.data), ISO_BLOCK_SIZE)
+
+    dir_timestamp = struct.pack('7B', timestamp.year - 1900, timestamp.month,
+                                timestamp.day, timestamp.hour,
+                                timestamp.minute, timestamp.second, 0)
+    vd_timestamp = timestamp.strftime('%Y%m%d%H%M%S') + '00\x00'
+
+    f.write('\x00' * 16 * ISO_BLOCK_SIZE)
+    for tree in trees:
+        f.write(tree.volume_descriptor(volume_id, publisher, block,
+                                       dir_timestamp, vd_timestamp))
+    f.write('\xffCD001\x01'.ljust(ISO_BLOCK_SIZE, '\x00'))
+    for tree in trees:
+        tree.write_path_tables(f)
+    for tree in trees:
+        tree.write_directories(f, dir_timestamp)
+    for node in files:
+        f.write(_iso_pad(node.data))
+
+
+def _fat_short_name(name, used):
+    """Return a unique 8.3 alias for a long file name."""
+    if u'.' in name[1:]:
+        base, ext = name.rsplit(u'.', 1)
+    else:
+        base, ext = name, u''
+
+    def clean(value):
+        return ''.join(str(c) for c in value.upper()
+                       if c < u'\x80' and (c.isalnum() or
+                                           c in FAT_SHORT_NAME_CHARS))
+
+    base = clean(base) or '_'
+    ext = clean(ext)[:3]
+    number = 1
+    while True:
+        tail = '~%d' % number
+        short_name = (base[:8 - len(tail)] + tail).ljust(8) + ext.ljust(3)
+        if short_name not in used:
+            used.add(short_name)
+            return short_name
+        number += 1
+
+
+def _fat_checksum(short_name):
+    checksum = 0
+    for c in short_name:
+        checksum = (((checksum & 1) << 7) + (checksum >> 1) + ord(c)) & 0xff
+    return checksum
+
+
+def _fat_long_name_entries(name, checksum):
+    """Return the long file name entries of a name, in on-disk order."""
+    encoded = name.encode('utf-16-le')
+    units = [encoded[i:i + 2] for i in xrange(0, len(encoded), 2)]
+    if len(units) % 13:
+        units.append('\x00\x00')
+        units.extend(['\xff\xff'] * (-len(units) % 13))
+    count = len(units) // 13
+    entries = []
+    for i in xrange(count):
+        part = units[i * 13:(i + 1) * 13]
+        sequence = i + 1
+        if sequence == count:
+            sequence |= 0x40
+        entries.append(struct.pack('<B', sequence) + ''.join(part[:5]) +
+                       struct.pack('<BBB', FAT_ATTR_LONG_NAME, 0, checksum) +
+                       ''.join(part[5:11]) + '\x00\x00' +
+                       ''.join(part[11:]))
+    entries.reverse()
+    return entries
+
+
+def _fat_entry(short_name, attr, cluster, size, date, time):
+    return struct.pack('<11sBBBHHHHHHHI', short_name, attr, 0, 0, time, date,
+                       date, 0, time, date, cluster, size)
+
+
+def _fat_directory(node, date, time, label=None):
+    """Return the entries of a directory."""
+    entries = []
+    if label is not None:
+        entries.append(_fat_entry(label, FAT_ATTR_VOLUME_ID, 0, 0, date,
+                                  time))
+    else:
+        parent = node.parent.location.get('data', 0)
+        entries.append(_fat_entry('.'.ljust(11), FAT_ATTR_DIRECTORY,
+                                  node.location.get('data', 0), 0, date,
+                                  time))
+        entries.append(_fat_entry('..'.ljust(11), FAT_ATTR_DIRECTORY,
+                                  parent, 0, date, time))
+    used = set()
+    for name, child in sorted(node.children.items()):
+        short_name = _fat_short_name(name, used)
+        entries.extend(_fat_long_name_entries(name,
+                                              _fat_checksum(short_name)))
+        if child.is_dir:
+            entries.append(_fat_entry(short_name, FAT_ATTR_DIRECTORY,
+                                      child.location.get('data', 0), 0,
+                                      date, time))
+        else:
+            entries.append(_fat_entry(short_name, FAT_ATTR_ARCHIVE,
+                                      child.location.get('data', 0),
+                                      len(child.data), date, time))
+    return ''.join(entries)
+
+
+def write_vfat(f, files, label, size, timestamp=None):
+    """Write a FAT16 image with long file names holding the given files.
+
+    :param f: file object to write the image to.
+    :param files: list of (path, data) pairs, directories are created as
+                  needed.
+    :param label: volume label of the image, at most 11 characters.
+    :param size: size of the image in bytes.
+    :param timestamp: modification time of the files, defaults to now.
+    """
+    if timestamp is None:
+        timestamp = timeutils.utcnow()
+    date = (((timestamp.year - 1980) << 9) | (timestamp.month << 5) |
+            timestamp.day)
+    time = ((timestamp.hour << 11) | (timestamp.minute << 5) |
+            (timestamp.second // 2))
+    label = label.encode('ascii', 'replace')[:11].ljust(11)
+
+    total_sectors = size // FAT_SECTOR_SIZE
+    root_sectors = FAT_ROOT_ENTRIES * FAT_DIR_ENTRY_SIZE // FAT_SECTOR_SIZE
+    sectors_per_cluster = 1
+    while True:
+        fat_sectors = 1
+        while True:
+            data_sectors = (total_sectors - FAT_RESERVED_SECTORS -
+                            FAT_COUNT * fat_sectors - root_sectors)
+            clusters = data_sectors // sectors_per_cluster
+            needed = _blocks((clusters + 2) * 2, FAT_SECTOR_SIZE)
+            if needed <= fat_sectors:
+                break
+            fat_sectors = needed
+        if clusters <= FAT16_MAX_CLUSTERS or sectors_per_cluster == 64:
+            break
+        sectors_per_cluster *= 2
+    if not FAT16_MIN_CLUSTERS <= clusters <= FAT16_MAX_CLUSTERS:
+        raise exception.InvalidInput(
+                reason=_('Cannot build a FAT16 image of %d bytes') % size)
+    cluster_size = sectors_per_cluster * FAT_SECTOR_SIZE
+
+    root = _make_tree(files)
+    dirs = _walk_dirs(root)
+    files = _walk_files(root)
+    # Directory sizes only depend on the names they hold, so they can be
+    # computed before clusters are allocated.
+    contents = [(node, len(_fat_directory(node, date, time)))
+                for node in dirs[1:]]
+    contents.extend((node, len(node.data)) for node in files)
+    root_size = len(_fat_directory(root, date, time, label=label))
+    if root_size > root_sectors * FAT_SECTOR_SIZE:
+        raise exception.InvalidInput(
+                reason=_('Too many files in the image root directory'))
+
+    fat = [0xfff8, 0xffff]
+    for node, length in contents:
+        count = _blocks(length, cluster_size)
+        if not count:
+            continue
+        first = len(fat)
+        node.location['data'] = first
+        fat.extend(range(first + 1, first + count))
+        fat.append(0xffff)
+    if len(fat) > clusters + 2:
+        raise exception.InvalidInput(
+                reason=_('The image files do not fit in %d bytes') % size)
+
+    boot = struct.pack('<3s8sHBHBHHBHHHII', '\xeb\x3c\x90', 'mkfs.fat',
+                       FAT_SECTOR_SIZE, sectors_per_cluster,
+                       FAT_RESERVED_SECTORS, FAT_COUNT, FAT_ROOT_ENTRIES,
+                       total_sectors if total_sectors < 0x10000 else 0,
+                       0xf8, fat_sectors, 32, 64, 0,
+                       total_sectors if total_sectors >= 0x10000 else 0)
+    boot += struct.pack('<BBBI11s8s', 0x80, 0, 0x29,
+                        uuid.uuid4().int & 0xffffffff, label, 'FAT16   ')
+    boot = boot.ljust(FAT_SECTOR_SIZE - 2, '\x00') + '\x55\xaa'
+
+    f.write(boot)
+    table = struct.pack('<%dH' % len(fat), *fat)
+    table = table.ljust(fat_sectors * FAT_SECTOR_SIZE, '\x00')
+    for i in xrange(FAT_COUNT):
+        f.write(table)
+    f.write(_fat_directory(root, date, time, label=label).ljust(
+            root_sectors * FAT_SECTOR_SIZE, '\x00'))
+    for node, length in contents:
+        if node.is_dir:
+            data = _fat_directory(node, date, time)
+        else:
+            data = node.data
+        f.write(data + '\x00' * (-len(data) % cluster_size))
+    # Leave the free clusters as a hole in the file
+    f.seek(total_sectors * FAT_SECTOR_SIZE - 1)
+    f.write('\x00')
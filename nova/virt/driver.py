@@ -26,6 +26,7 @@ import sys
 
 from oslo.config import cfg
 
+from nova import exception
 from nova.openstack.common import importutils
 from nova.openstack.common import log as logging
 from nova import utils
@@ -155,6 +156,28 @@ class ComputeDriver(object):
         # TODO(Vek): Need to pass context in for access to auth_token
         raise NotImplementedError()
 
+    def get_info_bulk(self, instances):
+        """Get the current status of several instances at once.
+
+        Returns a dict mapping the uuid of each instance to the dict
+        get_info() returns for it. Instances unknown to the hypervisor are
+        left out.
+
+        .. note::
+
+            This implementation works for all drivers, but it calls
+            get_info() once per instance. Maintainers of the virt drivers
+            are encouraged to override this method with something that
+            queries the hypervisor once.
+        """
+        infos = {}
+        for instance in instances:
+            try:
+                infos[instance['uuid']] = self.get_info(instance)
+            except exception.InstanceNotFound:
+                pass
+        return infos
+
     def get_num_instances(self):
         """Return the total number of virtual machines.
 
@@ -430,6 +453,20 @@ class ComputeDriver(object):
         """
         raise NotImplementedError()
 
+    def get_available_resources(self, nodenames):
+        """Retrieve resource information for several nodes at once.
+
+        Used by the batched resource audit of hosts with several nodes.
+        Drivers that can collect the resources of all their nodes more
+        cheaply than one at a time should override this.
+
+        :param nodenames: nodes which the caller wants to get resources from
+        :returns: Dictionary of nodename to the dictionary describing its
+                  resources, as returned by get_available_resource()
+        """
+        return dict((nodename, self.get_available_resource(nodename))
+                    for nodename in nodenames)
+
     def pre_live_migration(self, ctxt, instance_ref,
                            block_device_info, network_info,
                            migrate_data=None):
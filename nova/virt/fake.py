@@ -246,6 +246,13 @@ class FakeDriver(driver.ComputeDriver):
                 'num_cpu': 2,
                 'cpu_time': 0}
 
+    def get_info_bulk(self, instances):
+        infos = {}
+        for instance in instances:
+            if instance['name'] in self.instances:
+                infos[instance['uuid']] = self.get_info(instance)
+        return infos
+
     def get_diagnostics(self, instance_name):
         return {'cpu0_time': 17300000000,
                 'memory': 524288,
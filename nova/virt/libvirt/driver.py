@@ -1512,19 +1512,21 @@ class LibvirtDriver(driver.ComputeDriver):
                                             instance,
                                             block_device_info,
                                             image_meta)
-        self._create_image(context, instance,
-                           disk_info['mapping'],
-                           network_info=network_info,
-                           block_device_info=block_device_info,
-                           files=injected_files,
-                           admin_pass=admin_password)
-        xml = self.to_xml(instance, network_info,
-                          disk_info, image_meta,
-                          block_device_info=block_device_info,
-                          write_to_disk=True)
-
-        self._create_domain_and_network(xml, instance, network_info,
-                                        block_device_info)
+        with utils.span('create_image'):
+            self._create_image(context, instance,
+                               disk_info['mapping'],
+                               network_info=network_info,
+                               block_device_info=block_device_info,
+                               files=injected_files,
+                               admin_pass=admin_password)
+        with utils.span('create_domain'):
+            xml = self.to_xml(instance, network_info,
+                              disk_info, image_meta,
+                              block_device_info=block_device_info,
+                              write_to_disk=True)
+
+            self._create_domain_and_network(xml, instance, network_info,
+                                            block_device_info)
         LOG.debug(_("Instance is running"), instance=instance)
 
         def _wait_for_boot():
@@ -1536,8 +1538,9 @@ class LibvirtDriver(driver.ComputeDriver):
                          instance=instance)
                 raise utils.LoopingCallDone()
 
-        timer = utils.FixedIntervalLoopingCall(_wait_for_boot)
-        timer.start(interval=0.5).wait()
+        with utils.span('wait_for_boot'):
+            timer = utils.FixedIntervalLoopingCall(_wait_for_boot)
+            timer.start(interval=0.5).wait()
 
     def _flush_libvirt_console(self, pty):
         out, err = utils.execute('dd',
@@ -2375,6 +2378,54 @@ class LibvirtDriver(driver.ComputeDriver):
                 'cpu_time': cpu_time,
                 'id': virt_dom.ID()}
 
+    def _list_domains(self):
+        """Return the domains defined on the host, running or not."""
+        if hasattr(self._conn, 'listAllDomains'):
+            return self._conn.listAllDomains(0)
+
+        domains = []
+        for domain_id in self.list_instance_ids():
+            try:
+                # We skip domains with ID 0 (hypervisors).
+                if domain_id != 0:
+                    domains.append(self._conn.lookupByID(domain_id))
+            except libvirt.libvirtError:
+                # Instance was deleted while listing... ignore it
+                pass
+        for name in self._conn.listDefinedDomains():
+            try:
+                domains.append(self._conn.lookupByName(name))
+            except libvirt.libvirtError:
+                pass
+        return domains
+
+    def get_info_bulk(self, instances):
+        """Retrieve information from libvirt for several instances.
+
+        The domains are listed once instead of being looked up one instance
+        name at a time.
+        """
+        uuids_by_name = dict((instance['name'], instance['uuid'])
+                             for instance in instances)
+        infos = {}
+        for virt_dom in self._list_domains():
+            try:
+                name = virt_dom.name()
+                if name not in uuids_by_name:
+                    continue
+                (state, max_mem, mem, num_cpu, cpu_time) = virt_dom.info()
+                infos[uuids_by_name[name]] = {
+                        'state': LIBVIRT_POWER_STATE[state],
+                        'max_mem': max_mem,
+                        'mem': mem,
+                        'num_cpu': num_cpu,
+                        'cpu_time': cpu_time,
+                        'id': virt_dom.ID()}
+            except libvirt.libvirtError:
+                # Domain was undefined while listing... ignore it
+                pass
+        return infos
+
     def _create_domain(self, xml=None, domain=None,
                        instance=None, launch_flags=0):
         """Create a domain.
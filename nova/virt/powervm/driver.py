@@ -48,7 +48,12 @@ powervm_opts = [
     cfg.StrOpt('powervm_img_local_path',
                default='/tmp',
                help='Local directory to download glance images to.'
-               ' Make sure this path can fit your biggest image in glance')
+               ' Make sure this path can fit your biggest image in glance'),
+    cfg.IntOpt('powervm_lpar_cache_ttl',
+               default=5,
+               help='Number of seconds the state and profiles of the LPARs '
+                    'collected from the PowerVM manager are served from '
+                    'memory before being collected again')
     ]
 
 CONF = cfg.CONF
@@ -25,6 +25,7 @@ from nova.compute import power_state
 from nova import exception as nova_exception
 from nova.openstack.common import excutils
 from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
 from nova import utils
 from nova.virt.powervm import blockdev
 from nova.virt.powervm import command
@@ -36,6 +37,14 @@ from nova.virt.powervm import lpar as LPAR
 LOG = logging.getLogger(__name__)
 CONF = cfg.CONF
 
+# Fields of the LPARs and of their profiles collected by get_lpars(). The
+# name comes last since it is the only field that may contain commas.
+LPAR_SNAPSHOT_FIELDS = ['lpar_id', 'state', 'uptime', 'name']
+PROFILE_SNAPSHOT_FIELDS = ['desired_mem', 'max_mem', 'max_procs', 'lpar_name']
+
+# Printed with the exit code after each command run by run_vios_commands()
+OUTPUT_SEPARATOR = '--nova-output-separator--'
+
 
 def get_powervm_operator():
     if CONF.powervm_mgr_type == 'ivm':
@@ -88,12 +97,12 @@ class PowerVMOperator(object):
                 'cpu_time': lpar_instance['uptime']}
 
     def instance_exists(self, instance_name):
-        lpar_instance = self._operator.get_lpar(instance_name)
+        lpar_instance = self._operator.get_cached_lpar(instance_name)
         return True if lpar_instance else False
 
     def _get_instance(self, instance_name):
         """Check whether or not the LPAR instance exists and return it."""
-        lpar_instance = self._operator.get_lpar(instance_name)
+        lpar_instance = self._operator.get_cached_lpar(instance_name)
 
         if lpar_instance is None:
             LOG.error(_("LPAR instance '%s' not found") % instance_name)
@@ -106,8 +115,7 @@ class PowerVMOperator(object):
         Return the names of all the instances known to the virtualization
         layer, as a list.
         """
-        lpar_instances = self._operator.list_lpar_instances()
-        return lpar_instances
+        return self._operator.get_lpars().keys()
 
     def get_available_resource(self):
         """Retrieve resource info.
@@ -130,7 +138,7 @@ class PowerVMOperator(object):
                'local_gb_used': local_gb_used,
                'hypervisor_type': data['hypervisor_type'],
                'hypervisor_version': data['hypervisor_version'],
-               'hypervisor_hostname': self._operator.get_hostname(),
+               'hypervisor_hostname': data['hypervisor_hostname'],
                'cpu_info': ','.join(data['cpu_info']),
                'disk_available_least': data['disk_total']}
         return dic
@@ -142,16 +150,16 @@ class PowerVMOperator(object):
         return self._host_stats
 
     def _update_host_stats(self):
-        memory_info = self._operator.get_memory_info()
-        cpu_info = self._operator.get_cpu_info()
-
         # Note: disk avail information is not accurate. The value
         # is a sum of all Volume Groups and the result cannot
         # represent the real possibility. Example: consider two
         # VGs both 10G, the avail disk will be 20G however,
         # a 15G image does not fit in any VG. This can be improved
         # later on.
-        disk_info = self._operator.get_disk_info()
+        host_info = self._operator.get_host_info()
+        memory_info = host_info['memory']
+        cpu_info = host_info['cpu']
+        disk_info = host_info['disk']
 
         data = {}
         data['vcpus'] = cpu_info['total_procs']
@@ -164,7 +172,7 @@ class PowerVMOperator(object):
         data['host_memory_free'] = memory_info['avail_mem']
         data['hypervisor_type'] = constants.POWERVM_HYPERVISOR_TYPE
         data['hypervisor_version'] = constants.POWERVM_HYPERVISOR_VERSION
-        data['hypervisor_hostname'] = self._operator.get_hostname()
+        data['hypervisor_hostname'] = host_info['hostname']
         data['supported_instances'] = constants.POWERVM_SUPPORTED_INSTANCES
         data['extres'] = ''
 
@@ -215,6 +223,8 @@ class PowerVMOperator(object):
             # Wait for boot
             timeout_count = range(10)
             while timeout_count:
+                # The LPAR state is polled, don't use a cached one
+                self._operator.invalidate_lpars()
                 state = self.get_info(instance['name'])['state']
                 if state == power_state.RUNNING:
                     LOG.info(_("Instance spawned successfully."),
@@ -460,6 +470,8 @@ class BaseOperator(object):
         """
         self._connection = None
         self.connection_data = connection
+        self._lpars = None
+        self._lpars_updated_at = None
 
     def _set_connection(self):
         if self._connection is None:
@@ -480,6 +492,70 @@ class BaseOperator(object):
         lpar = LPAR.load_from_conf_data(output[0])
         return lpar
 
+    def invalidate_lpars(self):
+        """Forget the LPAR snapshot collected by get_lpars().
+
+        Called by every operation that creates, removes, renames or changes
+        the state or profile of a LPAR.
+        """
+        self._lpars = None
+        self._lpars_updated_at = None
+
+    def _lpars_are_stale(self):
+        if self._lpars is None:
+            return True
+        return timeutils.is_older_than(self._lpars_updated_at,
+                                       CONF.powervm_lpar_cache_ttl)
+
+    def get_lpars(self, refresh=False):
+        """Return all the LPARs of the managed system.
+
+        The state of every LPAR and its profile are collected with one
+        lssyscfg of each kind, run in a single ssh round-trip, and served
+        from memory for powervm_lpar_cache_ttl seconds.
+
+        :param refresh: collect a new snapshot even if the current one
+                        has not expired yet
+        :returns: dict -- LPAR name to LPAR object
+        """
+        if refresh or self._lpars_are_stale():
+            lpar_output, profile_output = self.run_vios_commands([
+                    self.command.lssyscfg('-r lpar -F %s' %
+                                          ','.join(LPAR_SNAPSHOT_FIELDS)),
+                    self.command.lssyscfg('-r prof -F %s' %
+                                          ','.join(PROFILE_SNAPSHOT_FIELDS))])
+            lpars = {}
+            for line in lpar_output:
+                values = line.split(',', len(LPAR_SNAPSHOT_FIELDS) - 1)
+                lpar = LPAR.LPAR(**dict(zip(LPAR_SNAPSHOT_FIELDS, values)))
+                lpars[lpar['name']] = lpar
+            for line in profile_output:
+                values = dict(zip(PROFILE_SNAPSHOT_FIELDS,
+                    line.split(',', len(PROFILE_SNAPSHOT_FIELDS) - 1)))
+                lpar = lpars.get(values.pop('lpar_name'))
+                if lpar is None:
+                    continue
+                for (key, value) in values.items():
+                    lpar[key] = value
+            self._lpars = lpars
+            self._lpars_updated_at = timeutils.utcnow()
+        return dict(self._lpars)
+
+    def get_cached_lpar(self, instance_name):
+        """Return a LPAR object from the get_lpars() snapshot.
+
+        A LPAR missing from a snapshot that was not just collected may have
+        been created since, so a miss triggers one refresh.
+
+        :param instance_name: LPAR instance name
+        :returns: LPAR object or None
+        """
+        fresh = self._lpars_are_stale()
+        lpar = self.get_lpars().get(instance_name)
+        if lpar is None and not fresh:
+            lpar = self.get_lpars(refresh=True).get(instance_name)
+        return lpar
+
     def list_lpar_instances(self):
         """List all existent LPAR instances names.
 
@@ -497,6 +573,7 @@ class BaseOperator(object):
         :param lpar: LPAR object
         """
         conf_data = lpar.to_string()
+        self.invalidate_lpars()
         self.run_vios_command(self.command.mksyscfg('-r lpar -i "%s"' %
                                                     conf_data))
 
@@ -505,6 +582,7 @@ class BaseOperator(object):
 
         :param instance_name: LPAR instance name
         """
+        self.invalidate_lpars()
         self.run_vios_command(self.command.chsysstate('-r lpar -o on -n %s'
                                                  % instance_name))
 
@@ -517,6 +595,7 @@ class BaseOperator(object):
         """
         cmd = self.command.chsysstate('-r lpar -o shutdown --immed -n %s' %
                                       instance_name)
+        self.invalidate_lpars()
         self.run_vios_command(cmd)
 
         # poll instance until stopped or raise exception
@@ -539,6 +618,7 @@ class BaseOperator(object):
 
         :param instance_name: LPAR instance name
         """
+        self.invalidate_lpars()
         self.run_vios_command(self.command.rmsyscfg('-r lpar -n %s'
                                                % instance_name))
 
@@ -607,42 +687,48 @@ class BaseOperator(object):
         cmd = self.command.mkvdev('-vdev %s -vadapter %s') % (disk, vhost)
         self.run_vios_command(cmd)
 
-    def get_memory_info(self):
-        """Get memory info.
-
-        :returns: tuple - memory info (total_mem, avail_mem)
-        """
-        cmd = self.command.lshwres(
+    def _memory_info_cmd(self):
+        return self.command.lshwres(
             '-r mem --level sys -F configurable_sys_mem,curr_avail_sys_mem')
-        output = self.run_vios_command(cmd)
+
+    def _parse_memory_info(self, output):
         total_mem, avail_mem = output[0].split(',')
         return {'total_mem': int(total_mem),
                 'avail_mem': int(avail_mem)}
 
-    def get_cpu_info(self):
-        """Get CPU info.
+    def get_memory_info(self):
+        """Get memory info.
 
-        :returns: tuple - cpu info (total_procs, avail_procs)
+        :returns: tuple - memory info (total_mem, avail_mem)
         """
-        cmd = self.command.lshwres(
+        output = self.run_vios_command(self._memory_info_cmd())
+        return self._parse_memory_info(output)
+
+    def _cpu_info_cmd(self):
+        return self.command.lshwres(
             '-r proc --level sys -F '
             'configurable_sys_proc_units,curr_avail_sys_proc_units')
-        output = self.run_vios_command(cmd)
+
+    def _parse_cpu_info(self, output):
         total_procs, avail_procs = output[0].split(',')
         return {'total_procs': float(total_procs),
                 'avail_procs': float(avail_procs)}
 
-    def get_disk_info(self):
-        """Get the disk usage information.
+    def get_cpu_info(self):
+        """Get CPU info.
 
-        :returns: tuple - disk info (disk_total, disk_used, disk_avail)
+        :returns: tuple - cpu info (total_procs, avail_procs)
         """
-        vgs = self.run_vios_command(self.command.lsvg())
+        output = self.run_vios_command(self._cpu_info_cmd())
+        return self._parse_cpu_info(output)
+
+    def _vg_info_cmd(self, vg):
+        return self.command.lsvg('%s -field totalpps usedpps freepps -fmt :'
+                                 % vg)
+
+    def _parse_disk_info(self, vg_outputs):
         (disk_total, disk_used, disk_avail) = [0, 0, 0]
-        for vg in vgs:
-            cmd = self.command.lsvg('%s -field totalpps usedpps freepps -fmt :'
-                                    % vg)
-            output = self.run_vios_command(cmd)
+        for output in vg_outputs:
             # Output example:
             # 1271 (10168 megabytes):0 (0 megabytes):1271 (10168 megabytes)
             (d_total, d_used, d_avail) = re.findall(r'(\d+) megabytes',
@@ -655,6 +741,40 @@ class BaseOperator(object):
                 'disk_used': disk_used,
                 'disk_avail': disk_avail}
 
+    def get_disk_info(self):
+        """Get the disk usage information.
+
+        :returns: tuple - disk info (disk_total, disk_used, disk_avail)
+        """
+        vgs = self.run_vios_command(self.command.lsvg())
+        vg_outputs = [self.run_vios_command(self._vg_info_cmd(vg))
+                      for vg in vgs]
+        return self._parse_disk_info(vg_outputs)
+
+    def get_host_info(self):
+        """Get the memory, CPU and disk info and the hostname at once.
+
+        Same as get_memory_info(), get_cpu_info(), get_disk_info() and
+        get_hostname(), but their commands are pipelined in two ssh
+        round-trips, the second one for the volume groups found by the
+        first.
+
+        :returns: dict with the memory, cpu, disk and hostname keys
+        """
+        memory_output, cpu_output, vgs, hostname_output = (
+                self.run_vios_commands([self._memory_info_cmd(),
+                                        self._cpu_info_cmd(),
+                                        self.command.lsvg(),
+                                        self.command.hostname()]))
+        vg_outputs = []
+        if vgs:
+            vg_outputs = self.run_vios_commands([self._vg_info_cmd(vg)
+                                                 for vg in vgs])
+        return {'memory': self._parse_memory_info(memory_output),
+                'cpu': self._parse_cpu_info(cpu_output),
+                'disk': self._parse_disk_info(vg_outputs),
+                'hostname': hostname_output[0]}
+
     def run_vios_command(self, cmd, check_exit_code=True):
         """Run a remote command using an active ssh connection.
 
@@ -665,6 +785,42 @@ class BaseOperator(object):
                                            check_exit_code=check_exit_code)
         return stdout.strip().splitlines()
 
+    def run_vios_commands(self, cmds, check_exit_code=True):
+        """Run several remote commands in a single ssh round-trip.
+
+        The commands are run one after the other by the remote shell, each
+        followed by a separator line carrying its exit code, so that their
+        outputs can be told apart and every exit code is checked.
+
+        :param cmds: list of command strings
+        :returns: list -- the output lines of each command
+        """
+        script = '; '.join('%s; echo %s $?' % (cmd, OUTPUT_SEPARATOR)
+                           for cmd in cmds)
+        # The exit code of the script is the one of the last echo, the
+        # exit codes of the commands are checked below.
+        output = self.run_vios_command(script, check_exit_code=False)
+        outputs = []
+        lines = []
+        for line in output:
+            fields = line.split()
+            if len(fields) == 2 and fields[0] == OUTPUT_SEPARATOR:
+                cmd = cmds[len(outputs)]
+                exit_code = int(fields[1])
+                if check_exit_code and exit_code != 0:
+                    raise nova_exception.ProcessExecutionError(
+                            exit_code=exit_code, stdout='\n'.join(lines),
+                            cmd=cmd)
+                outputs.append(lines)
+                lines = []
+            else:
+                lines.append(line)
+        if len(outputs) != len(cmds):
+            raise nova_exception.ProcessExecutionError(
+                    stdout='\n'.join(output), cmd=script,
+                    description=_('Not every command was run.'))
+        return outputs
+
     def run_vios_command_as_root(self, command, check_exit_code=True):
         """Run a remote command as root using an active ssh connection.
 
@@ -697,6 +853,7 @@ class BaseOperator(object):
                                lpar_info['desired_proc_units'],
                                lpar_info['max_proc_units']))
 
+        self.invalidate_lpars()
         self.run_vios_command(self.command.chsyscfg('-r prof -i "%s"' %
                                                configuration_data))
 
@@ -739,6 +896,7 @@ class BaseOperator(object):
                        'new_name=%s' % new_name_trimmed,
                        '"'])
 
+        self.invalidate_lpars()
         self.run_vios_command(cmd)
 
         return new_name_trimmed
@@ -773,6 +931,7 @@ class BaseOperator(object):
         cmd = ' '.join(['chsyscfg -r lpar -i',
                         '"name=%s,' % instance_name,
                         'virtual_eth_mac_base_value=%s"' % mac_base_value])
+        self.invalidate_lpars()
         self.run_vios_command(cmd)
 
 
@@ -28,6 +28,8 @@ from nova.openstack.common import log as logging
 from nova.openstack.common import jsonutils
 
 from nova.virt import driver
+from nova.virt.smartosapi import hostinfo
+from nova.virt.smartosapi import inventory
 from nova.virt.smartosapi import vmops
 
 import socket
@@ -164,7 +166,9 @@ class SmartOSDriver(driver.ComputeDriver):
         super(SmartOSDriver, self).__init__(virtapi)
         self._host_state = None
         self.read_only = read_only
-        self._vmops = vmops.SmartOSOps()
+        self._inventory = inventory.VmadmInventory()
+        self._vmops = vmops.SmartOSOps(self._inventory)
+        self._host_resources = hostinfo.HostResources(self._inventory)
 
     def init_host(self, host):
         """Do the initialization that needs to be done."""
@@ -182,6 +186,14 @@ class SmartOSDriver(driver.ComputeDriver):
         """
         return self._vmops.list_instances_uuids()
 
+    def get_num_instances(self):
+        """Return the total number of virtual machines."""
+        return self._vmops.get_num_instances()
+
+    def instance_exists(self, instance_id):
+        """Checks existence of an instance on the host."""
+        return self._vmops.instance_exists(instance_id)
+
     def spawn(self, context, instance, image_meta, injected_files,
               admin_password, network_info=None, block_device_info=None):
         """Create VM instance."""
@@ -248,7 +260,7 @@ class SmartOSDriver(driver.ComputeDriver):
         pass
 
     def get_disk_available_least(self):
-        return 100
+        return self._host_resources.get()['disk_available_least']
 
     def legacy_nwinfo(self):
         return True
@@ -297,6 +309,7 @@ class SmartOSDriver(driver.ComputeDriver):
         :param nodename: ignored in this driver
         :returns: dictionary containing resource info
         """
+        self.refresh_host_resources()
         dic = {'vcpus': self.get_vcpu_total(),
                'memory_mb': self.get_memory_mb_total(),
                'local_gb': self.get_local_gb_total(),
@@ -333,7 +346,7 @@ class SmartOSDriver(driver.ComputeDriver):
     @property
     def host_state(self):
         if not self._host_state:
-            self._host_state = HostState(self.read_only)
+            self._host_state = HostState(self)
         return self._host_state
 
     def get_host_stats(self, refresh=False):
@@ -348,59 +361,31 @@ class SmartOSDriver(driver.ComputeDriver):
         """Unplug VIFs from networks."""
         self._vmops.unplug_vifs(instance, network_info)
 
-    @staticmethod
-    def get_vcpu_total():
-        # Use psrinfo
-        return 10
+    def refresh_host_resources(self):
+        """Collect the host resources in one pass."""
+        self._host_resources.refresh()
 
-    @staticmethod
-    def get_vcpu_used():
-        # vmadm list -o vcpus
-        return 0
+    def get_vcpu_total(self):
+        return self._host_resources.get()['vcpus']
 
-    @staticmethod
-    def get_cpu_info():
-        cpu_info = dict()
-
-        cpu_info['arch'] = "x86_64"
-        cpu_info['model'] = "Xeon"
-        cpu_info['vendor'] = "Intel"
-
-        topology = dict()
-        topology['sockets'] = 1
-        topology['cores'] = 2
-        topology['threads'] = 4
-        cpu_info['topology'] = topology
-
-        features = list()
-        features.append("sse")
-        cpu_info['features'] = features
-
-        guest_arches = list()
-        guest_arches.append("i386")
-        guest_arches.append("x86_64")
-        cpu_info['permitted_instance_types'] = guest_arches
+    def get_vcpu_used(self):
+        return self._host_resources.get()['vcpus_used']
+
+    def get_cpu_info(self):
         # TODO: See smartos/driver.py:2149
-        return jsonutils.dumps(cpu_info)
+        return jsonutils.dumps(self._host_resources.get()['cpu_info'])
 
-    @staticmethod
-    def get_memory_mb_total():
-        # prtconf |grep -i mem
-        return 12000
+    def get_memory_mb_total(self):
+        return self._host_resources.get()['memory_mb']
 
-    @staticmethod
-    def get_memory_mb_used():
-        #  echo ::memstat | mdb -k
-        return 0
+    def get_memory_mb_used(self):
+        return self._host_resources.get()['memory_mb_used']
 
-    @staticmethod
-    def get_local_gb_used():
-        # zpool list -p zones
-        return 0
+    def get_local_gb_used(self):
+        return self._host_resources.get()['local_gb_used']
 
-    @staticmethod
-    def get_local_gb_total():
-        return 20
+    def get_local_gb_total(self):
+        return self._host_resources.get()['local_gb']
 
     @staticmethod
     def get_hypervisor_type():
@@ -413,26 +398,31 @@ class SmartOSDriver(driver.ComputeDriver):
 
 class HostState(object):
     """Manages information about the compute node through smartos"""
-    def __init__(self, read_only):
+    def __init__(self, connection):
         super(HostState, self).__init__()
-        self.read_only = read_only
         self._stats = {}
-        self.connection = None
-        self.update_status()
+        self.connection = connection
+        self._update_stats()
 
     def get_host_stats(self, refresh=False):
         """Return the current state of the host.
 
-        If 'refresh' is True, run update the stats first."""
+        If 'refresh' is True, run update the stats first.  Otherwise the
+        stats reflect the last collection of the host resources, which
+        may have been done by the resource tracker."""
         if refresh:
             self.update_status()
+        else:
+            self._update_stats()
         return self._stats
 
     def update_status(self):
         """Retrieve status info from smartos."""
         LOG.debug(_("Updating host stats"))
-        if self.connection is None:
-            self.connection = get_connection(self.read_only)
+        self.connection.refresh_host_resources()
+        return self._update_stats()
+
+    def _update_stats(self):
         data = {"vcpus": self.connection.get_vcpu_total(),
                 "vcpus_used": self.connection.get_vcpu_used(),
                 "cpu_info": jsonutils.loads(self.connection.get_cpu_info()),
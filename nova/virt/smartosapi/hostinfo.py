@@ -0,0 +1,125 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+Collection of the resources of a SmartOS host.
+
+CPU and memory come from 'sysinfo', disk from 'zpool list' and the
+allocations of the guests from the vmadm inventory.  All of them are
+gathered in one pass and kept until the next one.
+"""
+
+from nova.openstack.common import jsonutils
+from nova.openstack.common import log as logging
+from nova import utils
+
+LOG = logging.getLogger(__name__)
+
+ZPOOL = 'zones'
+ZPOOL_FIELDS = ['name', 'size', 'allocated', 'free']
+
+_GB = 1024 * 1024 * 1024
+
+
+def parse_sysinfo(output):
+    """Parse the JSON printed by 'sysinfo'.
+
+    Returns a dict with the number of vcpus, the memory in MB and the
+    CPU description of the host.
+    """
+    info = jsonutils.loads(output)
+    cpu_type = info.get('CPU Type', '')
+    sockets = int(info.get('CPU Physical Cores', 1)) or 1
+    vcpus = int(info.get('CPU Total Cores', 0))
+    if 'AMD' in cpu_type:
+        vendor = 'AMD'
+    else:
+        vendor = 'Intel'
+    return {'vcpus': vcpus,
+            'memory_mb': int(info.get('MiB of Memory', 0)),
+            'hostname': info.get('Hostname'),
+            'platform': info.get('Live Image'),
+            'cpu_info': {'arch': 'x86_64',
+                         'model': cpu_type,
+                         'vendor': vendor,
+                         'topology': {'sockets': sockets,
+                                      'cores': max(vcpus / sockets, 1),
+                                      'threads': 1},
+                         'features': [f for f in
+                                      [info.get('CPU Virtualization')]
+                                      if f],
+                         'permitted_instance_types': ['i386', 'x86_64']}}
+
+
+def parse_zpool_list(output):
+    """Parse the output of 'zpool list -Hp -o <ZPOOL_FIELDS>'.
+
+    Returns a dict of pool name to a dict of its sizes in bytes.
+    """
+    pools = {}
+    for line in output.splitlines():
+        values = line.split()
+        if len(values) != len(ZPOOL_FIELDS):
+            continue
+        pool = dict(zip(ZPOOL_FIELDS, values))
+        for field in ZPOOL_FIELDS[1:]:
+            pool[field] = int(pool[field])
+        pools[pool['name']] = pool
+    return pools
+
+
+class HostResources(object):
+    """Collects and keeps the resources of the host."""
+
+    def __init__(self, inventory):
+        self._inventory = inventory
+        self._resources = None
+
+    def refresh(self):
+        """Collect the host resources.  Returns the new resources."""
+        LOG.debug(_("Collecting host resources"))
+        out, err = utils.execute('sysinfo')
+        host = parse_sysinfo(out)
+        out, err = utils.execute('zpool', 'list', '-Hp', '-o',
+                                 ','.join(ZPOOL_FIELDS), ZPOOL)
+        pool = parse_zpool_list(out).get(ZPOOL)
+        if pool is None:
+            LOG.warn(_("zpool %s not found"), ZPOOL)
+            pool = {'size': 0, 'allocated': 0, 'free': 0}
+        self._inventory.refresh()
+        vms = self._inventory.get_vms().values()
+
+        self._resources = {
+            'vcpus': host['vcpus'],
+            'vcpus_used': sum(vm['vcpus'] for vm in vms),
+            'memory_mb': host['memory_mb'],
+            'memory_mb_used': sum(vm['ram'] for vm in vms),
+            'local_gb': pool['size'] / _GB,
+            'local_gb_used': pool['allocated'] / _GB,
+            'disk_available_least': pool['free'] / _GB,
+            'hostname': host['hostname'],
+            'platform': host['platform'],
+            'cpu_info': host['cpu_info'],
+        }
+        return self._resources
+
+    def get(self, refresh=False):
+        """Return the resources of the last collection, collecting them
+        first if asked to or if they never were.
+        """
+        if refresh or self._resources is None:
+            self.refresh()
+        return self._resources
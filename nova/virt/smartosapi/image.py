@@ -19,20 +19,23 @@ import os
 
 from nova.virt import images
 
-from nova.openstack.common import log as logging
 from nova.openstack.common import jsonutils
+from nova.openstack.common import lockutils
+from nova.openstack.common import log as logging
 
 LOG = logging.getLogger(__name__)
 
 
 class Image(object):
 
-    def __init__(self, context, image_id, image_size, user_id, tenant_id):
+    def __init__(self, context, image_id, image_size, user_id, tenant_id,
+                 disk_format=None):
         self.context = context
         self.image_uuid = image_id
         self.user_id = user_id
         self.tenant_id = tenant_id
         self.image_size = image_size
+        self.disk_format = disk_format
 
     def uuid(self):
         return self.image_uuid
@@ -41,12 +44,22 @@ class Image(object):
         return self.image_size
 
     def ensure_created(self):
+        # Concurrent spawns from the same image wait for the first one to
+        # fetch it instead of fetching it again.
+        @lockutils.synchronized('smartos-image-%s' % self.image_uuid,
+                                'nova-')
+        def _ensure_created():
+            if not self.check_image_exists_locally():
+                LOG.debug("Fetching image from glance")
+                self.fetch_image()
+
+        _ensure_created()
+
+    def fetch_image(self):
         self.image_temp_target = "/tmp/%s-tmp-img" % self.image_uuid
-        if not self.check_image_exists_locally():
-            LOG.debug("Fetching image from glance")
-            images.fetch_to_raw(self.context, self.image_uuid,
-                self.image_temp_target, self.user_id, self.tenant_id)
-            self.register_image()
+        images.fetch_to_raw(self.context, self.image_uuid,
+            self.image_temp_target, self.user_id, self.tenant_id)
+        self.register_image()
 
     def check_image_exists_locally(self):
         # TODO: make this more robust (imgadm show..) but imgadm has to work
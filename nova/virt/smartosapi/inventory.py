@@ -0,0 +1,142 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In-memory snapshot of the zones and KVM guests known to vmadm.
+
+The state of every guest is collected with a single 'vmadm list'
+invocation and answered from memory until it is older than
+smartos_inventory_cache_ttl seconds or explicitly invalidated.
+"""
+
+from oslo.config import cfg
+
+from nova.compute import power_state
+from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
+from nova import utils
+
+inventory_opts = [
+    cfg.StrOpt('smartos_vmadm_path',
+               default='vmadm',
+               help='Path to the vmadm executable used to manage zones '
+                    'and KVM guests'),
+    cfg.IntOpt('smartos_inventory_cache_ttl',
+               default=10,
+               help='Number of seconds the guest list collected from '
+                    'vmadm is served from memory before being refreshed. '
+                    'Set to 0 to disable caching'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(inventory_opts)
+
+LOG = logging.getLogger(__name__)
+
+# alias is last as it is the only field that may contain the separator.
+VMADM_FIELDS = ['uuid', 'brand', 'state', 'ram', 'vcpus', 'alias']
+
+VMADM_POWER_STATES = {
+    'running': power_state.RUNNING,
+    'stopping': power_state.RUNNING,
+    'shutting_down': power_state.RUNNING,
+    'stopped': power_state.SHUTDOWN,
+    'installed': power_state.SHUTDOWN,
+    'down': power_state.SHUTDOWN,
+    'failed': power_state.CRASHED,
+}
+
+
+def _to_int(value):
+    try:
+        return int(value)
+    except ValueError:
+        return 0
+
+
+def parse_vmadm_list(output):
+    """Parse the output of 'vmadm list -p -o <VMADM_FIELDS>'.
+
+    Returns a dict of guest uuid to a dict of its fields.
+    """
+    vms = {}
+    for line in output.splitlines():
+        if not line.strip():
+            continue
+        values = line.split(':', len(VMADM_FIELDS) - 1)
+        if len(values) != len(VMADM_FIELDS):
+            LOG.warn(_("Ignoring unexpected vmadm output: %s"), line)
+            continue
+        vm = dict(zip(VMADM_FIELDS, values))
+        vm['ram'] = _to_int(vm['ram'])
+        vm['vcpus'] = _to_int(vm['vcpus'])
+        vm['power_state'] = VMADM_POWER_STATES.get(vm['state'],
+                                                   power_state.NOSTATE)
+        vms[vm['uuid']] = vm
+    return vms
+
+
+class VmadmInventory(object):
+    """Answers guest lookups from a bulk 'vmadm list' snapshot."""
+
+    def __init__(self):
+        self._vms = None
+        self._updated_at = None
+
+    def invalidate(self):
+        """Forget the snapshot.
+
+        Called after any operation that creates, removes or changes the
+        state of a guest, so that the next lookup reflects the change.
+        """
+        self._vms = None
+        self._updated_at = None
+
+    def _is_stale(self):
+        if self._vms is None:
+            return True
+        return timeutils.is_older_than(self._updated_at,
+                                       CONF.smartos_inventory_cache_ttl)
+
+    def refresh(self):
+        """Collect the state of all guests with one vmadm invocation."""
+        LOG.debug(_("Refreshing the vmadm inventory cache"))
+        out, err = utils.execute(CONF.smartos_vmadm_path, 'list', '-p',
+                                 '-o', ','.join(VMADM_FIELDS))
+        self._vms = parse_vmadm_list(out)
+        self._updated_at = timeutils.utcnow()
+
+    def _get_vms(self):
+        if self._is_stale():
+            self.refresh()
+        return self._vms
+
+    def get_vms(self):
+        """Return a dict of guest uuid to a dict of its fields."""
+        return dict(self._get_vms())
+
+    def get_vm(self, instance_id):
+        """Return the fields of a guest looked up by uuid or alias, or
+        None if vmadm doesn't know about it.
+        """
+        vms = self._get_vms()
+        vm = vms.get(instance_id)
+        if vm is None:
+            for candidate in vms.itervalues():
+                if candidate['alias'] and candidate['alias'] == instance_id:
+                    vm = candidate
+                    break
+        return vm
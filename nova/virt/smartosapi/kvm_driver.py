@@ -15,14 +15,27 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from nova.openstack.common import excutils
+from nova.virt.smartosapi import kvm_image
 from nova.virt.smartosapi import vm_driver
 
 
 class KVMDriver(vm_driver.VmDriver):
 
+    def boot(self):
+        # The boot disk is a clone of the cached image, so vmadm is told
+        # to use it rather than to create one.
+        self.disk_path = self.image.clone_disk(self.instance['uuid'])
+        try:
+            super(KVMDriver, self).boot()
+        except Exception:
+            with excutils.save_and_reraise_exception():
+                kvm_image.destroy_instance_disk(self.instance['uuid'])
+
     def startinfo(self):
         return {
            "brand": "kvm",
+           "alias": self.instance['name'],
            "default-gateway": "192.168.2.1",
            "resolvers": [
              "208.67.222.222",
@@ -43,7 +56,8 @@ class KVMDriver(vm_driver.VmDriver):
              ],
            "disks": [
              {
-               "image_uuid": self.image_id,
+               "path": self.disk_path,
+               "nocreate": True,
                "boot": True,
                "model": "virtio",
                "size": self.image_size
@@ -15,30 +15,78 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
-import os
-from nova import utils
+from nova import exception
+from nova.image import glance
+from nova.openstack.common import excutils
 from nova.openstack.common import log as logging
+from nova import utils
+from nova.virt import images
 from nova.virt.smartosapi import image
 
 LOG = logging.getLogger(__name__)
 
 
+def _bytes_to_mb(size):
+    return (int(size) / 1024 / 1024) + 1
+
+
+def _instance_disk_name(instance_uuid):
+    return "zones/%s-disk0" % instance_uuid
+
+
+def destroy_instance_disk(instance_uuid):
+    """Destroy the boot disk cloned for an instance, if there is one.
+
+    Zones and instances that failed before their disk was cloned have no
+    such dataset; any other zfs failure is raised.
+    """
+    try:
+        utils.execute("zfs", "destroy", _instance_disk_name(instance_uuid))
+    except exception.ProcessExecutionError as e:
+        if 'dataset does not exist' not in (e.stderr or ''):
+            raise
+
+
 class KVMImage(image.Image):
 
-    def register_image(self):
+    def zvol_name(self):
+        return "zones/%s" % self.image_uuid
+
+    def zvol_device(self):
+        return "/dev/zvol/rdsk/%s" % self.zvol_name()
+
+    def fetch_image(self):
+        """Write the image from glance into a new zvol and snapshot it.
+
+        Raw images are streamed straight into the zvol.  Other formats
+        are fetched once and converted into the zvol by qemu-img.
+        """
         LOG.debug("Doing the -KVM- thing")
+        if self.disk_format == 'raw':
+            self._create_zvol(self.image_size)
+            try:
+                self._stream_to_zvol()
+            except Exception:
+                with excutils.save_and_reraise_exception():
+                    self._destroy_zvol()
+        else:
+            image_temp_target = "/tmp/%s-tmp-img" % self.image_uuid
+            images.fetch(self.context, self.image_uuid, image_temp_target,
+                         self.user_id, self.tenant_id)
+            try:
+                data = images.qemu_img_info(image_temp_target)
+                self.image_size = data.virtual_size
+                self._create_zvol(self.image_size)
+                try:
+                    images.convert_image(image_temp_target,
+                                         self.zvol_device(), 'raw')
+                except Exception:
+                    with excutils.save_and_reraise_exception():
+                        self._destroy_zvol()
+            finally:
+                utils.delete_if_exists(image_temp_target)
 
-        # Get the actual file sizse from file (the image might have been
-        # converted from qcow2 to raw)
-        # and thus become bigger
-        self.image_size = os.path.getsize(self.image_temp_target)
-        image_size_in_mb = (int(self.image_size) / 1024 / 1024) + 1
-
-        utils.execute("zfs", "create", "-V", "%sM" % image_size_in_mb,
-            "zones/%s" % self.image_uuid)
-        utils.execute("dd", "if=%s" % self.image_temp_target,
-            "of=/dev/zvol/rdsk/zones/%s" % self.image_uuid)
-        utils.execute("zfs", "snapshot", "zones/%s@dataset" % self.image_uuid)
+        utils.execute("zfs", "snapshot", "%s@dataset" % self.zvol_name())
         manifest_file = "/var/db/imgadm/%s.json" % self.image_uuid
         self.write_manifest_file(manifest_file)
 
@@ -49,6 +97,27 @@ class KVMImage(image.Image):
         # utils.execute("imgadm","install","-m", manifest_file, "-f",
         # image_temp_target)
 
+    def _create_zvol(self, size):
+        utils.execute("zfs", "create", "-V", "%sM" % _bytes_to_mb(size),
+            self.zvol_name())
+
+    def _destroy_zvol(self):
+        utils.execute("zfs", "destroy", "-r", self.zvol_name())
+
+    def _stream_to_zvol(self):
+        (image_service, image_id) = glance.get_remote_image_service(
+                self.context, self.image_uuid)
+        with open(self.zvol_device(), "wb") as zvol:
+            image_service.download(self.context, image_id, zvol)
+
+    def clone_disk(self, instance_uuid):
+        """Provision the boot disk of an instance as a ZFS clone of the
+        image snapshot and return its device path.
+        """
+        disk = _instance_disk_name(instance_uuid)
+        utils.execute("zfs", "clone", "%s@dataset" % self.zvol_name(), disk)
+        return "/dev/zvol/rdsk/%s" % disk
+
     def create_manifest(self):
         return {
   "name": "cirros",
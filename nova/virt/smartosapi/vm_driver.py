@@ -15,17 +15,23 @@
 #    License for the specific language governing permissions and limitations
 #    under the License.
 
+from oslo.config import cfg
+
 from nova.openstack.common import log as logging
 from nova.openstack.common import jsonutils
 from nova import utils
 
 LOG = logging.getLogger(__name__)
 
+CONF = cfg.CONF
+CONF.import_opt('smartos_vmadm_path', 'nova.virt.smartosapi.inventory')
+
 
 class VmDriver(object):
 
     def __init__(self, instance, image, nics):
         self.instance = instance
+        self.image = image
         self.image_id = image.uuid()
         self.image_size = image.size()
         self.nics = nics
@@ -38,5 +44,5 @@ class VmDriver(object):
         machine_file = "/tmp/machine-%s.json" % self.instance['uuid']
         with open(machine_file, "w") as f:
             f.write(jsonutils.dumps(self.startinfo()))
-        utils.execute("vmadm", "create", "-f", machine_file)
+        utils.execute(CONF.smartos_vmadm_path, "create", "-f", machine_file)
         LOG.debug("-- HXO -- done booting")
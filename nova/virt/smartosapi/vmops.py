@@ -18,9 +18,13 @@
 
 import uuid
 
+from oslo.config import cfg
+
+from nova import exception
 from nova.openstack.common import log as logging
 from nova import utils
 
+from nova.virt.smartosapi import inventory
 from nova.virt.smartosapi import zone_image
 from nova.virt.smartosapi import kvm_image
 
@@ -29,24 +33,39 @@ from nova.virt.smartosapi import kvm_driver
 
 LOG = logging.getLogger(__name__)
 
+CONF = cfg.CONF
+CONF.import_opt('smartos_vmadm_path', 'nova.virt.smartosapi.inventory')
+
 
 class SmartOSOps(object):
 
+    def __init__(self, vmadm_inventory=None):
+        if vmadm_inventory is None:
+            vmadm_inventory = inventory.VmadmInventory()
+        self._inventory = vmadm_inventory
+
     def list_instances(self):
-        return []
+        return [vm['alias'] or vm['uuid']
+                for vm in self._inventory.get_vms().itervalues()]
 
     def list_instances_uuids(self):
-        return []
+        return self._inventory.get_vms().keys()
+
+    def get_num_instances(self):
+        return len(self._inventory.get_vms())
+
+    def instance_exists(self, instance_id):
+        return self._inventory.get_vm(instance_id) is not None
 
     def get_info(self, instance):
-        # TODO: Replace with real request to data instead of dummy values
-        (state, max_mem, mem, num_cpu, cpu_time) = ('running', 512, 512, 1,
-                                                    12)
-        return {'state': state,
-             'max_mem': max_mem,
-             'mem': mem,
-             'num_cpu': num_cpu,
-             'cpu_time': cpu_time}
+        vm = self._inventory.get_vm(instance['uuid'])
+        if vm is None:
+            raise exception.InstanceNotFound(instance_id=instance['uuid'])
+        return {'state': vm['power_state'],
+                'max_mem': vm['ram'] * 1024,
+                'mem': vm['ram'] * 1024,
+                'num_cpu': vm['vcpus'],
+                'cpu_time': 0}
 
     def get_image_handler_and_driver(self, context, image_meta, instance,
                                      nics):
@@ -65,7 +84,8 @@ class SmartOSOps(object):
             driver = zone_driver.ZoneDriver(instance, image, nics)
         else:
             image = kvm_image.KVMImage(context, image_id, image_meta['size'],
-                instance['user_id'], instance['project_id'])
+                instance['user_id'], instance['project_id'],
+                disk_format=image_meta.get('disk_format'))
             driver = kvm_driver.KVMDriver(instance, image, nics)
         return image, driver
 
@@ -82,7 +102,10 @@ class SmartOSOps(object):
         (image, driver) = self.get_image_handler_and_driver(context,
             image_meta, instance, nics)
         image.ensure_created()
-        driver.boot()
+        try:
+            driver.boot()
+        finally:
+            self._inventory.invalidate()
 
     def plug_vifs(self, instance, network_info):
         """Plug VIFs into networks."""
@@ -93,12 +116,13 @@ class SmartOSOps(object):
         print network_info
 
     def destroy(self, instance, network_info):
-        (exists, stderr) = utils.execute("vmadm", "lookup",
-            "uuid=%s" % instance['uuid'])
-        if len(exists) > 0:
-            utils.execute("vmadm", "delete", instance['uuid'])
-            #if kvm_vm:
-            #    image_uuid =
-            #    utils.execute("zfs","destroy","zones/%s@%s-disk0" % (
-            # image_uuid, instance_uuid)
+        if self._inventory.get_vm(instance['uuid']) is not None:
+            try:
+                utils.execute(CONF.smartos_vmadm_path, "delete",
+                              instance['uuid'])
+            finally:
+                self._inventory.invalidate()
+            # KVM boot disks are clones of the cached image that vmadm
+            # did not create.
+            kvm_image.destroy_instance_disk(instance['uuid'])
         LOG.debug("Deleted %s" % instance['uuid'])
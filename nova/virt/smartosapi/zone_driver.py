@@ -24,6 +24,7 @@ class ZoneDriver(VmDriver):
     def startinfo(self):
         return {
            "brand": "joyent",
+           "alias": self.instance['name'],
            "hostname": (self.instance['name'] or self.instance['uuid']),
            "max_physical_memory": self.instance['memory_mb'],
            "dataset_uuid": self.image_id,
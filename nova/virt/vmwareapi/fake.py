@@ -35,6 +35,10 @@ _FAKE_FILE_SIZE = 1024
 
 _db_content = {}
 
+# Number of calls made to each VIM API method, used by the tests to count
+# round-trips to the ESX/VC host.
+_call_counts = {}
+
 LOG = logging.getLogger(__name__)
 
 
@@ -54,6 +58,7 @@ def reset():
             _db_content[c] = []
         else:
             _db_content[c] = {}
+    _call_counts.clear()
     create_network()
     create_host_network_system()
     create_host()
@@ -66,6 +71,17 @@ def cleanup():
     """Clear the db contents."""
     for c in _CLASSES:
         _db_content[c] = {}
+    _call_counts.clear()
+
+
+def reset_call_counts():
+    """Resets the VIM API call counters."""
+    _call_counts.clear()
+
+
+def get_call_count(method):
+    """Returns the number of calls made to the VIM API method."""
+    return _call_counts.get(method, 0)
 
 
 def _create_object(table, table_obj):
@@ -709,6 +725,7 @@ class FakeVim(object):
         host_mdo._add_port_group(kwargs.get("portgrp"))
 
     def __getattr__(self, attr_name):
+        _call_counts[attr_name] = _call_counts.get(attr_name, 0) + 1
         if attr_name != "Login":
             self._check_session()
         if attr_name == "Login":
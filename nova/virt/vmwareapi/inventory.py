@@ -0,0 +1,167 @@
+# vim: tabstop=4 shiftwidth=4 softtabstop=4
+
+# Copyright (c) 2013 OpenStack Foundation
+#
+#    Licensed under the Apache License, Version 2.0 (the "License"); you may
+#    not use this file except in compliance with the License. You may obtain
+#    a copy of the License at
+#
+#         http://www.apache.org/licenses/LICENSE-2.0
+#
+#    Unless required by applicable law or agreed to in writing, software
+#    distributed under the License is distributed on an "AS IS" BASIS, WITHOUT
+#    WARRANTIES OR CONDITIONS OF ANY KIND, either express or implied. See the
+#    License for the specific language governing permissions and limitations
+#    under the License.
+
+"""
+In-memory cache of the VMware inventory used by the driver.
+
+Instead of issuing a RetrieveProperties round-trip for every VM name, power
+state or datacenter lookup, the VirtualMachine inventory is collected with a
+single bulk RetrieveProperties call and answered from memory until it is
+older than vmwareapi_inventory_cache_ttl seconds or explicitly invalidated.
+"""
+
+from oslo.config import cfg
+
+from nova.openstack.common import log as logging
+from nova.openstack.common import timeutils
+from nova.virt.vmwareapi import vim_util
+
+inventory_opts = [
+    cfg.IntOpt('vmwareapi_inventory_cache_ttl',
+               default=10,
+               help='Number of seconds the VirtualMachine inventory, '
+                    'datacenter and resource pool collected from the ESX/VC '
+                    'host are served from memory before being refreshed. '
+                    'Set to 0 to disable caching. '
+                    'Used only if compute_driver is '
+                    'vmwareapi.VMwareESXDriver or vmwareapi.VMwareVCDriver.'),
+    ]
+
+CONF = cfg.CONF
+CONF.register_opts(inventory_opts)
+
+LOG = logging.getLogger(__name__)
+
+VM_PROPERTIES = ["name", "runtime.connectionState", "runtime.powerState",
+                 "summary.config.numCpu", "summary.config.memorySizeMB"]
+
+
+class VMwareInventoryCache(object):
+    """Answers inventory lookups from a bulk property collector snapshot."""
+
+    def __init__(self, session, cluster=None):
+        self._session = session
+        self._cluster = cluster
+        self._vms = None
+        self._updated_at = None
+        self._datacenter = None
+        self._datacenter_updated_at = None
+        self._res_pool_ref = None
+        self._res_pool_updated_at = None
+
+    def invalidate(self):
+        """Forget the VirtualMachine snapshot.
+
+        Called after any operation that creates, removes, renames or
+        changes the power state of a VM, so that the next lookup reflects
+        the change.
+        """
+        self._vms = None
+        self._updated_at = None
+
+    @staticmethod
+    def _expired(updated_at):
+        return (updated_at is None or
+                timeutils.is_older_than(updated_at,
+                                        CONF.vmwareapi_inventory_cache_ttl))
+
+    def _is_stale(self):
+        if self._vms is None:
+            return True
+        return self._expired(self._updated_at)
+
+    def refresh(self):
+        """Collect the VirtualMachine inventory in one round-trip."""
+        LOG.debug(_("Refreshing the VirtualMachine inventory cache"))
+        vms = {}
+        objects = self._session._call_method(vim_util, "get_objects",
+                                             "VirtualMachine", VM_PROPERTIES)
+        for obj in objects:
+            props = {}
+            for prop in getattr(obj, 'propSet', None) or []:
+                props[prop.name] = prop.val
+            vms[props.get("name")] = (obj.obj, props)
+        self._vms = vms
+        self._updated_at = timeutils.utcnow()
+
+    def _get_vms(self):
+        if self._is_stale():
+            self.refresh()
+        return self._vms
+
+    def get_vms(self):
+        """Return a dict of VM name to (vm_ref, property dict)."""
+        return dict(self._get_vms())
+
+    def get_vm(self, vm_name):
+        """Return (vm_ref, property dict) for a VM, or None.
+
+        A VM missing from a cached snapshot may have been created since it
+        was collected, so a miss triggers one refresh before giving up.
+        """
+        fresh = self._is_stale()
+        vm = self._get_vms().get(vm_name)
+        if vm is None and not fresh:
+            self.refresh()
+            vm = self._vms.get(vm_name)
+        return vm
+
+    def get_vm_ref(self, vm_name):
+        """Return the reference of the VM with the given name, or None."""
+        vm = self.get_vm(vm_name)
+        if vm is None:
+            return None
+        return vm[0]
+
+    def _get_datacenter(self):
+        if (self._datacenter is None or
+                self._expired(self._datacenter_updated_at)):
+            dc_objs = self._session._call_method(vim_util, "get_objects",
+                                                 "Datacenter",
+                                                 ["name", "vmFolder"])
+            # There is only one default datacenter in a standalone ESX host
+            dc_obj = dc_objs[0]
+            props = {}
+            for prop in dc_obj.propSet:
+                props[prop.name] = prop.val
+            self._datacenter = (dc_obj.obj, props["name"], props["vmFolder"])
+            self._datacenter_updated_at = timeutils.utcnow()
+        return self._datacenter
+
+    def get_datacenter_ref_and_name(self):
+        """Return the reference and name of the datacenter."""
+        dc_ref, dc_name, vm_folder_ref = self._get_datacenter()
+        return dc_ref, dc_name
+
+    def get_vmfolder_ref(self):
+        """Return the reference of the datacenter VM folder."""
+        return self._get_datacenter()[2]
+
+    def get_res_pool_ref(self):
+        """Return the reference of the resource pool to spawn VMs in."""
+        if (self._res_pool_ref is None or
+                self._expired(self._res_pool_updated_at)):
+            # Taking the first resource pool coming our way. Assuming that is
+            # the default resource pool.
+            if self._cluster is None:
+                self._res_pool_ref = self._session._call_method(
+                        vim_util, "get_objects", "ResourcePool")[0].obj
+            else:
+                self._res_pool_ref = self._session._call_method(
+                        vim_util, "get_dynamic_property", self._cluster,
+                        "ClusterComputeResource", "resourcePool")
+            self._res_pool_updated_at = timeutils.utcnow()
+        return self._res_pool_ref
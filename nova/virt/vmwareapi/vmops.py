@@ -38,6 +38,7 @@ from nova import exception
 from nova.openstack.common import excutils
 from nova.openstack.common import log as logging
 from nova.virt import driver
+from nova.virt.vmwareapi import inventory
 from nova.virt.vmwareapi import network_util
 from nova.virt.vmwareapi import vif as vmwarevif
 from nova.virt.vmwareapi import vim_util
@@ -86,26 +87,31 @@ class VMwareVMOps(object):
         else:
             self._cluster = vm_util.get_cluster_ref_from_name(
                                         self._session, cluster_name)
+        self._inventory = inventory.VMwareInventoryCache(self._session,
+                                                         self._cluster)
         self._instance_path_base = VMWARE_PREFIX + CONF.base_dir_name
         self._default_root_device = 'vda'
         self._rescue_suffix = '-rescue'
         self._poll_rescue_last_ran = None
 
+    def _wait_for_vm_task(self, instance_uuid, task_ref):
+        """Wait for a task that changes a VM, then drop the inventory cache.
+
+        The cache is invalidated even when the task fails, since a failed
+        task may still have half-created or half-destroyed the VM.
+        """
+        try:
+            self._session._wait_for_task(instance_uuid, task_ref)
+        finally:
+            self._inventory.invalidate()
+
     def list_instances(self):
         """Lists the VM instances that are registered with the ESX host."""
         LOG.debug(_("Getting list of instances"))
-        vms = self._session._call_method(vim_util, "get_objects",
-                     "VirtualMachine",
-                     ["name", "runtime.connectionState"])
+        vms = self._inventory.get_vms()
         lst_vm_names = []
-        for vm in vms:
-            vm_name = None
-            conn_state = None
-            for prop in vm.propSet:
-                if prop.name == "name":
-                    vm_name = prop.val
-                elif prop.name == "runtime.connectionState":
-                    conn_state = prop.val
+        for vm_name, (vm_ref, props) in vms.iteritems():
+            conn_state = props.get("runtime.connectionState")
             # Ignoring the orphaned or inaccessible VMs
             if conn_state not in ["orphaned", "inaccessible"]:
                 lst_vm_names.append(vm_name)
@@ -134,7 +140,7 @@ class VMwareVMOps(object):
         4. Attach the disk to the VM by reconfiguring the same.
         5. Power on the VM.
         """
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref:
             raise exception.InstanceExists(name=instance['name'])
 
@@ -210,12 +216,12 @@ class VMwareVMOps(object):
                                     self._session._get_vim(),
                                     "CreateVM_Task", vm_folder_ref,
                                     config=config_spec, pool=res_pool_ref)
-            self._session._wait_for_task(instance['uuid'], vm_create_task)
+            self._wait_for_vm_task(instance['uuid'], vm_create_task)
 
             LOG.debug(_("Created VM on the ESX host"), instance=instance)
 
         _execute_create_vm()
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
 
         # Set the machine.id parameter of the instance to inject
         # the NIC configuration inside the VM
@@ -425,7 +431,7 @@ class VMwareVMOps(object):
             power_on_task = self._session._call_method(
                                self._session._get_vim(),
                                "PowerOnVM_Task", vm_ref)
-            self._session._wait_for_task(instance['uuid'], power_on_task)
+            self._wait_for_vm_task(instance['uuid'], power_on_task)
             LOG.debug(_("Powered on the VM instance"), instance=instance)
         _power_on_vm()
 
@@ -444,7 +450,7 @@ class VMwareVMOps(object):
         4. Now upload the -flat.vmdk file to the image store.
         5. Delete the coalesced .vmdk and -flat.vmdk created.
         """
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
@@ -592,7 +598,7 @@ class VMwareVMOps(object):
 
     def reboot(self, instance, network_info):
         """Reboot a VM instance."""
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
@@ -632,7 +638,7 @@ class VMwareVMOps(object):
             LOG.debug(_("Doing hard reboot of VM"), instance=instance)
             reset_task = self._session._call_method(self._session._get_vim(),
                                                     "ResetVM_Task", vm_ref)
-            self._session._wait_for_task(instance['uuid'], reset_task)
+            self._wait_for_vm_task(instance['uuid'], reset_task)
             LOG.debug(_("Did hard reboot of VM"), instance=instance)
 
     def _delete(self, instance, network_info):
@@ -642,8 +648,7 @@ class VMwareVMOps(object):
         2. Destroy the VM.
         """
         try:
-            vm_ref = vm_util.get_vm_ref_from_name(self._session,
-                                                  instance['name'])
+            vm_ref = self._inventory.get_vm_ref(instance['name'])
             if vm_ref is None:
                 LOG.debug(_("instance not present"), instance=instance)
                 return
@@ -655,7 +660,7 @@ class VMwareVMOps(object):
                 destroy_task = self._session._call_method(
                     self._session._get_vim(),
                     "Destroy_Task", vm_ref)
-                self._session._wait_for_task(instance['uuid'], destroy_task)
+                self._wait_for_vm_task(instance['uuid'], destroy_task)
                 LOG.debug(_("Destroyed the VM"), instance=instance)
             except Exception, excep:
                 LOG.warn(_("In vmwareapi:vmops:delete, got this exception"
@@ -674,8 +679,7 @@ class VMwareVMOps(object):
         3. Delete the contents of the folder holding the VM related data.
         """
         try:
-            vm_ref = vm_util.get_vm_ref_from_name(self._session,
-                                                  instance['name'])
+            vm_ref = self._inventory.get_vm_ref(instance['name'])
             if vm_ref is None:
                 LOG.debug(_("instance not present"), instance=instance)
                 return
@@ -700,14 +704,17 @@ class VMwareVMOps(object):
                 poweroff_task = self._session._call_method(
                        self._session._get_vim(),
                        "PowerOffVM_Task", vm_ref)
-                self._session._wait_for_task(instance['uuid'], poweroff_task)
+                self._wait_for_vm_task(instance['uuid'], poweroff_task)
                 LOG.debug(_("Powered off the VM"), instance=instance)
 
             # Un-register the VM
             try:
                 LOG.debug(_("Unregistering the VM"), instance=instance)
-                self._session._call_method(self._session._get_vim(),
-                                           "UnregisterVM", vm_ref)
+                try:
+                    self._session._call_method(self._session._get_vim(),
+                                               "UnregisterVM", vm_ref)
+                finally:
+                    self._inventory.invalidate()
                 LOG.debug(_("Unregistered the VM"), instance=instance)
             except Exception, excep:
                 LOG.warn(_("In vmwareapi:vmops:destroy, got this exception"
@@ -757,7 +764,7 @@ class VMwareVMOps(object):
 
     def suspend(self, instance):
         """Suspend the specified instance."""
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
@@ -769,7 +776,7 @@ class VMwareVMOps(object):
             LOG.debug(_("Suspending the VM"), instance=instance)
             suspend_task = self._session._call_method(self._session._get_vim(),
                     "SuspendVM_Task", vm_ref)
-            self._session._wait_for_task(instance['uuid'], suspend_task)
+            self._wait_for_vm_task(instance['uuid'], suspend_task)
             LOG.debug(_("Suspended the VM"), instance=instance)
         # Raise Exception if VM is poweredOff
         elif pwr_state == "poweredOff":
@@ -781,7 +788,7 @@ class VMwareVMOps(object):
 
     def resume(self, instance):
         """Resume the specified instance."""
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
@@ -793,7 +800,7 @@ class VMwareVMOps(object):
             suspend_task = self._session._call_method(
                                         self._session._get_vim(),
                                        "PowerOnVM_Task", vm_ref)
-            self._session._wait_for_task(instance['uuid'], suspend_task)
+            self._wait_for_vm_task(instance['uuid'], suspend_task)
             LOG.debug(_("Resumed the VM"), instance=instance)
         else:
             reason = _("instance is not in a suspended state")
@@ -806,7 +813,7 @@ class VMwareVMOps(object):
             - spawn a rescue VM (the vm name-label will be instance-N-rescue).
 
         """
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
@@ -822,8 +829,7 @@ class VMwareVMOps(object):
             = vm_util.get_vmdk_path_and_adapter_type(hardware_devices)
         # Figure out the correct unit number
         unit_number = unit_number + 1
-        rescue_vm_ref = vm_util.get_vm_ref_from_name(self._session,
-                                                     instance['name'])
+        rescue_vm_ref = self._inventory.get_vm_ref(instance['name'])
         self._volumeops.attach_disk_to_vm(
                                 rescue_vm_ref, instance,
                                 adapter_type, disk_type, vmdk_path,
@@ -840,7 +846,7 @@ class VMwareVMOps(object):
 
     def power_off(self, instance):
         """Power off the specified instance."""
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
@@ -853,7 +859,7 @@ class VMwareVMOps(object):
             poweroff_task = self._session._call_method(
                                         self._session._get_vim(),
                                         "PowerOffVM_Task", vm_ref)
-            self._session._wait_for_task(instance['uuid'], poweroff_task)
+            self._wait_for_vm_task(instance['uuid'], poweroff_task)
             LOG.debug(_("Powered off the VM"), instance=instance)
         # Raise Exception if VM is suspended
         elif pwr_state == "suspended":
@@ -865,7 +871,7 @@ class VMwareVMOps(object):
 
     def power_on(self, instance):
         """Power on the specified instance."""
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
@@ -881,7 +887,7 @@ class VMwareVMOps(object):
             poweron_task = self._session._call_method(
                                         self._session._get_vim(),
                                         "PowerOnVM_Task", vm_ref)
-            self._session._wait_for_task(instance['uuid'], poweron_task)
+            self._wait_for_vm_task(instance['uuid'], poweron_task)
             LOG.debug(_("Powered on the VM"), instance=instance)
 
     def _get_orig_vm_name_label(self, instance):
@@ -915,7 +921,7 @@ class VMwareVMOps(object):
                                        step=0,
                                        total_steps=RESIZE_TOTAL_STEPS)
 
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['name'])
         host_ref = self._get_host_ref_from_name(dest)
@@ -935,7 +941,7 @@ class VMwareVMOps(object):
         rename_task = self._session._call_method(
                             self._session._get_vim(),
                             "Rename_Task", vm_ref, newName=name_label)
-        self._session._wait_for_task(instance['uuid'], rename_task)
+        self._wait_for_vm_task(instance['uuid'], rename_task)
         LOG.debug(_("Renamed the VM to %s") % name_label,
                   instance=instance)
         self._update_instance_progress(context, instance,
@@ -958,7 +964,7 @@ class VMwareVMOps(object):
                                 folder=vm_folder_ref,
                                 name=instance['name'],
                                 spec=clone_spec)
-        self._session._wait_for_task(instance['uuid'], vm_clone_task)
+        self._wait_for_vm_task(instance['uuid'], vm_clone_task)
         LOG.debug(_("Cloned VM to host %s") % dest, instance=instance)
         self._update_instance_progress(context, instance,
                                        step=3,
@@ -968,7 +974,7 @@ class VMwareVMOps(object):
         """Confirms a resize, destroying the source VM."""
         instance_name = self._get_orig_vm_name_label(instance)
         # Destroy the original VM.
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance_name)
+        vm_ref = self._inventory.get_vm_ref(instance_name)
         if vm_ref is None:
             LOG.debug(_("instance not present"), instance=instance)
             return
@@ -978,7 +984,7 @@ class VMwareVMOps(object):
             destroy_task = self._session._call_method(
                                         self._session._get_vim(),
                                         "Destroy_Task", vm_ref)
-            self._session._wait_for_task(instance['uuid'], destroy_task)
+            self._wait_for_vm_task(instance['uuid'], destroy_task)
             LOG.debug(_("Destroyed the VM"), instance=instance)
         except Exception, excep:
             LOG.warn(_("In vmwareapi:vmops:confirm_migration, got this "
@@ -992,7 +998,7 @@ class VMwareVMOps(object):
         # The original vm was suffixed with '-orig'; find it using
         # the old suffix, remove the suffix, then power it back on.
         name_label = self._get_orig_vm_name_label(instance)
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, name_label)
+        vm_ref = self._inventory.get_vm_ref(name_label)
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=name_label)
 
@@ -1001,7 +1007,7 @@ class VMwareVMOps(object):
         rename_task = self._session._call_method(
                             self._session._get_vim(),
                             "Rename_Task", vm_ref, newName=instance['name'])
-        self._session._wait_for_task(instance['uuid'], rename_task)
+        self._wait_for_vm_task(instance['uuid'], rename_task)
         LOG.debug(_("Renamed the VM from %s") % name_label,
                   instance=instance)
         self.power_on(instance)
@@ -1018,7 +1024,7 @@ class VMwareVMOps(object):
     def live_migration(self, context, instance_ref, dest,
                        post_method, recover_method, block_migration=False):
         """Spawning live_migration operation for distributing high-load."""
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance_ref.name)
+        vm_ref = self._inventory.get_vm_ref(instance_ref.name)
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance_ref.name)
         host_ref = self._get_host_ref_from_name(dest)
@@ -1032,7 +1038,7 @@ class VMwareVMOps(object):
                                     "MigrateVM_Task", vm_ref,
                                     host=host_ref,
                                     priority="defaultPriority")
-            self._session._wait_for_task(instance_ref['uuid'], vm_migrate_task)
+            self._wait_for_vm_task(instance_ref['uuid'], vm_migrate_task)
         except Exception:
             with excutils.save_and_reraise_exception():
                 recover_method(context, instance_ref, dest, block_migration)
@@ -1056,28 +1062,21 @@ class VMwareVMOps(object):
 
     def get_info(self, instance):
         """Return data about the VM instance."""
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
-        if vm_ref is None:
+        vm = self._inventory.get_vm(instance['name'])
+        if vm is None:
             raise exception.InstanceNotFound(instance_id=instance['name'])
 
-        lst_properties = ["summary.config.numCpu",
-                    "summary.config.memorySizeMB",
-                    "runtime.powerState"]
-        vm_props = self._session._call_method(vim_util,
-                    "get_object_properties", None, vm_ref, "VirtualMachine",
-                    lst_properties)
+        vm_props = vm[1]
         max_mem = None
         pwr_state = None
         num_cpu = None
-        for elem in vm_props:
-            for prop in elem.propSet:
-                if prop.name == "summary.config.numCpu":
-                    num_cpu = int(prop.val)
-                elif prop.name == "summary.config.memorySizeMB":
-                    # In MB, but we want in KB
-                    max_mem = int(prop.val) * 1024
-                elif prop.name == "runtime.powerState":
-                    pwr_state = VMWARE_POWER_STATES[prop.val]
+        if vm_props.get("summary.config.numCpu") is not None:
+            num_cpu = int(vm_props["summary.config.numCpu"])
+        if vm_props.get("summary.config.memorySizeMB") is not None:
+            # In MB, but we want in KB
+            max_mem = int(vm_props["summary.config.memorySizeMB"]) * 1024
+        if vm_props.get("runtime.powerState") is not None:
+            pwr_state = VMWARE_POWER_STATES[vm_props["runtime.powerState"]]
 
         return {'state': pwr_state,
                 'max_mem': max_mem,
@@ -1092,7 +1091,7 @@ class VMwareVMOps(object):
 
     def get_console_output(self, instance):
         """Return snapshot of console."""
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
         param_list = {"id": str(vm_ref)}
@@ -1113,7 +1112,7 @@ class VMwareVMOps(object):
 
     def get_vnc_console(self, instance):
         """Return connection info for a vnc console."""
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
@@ -1161,7 +1160,7 @@ class VMwareVMOps(object):
         Set the machine id of the VM for guest tools to pick up and reconfigure
         the network interfaces.
         """
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
@@ -1182,7 +1181,7 @@ class VMwareVMOps(object):
         """
         Set the vnc configuration of the VM.
         """
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance['name'])
+        vm_ref = self._inventory.get_vm_ref(instance['name'])
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance['uuid'])
 
@@ -1202,9 +1201,7 @@ class VMwareVMOps(object):
 
     def _get_datacenter_ref_and_name(self):
         """Get the datacenter name and the reference."""
-        dc_obj = self._session._call_method(vim_util, "get_objects",
-                "Datacenter", ["name"])
-        return dc_obj[0].obj, dc_obj[0].propSet[0].val
+        return self._inventory.get_datacenter_ref_and_name()
 
     def _get_host_ref_from_name(self, host_name):
         """Get reference to the host with the name specified."""
@@ -1217,25 +1214,11 @@ class VMwareVMOps(object):
 
     def _get_vmfolder_ref(self):
         """Get the Vm folder ref from the datacenter."""
-        dc_objs = self._session._call_method(vim_util, "get_objects",
-                                             "Datacenter", ["vmFolder"])
-        # There is only one default datacenter in a standalone ESX host
-        vm_folder_ref = dc_objs[0].propSet[0].val
-        return vm_folder_ref
+        return self._inventory.get_vmfolder_ref()
 
     def _get_res_pool_ref(self):
-        # Get the resource pool. Taking the first resource pool coming our
-        # way. Assuming that is the default resource pool.
-        if self._cluster is None:
-            res_pool_ref = self._session._call_method(vim_util, "get_objects",
-                                                      "ResourcePool")[0].obj
-        else:
-            res_pool_ref = self._session._call_method(vim_util,
-                                                      "get_dynamic_property",
-                                                      self._cluster,
-                                                      "ClusterComputeResource",
-                                                      "resourcePool")
-        return res_pool_ref
+        """Get the resource pool to spawn the VMs in."""
+        return self._inventory.get_res_pool_ref()
 
     def _path_exists(self, ds_browser, ds_path):
         """Check if the path exists on the datastore."""
@@ -1338,7 +1321,7 @@ class VMwareVMOps(object):
         interface_stats).  These IDs only need to be unique for a given
         instance.
         """
-        vm_ref = vm_util.get_vm_ref_from_name(self._session, instance_name)
+        vm_ref = self._inventory.get_vm_ref(instance_name)
         if vm_ref is None:
             raise exception.InstanceNotFound(instance_id=instance_name)
 
@@ -20,6 +20,7 @@
 Handles all requests relating to volumes + cinder.
 """
 
+import contextlib
 import copy
 import sys
 
@@ -55,6 +56,15 @@ cinder_opts = [
                default=True,
                help='Allow attach between instance and volume in different '
                     'availability zones.'),
+    cfg.IntOpt('cinder_client_pool_size',
+               default=10,
+               help='Maximum number of idle cinderclient connections kept '
+                    'per cinder endpoint'),
+    cfg.IntOpt('cinder_list_volumes_threshold',
+               default=5,
+               help='Number of volumes above which looking several volumes '
+                    'up lists all the volumes of the project in a single '
+                    'request rather than getting each volume on its own'),
 ]
 
 CONF = cfg.CONF
@@ -63,8 +73,7 @@ CONF.register_opts(cinder_opts)
 LOG = logging.getLogger(__name__)
 
 
-def cinderclient(context):
-
+def _get_cinder_url(context):
     # FIXME: the cinderclient ServiceCatalog object is mis-named.
     #        It actually contains the entire access blob.
     # Only needed parts of the service catalog are passed in, see
@@ -90,20 +99,63 @@ def cinderclient(context):
                          service_type=service_type,
                          service_name=service_name,
                          endpoint_type=endpoint_type)
+    return url
+
+
+class ClientPool(object):
+    """Pool of idle cinder clients, per endpoint.
+
+    Building a client for every call means a new HTTP connection for every
+    call. Clients are checked out for the duration of a call, so that the
+    credentials of one request context never leak into another, and are
+    then kept for reuse with their connection to the endpoint.
+    """
+
+    def __init__(self):
+        self._idle = {}
+
+    @contextlib.contextmanager
+    def client(self, context):
+        url = _get_cinder_url(context)
+        key = (url, CONF.cinder_api_insecure, CONF.cinder_http_retries)
+        idle = self._idle.setdefault(key, [])
+        if idle:
+            c = idle.pop()
+        else:
+            LOG.debug(_('Cinderclient connection created using URL: %s')
+                      % url)
+            c = cinder_client.Client(context.user_id,
+                                     context.auth_token,
+                                     project_id=context.project_id,
+                                     auth_url=url,
+                                     insecure=CONF.cinder_api_insecure,
+                                     retries=CONF.cinder_http_retries)
+        c.client.user = context.user_id
+        c.client.password = context.auth_token
+        c.client.projectid = context.project_id
+        # noauth extracts user_id:project_id from auth_token
+        c.client.auth_token = (context.auth_token or
+                               '%s:%s' % (context.user_id,
+                                          context.project_id))
+        c.client.management_url = url
+        try:
+            yield c
+        finally:
+            c.client.password = None
+            c.client.auth_token = None
+            if len(idle) < CONF.cinder_client_pool_size:
+                idle.append(c)
 
-    LOG.debug(_('Cinderclient connection created using URL: %s') % url)
 
-    c = cinder_client.Client(context.user_id,
-                             context.auth_token,
-                             project_id=context.project_id,
-                             auth_url=url,
-                             insecure=CONF.cinder_api_insecure,
-                             retries=CONF.cinder_http_retries)
-    # noauth extracts user_id:project_id from auth_token
-    c.client.auth_token = context.auth_token or '%s:%s' % (context.user_id,
-                                                           context.project_id)
-    c.client.management_url = url
-    return c
+_CLIENT_POOL = ClientPool()
+
+
+def cinderclient(context):
+    """Check a cinderclient for the context out of the pool.
+
+    To be used as a context manager, for the duration of one call.
+    """
+    return _CLIENT_POOL.client(context)
 
 
 def _untranslate_volume_summary_view(context, vol):
@@ -187,13 +239,15 @@ class API(base.Base):
 
     def get(self, context, volume_id):
         try:
-            item = cinderclient(context).volumes.get(volume_id)
+            with cinderclient(context) as client:
+                item = client.volumes.get(volume_id)
             return _untranslate_volume_summary_view(context, item)
         except Exception:
             self._reraise_translated_volume_exception(volume_id)
 
     def get_all(self, context, search_opts={}):
-        items = cinderclient(context).volumes.list(detailed=True)
+        with cinderclient(context) as client:
+            items = client.volumes.list(detailed=True)
         rval = []
 
         for item in items:
@@ -201,6 +255,32 @@ class API(base.Base):
 
         return rval
 
+    def get_many(self, context, volume_ids):
+        """Return a dict of volume id to volume for the given volumes.
+
+        More volumes than cinder_list_volumes_threshold are looked up with
+        a single detailed volume list rather than one request per volume.
+        Volumes missing from the list, such as volumes of other projects
+        seen by an admin, are looked up one by one. Volumes which cannot be
+        found are left out.
+        """
+        volume_ids = set(volume_ids)
+        volumes = {}
+        if len(volume_ids) > CONF.cinder_list_volumes_threshold:
+            with cinderclient(context) as client:
+                items = client.volumes.list(detailed=True)
+            for item in items:
+                if item.id in volume_ids:
+                    volumes[item.id] = _untranslate_volume_summary_view(
+                            context, item)
+
+        for volume_id in volume_ids - set(volumes):
+            try:
+                volumes[volume_id] = self.get(context, volume_id)
+            except exception.VolumeNotFound:
+                pass
+        return volumes
+
     def check_attach(self, context, volume, instance=None):
         # TODO(vish): abstract status checking?
         if volume['status'] != "available":
@@ -221,32 +301,38 @@ class API(base.Base):
             raise exception.InvalidVolume(reason=msg)
 
     def reserve_volume(self, context, volume):
-        cinderclient(context).volumes.reserve(volume['id'])
+        with cinderclient(context) as client:
+            client.volumes.reserve(volume['id'])
 
     def unreserve_volume(self, context, volume):
-        cinderclient(context).volumes.unreserve(volume['id'])
+        with cinderclient(context) as client:
+            client.volumes.unreserve(volume['id'])
 
     def begin_detaching(self, context, volume):
-        cinderclient(context).volumes.begin_detaching(volume['id'])
+        with cinderclient(context) as client:
+            client.volumes.begin_detaching(volume['id'])
 
     def roll_detaching(self, context, volume):
-        cinderclient(context).volumes.roll_detaching(volume['id'])
+        with cinderclient(context) as client:
+            client.volumes.roll_detaching(volume['id'])
 
     def attach(self, context, volume, instance_uuid, mountpoint):
-        cinderclient(context).volumes.attach(volume['id'],
-                                             instance_uuid,
-                                             mountpoint)
+        with cinderclient(context) as client:
+            client.volumes.attach(volume['id'], instance_uuid, mountpoint)
 
     def detach(self, context, volume):
-        cinderclient(context).volumes.detach(volume['id'])
+        with cinderclient(context) as client:
+            client.volumes.detach(volume['id'])
 
     def initialize_connection(self, context, volume, connector):
-        return cinderclient(context).\
-                 volumes.initialize_connection(volume['id'], connector)
+        with cinderclient(context) as client:
+            return client.volumes.initialize_connection(volume['id'],
+                                                        connector)
 
     def terminate_connection(self, context, volume, connector):
-        return cinderclient(context).\
-                 volumes.terminate_connection(volume['id'], connector)
+        with cinderclient(context) as client:
+            return client.volumes.terminate_connection(volume['id'],
+                                                       connector)
 
     def create(self, context, size, name, description, snapshot=None,
                image_id=None, volume_type=None, metadata=None,
@@ -268,23 +354,27 @@ class API(base.Base):
                       imageRef=image_id)
 
         try:
-            item = cinderclient(context).volumes.create(size, **kwargs)
+            with cinderclient(context) as client:
+                item = client.volumes.create(size, **kwargs)
             return _untranslate_volume_summary_view(context, item)
         except Exception:
             self._reraise_translated_volume_exception()
 
     def delete(self, context, volume):
-        cinderclient(context).volumes.delete(volume['id'])
+        with cinderclient(context) as client:
+            client.volumes.delete(volume['id'])
 
     def update(self, context, volume, fields):
         raise NotImplementedError()
 
     def get_snapshot(self, context, snapshot_id):
-        item = cinderclient(context).volume_snapshots.get(snapshot_id)
+        with cinderclient(context) as client:
+            item = client.volume_snapshots.get(snapshot_id)
         return _untranslate_snapshot_summary_view(context, item)
 
     def get_all_snapshots(self, context):
-        items = cinderclient(context).volume_snapshots.list(detailed=True)
+        with cinderclient(context) as client:
+            items = client.volume_snapshots.list(detailed=True)
         rvals = []
 
         for item in items:
@@ -293,22 +383,21 @@ class API(base.Base):
         return rvals
 
     def create_snapshot(self, context, volume, name, description):
-        item = cinderclient(context).volume_snapshots.create(volume['id'],
-                                                             False,
-                                                             name,
-                                                             description)
+        with cinderclient(context) as client:
+            item = client.volume_snapshots.create(volume['id'], False,
+                                                  name, description)
         return _untranslate_snapshot_summary_view(context, item)
 
     def create_snapshot_force(self, context, volume, name, description):
-        item = cinderclient(context).volume_snapshots.create(volume['id'],
-                                                             True,
-                                                             name,
-                                                             description)
+        with cinderclient(context) as client:
+            item = client.volume_snapshots.create(volume['id'], True,
+                                                  name, description)
 
         return _untranslate_snapshot_summary_view(context, item)
 
     def delete_snapshot(self, context, snapshot):
-        cinderclient(context).volume_snapshots.delete(snapshot['id'])
+        with cinderclient(context) as client:
+            client.volume_snapshots.delete(snapshot['id'])
 
     def get_volume_metadata(self, context, volume):
         raise NotImplementedError()